@@ -1,6 +1,72 @@
 # 代码地址 https://github.com/mpquant/MyTT
+import math
+import os
+
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 可选的 Numba 加速：安装了 numba 时递推类循环编译为机器码，否则自动使用纯 Python 实现
+# 设置环境变量 MYTT_NO_NUMBA=1 可强制使用纯 Python 实现
+try:
+    if os.environ.get("MYTT_NO_NUMBA"):
+        raise ImportError
+    from numba import njit as _njit
+except ImportError:
+    _njit = None
+
+
+def _jit(func):  # 递推循环装饰器：优先调用 numba 编译版本，编译或运行失败时回退到原函数
+    if _njit is None:
+        return func
+    compiled = [_njit(cache=True)(func)]
+
+    def wrapper(*args):
+        if compiled[0] is not None:
+            try:
+                return compiled[0](*args)
+            except Exception:
+                compiled[0] = None
+        return func(*args)
+
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+# 所有函数同时支持一维序列和二维 (时间 × 股票) 数组/宽表 DataFrame：沿第0维（时间）计算，各列互不影响
+def _pd(S):  # 一维输入转为 Series，二维输入转为 DataFrame（pandas 的 rolling/ewm/shift 按列计算）
+    return pd.DataFrame(S) if np.ndim(S) == 2 else pd.Series(S)
+
+
+def _time_index(S):  # 与 S 的时间维对齐、可按列广播的序号
+    return np.arange(len(S)).reshape((-1,) + (1,) * (np.ndim(S) - 1))
+
+
+def _prepend(S, value):  # 在时间维前面补一行 value
+    return np.concatenate((np.full((1,) + S.shape[1:], value, dtype=S.dtype), S))
+
+
+def _by_column(loop, *arrays):  # 一维递推内核逐列应用于二维输入，返回值按列拼接
+    if arrays[0].ndim == 1:
+        return loop(*arrays)
+    columns = [np.ascontiguousarray(a.T) for a in arrays]
+    res = [loop(*(c[j] for c in columns)) for j in range(arrays[0].shape[1])]
+    return np.stack(res, axis=1) if res else np.zeros(arrays[0].shape)
+
+
+def _rolling_apply(S, N, func):  # 向量化的 rolling(N).apply：func 作用于最后一维为窗口的视图，窗口未满或含NaN时为NaN
+    S = np.asarray(S, dtype=np.float64)
+    res = np.full(S.shape, np.nan)
+    if N < 1 or len(S) < N:
+        return res
+    nan_count = _prepend(np.cumsum(np.isnan(S), axis=0), 0)
+    valid = nan_count[N:] == nan_count[:-N]
+    windows = sliding_window_view(S, N, axis=0)
+    step = max(1, (1 << 22) // (N * max(1, S[0].size)))  # 分块计算，限制临时数组大小
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i in range(0, len(windows), step):
+            res[N - 1 + i:N - 1 + i + step] = np.where(valid[i:i + step], func(windows[i:i + step]), np.nan)
+    return res
 
 
 # ------------------ 0级：核心工具函数（适配日线数据字段） --------------------------------------------
@@ -49,81 +115,99 @@ def IF(S, A, B): return np.where(S, A, B)  # 布尔判断（S为真返回A，否
 
 
 def REF(S, N=1):  # 序列后移N位（获取历史值，如REF(CLOSE,1)为昨收价）
-    return pd.Series(S).shift(N).values
+    return _pd(S).shift(N).values
 
 
 def DIFF(S, N=1):  # 序列差分（前值-后值，如DIFF(CLOSE)为当日涨跌额）
-    return pd.Series(S).diff(N).values
+    return _pd(S).diff(N).values
 
 
 def STD(S, N):  # N日标准差（如计算波动率）
-    return pd.Series(S).rolling(N).std(ddof=0).values
+    return _pd(S).rolling(N).std(ddof=0).values
 
 
 def SUM(S, N):  # N日累计和（N=0为累加，如计算总成交量）
-    return pd.Series(S).rolling(N).sum().values if N > 0 else pd.Series(S).cumsum().values
+    return _pd(S).rolling(N).sum().values if N > 0 else _pd(S).cumsum().values
 
 
 def CONST(S):  # 序列末尾值扩展为等长常量（如固定基准值）
-    return np.full(len(S), S[-1])
+    return np.full(np.shape(S), np.asarray(S)[-1])
 
 
 def HHV(S, N):  # N日最高价（如HHV(HIGH, 5)为最近5日最高价）
-    return pd.Series(S).rolling(N).max().values
+    return _pd(S).rolling(N).max().values
 
 
 def LLV(S, N):  # N日最低价（如LLV(LOW, 5)为最近5日最低价）
-    return pd.Series(S).rolling(N).min().values
+    return _pd(S).rolling(N).min().values
 
 
 def HHVBARS(S, N):  # N日内最高价到当前的周期数（如找最近5日高点位置）
-    return pd.Series(S).rolling(N).apply(lambda x: np.argmax(x[::-1]), raw=True).values
+    return _rolling_apply(S, N, lambda w: np.argmax(w[..., ::-1], axis=-1))
 
 
 def LLVBARS(S, N):  # N日内最低价到当前的周期数（如找最近5日低点位置）
-    return pd.Series(S).rolling(N).apply(lambda x: np.argmin(x[::-1]), raw=True).values
+    return _rolling_apply(S, N, lambda w: np.argmin(w[..., ::-1], axis=-1))
 
 
 def MA(S, N):  # N日简单移动平均（如MA(CLOSE, 20)为20日均线）
-    return pd.Series(S).rolling(N).mean().values
+    return _pd(S).rolling(N).mean().values
 
 
 def EMA(S, N):  # 指数移动平均（如EMA(CLOSE, 12)为12日指数均线）
-    return pd.Series(S).ewm(span=N, adjust=False).mean().values
+    return _pd(S).ewm(span=N, adjust=False).mean().values
 
 
 def SMA(S, N, M=1):  # 中国式SMA（如KDJ中的平滑计算）
-    return pd.Series(S).ewm(alpha=M / N, adjust=False).mean().values
+    return _pd(S).ewm(alpha=M / N, adjust=False).mean().values
 
 
 def WMA(S, N):  # 加权移动平均（按时间加权，近期权重更高）
-    return pd.Series(S).rolling(N).apply(lambda x: x[::-1].cumsum().sum() * 2 / N / (N + 1), raw=True).values
+    weights = np.arange(1, N + 1) * 2 / N / (N + 1)  # 窗口内由远到近权重为 1..N
+    return _rolling_apply(S, N, lambda w: w @ weights)
 
 
-def DMA(S, A):  # 动态移动平均（A为平滑因子，支持序列输入）
-    if isinstance(A, (int, float)):  return pd.Series(S).ewm(alpha=A, adjust=False).mean().values
-    A = np.array(A);
-    A[np.isnan(A)] = 1.0;
-    Y = np.zeros(len(S));
+@_jit
+def _dma_loop(S, A):  # DMA 递推：Y[i] = A[i]*S[i] + (1-A[i])*Y[i-1]，二维输入时每步整行计算
+    Y = np.zeros(S.shape)
     Y[0] = S[0]
     for i in range(1, len(S)): Y[i] = A[i] * S[i] + (1 - A[i]) * Y[i - 1]
     return Y
 
 
+def DMA(S, A):  # 动态移动平均（A为平滑因子，支持序列输入）
+    if isinstance(A, (int, float)):  return _pd(S).ewm(alpha=A, adjust=False).mean().values
+    S = np.asarray(S, dtype=np.float64)
+    A = np.array(np.broadcast_to(A, S.shape), dtype=np.float64)  # 一维的 A 可用于二维的 S（各列相同）
+    A[np.isnan(A)] = 1.0
+    return _dma_loop(S, A)
+
+
 def AVEDEV(S, N):  # 平均绝对偏差（如CCI指标中的平均偏差计算）
-    return pd.Series(S).rolling(N).apply(lambda x: (np.abs(x - x.mean())).mean()).values
+    return _rolling_apply(S, N, lambda w: np.abs(w - w.mean(axis=-1, keepdims=True)).mean(axis=-1))
+
+
+def _slope(w, N):  # 窗口内对 0..N-1 的最小二乘斜率：sum((x-x̄)·y) / sum((x-x̄)²)
+    x = np.arange(N) - (N - 1) / 2
+    return w @ x / (x @ x)
 
 
 def SLOPE(S, N):  # 线性回归斜率（如趋势线斜率）
-    return pd.Series(S).rolling(N).apply(lambda x: np.polyfit(range(N), x, deg=1)[0], raw=True).values
+    return _rolling_apply(S, N, lambda w: _slope(w, N))
 
 
 def FORCAST(S, N):  # 线性回归预测值（如基于历史的未来值预测）
-    return pd.Series(S).rolling(N).apply(lambda x: np.polyval(np.polyfit(range(N), x, deg=1), N - 1), raw=True).values
+    return _rolling_apply(S, N, lambda w: w.mean(axis=-1) + _slope(w, N) * (N - 1) / 2)
 
 
 def LAST(S, A, B):  # A到B日前持续满足条件（如LAST(CLOSE>OPEN, 5, 1)表示近5日中前4日都收阳）
-    return np.array(pd.Series(S).rolling(A + 1).apply(lambda x: np.all(x[::-1][B:]), raw=True), dtype=bool)
+    S = np.asarray(S)
+    res = np.ones(S.shape, dtype=bool)  # 窗口未满时为 True（与原 rolling 结果 NaN 转 bool 一致）
+    if B <= A < len(S):
+        hits = _prepend(np.cumsum(S != 0, axis=0), 0)  # NaN 视为成立
+        t = np.arange(A, len(S))
+        res[A:] = hits[t - B + 1] - hits[t - A] == A - B + 1
+    return res
 
 
 # ------------------ 1级：应用层函数（直接适配日线字段） --------------------------------
@@ -140,30 +224,50 @@ def EXIST(S, N):  # N日内存在满足条件（如EXIST(CLOSE>10%, 5)为近5日
 
 
 def FILTER(S, N):  # 条件成立后屏蔽后续N周期（如FILTER(CROSS(MA5, MA10), 3)为金叉后3日不重复提示）
-    for i in range(len(S)):
-        if S[i]: S[i + 1:i + 1 + N] = 0
+    flags = np.asarray(S) != 0  # 只遍历有成立信号的时间点；与原实现一样原地修改 S
+    if flags.ndim == 1:
+        signals = np.flatnonzero(flags)
+        blocked = np.zeros(len(signals), dtype=bool)
+        until = -1
+        for j, i in enumerate(signals.tolist()):
+            if i <= until:
+                blocked[j] = True
+            else:
+                until = i + N
+        S[signals[blocked]] = 0
+        return S
+    blocked = np.zeros(flags.shape, dtype=bool)  # 二维时整行处理
+    until = np.full(flags.shape[1:], -1)  # 各列屏蔽截止的位置
+    for i in np.flatnonzero(flags.any(axis=1)).tolist():
+        blocked[i] = flags[i] & (i <= until)
+        until = np.where(flags[i] & ~blocked[i], i + N, until)
+    S[blocked] = 0
     return S
 
 
 def BARSLAST(S):  # 上一次条件成立到当前的周期数（如BARSLAST(CLOSE跌停)为上次跌停至今天数）
-    M = np.concatenate(([0], np.where(S, 1, 0)))
-    for i in range(1, len(M)): M[i] = 0 if M[i] else M[i - 1] + 1
-    return M[1:]
+    M = _prepend(np.asarray(S) != 0, True)
+    idx = _time_index(M)
+    return (idx - np.maximum.accumulate(np.where(M, idx, 0), axis=0))[1:]
 
 
 def BARSLASTCOUNT(S):  # 连续满足条件的周期数（如BARSLASTCOUNT(CLOSE>OPEN)为连续阳线数）
-    rt = np.zeros(len(S) + 1)
-    for i in range(len(S)): rt[i + 1] = rt[i] + 1 if S[i] else rt[i + 1]
-    return rt[1:]
+    S = np.asarray(S) != 0
+    idx = _time_index(S)
+    last_false = np.maximum.accumulate(np.where(S, -1, idx), axis=0)
+    return np.where(S, idx - last_false, 0).astype(float)
 
 
 def BARSSINCEN(S, N):  # N周期内首次满足条件到现在的周期数（如BARSSINCEN(CLOSE>MA20, 20)为20日内首次上穿均线至今天数）
-    return pd.Series(S).rolling(N).apply(lambda x: N - 1 - np.argmax(x) if np.argmax(x) or x[0] else 0,
-                                         raw=True).fillna(0).values.astype(int)
+    def first(w):
+        pos = np.argmax(w, axis=-1)
+        return np.where((pos != 0) | (w[..., 0] != 0), N - 1 - pos, 0)
+    return np.nan_to_num(_rolling_apply(S, N, first), nan=0).astype(int)
 
 
 def CROSS(S1, S2):  # 向上金叉（如CROSS(MA(CLOSE,5), MA(CLOSE,10))为5日均线上穿10日线）
-    return np.concatenate(([False], np.logical_not((S1 > S2)[:-1]) & (S1 > S2)[1:]))
+    S = np.asarray(S1 > S2)
+    return _prepend(np.logical_not(S[:-1]) & S[1:], False)
 
 
 def LONGCROSS(S1, S2, N):  # 持续N周期后交叉（如LONGCROSS(MA5, MA10, 3)为5日线在3日内始终低于10日线后上穿）
@@ -171,23 +275,38 @@ def LONGCROSS(S1, S2, N):  # 持续N周期后交叉（如LONGCROSS(MA5, MA10, 3)
 
 
 def VALUEWHEN(S, X):  # 条件成立时记录X值（如VALUEWHEN(CROSS(MA5, MA10), CLOSE)为金叉时的收盘价）
-    return pd.Series(np.where(S, X, np.nan)).ffill().values
+    return _pd(np.where(S, X, np.nan)).ffill().values
 
 
 def BETWEEN(S, A, B):  # S在A和B之间（如BETWEEN(CLOSE, MA20*0.98, MA20*1.02)为收盘价在20均线附近）
     return ((A < S) & (S < B)) | ((A > S) & (S > B))
 
 
+@_jit
+def _range_loop(V, missing):  # 单调栈：查找前方最近的 V[j] >= V[i]，返回两者之间的周期数；前方没有时为0
+    rt = np.zeros(len(V), dtype=np.int64)
+    stack = np.zeros(len(V), dtype=np.int64)
+    size = 0
+    for i in range(len(V)):
+        while size > 0 and V[stack[size - 1]] < V[i]: size -= 1
+        if size > 0 and not missing[i]: rt[i] = i - 1 - stack[size - 1]
+        stack[size] = i
+        size += 1
+    return rt
+
+
+def _range(V):  # TOPRANGE/LOWRANGE 公共部分：NaN 与任何值比较都不成立，视为 +inf 阻断，自身结果为0
+    V = np.asarray(V, dtype=np.float64)
+    missing = np.isnan(V)
+    return _by_column(_range_loop, np.where(missing, np.inf, V), missing)
+
+
 def TOPRANGE(S):  # 当前值为近多少周期内的最大值（如TOPRANGE(HIGH)为当前最高价是近几日最高价）
-    rt = np.zeros(len(S))
-    for i in range(1, len(S)): rt[i] = np.argmin(np.flipud(S[:i] < S[i]))
-    return rt.astype('int')
+    return _range(S).astype('int')
 
 
 def LOWRANGE(S):  # 当前值为近多少周期内的最小值（如LOWRANGE(LOW)为当前最低价是近几日最低价）
-    rt = np.zeros(len(S))
-    for i in range(1, len(S)): rt[i] = np.argmin(np.flipud(S[:i] > S[i]))
-    return rt.astype('int')
+    return _range(-np.asarray(S, dtype=np.float64)).astype('int')
 
 
 # ------------------ 2级：技术指标函数（明确字段依赖） ------------------------------
@@ -247,7 +366,9 @@ def PSY(CLOSE, N=12, M=6):
 def CCI(CLOSE, HIGH, LOW, N=14):
     # 输入：CLOSE（收盘价）、HIGH（最高价）、LOW（最低价）
     TP = (HIGH + LOW + CLOSE) / 3
-    return (TP - MA(TP, N)) / (0.015 * AVEDEV(TP, N))
+    DEV = TP - MA(TP, N)
+    with np.errstate(invalid='ignore', divide='ignore'):  # 窗口内价格全部相同时 DEV 为0，结果为0而不是 0/0
+        return np.where(DEV == 0, 0.0, DEV / (0.015 * AVEDEV(TP, N)))
 
 
 def ATR(CLOSE, HIGH, LOW, N=20):
@@ -423,6 +544,34 @@ def XSII(CLOSE, HIGH, LOW, N=102, M=7):  # 薛斯通道II
 
 # ------------------ 0级扩展：支持动态周期的核心函数 --------------------------------------------
 
+def _dynamic_extreme(S, N, func):  # 动态周期极值：稀疏表（S[i:i+2^k] 的极值）上两段重叠区间 O(1) 查询
+    S = np.asarray(S, dtype=np.float64)
+    N = np.asarray(N, dtype=np.float64)
+    if N.ndim < S.ndim:
+        N = np.broadcast_to(N.reshape(N.shape + (1,) * (S.ndim - N.ndim)), S.shape)  # 一维的 N 各列共用
+    res = np.full(S.shape, np.nan)
+    with np.errstate(invalid='ignore'):
+        ok = ~np.isnan(N) & (N <= _time_index(S) + 1) & (N >= 1)  # 周期数有效且不超过当前位置
+    if not ok.any():
+        return res
+    pos = np.nonzero(ok)
+    end, columns = pos[0], pos[1:]
+    length = N[ok].astype(np.int64)
+    start = end + 1 - length
+    level = np.frexp(length)[1] - 1  # floor(log2(length))
+    table = [S]
+    for k in range(1, int(level.max()) + 1):
+        half = 1 << (k - 1)
+        table.append(func(table[-1][:-half], table[-1][half:]))
+    out = np.empty(len(end))
+    for k in np.unique(level).tolist():
+        m = level == k
+        cols = tuple(c[m] for c in columns)
+        out[m] = func(table[k][(start[m],) + cols], table[k][(end[m] + 1 - (1 << k),) + cols])
+    res[ok] = out
+    return res
+
+
 def HHV(S, N):
     """
     计算N周期内的最高价（支持N为固定值或动态序列）
@@ -431,13 +580,9 @@ def HHV(S, N):
     示例：HHV(HIGH, 5)  # 最近5日最高价；HHV(CLOSE, N序列)  # 每个位置用对应N值计算高点
     """
     if isinstance(N, (int, float)):
-        return pd.Series(S).rolling(N).max().values  # 固定周期：用pandas滚动窗口计算
+        return _pd(S).rolling(N).max().values  # 固定周期：用pandas滚动窗口计算
     else:
-        res = np.repeat(np.nan, len(S))  # 初始化结果为nan
-        for i in range(len(S)):
-            if (not np.isnan(N[i])) and N[i] <= i + 1:  # 周期数有效且不超过当前位置
-                res[i] = S[i + 1 - int(N[i]):i + 1].max()  # 动态周期：截取对应长度计算高点
-        return res
+        return _dynamic_extreme(S, N, np.maximum)  # 动态周期：每个位置按对应长度计算高点
 
 
 def LLV(S, N):
@@ -448,17 +593,23 @@ def LLV(S, N):
     示例：LLV(LOW, 5)  # 最近5日最低价；LLV(CLOSE, N序列)  # 每个位置用对应N值计算低点
     """
     if isinstance(N, (int, float)):
-        return pd.Series(S).rolling(N).min().values  # 固定周期：用pandas滚动窗口计算
+        return _pd(S).rolling(N).min().values  # 固定周期：用pandas滚动窗口计算
     else:
-        res = np.repeat(np.nan, len(S))  # 初始化结果为nan
-        for i in range(len(S)):
-            if (not np.isnan(N[i])) and N[i] <= i + 1:  # 周期数有效且不超过当前位置
-                res[i] = S[i + 1 - int(N[i]):i + 1].min()  # 动态周期：截取对应长度计算低点
-        return res
+        return _dynamic_extreme(S, N, np.minimum)  # 动态周期：每个位置按对应长度计算低点
 
 
 # ------------------ 0级扩展：高级移动平均函数 --------------------------------------------
 
+@_jit
+def _dsma_filter(U, c2, c3):  # 二阶递归滤波：Filt[i] = U[i] + c2*Filt[i-1] + c3*Filt[i-2]，起点之前视为0，二维输入时每步整行计算
+    Filt = np.zeros(U.shape)
+    for i in range(len(U)):
+        Filt[i] = U[i]
+        if i >= 1: Filt[i] += c2 * Filt[i - 1]
+        if i >= 2: Filt[i] += c3 * Filt[i - 2]
+    return Filt
+
+
 def DSMA(X, N):
     """
     偏差自适应移动平均线（Deviation Scaled Moving Average）
@@ -473,12 +624,11 @@ def DSMA(X, N):
     c1 = 1 - c2 - c3  # 剩余系数
 
     # 计算价格变化率（Zeros为X的二阶差分）
-    Zeros = np.pad(X[2:] - X[:-2], (2, 0), 'constant')  # 填充前两个位置为0
+    X = np.asarray(X, dtype=np.float64)
+    Zeros = np.pad(X[2:] - X[:-2], [(2, 0)] + [(0, 0)] * (X.ndim - 1), 'constant')  # 填充前两个位置为0
 
-    Filt = np.zeros(len(X))  # 初始化滤波值
-    for i in range(len(X)):
-        # 递归计算滤波值（考虑前两项的影响）
-        Filt[i] = c1 * (Zeros[i] + Zeros[i - 1]) / 2 + c2 * Filt[i - 1] + c3 * Filt[i - 2]
+    # 递归计算滤波值（考虑前两项的影响），输入项先整体算好
+    Filt = _dsma_filter(c1 * (Zeros + np.roll(Zeros, 1, axis=0)) / 2, c2, c3)
 
     # 计算滤波值的N周期均方根（RMS）
     RMS = np.sqrt(SUM(np.square(Filt), N) / N)
@@ -499,8 +649,12 @@ def SUMBARSFAST(X, A):
     输出：等长于X的周期数序列（每个位置表示从该位置向前累加至A所需的周期数）
     示例：SUMBARSFAST(VOL, 100000)  # 成交量累加至10万股的周期数；SUMBARSFAST(VOL, CAPITAL)  # 完全换手周期数
     """
-    if any(X <= 0):  # 检查X是否全为正数（否则无法累加）
+    if np.any(np.asarray(X) <= 0):  # 检查X是否全为正数（否则无法累加）
         raise ValueError('数组X的每个元素都必须大于0！')
+    if np.ndim(X) == 2:  # 二维输入逐列计算，A 可为单值、与时间轴等长的序列或同形状的二维数组
+        X = np.asarray(X)
+        A = np.broadcast_to(np.asarray(A).reshape(np.shape(A) + (1,) * (2 - np.ndim(A))), X.shape)
+        return _by_column(SUMBARSFAST, X, A)
 
     X = np.flipud(X)  # 倒转X（从后往前处理）
     length = len(X)
@@ -512,34 +666,23 @@ def SUMBARSFAST(X, A):
     sumbars = np.zeros(length)  # 初始化周期数结果
     Sigma = np.insert(np.cumsum(X), 0, 0.0)  # 累加前缀和（前面插入0便于索引）
 
-    for i in range(length):
-        # 查找累加和超过A[i]的位置
-        k = np.searchsorted(Sigma[i + 1:], A[i] + Sigma[i])
-        if k < length - i:  # 找到有效位置
-            sumbars[length - i - 1] = k + 1  # 转换回原顺序的周期数
+    # 前缀和严格递增，一次 searchsorted 查找所有位置累加和超过A[i]的下标，再换算为相对 i+1 的偏移
+    i = np.arange(length)
+    k = np.maximum(np.searchsorted(Sigma, A + Sigma[:-1]) - (i + 1), 0)
+    found = k < length - i  # 找到有效位置
+    sumbars[length - i[found] - 1] = k[found] + 1  # 转换回原顺序的周期数
     return sumbars.astype(int)
 
 
 # ------------------ 2级扩展：技术指标函数 --------------------------------------------
 
-def SAR(HIGH, LOW, N=10, S=2, M=20):
-    """
-    抛物转向指标（Parabolic SAR）
-    输入：HIGH（最高价字段）、LOW（最低价字段）、N（初始计算周期）、S（步长%）、M（步长极限%）
-    输出：等长于HIGH的抛物转向序列（SAR值）
-    说明：SAR是趋势跟踪指标，多空分界点，价格在SAR上方为多头，下方为空头
-    """
-    f_step = S / 100  # 步长因子（如S=2对应0.02）
-    f_max = M / 100  # 步长极限（如M=20对应0.2）
-    af = 0.0  # 加速因子（Acceleration Factor）
+@_jit
+def _sar_loop(HIGH, LOW, s_hhv, s_llv, N, f_step, f_max):  # SAR 逐K线递推
     is_long = HIGH[N - 1] > HIGH[N - 2]  # 初始趋势（多头/空头）
+    af = 0.0  # 加速因子（Acceleration Factor）
     b_first = True  # 是否为趋势起始点
     length = len(HIGH)
-
-    # 计算初始极值（前N日高点/低点）
-    s_hhv = REF(HHV(HIGH, N), 1)  # 前一日的N日最高价（延迟1日）
-    s_llv = REF(LLV(LOW, N), 1)  # 前一日的N日最低价（延迟1日）
-    sar_x = np.repeat(np.nan, length)  # 初始化SAR序列
+    sar_x = np.full(length, np.nan)  # 初始化SAR序列
 
     for i in range(N, length):
         if b_first:  # 趋势起始点
@@ -561,15 +704,26 @@ def SAR(HIGH, LOW, N=10, S=2, M=20):
     return sar_x
 
 
-def TDX_SAR(High, Low, iAFStep=2, iAFLimit=20):
+def SAR(HIGH, LOW, N=10, S=2, M=20):
     """
-    通达信版本抛物转向指标（与通达信SAR完全一致）
-    输入：High（最高价字段）、Low（最低价字段）、iAFStep（步长%）、iAFLimit（步长极限%）
-    输出：等长于High的抛物转向序列（SAR值）
-    说明：与通用SAR算法差异在于极值修正和反转逻辑，更贴近通达信实际显示效果
+    抛物转向指标（Parabolic SAR）
+    输入：HIGH（最高价字段）、LOW（最低价字段）、N（初始计算周期）、S（步长%）、M（步长极限%）
+    输出：等长于HIGH的抛物转向序列（SAR值）
+    说明：SAR是趋势跟踪指标，多空分界点，价格在SAR上方为多头，下方为空头
     """
-    af_step = iAFStep / 100  # 步长因子（如iAFStep=2对应0.02）
-    af_limit = iAFLimit / 100  # 步长极限（如iAFLimit=20对应0.2）
+    f_step = S / 100  # 步长因子（如S=2对应0.02）
+    f_max = M / 100  # 步长极限（如M=20对应0.2）
+    HIGH = np.asarray(HIGH, dtype=np.float64)
+    LOW = np.asarray(LOW, dtype=np.float64)
+
+    # 计算初始极值（前N日高点/低点）
+    s_hhv = REF(HHV(HIGH, N), 1)  # 前一日的N日最高价（延迟1日）
+    s_llv = REF(LLV(LOW, N), 1)  # 前一日的N日最低价（延迟1日）
+    return _by_column(lambda h, l, hh, ll: _sar_loop(h, l, hh, ll, N, f_step, f_max), HIGH, LOW, s_hhv, s_llv)
+
+
+@_jit
+def _tdx_sar_loop(High, Low, af_step, af_limit):  # 通达信 SAR 逐K线递推
     SarX = np.zeros(len(High))  # 初始化SAR序列
 
     # 第一个K线：默认多头，SAR初始为当日低点
@@ -621,4 +775,17 @@ def TDX_SAR(High, Low, iAFStep=2, iAFLimit=20):
                 # 修正反转后的SAR值（取前两日低点的最小值）
                 SarX[i] = min(Low[i], Low[i - 1])
 
-    return SarX
\ No newline at end of file
+    return SarX
+
+
+def TDX_SAR(High, Low, iAFStep=2, iAFLimit=20):
+    """
+    通达信版本抛物转向指标（与通达信SAR完全一致）
+    输入：High（最高价字段）、Low（最低价字段）、iAFStep（步长%）、iAFLimit（步长极限%）
+    输出：等长于High的抛物转向序列（SAR值）
+    说明：与通用SAR算法差异在于极值修正和反转逻辑，更贴近通达信实际显示效果
+    """
+    af_step = iAFStep / 100  # 步长因子（如iAFStep=2对应0.02）
+    af_limit = iAFLimit / 100  # 步长极限（如iAFLimit=20对应0.2）
+    return _by_column(lambda h, l: _tdx_sar_loop(h, l, af_step, af_limit),
+                      np.asarray(High, dtype=np.float64), np.asarray(Low, dtype=np.float64))
@@ -0,0 +1,542 @@
+# coding: utf-8
+"""
+MyTT 指标的流式（增量）版本
+
+MyTT 的函数只接受完整序列，逐K线回测或实盘行情回调中每来一根新K线都要重算整段历史。
+这里的每个指标都是一个有状态对象，update(bar) 计入一根新K线并返回最新值，
+单根K线的计算量与历史长度无关；预热期过后结果与对应的 MyTT 函数在同一位置的值一致
+（同样保留 RD 的四舍五入和 NaN 的传播规则）。
+
+用法示例：
+    import MyTTStream as mts
+    macd = mts.MACD(12, 26, 9)
+    kdj = mts.KDJ(9, 3, 3)
+    for bar in bars:                      # bar 可以是 StockBar、字典或 (close, high, low) 元组
+        dif, dea, hist = macd.update(bar)
+        k, d, j = kdj.update(bar)
+    state = macd.snapshot()               # 保存状态
+    macd.restore(state)                   # 恢复到保存时的状态
+
+单序列指标的 update 也可以直接传入数值；多序列指标的元组按 MyTT 的参数顺序
+（CLOSE, HIGH, LOW 或 CLOSE, VOL）排列。
+"""
+import copy
+from collections import deque
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from khIndicator import RecursiveState, WindowState
+
+NAN = float("nan")
+
+
+def _rd(x: float, d: int = 3) -> float:
+    """与 MyTT.RD 一致的四舍五入（numpy 的舍入规则）"""
+    return float(np.round(x, d))
+
+
+def _max(a: float, b: float) -> float:
+    """与 np.maximum 一致：任一为NaN时结果为NaN"""
+    if a != a or b != b:
+        return NAN
+    return a if a >= b else b
+
+
+def _div(a: float, b: float) -> float:
+    """与 numpy 数组除法一致：除数为0时得到 inf 或 NaN 而不是抛出异常"""
+    if b == 0:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return float(np.float64(a) / np.float64(b))
+    return a / b
+
+
+class StreamIndicator:
+    """流式指标基类
+
+    子类声明 INPUTS（从K线中读取的字段）并实现 _update(*values) 返回最新值。
+    """
+
+    INPUTS: Tuple[str, ...] = ("close",)
+
+    def __init__(self):
+        self.value = NAN  # 最新值，多输出指标为元组
+        self.count = 0  # 已计入的K线数量
+
+    def update(self, bar):
+        """计入一根新K线
+
+        Args:
+            bar: 数值（单序列指标）、按 INPUTS 顺序排列的元组/列表，
+                或支持按字段名读取的对象（StockBar、字典、pandas.Series）
+
+        Returns:
+            最新指标值，多输出指标为元组
+        """
+        if isinstance(bar, (int, float, np.number)):
+            values = (float(bar),)
+        elif isinstance(bar, (tuple, list)):
+            values = tuple(float(x) for x in bar)
+        else:
+            values = tuple(float(bar[field]) for field in self.INPUTS)
+        self.value = self._update(*values)
+        self.count += 1
+        return self.value
+
+    def _update(self, *values):
+        raise NotImplementedError
+
+    def run(self, *series: Sequence[float]) -> np.ndarray:
+        """依次计入整段序列（按 INPUTS 顺序传入），返回每根K线上的指标值
+
+        Returns:
+            np.ndarray: 单输出指标为一维数组，多输出指标为 (K线数, 输出数) 数组
+        """
+        columns = [np.asarray(s, dtype=np.float64).tolist() for s in series]
+        return np.array([self.update(tuple(row)) for row in zip(*columns)], dtype=np.float64)
+
+    def snapshot(self) -> Dict:
+        """保存当前状态（深拷贝），可用 restore 恢复"""
+        return copy.deepcopy(self.__dict__)
+
+    def restore(self, state: Dict):
+        """恢复到 snapshot 保存的状态"""
+        self.__dict__.clear()
+        self.__dict__.update(copy.deepcopy(state))
+
+
+# ------------------ 0级：基础流式函数 --------------------------------------------
+
+class REF(StreamIndicator):
+    """N根K线之前的值（REF(S, N)）"""
+
+    def __init__(self, N: int = 1):
+        super().__init__()
+        self.buffer = deque(maxlen=N + 1)
+
+    def _update(self, x):
+        self.buffer.append(x)
+        return self.buffer[0] if len(self.buffer) == self.buffer.maxlen else NAN
+
+
+class MA(StreamIndicator):
+    """N日简单移动平均（MA(S, N)）"""
+
+    def __init__(self, N: int):
+        super().__init__()
+        self.state = WindowState("MA", N, skip_nan=False)
+
+    def _update(self, x):
+        self.state.push(x)
+        return self.state.value
+
+
+class SUM(StreamIndicator):
+    """N日累计和，N=0 为从头累加（SUM(S, N)）"""
+
+    def __init__(self, N: int):
+        super().__init__()
+        self.state = WindowState("SUM", N, skip_nan=False) if N > 0 else None
+        self.total = 0.0
+
+    def _update(self, x):
+        if self.state is not None:
+            self.state.push(x)
+            return self.state.value
+        # 与 cumsum 一致：NaN 位置为NaN，之后继续累加
+        if x != x:
+            return NAN
+        self.total += x
+        return self.total
+
+
+class STD(StreamIndicator):
+    """N日总体标准差（STD(S, N)）"""
+
+    def __init__(self, N: int):
+        super().__init__()
+        self.state = WindowState("STD", N, skip_nan=False)
+
+    def _update(self, x):
+        self.state.push(x)
+        return self.state.value
+
+
+class EMA(StreamIndicator):
+    """指数移动平均（EMA(S, N)）"""
+
+    def __init__(self, N: int):
+        super().__init__()
+        self.state = RecursiveState("EMA", N)
+
+    def _update(self, x):
+        self.state.push(x)
+        return self.state.value
+
+
+class SMA(StreamIndicator):
+    """中国式SMA（SMA(S, N, M)）"""
+
+    def __init__(self, N: int, M: int = 1):
+        super().__init__()
+        self.state = RecursiveState("SMA", N, M)
+
+    def _update(self, x):
+        self.state.push(x)
+        return self.state.value
+
+
+class _Extreme(StreamIndicator):
+    """N日最高/最低值，单调队列实现，每根K线均摊 O(1)"""
+
+    def __init__(self, N: int, highest: bool):
+        super().__init__()
+        self.N = N
+        self.highest = highest
+        self.window = deque()  # (序号, 值)，值单调
+        self.nan_at = deque()  # 窗口内NaN的序号
+        self.index = -1
+
+    def _update(self, x):
+        self.index += 1
+        start = self.index - self.N + 1
+        while self.window and self.window[0][0] < start:
+            self.window.popleft()
+        while self.nan_at and self.nan_at[0] < start:
+            self.nan_at.popleft()
+        if x != x:
+            self.nan_at.append(self.index)
+        else:
+            while self.window and (self.window[-1][1] <= x if self.highest else self.window[-1][1] >= x):
+                self.window.pop()
+            self.window.append((self.index, x))
+        # 与 rolling(N).max()/min() 一致：窗口未满或含NaN时为NaN
+        if start < 0 or self.nan_at:
+            return NAN
+        return self.window[0][1]
+
+
+class HHV(_Extreme):
+    """N日最高值（HHV(S, N)）"""
+
+    def __init__(self, N: int):
+        super().__init__(N, True)
+
+
+class LLV(_Extreme):
+    """N日最低值（LLV(S, N)）"""
+
+    def __init__(self, N: int):
+        super().__init__(N, False)
+
+
+class AVEDEV(StreamIndicator):
+    """N日平均绝对偏差（AVEDEV(S, N)），每根K线 O(N)，与历史长度无关"""
+
+    def __init__(self, N: int):
+        super().__init__()
+        self.buffer = deque(maxlen=N)
+
+    def _update(self, x):
+        self.buffer.append(x)
+        if len(self.buffer) < self.buffer.maxlen:
+            return NAN
+        window = np.fromiter(self.buffer, dtype=np.float64, count=len(self.buffer))
+        if np.isnan(window).any():
+            return NAN
+        return float(np.abs(window - window.mean()).mean())
+
+
+# ------------------ 2级：技术指标 --------------------------------------------
+
+class MACD(StreamIndicator):
+    """MACD，返回 (DIF, DEA, MACD)"""
+
+    def __init__(self, SHORT: int = 12, LONG: int = 26, M: int = 9):
+        super().__init__()
+        self.short = EMA(SHORT)
+        self.long = EMA(LONG)
+        self.dea = EMA(M)
+
+    def _update(self, close):
+        dif = self.short._update(close) - self.long._update(close)
+        dea = self.dea._update(dif)
+        return _rd(dif), _rd(dea), _rd((dif - dea) * 2)
+
+
+class KDJ(StreamIndicator):
+    """KDJ，输入 (CLOSE, HIGH, LOW)，返回 (K, D, J)"""
+
+    INPUTS = ("close", "high", "low")
+
+    def __init__(self, N: int = 9, M1: int = 3, M2: int = 3):
+        super().__init__()
+        self.hhv = HHV(N)
+        self.llv = LLV(N)
+        self.k = EMA(M1 * 2 - 1)
+        self.d = EMA(M2 * 2 - 1)
+
+    def _update(self, close, high, low):
+        hhv = self.hhv._update(high)
+        llv = self.llv._update(low)
+        rsv = _div(close - llv, hhv - llv) * 100
+        k = self.k._update(rsv)
+        d = self.d._update(k)
+        return k, d, k * 3 - d * 2
+
+
+class RSI(StreamIndicator):
+    """RSI"""
+
+    def __init__(self, N: int = 24):
+        super().__init__()
+        self.ref = REF(1)
+        self.up = SMA(N)
+        self.total = SMA(N)
+
+    def _update(self, close):
+        dif = close - self.ref._update(close)
+        up = self.up._update(_max(dif, 0.0))
+        total = self.total._update(abs(dif))
+        return _rd(_div(up, total) * 100)
+
+
+class WR(StreamIndicator):
+    """威廉指标，输入 (CLOSE, HIGH, LOW)，返回 (WR, WR1)"""
+
+    INPUTS = ("close", "high", "low")
+
+    def __init__(self, N: int = 10, N1: int = 6):
+        super().__init__()
+        self.hhv, self.llv = HHV(N), LLV(N)
+        self.hhv1, self.llv1 = HHV(N1), LLV(N1)
+
+    def _update(self, close, high, low):
+        hhv, llv = self.hhv._update(high), self.llv._update(low)
+        hhv1, llv1 = self.hhv1._update(high), self.llv1._update(low)
+        return _rd(_div(hhv - close, hhv - llv) * 100), _rd(_div(hhv1 - close, hhv1 - llv1) * 100)
+
+
+class BIAS(StreamIndicator):
+    """乖离率，返回 (BIAS1, BIAS2, BIAS3)"""
+
+    def __init__(self, L1: int = 6, L2: int = 12, L3: int = 24):
+        super().__init__()
+        self.mas = [MA(L1), MA(L2), MA(L3)]
+
+    def _update(self, close):
+        return tuple(_rd(_div(close - ma, ma) * 100) for ma in (m._update(close) for m in self.mas))
+
+
+class BOLL(StreamIndicator):
+    """布林线，返回 (UPPER, MID, LOWER)"""
+
+    def __init__(self, N: int = 20, P: float = 2):
+        super().__init__()
+        self.P = P
+        self.ma = MA(N)
+        self.std = STD(N)
+
+    def _update(self, close):
+        mid = self.ma._update(close)
+        std = self.std._update(close)
+        return _rd(mid + std * self.P), _rd(mid), _rd(mid - std * self.P)
+
+
+class PSY(StreamIndicator):
+    """心理线，返回 (PSY, PSYMA)"""
+
+    def __init__(self, N: int = 12, M: int = 6):
+        super().__init__()
+        self.N = N
+        self.ref = REF(1)
+        self.count_up = SUM(N)
+        self.ma = MA(M)
+
+    def _update(self, close):
+        # 与数组比较一致：前值为NaN时比较结果为False
+        up = 1.0 if close > self.ref._update(close) else 0.0
+        psy = self.count_up._update(up) / self.N * 100
+        return _rd(psy), _rd(self.ma._update(psy))
+
+
+class CCI(StreamIndicator):
+    """顺势指标，输入 (CLOSE, HIGH, LOW)"""
+
+    INPUTS = ("close", "high", "low")
+
+    def __init__(self, N: int = 14):
+        super().__init__()
+        self.ma = MA(N)
+        self.avedev = AVEDEV(N)
+
+    def _update(self, close, high, low):
+        tp = (high + low + close) / 3
+        ma = self.ma._update(tp)
+        avedev = self.avedev._update(tp)
+        # 与 MyTT.CCI 一致：窗口内价格全部相同时为0（累计和得到的均值有舍入误差，不能直接相减）
+        if avedev == avedev and max(self.avedev.buffer) == min(self.avedev.buffer):
+            return 0.0
+        return _div(tp - ma, 0.015 * avedev)
+
+
+class ATR(StreamIndicator):
+    """真实波幅均值，输入 (CLOSE, HIGH, LOW)"""
+
+    INPUTS = ("close", "high", "low")
+
+    def __init__(self, N: int = 20):
+        super().__init__()
+        self.ref = REF(1)
+        self.ma = MA(N)
+
+    def _update(self, close, high, low):
+        prev = self.ref._update(close)
+        tr = _max(_max(high - low, abs(prev - high)), abs(prev - low))
+        return self.ma._update(tr)
+
+
+class BBI(StreamIndicator):
+    """多空指标"""
+
+    def __init__(self, M1: int = 3, M2: int = 6, M3: int = 12, M4: int = 20):
+        super().__init__()
+        self.mas = [MA(M1), MA(M2), MA(M3), MA(M4)]
+
+    def _update(self, close):
+        values = [m._update(close) for m in self.mas]
+        return (values[0] + values[1] + values[2] + values[3]) / 4
+
+
+class DMI(StreamIndicator):
+    """动向指标，输入 (CLOSE, HIGH, LOW)，返回 (PDI, MDI, ADX, ADXR)"""
+
+    INPUTS = ("close", "high", "low")
+
+    def __init__(self, M1: int = 14, M2: int = 6):
+        super().__init__()
+        self.ref_close, self.ref_high, self.ref_low = REF(1), REF(1), REF(1)
+        self.tr, self.dmp, self.dmm = SUM(M1), SUM(M1), SUM(M1)
+        self.adx = MA(M2)
+        self.ref_adx = REF(M2)
+
+    def _update(self, close, high, low):
+        prev_close = self.ref_close._update(close)
+        prev_high = self.ref_high._update(high)
+        prev_low = self.ref_low._update(low)
+        tr = self.tr._update(_max(_max(high - low, abs(high - prev_close)), abs(low - prev_close)))
+        hd = high - prev_high
+        ld = prev_low - low
+        # 与 IF 的数组比较一致：NaN 参与比较时结果为False，取0
+        dmp = self.dmp._update(hd if hd > 0 and hd > ld else 0.0)
+        dmm = self.dmm._update(ld if ld > 0 and ld > hd else 0.0)
+        pdi = _div(dmp * 100, tr)
+        mdi = _div(dmm * 100, tr)
+        adx = self.adx._update(_div(abs(mdi - pdi), pdi + mdi) * 100)
+        adxr = (adx + self.ref_adx._update(adx)) / 2
+        return pdi, mdi, adx, adxr
+
+
+class TAQ(StreamIndicator):
+    """唐安奇通道，输入 (HIGH, LOW)，返回 (UP, MID, DOWN)"""
+
+    INPUTS = ("high", "low")
+
+    def __init__(self, N: int):
+        super().__init__()
+        self.hhv = HHV(N)
+        self.llv = LLV(N)
+
+    def _update(self, high, low):
+        up = self.hhv._update(high)
+        down = self.llv._update(low)
+        return up, (up + down) / 2, down
+
+
+class KTN(StreamIndicator):
+    """肯特纳通道，输入 (CLOSE, HIGH, LOW)，返回 (UPPER, MID, LOWER)"""
+
+    INPUTS = ("close", "high", "low")
+
+    def __init__(self, N: int = 20, M: int = 10):
+        super().__init__()
+        self.ema = EMA(N)
+        self.atr = ATR(M)
+
+    def _update(self, close, high, low):
+        mid = self.ema._update((high + low + close) / 3)
+        atr = self.atr._update(close, high, low)
+        return mid + 2 * atr, mid, mid - 2 * atr
+
+
+class TRIX(StreamIndicator):
+    """三重指数平滑，返回 (TRIX, TRMA)"""
+
+    def __init__(self, M1: int = 12, M2: int = 20):
+        super().__init__()
+        self.emas = [EMA(M1), EMA(M1), EMA(M1)]
+        self.ref = REF(1)
+        self.ma = MA(M2)
+
+    def _update(self, close):
+        tr = close
+        for ema in self.emas:
+            tr = ema._update(tr)
+        prev = self.ref._update(tr)
+        trix = _div(tr - prev, prev) * 100
+        return trix, self.ma._update(trix)
+
+
+class MTM(StreamIndicator):
+    """动量指标，返回 (MTM, MTMMA)"""
+
+    def __init__(self, N: int = 12, M: int = 6):
+        super().__init__()
+        self.ref = REF(N)
+        self.ma = MA(M)
+
+    def _update(self, close):
+        mtm = close - self.ref._update(close)
+        return mtm, self.ma._update(mtm)
+
+
+class ROC(StreamIndicator):
+    """变动率指标，返回 (ROC, MAROC)"""
+
+    def __init__(self, N: int = 12, M: int = 6):
+        super().__init__()
+        self.ref = REF(N)
+        self.ma = MA(M)
+
+    def _update(self, close):
+        prev = self.ref._update(close)
+        roc = _div(100 * (close - prev), prev)
+        return roc, self.ma._update(roc)
+
+
+class EXPMA(StreamIndicator):
+    """EMA指数平均数指标，返回 (EMA(N1), EMA(N2))"""
+
+    def __init__(self, N1: int = 12, N2: int = 50):
+        super().__init__()
+        self.ema1 = EMA(N1)
+        self.ema2 = EMA(N2)
+
+    def _update(self, close):
+        return self.ema1._update(close), self.ema2._update(close)
+
+
+class OBV(StreamIndicator):
+    """能量潮指标，输入 (CLOSE, VOL)"""
+
+    INPUTS = ("close", "volume")
+
+    def __init__(self):
+        super().__init__()
+        self.ref = REF(1)
+        self.total = SUM(0)
+
+    def _update(self, close, volume):
+        prev = self.ref._update(close)
+        flow = volume if close > prev else (-volume if close < prev else 0.0)
+        return self.total._update(flow) / 10000
@@ -0,0 +1,546 @@
+# coding: utf-8
+"""
+MyTT 性能基准与数值等价性检查
+
+只依赖 NumPy/pandas，完全离线运行，数据由固定随机种子生成的模拟行情（OHLCV）提供。
+
+用法：
+    python MyTT_bench.py check                  # 数值等价性检查
+    python MyTT_bench.py check --update         # 用当前实现重新生成参考输出（确认结果正确后再执行）
+    python MyTT_bench.py bench                  # 计时，与已保存的基线比较
+    python MyTT_bench.py bench --save-baseline  # 计时并保存为本机基线
+    python MyTT_bench.py bench --sizes 1e3,1e5 --panels 250x5000 --only MA,MACD
+
+check 包含两部分：
+- 一维结果与 MyTT_bench_reference.json 中的参考输出（形状、类型、NaN 位置、总和、抽样值）一致，
+  参考输出由向量化改写之前的逐元素实现生成
+- 二维 (时间 × 股票) 输入的结果与逐列调用一维函数的结果一致
+- MyTTStream 的流式指标逐根K线计入的结果与批量函数一致（含缺失值和价格长时间不变的行情）
+
+bench 对每个导出的指标分别在长度 1e3/1e5/1e6 的一维序列和二维面板上计时，报告每个元素的耗时（ns），
+与基线文件（机器相关，默认 MyTT_bench_baseline.json，不随代码提交）相比变慢超过阈值的标记为 SLOW。
+两个命令发现问题时都以返回码 1 退出，可直接用于持续集成。
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REFERENCE_FILE = os.path.join(BENCH_DIR, "MyTT_bench_reference.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "MyTT_bench_baseline.json")
+
+REFERENCE_LENGTH = 1500
+REFERENCE_SEED = 20240501
+GAP_RATIO = 0.01  # 带缺失值的参考数据中 NaN 的比例
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_PANELS = ((250, 5000),)
+
+# 每个导出函数的调用方式：名称 -> 从行情字典构造参数的函数
+# 字典字段：OPEN/HIGH/LOW/CLOSE/VOL 行情，COND 布尔条件，ALPHA 动态平滑因子，PERIOD 动态周期（含NaN）
+CASES: Dict[str, Tuple[str, Callable[[Dict], tuple]]] = {
+    "RD": ("RD", lambda d: (d["CLOSE"],)),
+    "RET": ("RET", lambda d: (d["CLOSE"],)),
+    "ABS": ("ABS", lambda d: (d["CLOSE"] - d["OPEN"],)),
+    "LN": ("LN", lambda d: (d["CLOSE"],)),
+    "POW": ("POW", lambda d: (d["CLOSE"], 2)),
+    "SQRT": ("SQRT", lambda d: (d["CLOSE"],)),
+    "SIN": ("SIN", lambda d: (d["CLOSE"],)),
+    "COS": ("COS", lambda d: (d["CLOSE"],)),
+    "TAN": ("TAN", lambda d: (d["CLOSE"],)),
+    "MAX": ("MAX", lambda d: (d["CLOSE"], d["OPEN"])),
+    "MIN": ("MIN", lambda d: (d["CLOSE"], d["OPEN"])),
+    "IF": ("IF", lambda d: (d["COND"], d["HIGH"], d["LOW"])),
+    "REF": ("REF", lambda d: (d["CLOSE"], 3)),
+    "DIFF": ("DIFF", lambda d: (d["CLOSE"], 2)),
+    "STD": ("STD", lambda d: (d["CLOSE"], 20)),
+    "SUM": ("SUM", lambda d: (d["VOL"], 10)),
+    "SUM[N=0]": ("SUM", lambda d: (d["VOL"], 0)),
+    "CONST": ("CONST", lambda d: (d["CLOSE"],)),
+    "HHV": ("HHV", lambda d: (d["HIGH"], 20)),
+    "LLV": ("LLV", lambda d: (d["LOW"], 20)),
+    "HHV[N序列]": ("HHV", lambda d: (d["HIGH"], d["PERIOD"])),
+    "LLV[N序列]": ("LLV", lambda d: (d["LOW"], d["PERIOD"])),
+    "HHVBARS": ("HHVBARS", lambda d: (d["HIGH"], 20)),
+    "LLVBARS": ("LLVBARS", lambda d: (d["LOW"], 20)),
+    "MA": ("MA", lambda d: (d["CLOSE"], 20)),
+    "EMA": ("EMA", lambda d: (d["CLOSE"], 12)),
+    "SMA": ("SMA", lambda d: (d["CLOSE"], 9, 2)),
+    "WMA": ("WMA", lambda d: (d["CLOSE"], 10)),
+    "DMA": ("DMA", lambda d: (d["CLOSE"], 0.2)),
+    "DMA[A序列]": ("DMA", lambda d: (d["CLOSE"], d["ALPHA"])),
+    "AVEDEV": ("AVEDEV", lambda d: (d["CLOSE"], 14)),
+    "SLOPE": ("SLOPE", lambda d: (d["CLOSE"], 10)),
+    "FORCAST": ("FORCAST", lambda d: (d["CLOSE"], 10)),
+    "LAST": ("LAST", lambda d: (d["COND"], 5, 1)),
+    "COUNT": ("COUNT", lambda d: (d["COND"], 10)),
+    "EVERY": ("EVERY", lambda d: (d["COND"], 3)),
+    "EXIST": ("EXIST", lambda d: (d["COND"], 5)),
+    "FILTER": ("FILTER", lambda d: (d["COND"].copy(), 3)),  # FILTER 原地修改输入
+    "BARSLAST": ("BARSLAST", lambda d: (d["COND"],)),
+    "BARSLASTCOUNT": ("BARSLASTCOUNT", lambda d: (d["COND"],)),
+    "BARSSINCEN": ("BARSSINCEN", lambda d: (d["COND"], 10)),
+    "CROSS": ("CROSS", lambda d: (d["CLOSE"], d["OPEN"])),
+    "LONGCROSS": ("LONGCROSS", lambda d: (d["CLOSE"], d["OPEN"], 3)),
+    "VALUEWHEN": ("VALUEWHEN", lambda d: (d["COND"], d["CLOSE"])),
+    "BETWEEN": ("BETWEEN", lambda d: (d["CLOSE"], d["LOW"], d["HIGH"])),
+    "TOPRANGE": ("TOPRANGE", lambda d: (d["HIGH"],)),
+    "LOWRANGE": ("LOWRANGE", lambda d: (d["LOW"],)),
+    "MACD": ("MACD", lambda d: (d["CLOSE"],)),
+    "KDJ": ("KDJ", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"])),
+    "RSI": ("RSI", lambda d: (d["CLOSE"],)),
+    "WR": ("WR", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"])),
+    "BIAS": ("BIAS", lambda d: (d["CLOSE"],)),
+    "BOLL": ("BOLL", lambda d: (d["CLOSE"],)),
+    "PSY": ("PSY", lambda d: (d["CLOSE"],)),
+    "CCI": ("CCI", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"])),
+    "ATR": ("ATR", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"])),
+    "BBI": ("BBI", lambda d: (d["CLOSE"],)),
+    "DMI": ("DMI", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"])),
+    "TAQ": ("TAQ", lambda d: (d["HIGH"], d["LOW"], 20)),
+    "KTN": ("KTN", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"])),
+    "TRIX": ("TRIX", lambda d: (d["CLOSE"],)),
+    "VR": ("VR", lambda d: (d["CLOSE"], d["VOL"])),
+    "CR": ("CR", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"])),
+    "EMV": ("EMV", lambda d: (d["HIGH"], d["LOW"], d["VOL"])),
+    "DPO": ("DPO", lambda d: (d["CLOSE"],)),
+    "BRAR": ("BRAR", lambda d: (d["OPEN"], d["CLOSE"], d["HIGH"], d["LOW"])),
+    "DFMA": ("DFMA", lambda d: (d["CLOSE"],)),
+    "MTM": ("MTM", lambda d: (d["CLOSE"],)),
+    "MASS": ("MASS", lambda d: (d["HIGH"], d["LOW"])),
+    "ROC": ("ROC", lambda d: (d["CLOSE"],)),
+    "EXPMA": ("EXPMA", lambda d: (d["CLOSE"],)),
+    "OBV": ("OBV", lambda d: (d["CLOSE"], d["VOL"])),
+    "MFI": ("MFI", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"], d["VOL"])),
+    "ASI": ("ASI", lambda d: (d["OPEN"], d["CLOSE"], d["HIGH"], d["LOW"])),
+    "XSII": ("XSII", lambda d: (d["CLOSE"], d["HIGH"], d["LOW"])),
+    "DSMA": ("DSMA", lambda d: (d["CLOSE"], 20)),
+    "SUMBARSFAST": ("SUMBARSFAST", lambda d: (d["VOL"], 500000)),
+    "SAR": ("SAR", lambda d: (d["HIGH"], d["LOW"])),
+    "TDX_SAR": ("TDX_SAR", lambda d: (d["HIGH"], d["LOW"])),
+}
+
+# 有流式版本（MyTTStream）的用例：与批量结果逐点比较，流式对象的参数与批量调用的标量参数相同
+STREAM_CASES = ("MA", "EMA", "SMA", "SUM", "SUM[N=0]", "STD", "HHV", "LLV", "REF", "AVEDEV", "MACD", "KDJ",
+                "RSI", "WR", "BIAS", "BOLL", "PSY", "CCI", "ATR", "BBI", "DMI", "TAQ", "KTN", "TRIX", "MTM",
+                "ROC", "EXPMA", "OBV")
+
+# 缺失值数据上不做参考比较的用例：TDX_SAR 对 NaN 使用内置 min/max，结果依赖比较顺序，Numba 与纯 Python 不保证一致
+SKIP_WITH_GAPS = {"TDX_SAR"}
+
+
+def synthetic_ohlcv(length: int, stocks: Optional[int] = None, seed: int = REFERENCE_SEED,
+                    gaps: float = 0.0) -> Dict[str, np.ndarray]:
+    """生成模拟行情
+
+    Args:
+        length: K线数量
+        stocks: 股票数量，None 生成一维序列，否则生成 (length, stocks) 的二维面板
+        seed: 随机种子
+        gaps: OHLC 与动态周期中置为 NaN 的比例
+
+    Returns:
+        Dict[str, np.ndarray]: OPEN/HIGH/LOW/CLOSE/VOL/COND/ALPHA/PERIOD
+    """
+    rng = np.random.default_rng(seed)
+    shape = (length,) if stocks is None else (length, stocks)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, shape), axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.005, shape))
+    high = np.maximum(open_, close) * (1 + rng.random(shape) * 0.02)
+    low = np.minimum(open_, close) * (1 - rng.random(shape) * 0.02)
+    data = {
+        "OPEN": open_, "HIGH": high, "LOW": low, "CLOSE": close,
+        "VOL": rng.integers(1000, 100000, shape).astype(np.float64),
+        "COND": rng.random(shape) > 0.7,
+        "ALPHA": 0.05 + rng.random(shape) * 0.45,
+        "PERIOD": rng.integers(1, 30, shape).astype(np.float64),
+    }
+    if gaps:
+        missing = rng.random(shape) < gaps
+        for field in ("OPEN", "HIGH", "LOW", "CLOSE"):
+            data[field][missing] = np.nan
+        data["PERIOD"][rng.random(shape) < gaps] = np.nan
+    return data
+
+
+def _call(module, case: str, data: Dict):
+    """按用例调用指标函数"""
+    name, make_args = CASES[case]
+    return getattr(module, name)(*make_args(data))
+
+
+def _outputs(result) -> Tuple:
+    return result if isinstance(result, tuple) else (result,)
+
+
+def fingerprint(result) -> List[Dict]:
+    """计算指标输出的指纹：形状、类型、非有限值位置、总和与抽样值
+
+    Args:
+        result: 指标函数的返回值（数组或数组元组）
+
+    Returns:
+        List[Dict]: 每个输出一项
+    """
+    prints = []
+    for out in _outputs(result):
+        arr = np.asarray(out)
+        values = arr.astype(np.float64).ravel()
+        bad = ~np.isfinite(values)
+        finite = values[~bad]
+        index = np.linspace(0, len(values) - 1, 24).astype(np.int64) if len(values) else np.zeros(0, np.int64)
+        prints.append({
+            "shape": list(arr.shape),
+            "kind": arr.dtype.kind,
+            "nonfinite": int(bad.sum()),
+            "nonfinite_md5": hashlib.md5(np.packbits(bad).tobytes()).hexdigest(),
+            "sum": float(finite.sum()),
+            "abs_sum": float(np.abs(finite).sum()),
+            "samples": [float(v) if np.isfinite(v) else repr(float(v)) for v in values[index].tolist()],
+        })
+    return prints
+
+
+def compare_fingerprints(actual: List[Dict], expected: List[Dict], rtol: float) -> List[str]:
+    """比较两组指纹
+
+    Args:
+        actual: 当前实现的指纹
+        expected: 参考指纹
+        rtol: 数值相对误差容限
+
+    Returns:
+        List[str]: 差异说明，完全一致时为空
+    """
+    if len(actual) != len(expected):
+        return [f"输出个数 {len(actual)} != {len(expected)}"]
+    problems = []
+    for i, (a, e) in enumerate(zip(actual, expected)):
+        for key in ("shape", "kind", "nonfinite", "nonfinite_md5"):
+            if a[key] != e[key]:
+                problems.append(f"输出{i} {key}: {a[key]} != {e[key]}")
+        scale = e["abs_sum"] + 1.0
+        if abs(a["sum"] - e["sum"]) > rtol * scale:
+            problems.append(f"输出{i} sum: {a['sum']!r} != {e['sum']!r}")
+        for j, (x, y) in enumerate(zip(a["samples"], e["samples"])):
+            if isinstance(x, str) or isinstance(y, str):
+                ok = x == y
+            else:
+                ok = abs(x - y) <= rtol * max(1.0, abs(y))
+            if not ok:
+                problems.append(f"输出{i} 抽样{j}: {x!r} != {y!r}")
+                break
+    return problems
+
+
+def reference_datasets() -> Dict[str, Dict[str, np.ndarray]]:
+    """参考比较使用的数据集：无缺失值与带缺失值各一份"""
+    return {
+        "clean": synthetic_ohlcv(REFERENCE_LENGTH),
+        "gaps": synthetic_ohlcv(REFERENCE_LENGTH, seed=REFERENCE_SEED + 1, gaps=GAP_RATIO),
+    }
+
+
+def build_reference(module) -> Dict:
+    """用指定实现生成参考输出"""
+    cases = {}
+    for dataset, data in reference_datasets().items():
+        for case in CASES:
+            if dataset == "gaps" and case in SKIP_WITH_GAPS:
+                continue
+            with np.errstate(all="ignore"):
+                cases[f"{case}@{dataset}"] = fingerprint(_call(module, case, data))
+    return {
+        "generated_by": module.__name__,
+        "length": REFERENCE_LENGTH,
+        "seed": REFERENCE_SEED,
+        "cases": cases,
+    }
+
+
+def write_reference(reference: Dict, path: str = REFERENCE_FILE):
+    """写入参考输出，每个用例一行，便于查看差异"""
+    cases = reference["cases"]
+    header = {k: v for k, v in reference.items() if k != "cases"}
+    lines = [f" {json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}"
+             for key, value in cases.items()]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "cases": {\n' + ",\n".join(lines) + "\n}}\n")
+
+
+def check_reference(module, path: str = REFERENCE_FILE, rtol: float = 1e-7) -> List[str]:
+    """与参考输出比较
+
+    Args:
+        module: 被检查的 MyTT 实现
+        path: 参考输出文件
+        rtol: 数值相对误差容限
+
+    Returns:
+        List[str]: 失败说明
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        reference = json.load(f)["cases"]
+    failures = []
+    for dataset, data in reference_datasets().items():
+        for case in CASES:
+            key = f"{case}@{dataset}"
+            if key not in reference:
+                continue
+            try:
+                with np.errstate(all="ignore"):
+                    actual = fingerprint(_call(module, case, data))
+            except Exception as e:
+                failures.append(f"{key}: 调用失败 {e!r}")
+                continue
+            failures.extend(f"{key}: {p}" for p in compare_fingerprints(actual, reference[key], rtol))
+    missing = sorted(set(f"{case}@clean" for case in CASES) - set(reference))
+    failures.extend(f"{key}: 参考文件中没有该用例，请用 check --update 重新生成" for key in missing)
+    return failures
+
+
+def check_columnwise(module, length: int = 240, stocks: int = 6, rtol: float = 1e-9) -> List[str]:
+    """检查二维输入的结果与逐列调用一维函数的结果一致
+
+    Args:
+        module: 被检查的 MyTT 实现
+        length: 面板长度
+        stocks: 股票数量
+        rtol: 数值相对误差容限
+
+    Returns:
+        List[str]: 失败说明
+    """
+    panel = synthetic_ohlcv(length, stocks, seed=REFERENCE_SEED + 2, gaps=GAP_RATIO)
+    failures = []
+    for case in CASES:
+        data = panel
+        if case in SKIP_WITH_GAPS:
+            data = synthetic_ohlcv(length, stocks, seed=REFERENCE_SEED + 2)
+        try:
+            with np.errstate(all="ignore"):
+                whole = _outputs(_call(module, case, data))
+                columns = [_outputs(_call(module, case, {k: v[:, j] for k, v in data.items()}))
+                           for j in range(stocks)]
+        except Exception as e:
+            failures.append(f"{case}@2d: 调用失败 {e!r}")
+            continue
+        for i, out in enumerate(whole):
+            out = np.asarray(out)
+            expected = np.stack([np.asarray(c[i]) for c in columns], axis=-1)
+            if out.shape != expected.shape or out.dtype.kind != expected.dtype.kind:
+                failures.append(f"{case}@2d 输出{i}: {out.shape}/{out.dtype} != {expected.shape}/{expected.dtype}")
+            elif not np.allclose(out.astype(np.float64), expected.astype(np.float64), rtol=rtol, atol=rtol, equal_nan=True):
+                failures.append(f"{case}@2d 输出{i}: 与逐列结果不一致")
+    return failures
+
+
+def stream_datasets(length: int = 600) -> Dict[str, Dict[str, np.ndarray]]:
+    """流式比较使用的数据集：带缺失值的行情，以及中段价格长时间不变（停牌、一字板）的行情"""
+    flat = synthetic_ohlcv(length, seed=REFERENCE_SEED + 3)
+    for field in ("OPEN", "HIGH", "LOW", "CLOSE"):
+        flat[field][length // 3:length // 2] = flat["CLOSE"][length // 3]
+    return {
+        "gaps": synthetic_ohlcv(length, seed=REFERENCE_SEED + 3, gaps=GAP_RATIO),
+        "flat": flat,
+    }
+
+
+def check_stream(module, stream_module: str = "MyTTStream", rtol: float = 1e-9) -> List[str]:
+    """检查流式指标逐根K线计入的结果与批量函数一致
+
+    Args:
+        module: 作为基准的 MyTT 实现
+        stream_module: 流式指标模块名
+        rtol: 数值相对误差容限
+
+    Returns:
+        List[str]: 失败说明
+    """
+    stream = importlib.import_module(stream_module)
+    failures = []
+    for dataset, data in stream_datasets().items():
+        for case in STREAM_CASES:
+            name, make_args = CASES[case]
+            args = make_args(data)
+            series = [a for a in args if isinstance(a, np.ndarray)]
+            params = [a for a in args if not isinstance(a, np.ndarray)]
+            try:
+                with np.errstate(all="ignore"):
+                    expected = np.stack([np.asarray(out, dtype=np.float64) for out in _outputs(_call(module, case, data))],
+                                        axis=-1)
+                    actual = getattr(stream, name)(*params).run(*series).reshape(expected.shape)
+            except Exception as e:
+                failures.append(f"{case}@stream-{dataset}: 调用失败 {e!r}")
+                continue
+            bad = ~np.isclose(actual, expected, rtol=rtol, atol=rtol, equal_nan=True)
+            if bad.any():
+                row, col = np.argwhere(bad)[0]
+                failures.append(f"{case}@stream-{dataset} 输出{col} 第{row}根: {actual[row, col]!r} != {expected[row, col]!r}")
+    return failures
+
+
+def time_case(module, case: str, data: Dict, min_time: float = 0.2, max_repeat: int = 20) -> float:
+    """对一个用例计时，取多次运行的最短时间
+
+    Args:
+        module: 被测实现
+        case: 用例名称
+        data: 行情数据
+        min_time: 总计时不少于该秒数（单次超过该值时只运行一次）
+        max_repeat: 最多重复次数
+
+    Returns:
+        float: 单次运行的最短耗时（秒）
+    """
+    timings = []
+    with np.errstate(all="ignore"):
+        _call(module, case, data)  # 预热（含 Numba 编译）
+        while len(timings) < max_repeat and (len(timings) < 3 or sum(timings) < min_time):
+            start = time.perf_counter()
+            _call(module, case, data)
+            timings.append(time.perf_counter() - start)
+            if timings[0] >= min_time:
+                break
+    return min(timings)
+
+
+def environment() -> Dict[str, str]:
+    """运行环境信息，写入基线文件便于判断基线是否可比"""
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = ""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "numba": numba_version if not os.environ.get("MYTT_NO_NUMBA") else "",
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def run_benchmark(module, sizes: Sequence[int] = DEFAULT_SIZES, panels: Sequence[Tuple[int, int]] = DEFAULT_PANELS,
+                  cases: Optional[Sequence[str]] = None, baseline: Optional[Dict] = None,
+                  threshold: float = 1.5, noise_floor: float = 1e-3) -> Tuple[Dict[str, float], List[str]]:
+    """计时并与基线比较
+
+    Args:
+        module: 被测实现
+        sizes: 一维序列长度
+        panels: 二维面板的 (长度, 股票数)
+        cases: 只测这些用例，None 为全部
+        baseline: 基线结果（run_benchmark 返回的 ns/元素字典）
+        threshold: 比基线慢多少倍视为退化
+        noise_floor: 单次耗时低于该秒数时不判断退化（计时噪声过大）
+
+    Returns:
+        Tuple[Dict[str, float], List[str]]: ("用例@规模" -> ns/元素, 退化说明)
+    """
+    cases = list(cases or CASES)
+    shapes = [(n, None) for n in sizes] + [(t, k) for t, k in panels]
+    results, slow = {}, []
+    print(f"{'用例':<16}{'规模':>14}{'耗时(ms)':>12}{'ns/元素':>10}{'基线':>10}{'比值':>8}")
+    for length, stocks in shapes:
+        data = synthetic_ohlcv(length, stocks)
+        elements = length * (stocks or 1)
+        label = f"{length}" if stocks is None else f"{length}x{stocks}"
+        for case in cases:
+            try:
+                seconds = time_case(module, case, data)
+            except Exception as e:
+                print(f"{case:<16}{label:>14}  调用失败 {e!r}")
+                continue
+            key = f"{case}@{label}"
+            ns = seconds * 1e9 / elements
+            results[key] = ns
+            base = (baseline or {}).get(key)
+            ratio = ns / base if base else None
+            flag = ""
+            if ratio is not None and ratio > threshold and seconds > noise_floor:
+                flag = "  SLOW"
+                slow.append(f"{key}: {ns:.2f} ns/元素，基线 {base:.2f}（{ratio:.2f}x）")
+            print(f"{case:<16}{label:>14}{seconds * 1e3:>12.3f}{ns:>10.2f}"
+                  f"{(f'{base:.2f}' if base else '-'):>10}{(f'{ratio:.2f}' if ratio else '-'):>8}{flag}")
+    return results, slow
+
+
+def _parse_sizes(text: str) -> List[int]:
+    return [int(float(x)) for x in text.split(",") if x.strip()]
+
+
+def _parse_panels(text: str) -> List[Tuple[int, int]]:
+    panels = []
+    for item in text.split(","):
+        if item.strip():
+            length, stocks = item.lower().split("x")
+            panels.append((int(float(length)), int(float(stocks))))
+    return panels
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="MyTT 性能基准与数值等价性检查")
+    parser.add_argument("--module", default="MyTT", help="被测模块名，默认 MyTT")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    check = sub.add_parser("check", help="数值等价性检查")
+    check.add_argument("--reference", default=REFERENCE_FILE, help="参考输出文件")
+    check.add_argument("--rtol", type=float, default=1e-7, help="数值相对误差容限")
+    check.add_argument("--update", action="store_true", help="用当前实现重新生成参考输出")
+
+    bench = sub.add_parser("bench", help="性能基准")
+    bench.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES), help="一维序列长度，逗号分隔")
+    bench.add_argument("--panels", default=",".join(f"{t}x{k}" for t, k in DEFAULT_PANELS),
+                       help="二维面板 长度x股票数，逗号分隔，空字符串表示不测")
+    bench.add_argument("--only", default="", help="只测这些用例，逗号分隔")
+    bench.add_argument("--baseline", default=BASELINE_FILE, help="基线文件")
+    bench.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线（与原基线合并）")
+    bench.add_argument("--threshold", type=float, default=1.5, help="比基线慢多少倍视为退化")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BENCH_DIR)
+    module = importlib.import_module(args.module)
+
+    if args.command == "check":
+        if args.update:
+            write_reference(build_reference(module), args.reference)
+            print(f"参考输出已写入 {args.reference}")
+            return 0
+        failures = check_reference(module, args.reference, args.rtol) + check_columnwise(module) + check_stream(module)
+        for line in failures:
+            print("FAIL", line)
+        print(f"{len(CASES)} 个用例，{len(failures)} 处不一致")
+        return 1 if failures else 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    only = [c.strip() for c in args.only.split(",") if c.strip()]
+    unknown = [c for c in only if c not in CASES]
+    if unknown:
+        parser.error(f"未知用例: {unknown}")
+    results, slow = run_benchmark(module, _parse_sizes(args.sizes), _parse_panels(args.panels), only or None,
+                                  baseline, args.threshold)
+    for line in slow:
+        print("SLOW", line)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": {**baseline, **results}}, f,
+                      ensure_ascii=False, indent=1)
+        print(f"基线已写入 {args.baseline}")
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
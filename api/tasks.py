@@ -366,19 +366,24 @@ def khframe_pipeline_task(self: TrackedTask, payload: Dict[str, Any]) -> Dict[st
     request = KhFrameTaskRequest(**payload)
     self.init_meta("啟動 KhFrame 任務")
 
-    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from khFrame import KhQuantFramework  # import lazily to avoid heavy import at startup
 
-    try:
-        from PyQt5.QtCore import QCoreApplication
-        if QCoreApplication.instance() is None:
-            QCoreApplication([])
-    except Exception:  # pylint: disable=broad-except
-        LOGGER.warning("QCoreApplication 初始化失敗，可能在非GUI環境執行")
+    # 引擎本身不依賴 Qt，日誌與進度直接轉發到任務狀態；
+    # 一般日誌數量很多，只轉發警告與錯誤，避免頻繁寫入任務狀態
+    def forward_log(message: str, level: str) -> None:
+        if level in ("WARNING", "ERROR"):
+            self.push_log(message, level=level)
 
-    from khFrame import KhQuantFramework  # import lazily to avoid heavy import at startup
+    def forward_progress(percent: float) -> None:
+        self.push_log(f"回測進度 {percent:.2f}%", progress=min(percent / 100.0, 0.99))
 
     self.push_log("載入框架設定")
-    framework = KhQuantFramework(request.config_path, request.strategy_path)
+    framework = KhQuantFramework(
+        request.config_path,
+        request.strategy_path,
+        log_callback=forward_log,
+        progress_callback=forward_progress,
+    )
 
     self.push_log("初始化交易帳戶")
     framework.init_trader_and_account()
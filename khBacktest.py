@@ -0,0 +1,238 @@
+# coding: utf-8
+"""
+无界面回测命令行入口
+
+不启动Qt，直接读取 .kh 配置文件运行回测并把结果保存到结果目录，
+适用于服务器、定时任务和API工作进程。
+
+用法示例：
+    python -m khBacktest strategies/双均线多股票_批量向量化.kh
+    python -m khBacktest 配置.kh -s 策略A.py -s 策略B.py -o results --no-download
+    python -m khBacktest 配置.kh -p fast=10 -p slow=30
+    python -m khBacktest 配置.kh --provider synthetic       # 不依赖 MiniQMT，使用合成行情
+    python -m khBacktest 配置.kh -s 策略A.py -s 策略B.py --provider synthetic --check-lockstep
+    python -m khBacktest 配置.kh --provider synthetic --check-timezone
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from khFrame import KhQuantFramework
+from khProvider import set_provider
+from khSweep import summarize_records
+
+
+def _parse_params(items: List[str]) -> Dict:
+    """解析 -p 参数，值按JSON解析，失败时作为字符串"""
+    params = {}
+    for item in items:
+        if "=" not in item:
+            raise ValueError(f"参数格式应为 名称=值: {item}")
+        key, value = item.split("=", 1)
+        try:
+            params[key.strip()] = json.loads(value)
+        except ValueError:
+            params[key.strip()] = value
+    return params
+
+
+class ConsoleReporter:
+    """把回测日志和进度输出到标准错误"""
+
+    LEVELS = {"DEBUG": 0, "INFO": 1, "TRADE": 1, "WARNING": 2, "ERROR": 3}
+
+    def __init__(self, min_level: str = "INFO", progress_step: float = 10.0, show_progress: bool = True):
+        """初始化
+
+        Args:
+            min_level: 输出的最低日志级别
+            progress_step: 每前进多少个百分点输出一次进度
+            show_progress: 是否输出进度
+        """
+        self.min_level = self.LEVELS.get(min_level, 1)
+        self.progress_step = progress_step
+        self.show_progress = show_progress
+        self._next_progress = 0.0
+
+    def log(self, message: str, level: str = "INFO"):
+        if self.LEVELS.get(level, 1) >= self.min_level:
+            print(f"[{time.strftime('%H:%M:%S')}] [{level}] {message}", file=sys.stderr, flush=True)
+
+    def progress(self, percent: float):
+        if not self.show_progress:
+            return
+        if percent >= self._next_progress or percent >= 100:
+            print(f"[{time.strftime('%H:%M:%S')}] 回测进度: {percent:.2f}%", file=sys.stderr, flush=True)
+            self._next_progress = (int(percent // self.progress_step) + 1) * self.progress_step
+
+
+def check_lockstep(config: str, strategy_files: List[str], overrides: Optional[Dict] = None) -> List[str]:
+    """检查多策略同步回测的结果与各策略单独回测的结果一致
+
+    同步回测只共享行情数据，每个策略的交易记录和每日统计都应与单独回测完全相同。
+
+    Args:
+        config: 回测配置文件路径
+        strategy_files: 策略文件路径列表
+        overrides: 覆盖配置项
+
+    Returns:
+        List[str]: 不一致的描述，为空表示一致
+    """
+    lockstep = KhQuantFramework(config, strategy_files, config_overrides=overrides)
+    lockstep.run_on_panel()
+    failures = []
+    for book, path in zip(lockstep.books, strategy_files):
+        solo = KhQuantFramework(config, path, config_overrides=overrides)
+        solo.run_on_panel()
+        for key in ("trades", "daily_stats"):
+            expected = pd.DataFrame(solo.books[0].backtest_records[key])
+            actual = pd.DataFrame(book.backtest_records[key])
+            if not actual.equals(expected):
+                failures.append(f"{book.name}: 同步回测的 {key} 与单独回测不一致")
+    return failures
+
+
+def _dump_records(config: str, strategy_files: List[str], overrides: Optional[Dict], path: str):
+    """运行回测并把各策略的交易记录和每日统计保存为pickle，供 check_timezones 的子进程使用"""
+    framework = KhQuantFramework(config, strategy_files, config_overrides=overrides)
+    framework.run_on_panel()
+    records = {book.name: {key: pd.DataFrame(book.backtest_records[key]) for key in ("trades", "daily_stats")}
+               for book in framework.books}
+    with open(path, "wb") as f:
+        pickle.dump(records, f)
+
+
+def check_timezones(config: str, strategy_files: List[str], overrides: Optional[Dict] = None,
+                    provider: Optional[str] = None,
+                    timezones=("Asia/Shanghai", "UTC")) -> List[str]:
+    """检查回测结果与运行机器的时区无关
+
+    行情日期统一按北京时间换算，在不同TZ环境变量下的子进程中运行同一回测，
+    各策略的交易记录和每日统计都应完全相同。
+
+    Args:
+        config: 回测配置文件路径
+        strategy_files: 策略文件路径列表
+        overrides: 覆盖配置项
+        provider: 子进程使用的行情数据源，None 时沿用环境变量KHQUANT_DATA_PROVIDER
+        timezones: 依次比较的TZ取值，以第一个为基准
+
+    Returns:
+        List[str]: 不一致的描述，为空表示一致
+    """
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for tz in timezones:
+            path = os.path.join(tmp, f"records_{len(results)}.pkl")
+            env = dict(os.environ, TZ=tz)
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [module_dir, env.get("PYTHONPATH")]))
+            if provider:
+                env["KHQUANT_DATA_PROVIDER"] = provider
+            payload = json.dumps([config, strategy_files, overrides, path])
+            subprocess.run([sys.executable, "-c",
+                            "import sys, json, khBacktest; khBacktest._dump_records(*json.loads(sys.argv[1]))",
+                            payload], env=env, stdout=subprocess.DEVNULL, check=True)
+            with open(path, "rb") as f:
+                results[tz] = pickle.load(f)
+
+    base_tz = timezones[0]
+    failures = []
+    for tz in timezones[1:]:
+        for name, expected in results[base_tz].items():
+            for key, frame in expected.items():
+                actual = results[tz].get(name, {}).get(key)
+                if actual is None or not actual.equals(frame):
+                    failures.append(f"{name}: TZ={tz} 的 {key} 与 TZ={base_tz} 不一致")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口
+
+    Args:
+        argv: 命令行参数，默认读取 sys.argv
+
+    Returns:
+        int: 退出码，0为成功
+    """
+    parser = argparse.ArgumentParser(prog="python -m khBacktest", description="无界面运行看海量化回测")
+    parser.add_argument("config", help="回测配置文件（.kh）路径")
+    parser.add_argument("-s", "--strategy", action="append", default=[],
+                        help="策略文件路径，可重复指定以同步回测多个策略；默认使用配置文件中的strategy_file")
+    parser.add_argument("-o", "--output-dir", default="backtest_results", help="回测结果保存的根目录")
+    parser.add_argument("-p", "--param", action="append", default=[],
+                        help="覆盖配置项，格式为 名称=值；不带\".\"的名称写入strategy_params")
+    parser.add_argument("--no-download", action="store_true", help="运行前不补充下载行情数据")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出警告和错误日志")
+    parser.add_argument("--provider", default=None,
+                        help="行情数据源：xtdata、synthetic 或 local:<目录>，默认读取环境变量KHQUANT_DATA_PROVIDER")
+    parser.add_argument("--check-lockstep", action="store_true",
+                        help="不保存结果，检查多策略同步回测与各策略单独回测的结果一致")
+    parser.add_argument("--check-timezone", action="store_true",
+                        help="不保存结果，检查在不同时区（TZ）下运行的回测结果一致")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    reporter = ConsoleReporter("WARNING" if args.quiet else "INFO", show_progress=not args.quiet)
+
+    try:
+        if args.provider:
+            set_provider(args.provider)
+        overrides = _parse_params(args.param)
+        strategy_files = args.strategy
+        if not strategy_files:
+            with open(args.config, "r", encoding="utf-8") as f:
+                strategy_file = json.load(f).get("strategy_file", "")
+            if not strategy_file:
+                parser.error("配置文件中没有strategy_file，请用 -s 指定策略文件")
+            strategy_files = [strategy_file]
+
+        if args.check_lockstep:
+            failures = check_lockstep(args.config, strategy_files, overrides or None)
+            for failure in failures:
+                print(failure, file=sys.stderr)
+            print("同步回测与单独回测结果一致" if not failures else f"发现 {len(failures)} 处不一致")
+            return 1 if failures else 0
+
+        if args.check_timezone:
+            failures = check_timezones(args.config, strategy_files, overrides or None, provider=args.provider)
+            for failure in failures:
+                print(failure, file=sys.stderr)
+            print("不同时区下的回测结果一致" if not failures else f"发现 {len(failures)} 处不一致")
+            return 1 if failures else 0
+
+        framework = KhQuantFramework(args.config, strategy_files, config_overrides=overrides or None,
+                                     log_callback=reporter.log, progress_callback=reporter.progress)
+        framework.results_root = args.output_dir
+        framework.run(init_data=not args.no_download)
+    except Exception as e:
+        if args.quiet:
+            print(f"回测失败: {str(e)}", file=sys.stderr)
+        else:
+            logging.exception(f"回测失败: {str(e)}")
+        return 1
+
+    # 输出各策略的汇总指标和结果目录
+    for book in framework.books:
+        metrics = summarize_records(book.backtest_records)
+        print(f"{book.name}: 总收益 {metrics['total_return'] * 100:.2f}% | "
+              f"年化收益 {metrics['annual_return'] * 100:.2f}% | "
+              f"最大回撤 {metrics['max_drawdown'] * 100:.2f}% | "
+              f"夏普比率 {metrics['sharpe']:.2f} | 交易次数 {metrics['trade_count']} | "
+              f"结果目录 {framework.get_backtest_dir(book)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# coding: utf-8
+"""
+批量（向量化）策略模式
+
+策略模块可选实现 khHandlebarBatch(panel, data)，在回测开始前一次性拿到
+整段对齐行情面板（khMarket.MarketPanel），用 NumPy 计算出 时间×股票 的
+信号矩阵或目标持仓矩阵；回测引擎随后按时间顺序把矩阵逐行回放给
+KhTradeManager，成交、费用和账户记录与 khHandlebar 模式完全一致。
+
+khHandlebarBatch 的返回值：
+- ndarray / DataFrame（T×N）：信号矩阵，等价于 {"signal": 矩阵}
+- dict，可包含以下键：
+    "signal": 信号矩阵。正数买入、负数卖出、0或NaN不操作；
+              买入时 0<x≤1 表示占可用资金比例，x>1 表示买入股数（100的整数倍）；
+              卖出时 -1≤x<0 表示占可卖持仓比例，x<-1 表示卖出股数
+    "target": 目标持仓矩阵（股数），NaN 表示该时间点不调整
+    "price": 委托价格，字段名（默认 "close"）或 T×N 价格矩阵
+    "reason": 交易原因说明
+
+注意：面板包含整个回测区间的数据，第 t 行的信号只能使用第 t 行及之前的数据，
+否则会产生未来函数。
+"""
+import logging
+import math
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from khMarket import MarketPanel
+from khQTTools import generate_signal
+
+
+class BatchOrders:
+    """khHandlebarBatch 返回结果的标准化封装，负责按K线序号生成交易信号"""
+
+    def __init__(self, panel: MarketPanel, signal: Optional[np.ndarray] = None,
+                 target: Optional[np.ndarray] = None, price: Union[str, np.ndarray] = "close",
+                 reason: str = "批量策略信号"):
+        """初始化
+
+        Args:
+            panel: 回测行情面板
+            signal: T×N 信号矩阵
+            target: T×N 目标持仓矩阵（股数）
+            price: 委托价格字段名或 T×N 价格矩阵
+            reason: 交易原因说明
+        """
+        if (signal is None) == (target is None):
+            raise ValueError("khHandlebarBatch 需要返回 signal 或 target 矩阵中的一个")
+        self.panel = panel
+        self.codes = panel.codes
+        self.reason = reason
+        shape = (len(panel.times), len(panel.codes))
+
+        self.mode = "signal" if signal is not None else "target"
+        matrix = self._as_matrix(signal if signal is not None else target, shape, self.mode)
+        self.matrix = matrix
+
+        if isinstance(price, str):
+            if price not in panel.field_index:
+                raise ValueError(f"行情面板中没有价格字段: {price}")
+            self.prices = panel.column(price)
+        else:
+            self.prices = self._as_matrix(price, shape, "price")
+
+        # 预先标记有操作的行，回放时其余行直接跳过
+        if self.mode == "signal":
+            self.active = np.nan_to_num(matrix, nan=0.0) != 0
+        else:
+            self.active = ~np.isnan(matrix)
+        self.active_rows = self.active.any(axis=1)
+
+    def _as_matrix(self, value, shape, name: str) -> np.ndarray:
+        """转换为 float64 的 T×N 矩阵，DataFrame 按面板的股票代码对齐列"""
+        if isinstance(value, pd.DataFrame):
+            value = value.reindex(columns=self.codes).to_numpy(dtype=np.float64)
+        matrix = np.asarray(value, dtype=np.float64)
+        if matrix.shape != shape:
+            raise ValueError(f"{name} 矩阵形状应为 {shape}（时间×股票），实际为 {matrix.shape}")
+        return matrix
+
+    @classmethod
+    def from_result(cls, result, panel: MarketPanel) -> "BatchOrders":
+        """根据 khHandlebarBatch 的返回值构造
+
+        Args:
+            result: khHandlebarBatch 的返回值
+            panel: 回测行情面板
+
+        Returns:
+            BatchOrders: 标准化后的批量指令
+        """
+        if isinstance(result, dict):
+            return cls(
+                panel,
+                signal=result.get("signal"),
+                target=result.get("target"),
+                price=result.get("price", "close"),
+                reason=result.get("reason", "批量策略信号"),
+            )
+        return cls(panel, signal=result)
+
+    @property
+    def order_count(self) -> int:
+        """矩阵中的非空指令数量"""
+        return int(self.active.sum())
+
+    def signals_at(self, bar_index: int, data: Dict) -> List[Dict]:
+        """回放第 bar_index 行，生成交易信号
+
+        先卖后买，保证卖出释放的资金可用于同一时间点的买入。
+
+        Args:
+            bar_index: K线序号
+            data: 当前时间点的数据字典（需包含 __account__、__positions__、__current_time__）
+
+        Returns:
+            List[Dict]: 交易信号列表
+        """
+        if not self.active_rows[bar_index]:
+            return []
+
+        row = self.matrix[bar_index]
+        prices = self.prices[bar_index]
+        columns = np.flatnonzero(self.active[bar_index])
+        positions = data.get("__positions__", {})
+
+        sells, buys = [], []
+        for col in columns.tolist():
+            price = prices[col]
+            if not np.isfinite(price) or price <= 0:
+                continue
+            code = self.codes[col]
+            value = float(row[col])
+            if self.mode == "signal":
+                if value > 0:
+                    buys.append((code, float(price), value))
+                else:
+                    sells.append((code, float(price), -value))
+            else:
+                current = positions.get(code, {}).get("volume", 0)
+                diff = value - current
+                if diff >= 100:
+                    buys.append((code, float(price), math.floor(diff / 100) * 100))
+                elif diff < 0:
+                    sells.append((code, float(price), -diff))
+
+        signals = []
+        for code, price, amount in sells:
+            signals.extend(self._sell(data, code, price, amount))
+        for code, price, amount in buys:
+            signals.extend(generate_signal(data, code, price, amount, "buy", self.reason))
+        return signals
+
+    def _sell(self, data: Dict, code: str, price: float, amount: float) -> List[Dict]:
+        """生成卖出信号：amount≤1 为持仓比例（目标持仓模式下为股数），否则为股数"""
+        if self.mode == "signal" and amount <= 1:
+            return generate_signal(data, code, price, amount, "sell", self.reason)
+
+        position = data.get("__positions__", {}).get(code)
+        if not position:
+            return []
+        available = position.get("can_use_volume", position.get("volume", 0))
+        if amount >= available:
+            # 清仓时允许卖出零股
+            volume = available
+        else:
+            volume = math.floor(amount / 100) * 100
+        if volume <= 0:
+            logging.warning(f"无法生成卖出信号: 股票={code}, 目标卖出={amount:.0f}, 可用持仓={available}")
+            return []
+        signal = {
+            "code": code,
+            "action": "sell",
+            "price": round(price, 2),
+            "volume": int(volume),
+            "reason": self.reason,
+        }
+        timestamp = data.get("__current_time__", {}).get("timestamp")
+        if timestamp:
+            signal["timestamp"] = timestamp
+        return [signal]
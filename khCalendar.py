@@ -0,0 +1,286 @@
+# coding: utf-8
+"""
+A股交易日历模块
+
+交易日历在进程内只构建一次：按自然日生成 datetime64[D] 数组，
+剔除周末和 holidays.China() 的法定节假日，再应用可选的本地覆盖文件。
+之后的交易日判断为 O(1) 数组下标访问，前后交易日查找为 O(log n) 二分查找，
+区间交易日计数通过累计和向量化完成，全程不需要联网。
+
+本地覆盖文件（默认 data/trade_calendar_override.csv）格式：
+    date,is_trade_day
+    2024-02-09,0
+    2024-10-12,0
+is_trade_day 为 0 表示强制休市，为 1 表示强制开市。
+"""
+import csv
+import datetime
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import List, Optional, Union
+
+import numpy as np
+
+try:
+    import holidays
+except ImportError:  # 没有holidays库时只按周末判断，可通过覆盖文件补充节假日
+    holidays = None
+
+
+DEFAULT_OVERRIDE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "trade_calendar_override.csv")
+
+DateLike = Union[str, datetime.date, datetime.datetime, np.datetime64]
+
+
+@lru_cache(maxsize=65536)
+def _parse_date_str(date_str: str) -> np.datetime64:
+    """解析日期字符串，支持 YYYY-MM-DD / YYYYMMDD / YYYY/MM/DD"""
+    text = date_str.strip()
+    if len(text) == 8 and text.isdigit():
+        text = f"{text[:4]}-{text[4:6]}-{text[6:]}"
+    elif len(text) >= 10:
+        text = text[:10].replace("/", "-")
+    return np.datetime64(text, "D")
+
+
+def to_day(date: DateLike) -> np.datetime64:
+    """把各种日期表示统一转换为 datetime64[D]
+
+    Args:
+        date: 日期字符串、date/datetime 对象或 datetime64
+
+    Returns:
+        np.datetime64: 精度为天的日期
+    """
+    if isinstance(date, str):
+        return _parse_date_str(date)
+    if isinstance(date, datetime.datetime):
+        return np.datetime64(date.date(), "D")
+    return np.datetime64(date, "D")
+
+
+def to_days(dates) -> np.ndarray:
+    """把日期序列统一转换为 datetime64[D] 数组"""
+    if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype("datetime64[D]")
+    return np.array([to_day(d) for d in dates], dtype="datetime64[D]")
+
+
+class TradingCalendar:
+    """A股交易日历
+
+    Attributes:
+        trade_days: 已排序的交易日数组（datetime64[D]）
+        start / end: 日历覆盖的首尾自然日
+    """
+
+    def __init__(self, start_year: int = 2000, end_year: Optional[int] = None,
+                 override_file: Optional[str] = DEFAULT_OVERRIDE_FILE):
+        """构建交易日历
+
+        Args:
+            start_year: 日历起始年份
+            end_year: 日历结束年份，默认为当前年份的下一年
+            override_file: 本地覆盖文件路径，文件不存在时忽略
+        """
+        if end_year is None:
+            end_year = datetime.date.today().year + 1
+        self.start_year = start_year
+        self.end_year = end_year
+        self.override_file = override_file
+
+        self.start = np.datetime64(f"{start_year}-01-01", "D")
+        self.end = np.datetime64(f"{end_year}-12-31", "D")
+        days = np.arange(self.start, self.end + 1, dtype="datetime64[D]")
+
+        # 1970-01-01 是周四，(天数 + 3) % 7 即 Python 的 weekday()
+        weekday = (days.astype(np.int64) + 3) % 7
+        is_trade = weekday < 5
+
+        holiday_days = self._load_holidays(start_year, end_year)
+        if len(holiday_days):
+            is_trade &= ~np.isin(days, holiday_days)
+
+        for day, flag in self._load_overrides(override_file):
+            if self.start <= day <= self.end:
+                is_trade[int((day - self.start).astype(np.int64))] = flag
+
+        self._is_trade = is_trade
+        # _cum[i] 为 start 之前（不含第 i 天）的交易日数量
+        self._cum = np.concatenate(([0], np.cumsum(is_trade, dtype=np.int64)))
+        self.trade_days = days[is_trade]
+
+    @staticmethod
+    def _load_holidays(start_year: int, end_year: int) -> np.ndarray:
+        """读取 holidays.China() 的法定节假日"""
+        if holidays is None:
+            logging.warning("未安装holidays库，交易日历仅排除周末")
+            return np.array([], dtype="datetime64[D]")
+        cn_holidays = holidays.China(years=range(start_year, end_year + 1))
+        return np.array(sorted(cn_holidays.keys()), dtype="datetime64[D]")
+
+    @staticmethod
+    def _load_overrides(override_file: Optional[str]) -> List:
+        """读取本地覆盖文件，返回 [(日期, 是否交易日), ...]"""
+        if not override_file or not os.path.exists(override_file):
+            return []
+        overrides = []
+        try:
+            with open(override_file, "r", encoding="utf-8-sig") as f:
+                for row in csv.DictReader(f):
+                    date_str = (row.get("date") or "").strip()
+                    if not date_str:
+                        continue
+                    flag = str(row.get("is_trade_day", "0")).strip().lower() in ("1", "true", "yes")
+                    overrides.append((to_day(date_str), flag))
+        except Exception as e:
+            logging.error(f"读取交易日历覆盖文件失败 {override_file}: {str(e)}")
+            return []
+        logging.info(f"已加载交易日历覆盖文件 {override_file}，共{len(overrides)}条")
+        return overrides
+
+    # ------------------------------------------------------------------
+    # 查询接口
+    # ------------------------------------------------------------------
+    def _offset(self, day: np.datetime64) -> int:
+        """日期相对日历起点的偏移，超出覆盖范围时抛出 ValueError"""
+        if day < self.start or day > self.end:
+            raise ValueError(f"日期 {day} 超出交易日历范围 {self.start} ~ {self.end}")
+        return int((day - self.start).astype(np.int64))
+
+    def contains(self, date: DateLike) -> bool:
+        """日期是否在日历覆盖范围内"""
+        day = to_day(date)
+        return self.start <= day <= self.end
+
+    def is_trade_day(self, date: DateLike) -> bool:
+        """判断是否为交易日，O(1)
+
+        Args:
+            date: 日期
+
+        Returns:
+            bool: 是否为交易日
+        """
+        return bool(self._is_trade[self._offset(to_day(date))])
+
+    def is_trade_days(self, dates) -> np.ndarray:
+        """向量化判断一组日期是否为交易日
+
+        Args:
+            dates: 日期序列
+
+        Returns:
+            np.ndarray: 布尔数组
+        """
+        days = to_days(dates)
+        if len(days) and (days.min() < self.start or days.max() > self.end):
+            raise ValueError(f"日期超出交易日历范围 {self.start} ~ {self.end}")
+        return self._is_trade[(days - self.start).astype(np.int64)]
+
+    def next_trade_day(self, date: DateLike, n: int = 1) -> str:
+        """获取指定日期之后的第 n 个交易日（不含当天），O(log n)
+
+        Args:
+            date: 日期
+            n: 向后数的交易日个数
+
+        Returns:
+            str: YYYY-MM-DD 格式的交易日
+        """
+        pos = int(np.searchsorted(self.trade_days, to_day(date), side="right")) + n - 1
+        if pos >= len(self.trade_days):
+            raise ValueError(f"{date} 之后的第{n}个交易日超出交易日历范围")
+        return str(self.trade_days[pos])
+
+    def prev_trade_day(self, date: DateLike, n: int = 1) -> str:
+        """获取指定日期之前的第 n 个交易日（不含当天），O(log n)
+
+        Args:
+            date: 日期
+            n: 向前数的交易日个数
+
+        Returns:
+            str: YYYY-MM-DD 格式的交易日
+        """
+        pos = int(np.searchsorted(self.trade_days, to_day(date), side="left")) - n
+        if pos < 0:
+            raise ValueError(f"{date} 之前的第{n}个交易日超出交易日历范围")
+        return str(self.trade_days[pos])
+
+    def count_trade_days(self, start_date, end_date):
+        """计算闭区间 [start_date, end_date] 内的交易日数量
+
+        两个参数可以同时为日期序列，此时按元素向量化计算并返回整数数组。
+
+        Args:
+            start_date: 起始日期或日期序列
+            end_date: 结束日期或日期序列
+
+        Returns:
+            int 或 np.ndarray: 交易日数量，起始日期晚于结束日期时为0
+        """
+        scalar = isinstance(start_date, (str, datetime.date, np.datetime64)) and \
+            isinstance(end_date, (str, datetime.date, np.datetime64))
+        starts = np.atleast_1d(to_days([start_date]) if scalar else to_days(start_date))
+        ends = np.atleast_1d(to_days([end_date]) if scalar else to_days(end_date))
+        lo = np.clip((starts - self.start).astype(np.int64), 0, len(self._is_trade))
+        hi = np.clip((ends - self.start).astype(np.int64) + 1, 0, len(self._is_trade))
+        counts = np.maximum(self._cum[hi] - self._cum[lo], 0)
+        return int(counts[0]) if scalar else counts
+
+    def trade_days_between(self, start_date: DateLike, end_date: DateLike) -> np.ndarray:
+        """获取闭区间 [start_date, end_date] 内的交易日数组（datetime64[D]）"""
+        lo = np.searchsorted(self.trade_days, to_day(start_date), side="left")
+        hi = np.searchsorted(self.trade_days, to_day(end_date), side="right")
+        return self.trade_days[lo:hi]
+
+    def get_trade_days(self, start_date: DateLike, end_date: DateLike, fmt: str = "%Y-%m-%d") -> List[str]:
+        """获取闭区间 [start_date, end_date] 内的交易日字符串列表
+
+        Args:
+            start_date: 起始日期
+            end_date: 结束日期
+            fmt: 输出格式，支持 "%Y-%m-%d" 和 "%Y%m%d"
+
+        Returns:
+            List[str]: 交易日列表
+        """
+        days = np.datetime_as_string(self.trade_days_between(start_date, end_date)).tolist()
+        if fmt == "%Y%m%d":
+            return [d.replace("-", "") for d in days]
+        return days
+
+
+_calendar: Optional[TradingCalendar] = None
+_calendar_lock = threading.Lock()
+
+
+def get_trade_calendar(date: Optional[DateLike] = None) -> TradingCalendar:
+    """获取进程内共享的交易日历
+
+    日历在首次调用时构建；查询日期超出覆盖范围时按需扩展年份重建一次。
+
+    Args:
+        date: 即将查询的日期，用于判断是否需要扩展日历范围
+
+    Returns:
+        TradingCalendar: 交易日历
+    """
+    global _calendar
+    calendar = _calendar
+    if calendar is not None and (date is None or calendar.contains(date)):
+        return calendar
+    with _calendar_lock:
+        calendar = _calendar
+        if calendar is None:
+            calendar = TradingCalendar()
+        if date is not None and not calendar.contains(date):
+            year = int(str(to_day(date))[:4])
+            calendar = TradingCalendar(start_year=min(calendar.start_year, year),
+                                       end_year=max(calendar.end_year, year),
+                                       override_file=calendar.override_file)
+        _calendar = calendar
+    return calendar
@@ -0,0 +1,248 @@
+# coding: utf-8
+"""
+回测时钟模块
+
+在加载阶段把整条回测时间轴一次性向量化转换为逐K线的时间信息，
+回测循环、触发器和 TimeInfo 直接读取预先计算好的数组，
+不再在每根K线上调用 datetime.fromtimestamp / strftime。
+
+日期和当日秒数固定按北京时间（UTC+8）计算，与 khProvider、khMarket 等模块一致，
+不受运行机器所在时区的影响。
+"""
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from khProvider import BEIJING_OFFSET_MS, DAY_MS
+
+# 北京时间相对UTC的偏移（秒）
+BEIJING_OFFSET_SECONDS = BEIJING_OFFSET_MS // 1000
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def to_epoch_seconds(times) -> np.ndarray:
+    """把时间戳数组统一转换为秒级时间戳
+
+    与回测引擎原有逻辑一致：大于 1e10 的视为毫秒级时间戳。
+
+    Args:
+        times: 秒级或毫秒级时间戳序列
+
+    Returns:
+        np.ndarray: int64 秒级时间戳
+    """
+    raw = np.asarray(times, dtype=np.int64)
+    return np.where(raw > 1e10, raw // 1000, raw)
+
+
+def beijing_datetime(times) -> datetime.datetime:
+    """把一个秒级或毫秒级时间戳转换为北京时间的 datetime（不带时区信息）
+
+    替代 datetime.fromtimestamp，结果与运行机器所在时区无关。
+
+    Args:
+        times: 秒级或毫秒级时间戳
+
+    Returns:
+        datetime.datetime: 北京时间
+    """
+    seconds = float(times)
+    if seconds > 1e10:
+        seconds /= 1000
+    return _EPOCH + datetime.timedelta(seconds=seconds + BEIJING_OFFSET_SECONDS)
+
+
+def beijing_epoch_ms(value) -> int:
+    """把北京时间转换为毫秒时间戳（UTC），beijing_datetime 的逆运算
+
+    Args:
+        value: 不带时区的 datetime/pd.Timestamp 或 pandas 可解析的时间字符串（视为北京时间），
+            整数视为已经是秒级或毫秒级时间戳
+
+    Returns:
+        int: 毫秒时间戳
+    """
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        return value if value > 1e10 else value * 1000
+    return pd.Timestamp(value).value // 1_000_000 - BEIJING_OFFSET_MS
+
+
+def beijing_day_start_ms(ms: int) -> int:
+    """毫秒时间戳所在北京时间日期的零点（毫秒时间戳）"""
+    return (int(ms) + BEIJING_OFFSET_MS) // DAY_MS * DAY_MS - BEIJING_OFFSET_MS
+
+
+def seconds_of_day(times) -> np.ndarray:
+    """计算时间戳在北京时间下的当日秒数（从午夜开始）
+
+    Args:
+        times: 秒级或毫秒级时间戳序列
+
+    Returns:
+        np.ndarray: int32 当日秒数
+    """
+    local = to_epoch_seconds(times) + BEIJING_OFFSET_SECONDS
+    return (local % 86400).astype(np.int32)
+
+
+def local_day_grid(days, day_seconds) -> np.ndarray:
+    """把 北京时间日期 × 当日秒数 的网格转换为秒级时间戳
+
+    Args:
+        days: 北京时间日期序列（datetime64[D] 或可转换的日期）
+        day_seconds: 当日秒数序列
+
+    Returns:
+        np.ndarray: int64 秒级时间戳，按日期优先展平（每个日期内按 day_seconds 的顺序）
+    """
+    days = np.asarray(days, dtype="datetime64[D]")
+    day_seconds = np.asarray(day_seconds, dtype=np.int64)
+    naive = (days.astype("datetime64[s]").astype(np.int64)[:, None] + day_seconds[None, :]).ravel()
+    return naive - BEIJING_OFFSET_SECONDS
+
+
+def first_bar_on_or_after(times, date) -> int:
+    """查找时间轴上第一根北京时间日期不早于 date 的K线序号
+
+    Args:
+        times: 已排序的秒级或毫秒级时间戳序列
+        date: 日期（datetime64[D] 或 "YYYYMMDD"/"YYYY-MM-DD" 字符串）
+
+    Returns:
+        int: K线序号，所有K线都早于 date 时返回时间轴长度
+    """
+    local_days = (to_epoch_seconds(times) + BEIJING_OFFSET_SECONDS) // 86400
+    if isinstance(date, str) and len(date) == 8 and date.isdigit():
+        date = f"{date[:4]}-{date[4:6]}-{date[6:]}"
+    day = np.datetime64(date, "D").astype(np.int64)
+    return int(np.searchsorted(local_days, day, side="left"))
+
+
+class BarClock:
+    """回测时钟：整条时间轴的逐K线时间信息表
+
+    所有数组与时间轴等长，下标即回测循环中的K线序号：
+    - raw_times: 原始时间戳（保持数据源的秒/毫秒精度）
+    - seconds: 秒级时间戳
+    - seconds_of_day: 北京时间当日秒数（从午夜开始）
+    - day_index: K线所属日期在 day_dates 中的序号
+    - is_first_bar / is_last_bar: 是否为当日第一根/最后一根K线
+    - day_start / day_end: 每个日期在时间轴上的起止K线序号（左闭右开）
+    - dates / times / datetimes: "YYYY-MM-DD" / "HH:MM:SS" / "YYYY-MM-DD HH:MM:SS" 字符串列表
+    """
+
+    def __init__(self, times, day_offset: int = 0):
+        """一次性转换整条时间轴
+
+        Args:
+            times: 回测时间轴（秒级或毫秒级时间戳，需已排序）
+            day_offset: time_info 中 day_index 的起始值，流式回测的后续分段从前面分段的日期数继续计数
+        """
+        self.raw_times = np.asarray(times, dtype=np.int64)
+        self.seconds = to_epoch_seconds(self.raw_times)
+
+        # 转为北京时间后按天切分
+        local = self.seconds + BEIJING_OFFSET_SECONDS
+        local_days = local // 86400
+        self.seconds_of_day = (local - local_days * 86400).astype(np.int32)
+
+        day_values, self.day_index = np.unique(local_days, return_inverse=True)
+        self.day_index = self.day_index.astype(np.int32)
+        self.day_dates: List[str] = np.datetime_as_string(day_values.astype("datetime64[D]")).tolist()
+
+        count = len(self.raw_times)
+        self.is_first_bar = np.zeros(count, dtype=bool)
+        self.is_last_bar = np.zeros(count, dtype=bool)
+        if count:
+            changed = self.day_index[1:] != self.day_index[:-1]
+            self.is_first_bar[0] = True
+            self.is_first_bar[1:] = changed
+            self.is_last_bar[-1] = True
+            self.is_last_bar[:-1] = changed
+
+        # 日期边界索引：第 d 天的K线为 [day_start[d], day_end[d])
+        self.day_start = np.flatnonzero(self.is_first_bar).astype(np.int64)
+        self.day_end = np.append(self.day_start[1:], count).astype(np.int64) if count else self.day_start.copy()
+        self._day_lookup = {date: i for i, date in enumerate(self.day_dates)}
+
+        # 字符串按去重后的值格式化，再按下标展开
+        sod_values, sod_inverse = np.unique(self.seconds_of_day, return_inverse=True)
+        time_values = [
+            f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in sod_values.tolist()
+        ]
+        day_list = self.day_index.tolist()
+        sod_list = sod_inverse.tolist()
+        self.dates: List[str] = [self.day_dates[i] for i in day_list]
+        self.times: List[str] = [time_values[i] for i in sod_list]
+        self.datetimes: List[str] = [f"{d} {t}" for d, t in zip(self.dates, self.times)]
+        day_nums = [d.replace("-", "") for d in self.day_dates]
+        time_nums = [t.replace(":", "") for t in time_values]
+        self.date_nums: List[str] = [day_nums[i] for i in day_list]
+        self.time_nums: List[str] = [time_nums[i] for i in sod_list]
+        self._timestamps: List[int] = self.raw_times.tolist()
+        self._day_index: List[int] = [d + day_offset for d in day_list] if day_offset else day_list
+        self._first: List[bool] = self.is_first_bar.tolist()
+        self._last: List[bool] = self.is_last_bar.tolist()
+
+    def __len__(self) -> int:
+        return len(self.raw_times)
+
+    @property
+    def day_count(self) -> int:
+        """时间轴覆盖的自然日数量"""
+        return len(self.day_dates)
+
+    def day_bounds(self, date: str) -> Optional[Tuple[int, int]]:
+        """获取某个日期在时间轴上的K线区间，O(1)
+
+        Args:
+            date: "YYYY-MM-DD" 格式日期
+
+        Returns:
+            Optional[Tuple[int, int]]: (起始序号, 结束序号)，左闭右开；时间轴中没有该日期时返回None
+        """
+        day = self._day_lookup.get(date)
+        if day is None:
+            return None
+        return int(self.day_start[day]), int(self.day_end[day])
+
+    def bar_index_of(self, timestamp) -> int:
+        """根据时间戳查找K线序号，O(log n)
+
+        Args:
+            timestamp: 秒级或毫秒级时间戳
+
+        Returns:
+            int: K线序号，时间轴中不存在该时间戳时返回-1
+        """
+        seconds = int(to_epoch_seconds([int(float(timestamp))])[0])
+        pos = int(np.searchsorted(self.seconds, seconds))
+        if pos < len(self.seconds) and self.seconds[pos] == seconds:
+            return pos
+        return -1
+
+    def time_info(self, bar_index: int) -> Dict:
+        """生成回测循环使用的时间信息字典
+
+        Args:
+            bar_index: K线序号
+
+        Returns:
+            Dict: 与原引擎 __current_time__ 结构一致，并附带预计算字段
+        """
+        timestamp = self._timestamps[bar_index]
+        return {
+            "timestamp": timestamp,
+            "datetime": self.datetimes[bar_index],
+            "date": self.dates[bar_index],
+            "time": self.times[bar_index],
+            "raw_time": timestamp,
+            "date_num": self.date_nums[bar_index],
+            "time_num": self.time_nums[bar_index],
+            "day_index": self._day_index[bar_index],
+            "is_first_bar": self._first[bar_index],
+            "is_last_bar": self._last[bar_index],
+        }
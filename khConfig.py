@@ -16,7 +16,10 @@ class KhConfig:
         # 加载配置文件
         with open(config_path, 'r', encoding='utf-8') as f:
             self.config_dict = json.load(f)
+        self._parse_config()
         
+    def _parse_config(self):
+        """从配置字典解析常用配置项"""
         # 从根级别或system配置中读取run_mode
         self.run_mode = self.config_dict.get("run_mode") or \
                        self.config_dict.get("system", {}).get("run_mode", "backtest")
@@ -33,6 +36,8 @@ class KhConfig:
         backtest_config = self.config_dict.get("backtest", {})
         self.backtest_start = backtest_config.get("start_time", "20240101")
         self.backtest_end = backtest_config.get("end_time", "20241231")
+        # 回测开始前预加载的K线数量，策略模块也可以通过 WARMUP_BARS 声明，取两者较大值
+        self.warmup_bars = backtest_config.get("warmup_bars", 0)
         
         # 从回测配置中获取初始资金
         self.init_capital = backtest_config.get("init_capital", 1000000)
@@ -42,6 +47,12 @@ class KhConfig:
         self.kline_period = data_config.get("kline_period", "1d")
         # 优先从stock_list读取，如果没有则使用stock_pool（兼容性）
         self.stock_pool = data_config.get("stock_list", data_config.get("stock_pool", []))
+        # 历史数据加载：每批股票数量和并发线程数
+        self.load_batch_size = data_config.get("load_batch_size", 50)
+        self.load_workers = data_config.get("load_workers", 4)
+        # 流式回测：每次加载的交易日数量（0为一次性加载整个区间）和是否在后台预取下一段
+        self.stream_chunk_days = int(data_config.get("stream_chunk_days", 0) or 0)
+        self.stream_prefetch = bool(data_config.get("stream_prefetch", True))
         
         # 风控配置，设置默认值
         risk_config = self.config_dict.get("risk", {})
@@ -49,6 +60,26 @@ class KhConfig:
         self.order_limit = risk_config.get("order_limit", 100)
         self.loss_limit = risk_config.get("loss_limit", 0.1)
         
+    @property
+    def strategy_params(self) -> Dict[str, Any]:
+        """获取策略参数（配置文件中的strategy_params节）"""
+        return self.config_dict.get("strategy_params", {})
+
+    def apply_overrides(self, overrides: Dict[str, Any]):
+        """在内存中覆盖配置项（不写回文件），用于参数优化等批量回测
+
+        Args:
+            overrides: 覆盖项字典。键中带"."的按路径写入配置，如"backtest.init_capital"；
+                       不带"."的视为策略参数，写入strategy_params节
+        """
+        for key, value in overrides.items():
+            path = key.split(".") if "." in key else ["strategy_params", key]
+            node = self.config_dict
+            for part in path[:-1]:
+                node = node.setdefault(part, {})
+            node[path[-1]] = value
+        self._parse_config()
+
     @property
     def initial_cash(self):
         """获取初始资金，确保与回测配置中的init_capital保持一致"""
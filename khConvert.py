@@ -0,0 +1,235 @@
+# coding: utf-8
+"""
+MiniQMT 本地数据批量转换为列式存储
+
+要离线分析多年的 MiniQMT 本地数据，原来只能逐只股票调用 get_local_data 再导出 CSV。
+convert() 遍历 MiniQMT 的 datadir，把选定周期的全部 .DAT 文件用 khDat 直接读取，
+多进程并行写入 khStore.ColumnStore（价格列 float64/float32，过去年份的分区压缩封存）：
+
+- 每个任务是一只股票的一个周期（分笔为该股票的全部日期文件），同一股票只在一个进程内写入
+- 存储根目录下的 _qmt_convert.json 记录每个已转换文件的大小、修改时间、记录数和已转换记录的 CRC32；
+  再次运行时大小和修改时间都没变的文件直接跳过
+- 变化的文件如果只是在末尾追加了记录（原有记录的 CRC32 不变），只写入新增的记录；
+  否则整个文件重新转换：先删除上次从该文件写入的数据（K线为该股票该周期的全部数据，分笔为该文件的时间范围），
+  源文件中已删除或修改的记录不会残留在存储中
+- 清单每隔几秒写盘一次，中断后再次运行会从未完成的文件继续
+
+转换后的目录可直接用于 khProvider.LocalFileProvider（local:<存储目录>）、khScan 和回测。
+
+命令行：
+    python -m khConvert <datadir> <存储目录> [--period 1d 1m] [--workers 8] [--float32] [--no-compress] [--full]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from khDat import DatFile, iter_dat_files
+from khStore import ColumnStore
+
+MANIFEST_FILE = "_qmt_convert.json"
+FLUSH_INTERVAL = 5.0
+
+
+def load_manifest(root: str) -> Dict[str, Dict]:
+    """读取转换清单 {文件绝对路径: {"size", "mtime", "rows", "crc", "layout", "first", "last"}}"""
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError) as e:
+        logging.warning(f"转换清单无法读取，将全部重新转换: {e}")
+        return {}
+
+
+def save_manifest(root: str, files: Dict[str, Dict]):
+    """写入转换清单（先写临时文件再替换）"""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"files": files}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _crc(dat: DatFile, rows: int) -> int:
+    """前 rows 条记录的 CRC32（直接在映射区上计算）"""
+    return zlib.crc32(dat.records[:rows].view(np.uint8)) if rows else 0
+
+
+def _resume_index(dat: DatFile, previous: Optional[Dict]) -> int:
+    """上次转换后文件只在末尾追加了记录时，返回需要转换的第一条记录的下标，否则为 0"""
+    if not previous or previous.get("layout") != dat.layout.name:
+        return 0
+    rows = previous.get("rows", 0)
+    if 0 < rows <= dat.count and _crc(dat, rows) == previous.get("crc"):
+        return rows
+    return 0
+
+
+def _time_span(dat: DatFile) -> Tuple[Optional[int], Optional[int]]:
+    """文件中记录的最早和最晚时间（毫秒时间戳），没有记录时为 (None, None)"""
+    if not dat.count:
+        return None, None
+    times = dat.times()
+    return int(times.min()), int(times.max())
+
+
+def _clear_previous(store: ColumnStore, dat: DatFile, code: str, period: str, previous: Dict) -> int:
+    """整个文件重新转换前，删除上次从该文件写入的数据，返回删除的行数"""
+    if period != "tick":
+        # K线每只股票每个周期只有一个文件
+        return store.remove(code, period)
+    # 分笔每个交易日一个文件，删除上次记录的时间范围和本次数据的时间范围
+    first, last = _time_span(dat)
+    bounds = [t for t in (previous.get("first"), previous.get("last"), first, last) if t is not None]
+    return store.remove(code, period, min(bounds), max(bounds)) if bounds else 0
+
+
+def _convert_job(job: Tuple) -> Dict:
+    """转换一只股票一个周期的文件（在工作进程中执行）"""
+    root, price_dtype, compress, full, code, period, files = job
+    store = ColumnStore(root, price_dtype=price_dtype)
+    result = {"code": code, "period": period, "files": {}, "rows": 0, "records": 0, "errors": []}
+    for path, size, mtime, previous in files:
+        try:
+            with DatFile(path, period) as dat:
+                start = 0 if full else _resume_index(dat, previous)
+                if start == 0 and previous:
+                    result["rows"] -= _clear_previous(store, dat, code, period, previous)
+                if start < dat.count:
+                    result["rows"] += store.write(code, period, dat.columns(slice(start, None)))
+                result["records"] += dat.count - start
+                first, last = _time_span(dat)
+                result["files"][path] = {"size": size, "mtime": mtime, "rows": dat.count,
+                                         "crc": _crc(dat, dat.count), "layout": dat.layout.name,
+                                         "first": first, "last": last}
+        except (OSError, ValueError) as e:
+            result["errors"].append(f"{path}: {e}")
+    if compress and result["files"]:
+        # 整只股票写完后再封存，避免逐个文件写入时反复解压重写已封存的分区
+        store.seal(codes=[code], period=period)
+    return result
+
+
+def plan(datadir: str, manifest: Dict[str, Dict], periods: Optional[Sequence[str]] = None,
+         full: bool = False) -> Tuple[List[Tuple[str, str, List[Tuple]]], int]:
+    """找出需要转换的文件，按 (股票代码, 周期) 分组
+
+    Args:
+        datadir: MiniQMT 的 datadir 目录
+        manifest: 转换清单，见 load_manifest
+        periods: 周期，None 为全部K线周期（分笔数据量很大，需明确指定 "tick"）
+        full: 不跳过未变化的文件，全部重新转换
+
+    Returns:
+        Tuple: ([(股票代码, 周期, [(路径, 大小, 修改时间, 上次转换记录或None), ...]), ...], 未变化而跳过的文件数)
+    """
+    groups: Dict[Tuple[str, str], List[Tuple]] = {}
+    unchanged = 0
+    for path, code, period in iter_dat_files(datadir, periods):
+        if periods is None and period == "tick":
+            continue
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        previous = manifest.get(path)
+        if not full and previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns:
+            unchanged += 1
+            continue
+        groups.setdefault((code, period), []).append((path, stat.st_size, stat.st_mtime_ns, previous))
+    return [(code, period, files) for (code, period), files in groups.items()], unchanged
+
+
+def convert(datadir: str, root: str, periods: Optional[Sequence[str]] = None, workers: Optional[int] = None,
+            price_dtype: str = "float64", compress: bool = True, full: bool = False,
+            progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """把 MiniQMT datadir 中的 .DAT 文件增量转换为列式存储
+
+    Args:
+        datadir: MiniQMT 的 datadir 目录（其下为 SH/SZ/BJ 等市场目录）
+        root: 列式存储目录
+        periods: 周期，如 ["1d", "1m"]；None 为全部K线周期
+        workers: 并行进程数，None 为CPU核数，1 为在当前进程中顺序转换
+        price_dtype: 新建存储时价格列的精度，"float64" 或 "float32"
+        compress: 是否压缩封存今年以前的分区
+        full: 不跳过未变化的文件，全部重新转换
+        progress_callback: 进度回调 (已完成任务数, 任务总数)
+
+    Returns:
+        Dict: files（转换的文件数）、unchanged（跳过的文件数）、records（读取的记录数）、
+        rows（存储中K线数的净增量，重新转换时扣除删除的行）、errors（失败的文件及原因）、seconds
+    """
+    started = time.time()
+    manifest = load_manifest(root)
+    jobs, unchanged = plan(datadir, manifest, periods, full)
+    # 大文件优先，减少并行末尾的等待
+    jobs.sort(key=lambda job: -sum(size for _, size, _, _ in job[2]))
+    args = [(root, price_dtype, compress, full, code, period, files) for code, period, files in jobs]
+    summary = {"files": 0, "unchanged": unchanged, "records": 0, "rows": 0, "errors": []}
+    workers = (os.cpu_count() or 1) if workers is None else max(1, int(workers))
+    last_flush = time.monotonic()
+
+    def collect(result: Dict, done: int):
+        nonlocal last_flush
+        manifest.update(result["files"])
+        summary["files"] += len(result["files"])
+        summary["records"] += result["records"]
+        summary["rows"] += result["rows"]
+        summary["errors"].extend(result["errors"])
+        if progress_callback:
+            progress_callback(done, len(args))
+        if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+            save_manifest(root, manifest)
+            last_flush = time.monotonic()
+
+    try:
+        if workers == 1 or len(args) <= 1:
+            for done, job in enumerate(args, 1):
+                collect(_convert_job(job), done)
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(args))) as executor:
+                futures = [executor.submit(_convert_job, job) for job in args]
+                for done, future in enumerate(as_completed(futures), 1):
+                    collect(future.result(), done)
+    finally:
+        if args:
+            save_manifest(root, manifest)
+    summary["seconds"] = round(time.time() - started, 2)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m khConvert", description="MiniQMT 本地数据增量转换为列式存储")
+    parser.add_argument("datadir", help="MiniQMT 的 datadir 目录，例如 D:/国金QMT/userdata_mini/datadir")
+    parser.add_argument("root", help="列式存储目录")
+    parser.add_argument("--period", nargs="+", help="只转换这些周期（1m 5m 1d tick 等），默认全部K线周期")
+    parser.add_argument("--workers", type=int, help="并行进程数，默认为CPU核数")
+    parser.add_argument("--float32", action="store_true", help="新建存储时价格列使用 float32")
+    parser.add_argument("--no-compress", action="store_true", help="不压缩封存过去年份的分区")
+    parser.add_argument("--full", action="store_true", help="不跳过未变化的文件，全部重新转换")
+    args = parser.parse_args(argv)
+
+    def progress(done: int, total: int):
+        if done == total or done % 100 == 0:
+            print(f"\r{done}/{total}", end="" if done < total else "\n", flush=True)
+
+    summary = convert(args.datadir, args.root, args.period, args.workers,
+                      price_dtype="float32" if args.float32 else "float64",
+                      compress=not args.no_compress, full=args.full, progress_callback=progress)
+    print(f"转换 {summary['files']} 个文件（跳过未变化的 {summary['unchanged']} 个），读取 {summary['records']} 条记录，"
+          f"净增 {summary['rows']} 行，用时 {summary['seconds']} 秒")
+    for error in summary["errors"]:
+        print(f"失败: {error}")
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
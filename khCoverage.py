@@ -0,0 +1,314 @@
+# coding: utf-8
+"""
+本地行情覆盖范围清单
+
+supplement_history_data 原先每次都对每只股票调用 download_history_data(..., incrementally=True)，
+即使本地数据已经是最新的。CoverageManifest 按 (股票代码, 周期) 记录本地数据的覆盖情况：
+
+    first / last    本地第一根、最后一根K线的时间（毫秒时间戳）
+    rows            最近一次检查时区间内的K线数
+    start / final   已向数据源核对过的日期区间（YYYYMMDD）；final 之前的交易日数据已完整（收盘后才算完整）
+    gaps            first 与 last 之间没有数据的交易日区间 [[开始, 结束], ...]（停牌或缺失）
+
+每次补充后用取回的数据更新清单；下次补充前用 plan() 批量判断哪些股票、哪些区间需要下载，
+已是最新的股票直接跳过。清单为一个 JSON 文件，默认位于 data/_coverage_<数据源>.json，
+可用环境变量 KHQUANT_COVERAGE_FILE 指定。
+
+命令行：
+    python -m khCoverage info [周期] [--file 清单文件]
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from khCalendar import get_trade_calendar, to_day
+from khProvider import BEIJING_OFFSET_MS, DAY_MS, DEFAULT_DATA_DIR
+
+COVERAGE_ENV = "KHQUANT_COVERAGE_FILE"
+# 北京时间15:30之后当日数据视为完整
+FINAL_SECONDS = 15 * 3600 + 30 * 60
+
+
+def default_coverage_path(provider_name: Optional[str] = None) -> str:
+    """默认的清单文件路径（每个数据源一个文件）"""
+    if os.environ.get(COVERAGE_ENV):
+        return os.environ[COVERAGE_ENV]
+    if provider_name is None:
+        from khProvider import get_provider
+        provider_name = get_provider().name
+    return os.path.join(DEFAULT_DATA_DIR, f"_coverage_{provider_name}.json")
+
+
+def _day_text(day: np.datetime64) -> str:
+    return str(np.datetime64(day, "D")).replace("-", "")
+
+
+def _days_of(times_ms: np.ndarray) -> np.ndarray:
+    """毫秒时间戳对应的北京时间日期"""
+    return ((np.asarray(times_ms, dtype=np.int64) + BEIJING_OFFSET_MS) // DAY_MS).astype("datetime64[D]")
+
+
+def _runs(days: np.ndarray) -> List[List[str]]:
+    """把交易日数组（在交易日序列中的下标连续的为一段）压缩为 [[开始, 结束], ...]"""
+    if len(days) == 0:
+        return []
+    cal = get_trade_calendar(days[-1])
+    index = np.searchsorted(cal.trade_days, days)
+    breaks = np.flatnonzero(np.diff(index) > 1)
+    starts = np.concatenate([[0], breaks + 1])
+    ends = np.concatenate([breaks, [len(days) - 1]])
+    return [[_day_text(days[s]), _day_text(days[e])] for s, e in zip(starts, ends)]
+
+
+def complete_day(end_date: str, now_ms: Optional[int] = None) -> Optional[np.datetime64]:
+    """截至 now_ms，不晚于 end_date 且数据已完整的最后一个交易日
+
+    Args:
+        end_date: 结束日期 YYYYMMDD
+        now_ms: 当前时间（毫秒时间戳），默认为当前时间
+
+    Returns:
+        Optional[np.datetime64]: 交易日；没有时返回None
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+    local = now_ms + BEIJING_OFFSET_MS
+    today = np.datetime64(local // DAY_MS, "D")
+    if local % DAY_MS < FINAL_SECONDS * 1000:
+        today = today - 1
+    last = min(to_day(end_date), today)
+    cal = get_trade_calendar(last)
+    pos = int(np.searchsorted(cal.trade_days, last, side="right")) - 1
+    return cal.trade_days[pos] if pos >= 0 else None
+
+
+class CoverageManifest:
+    """按 (股票代码, 周期) 记录本地行情覆盖范围的清单"""
+
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 2.0):
+        """初始化并读取已有的清单
+
+        Args:
+            path: 清单文件路径，None 为 default_coverage_path()
+            flush_interval: 两次写盘的最短间隔（秒），save(force=True) 总会写盘
+        """
+        self.path = path or default_coverage_path()
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._last_flush = 0.0
+        self._dirty = False
+        self._data: Dict[str, Dict[str, Dict]] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f).get("periods", {})
+            except (OSError, ValueError) as e:
+                logging.warning(f"覆盖范围清单 {self.path} 无法读取，重新建立: {str(e)}")
+
+    # ---- 查询 ----
+    def get(self, code: str, period: str) -> Optional[Dict]:
+        """一只股票的覆盖记录，没有记录时返回None"""
+        entry = self._data.get(period, {}).get(code)
+        return dict(entry) if entry else None
+
+    def codes(self, period: str) -> List[str]:
+        """有覆盖记录的股票代码"""
+        return sorted(self._data.get(period, {}))
+
+    def periods(self) -> List[str]:
+        return sorted(self._data)
+
+    def frame(self, period: str, codes: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """批量查询覆盖记录
+
+        Args:
+            period: 周期
+            codes: 股票代码，None 为全部
+
+        Returns:
+            pd.DataFrame: 以股票代码为索引，列为 first/last（北京时间）、rows、start、final、gap_count、gaps、updated；
+            没有记录的股票各列为空
+        """
+        entries = self._data.get(period, {})
+        codes = self.codes(period) if codes is None else list(codes)
+        rows = []
+        for code in codes:
+            entry = entries.get(code)
+            if entry is None:
+                rows.append({"code": code})
+                continue
+            rows.append({
+                "code": code,
+                "first": pd.Timestamp(entry["first"] + BEIJING_OFFSET_MS, unit="ms") if entry.get("first") is not None else pd.NaT,
+                "last": pd.Timestamp(entry["last"] + BEIJING_OFFSET_MS, unit="ms") if entry.get("last") is not None else pd.NaT,
+                "rows": entry.get("rows", 0),
+                "start": entry.get("start"),
+                "final": entry.get("final"),
+                "gap_count": len(entry.get("gaps", [])),
+                "gaps": entry.get("gaps", []),
+                "updated": pd.Timestamp.fromtimestamp(entry["updated"]) if entry.get("updated") else pd.NaT,
+            })
+        columns = ["code", "first", "last", "rows", "start", "final", "gap_count", "gaps", "updated"]
+        return pd.DataFrame(rows, columns=columns).set_index("code")
+
+    def stale_ranges(self, code: str, period: str, start_date: str, end_date: str,
+                     include_gaps: bool = False, now_ms: Optional[int] = None) -> List[Tuple[str, str]]:
+        """一只股票在 [start_date, end_date] 内需要下载的区间
+
+        Args:
+            code: 股票代码
+            period: 周期
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+            include_gaps: 是否重新下载已知的缺口（停牌日通常没有数据，默认不重复请求）
+            now_ms: 当前时间（毫秒时间戳），默认为当前时间
+
+        Returns:
+            List[Tuple[str, str]]: [(开始日期, 结束日期)]，已是最新时为空列表
+        """
+        entry = self._data.get(period, {}).get(code)
+        if entry is None:
+            return [(start_date, end_date)]
+        ranges = []
+        if start_date < entry["start"]:
+            ranges.append((start_date, entry["start"]))
+        if include_gaps:
+            ranges.extend((max(a, start_date), min(b, end_date)) for a, b in entry.get("gaps", [])
+                          if a <= end_date and b >= start_date)
+        expected = complete_day(end_date, now_ms)
+        if expected is not None and _day_text(expected) > entry["final"] and end_date > entry["final"]:
+            ranges.append((max(entry["final"], start_date), end_date))
+        return ranges
+
+    def plan(self, codes: Iterable[str], period: str, start_date: str, end_date: str,
+             include_gaps: bool = False, now_ms: Optional[int] = None) -> Dict[str, List[Tuple[str, str]]]:
+        """批量判断需要补充的股票和区间
+
+        Returns:
+            Dict[str, List[Tuple[str, str]]]: {股票代码: 需要下载的区间}，只包含需要补充的股票，顺序与 codes 一致
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        result = {}
+        for code in dict.fromkeys(codes):
+            ranges = self.stale_ranges(code, period, start_date, end_date, include_gaps, now_ms)
+            if ranges:
+                result[code] = ranges
+        return result
+
+    # ---- 更新 ----
+    def update(self, code: str, period: str, times_ms, start_date: str, end_date: str,
+               now_ms: Optional[int] = None) -> Dict:
+        """用向数据源核对过的 [start_date, end_date] 区间的数据更新覆盖记录
+
+        Args:
+            code: 股票代码
+            period: 周期
+            times_ms: 区间内本地数据的时间（毫秒时间戳）
+            start_date: 区间开始日期 YYYYMMDD
+            end_date: 区间结束日期 YYYYMMDD
+            now_ms: 当前时间（毫秒时间戳），默认为当前时间；当日收盘前的数据不计入已完整区间
+
+        Returns:
+            Dict: 更新后的覆盖记录；区间内没有数据时不更新（取数失败或尚未下载），返回原记录
+        """
+        times = np.unique(np.asarray(times_ms, dtype=np.int64))
+        if len(times) == 0:
+            # 空结果无法区分取数失败和确实没有数据，不推进已完整区间，下次补充时重新核对
+            with self._lock:
+                old = self._data.get(period, {}).get(code)
+                return dict(old) if old else {}
+        final_day = complete_day(end_date, now_ms)
+        start_day = to_day(start_date)
+        with self._lock:
+            old = self._data.get(period, {}).get(code)
+            new_final = _day_text(final_day) if final_day is not None and final_day >= start_day else None
+            if new_final is None:
+                # 区间内还没有已完整的交易日，只记录时间范围
+                new_final = old["final"] if old else _day_text(start_day - 1)
+            lo = min(start_day, to_day(old["start"])) if old else start_day
+            hi = max(to_day(new_final), to_day(old["final"])) if old else to_day(new_final)
+            get_trade_calendar(lo)
+            days = get_trade_calendar(hi).trade_days_between(lo, hi)
+
+            # 按交易日标记是否有数据：旧记录覆盖的部分沿用旧结果，本次核对的区间以本次数据为准
+            has = np.zeros(len(days), dtype=bool)
+            if old and old.get("first") is not None:
+                first_day, last_day = _days_of([old["first"], old["last"]])
+                has |= (days >= to_day(old["start"])) & (days <= to_day(old["final"])) & \
+                    (days >= first_day) & (days <= last_day)
+                for a, b in old.get("gaps", []):
+                    has &= ~((days >= to_day(a)) & (days <= to_day(b)))
+            checked = (days >= start_day) & (days <= to_day(new_final))
+            has[checked] = np.isin(days[checked], _days_of(times))
+
+            first = [old["first"]] if old and old.get("first") is not None else []
+            last = [old["last"]] if old and old.get("last") is not None else []
+            if len(times):
+                first.append(int(times[0]))
+                last.append(int(times[-1]))
+            present = np.flatnonzero(has)
+            gaps = []
+            if len(present):
+                inner = days[present[0]:present[-1] + 1][~has[present[0]:present[-1] + 1]]
+                gaps = _runs(inner)
+            entry = {
+                "first": min(first) if first else None,
+                "last": max(last) if last else None,
+                "rows": int(len(times)),
+                "start": min(start_date, old["start"]) if old else start_date,
+                "final": max(new_final, old["final"]) if old else new_final,
+                "gaps": gaps,
+                "updated": time.time(),
+            }
+            self._data.setdefault(period, {})[code] = entry
+            self._dirty = True
+        self.save()
+        return dict(entry)
+
+    def remove(self, code: str, period: Optional[str] = None):
+        """删除覆盖记录（period 为None时删除该股票所有周期的记录），下次补充时重新核对"""
+        with self._lock:
+            for name in ([period] if period else list(self._data)):
+                if self._data.get(name, {}).pop(code, None) is not None:
+                    self._dirty = True
+        self.save()
+
+    def save(self, force: bool = False):
+        """写盘（先写临时文件再替换）；未到 flush_interval 时跳过，force=True 时总会写盘"""
+        with self._lock:
+            now = time.monotonic()
+            if not self._dirty or (not force and now - self._last_flush < self.flush_interval):
+                return
+            self._last_flush = now
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"periods": self._data}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="本地行情覆盖范围清单")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="查看覆盖范围")
+    info.add_argument("period", nargs="?", help="周期，省略时列出各周期的股票数")
+    info.add_argument("--file", help="清单文件，默认为当前数据源的清单")
+    args = parser.parse_args(argv)
+
+    manifest = CoverageManifest(args.file)
+    if args.period:
+        print(manifest.frame(args.period).drop(columns=["gaps"]).to_string())
+    else:
+        for period in manifest.periods():
+            print(f"{period}: {len(manifest.codes(period))} 只股票")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+# coding: utf-8
+"""
+MiniQMT 本地 .DAT 数据文件读取
+
+MiniQMT 把下载的行情保存在 datadir 下的定长记录文件中：
+
+    <datadir>/<市场>/<周期秒数>/<代码>.DAT       K线，例如 SH/60/600000.DAT（1m）、SZ/86400/000001.DAT（1d）
+    <datadir>/<市场>/0/<代码>/<日期>.dat         分笔，例如 SH/0/600000/20240105.dat
+
+原来的 MiniQMTDataParser 只能经 xtdata.get_local_data 读取，记录数靠文件大小能否被 32~48 字节整除来猜。
+这里直接把文件以 np.memmap 映射为 NumPy 结构化数组：
+
+- 记录布局（DatLayout）登记在 LAYOUTS 中。MiniQMT 没有公开文件格式，这些都是候选布局，
+  尚未用真实的 MiniQMT 文件逐一验证；打开文件时按文件大小筛选候选布局，
+  再抽样校验记录内容（时间戳在合理范围内且不递减、K线时间按分钟/日对齐、开高低收关系成立），
+  通过校验的布局才被采用；同一目录下的文件共用检测结果。都不符合时抛出 ValueError，
+  可用 register_layout() 登记新的布局
+- 布局确定后，记录数 = (文件大小 - 文件头) // 记录长度，O(1) 且精确
+- 按时间区间读取时在时间列上二分查找，只访问 O(log n) 条记录，返回的是映射数组的切片（零拷贝）
+- 不需要 MiniQMT 进程或 xtquant
+
+命令行：
+    python -m khDat info <文件> [<文件> ...]
+    python -m khDat show <文件> [--start 20240101] [--end 20241231] [--count 20]
+"""
+import argparse
+import bisect
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from khProvider import BEIJING_OFFSET_MS, DAY_MS, parse_time_bound, time_labels
+
+# 周期目录名（秒数）与周期名称的对应关系，"0" 目录下是按日期分文件的分笔数据
+PERIOD_DIRS = {"60": "1m", "300": "5m", "900": "15m", "1800": "30m", "3600": "1h", "86400": "1d"}
+TICK_DIR = "0"
+MARKETS = ("SH", "SZ", "BJ")
+
+# 校验时抽样的记录数，以及合理的时间戳下限（1990-01-01，北京时间）
+SAMPLE_RECORDS = 64
+MIN_TIME_MS = 631123200000 - BEIJING_OFFSET_MS
+
+
+class DatLayout:
+    """一种定长记录布局"""
+
+    def __init__(self, name: str, kind: str, fields: Sequence[Tuple], header: int = 0, time_unit: str = "ms",
+                 price_scale: float = 1.0, price_fields: Sequence[str] = ()):
+        """初始化
+
+        Args:
+            name: 布局名称
+            kind: "kline" 或 "tick"
+            fields: np.dtype 的字段列表，必须包含 time 字段；字段名与 xtdata 返回的列名一致
+            header: 文件头字节数
+            time_unit: time 字段的单位，"ms"、"s"（UTC 时间戳）或 "date"（YYYYMMDD 整数，北京时间）
+            price_scale: 价格字段以整数保存时的放大倍数，浮点保存时为 1
+            price_fields: 需要除以 price_scale 的字段
+        """
+        self.name = name
+        self.kind = kind
+        self.dtype = np.dtype(list(fields))
+        self.header = header
+        self.time_unit = time_unit
+        self.price_scale = float(price_scale)
+        self.price_fields = tuple(price_fields)
+
+    @property
+    def record_size(self) -> int:
+        return self.dtype.itemsize
+
+    def time_ms(self, raw) -> np.ndarray:
+        """把 time 字段的原始值转换为 int64 毫秒时间戳"""
+        raw = np.asarray(raw).astype(np.int64)
+        if self.time_unit == "ms":
+            return raw
+        if self.time_unit == "s":
+            return raw * 1000
+        year, month, day = raw // 10000, raw // 100 % 100, raw % 100
+        months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+        days = months.astype("datetime64[D]") + (day - 1)
+        return days.astype("datetime64[ms]").astype(np.int64) - BEIJING_OFFSET_MS
+
+    def raw_time(self, time_ms: int) -> int:
+        """把毫秒时间戳转换为 time 字段的原始值，用于在原始列上二分查找"""
+        if self.time_unit == "ms":
+            return int(time_ms)
+        if self.time_unit == "s":
+            return int(time_ms) // 1000
+        day = np.datetime64(int(time_ms) + BEIJING_OFFSET_MS, "ms").astype("datetime64[D]")
+        year, month, dom = str(day).split("-")
+        return int(year) * 10000 + int(month) * 100 + int(dom)
+
+    def prices(self, values: np.ndarray) -> np.ndarray:
+        """价格字段转换为 float64"""
+        values = np.asarray(values, dtype=np.float64)
+        return values / self.price_scale if self.price_scale != 1.0 else values
+
+    def __repr__(self) -> str:
+        return f"<DatLayout {self.name} {self.kind} {self.record_size}B time={self.time_unit}>"
+
+
+_KLINE_PRICES = ("open", "high", "low", "close", "preClose")
+_TICK_PRICES = ("lastPrice", "open", "high", "low", "lastClose", "lastSettlementPrice", "askPrice", "bidPrice")
+
+# 候选记录布局（未经真实 MiniQMT 文件验证，靠抽样校验判断是否适用），检测时按顺序尝试
+LAYOUTS: List[DatLayout] = [
+    DatLayout("kline64", "kline", [
+        ("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+        ("volume", "<i8"), ("amount", "<f8"), ("preClose", "<f8"),
+    ]),
+    DatLayout("kline48", "kline", [
+        ("time", "<i8"), ("open", "<i4"), ("high", "<i4"), ("low", "<i4"), ("close", "<i4"),
+        ("volume", "<i8"), ("amount", "<f8"), ("preClose", "<i4"), ("suspendFlag", "<i4"),
+    ], price_scale=1000, price_fields=_KLINE_PRICES),
+    DatLayout("kline40", "kline", [
+        ("time", "<u4"), ("open", "<i4"), ("high", "<i4"), ("low", "<i4"), ("close", "<i4"),
+        ("volume", "<u8"), ("amount", "<f8"), ("preClose", "<i4"),
+    ], time_unit="s", price_scale=1000, price_fields=_KLINE_PRICES),
+    DatLayout("day32", "kline", [
+        ("time", "<u4"), ("open", "<i4"), ("high", "<i4"), ("low", "<i4"), ("close", "<i4"),
+        ("amount", "<f4"), ("volume", "<u4"), ("reserved", "<u4"),
+    ], time_unit="date", price_scale=100, price_fields=_KLINE_PRICES),
+    DatLayout("tick200", "tick", [
+        ("time", "<i8"), ("lastPrice", "<f8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+        ("lastClose", "<f8"), ("amount", "<f8"), ("volume", "<i8"), ("pvolume", "<i8"),
+        ("stockStatus", "<i4"), ("openInt", "<i4"),
+        ("askPrice", "<f8", (5,)), ("bidPrice", "<f8", (5,)), ("askVol", "<i4", (5,)), ("bidVol", "<i4", (5,)),
+    ]),
+    DatLayout("tick140", "tick", [
+        ("time", "<i8"), ("lastPrice", "<i4"), ("open", "<i4"), ("high", "<i4"), ("low", "<i4"),
+        ("lastClose", "<i4"), ("amount", "<f8"), ("volume", "<i8"), ("pvolume", "<i8"),
+        ("stockStatus", "<i4"), ("openInt", "<i4"),
+        ("askPrice", "<i4", (5,)), ("bidPrice", "<i4", (5,)), ("askVol", "<i4", (5,)), ("bidVol", "<i4", (5,)),
+    ], price_scale=1000, price_fields=_TICK_PRICES),
+]
+
+_detected: Dict[Tuple[str, str], DatLayout] = {}
+_detected_lock = threading.Lock()
+
+
+def register_layout(layout: DatLayout, first: bool = True):
+    """登记一种记录布局
+
+    Args:
+        layout: 记录布局
+        first: 是否优先于已登记的布局尝试
+    """
+    with _detected_lock:
+        if first:
+            LAYOUTS.insert(0, layout)
+        else:
+            LAYOUTS.append(layout)
+        _detected.clear()
+
+
+def parse_path(path: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """从 datadir 内的路径解析 (股票代码, 周期, 分笔日期)
+
+    Returns:
+        Tuple: K线文件为 ("600000.SH", "1m", None)，分笔文件为 ("600000.SH", "tick", "20240105")，
+        无法识别时周期为 None
+    """
+    parts = os.path.normpath(os.path.abspath(path)).split(os.sep)
+    stem = os.path.splitext(parts[-1])[0]
+    if len(parts) >= 4 and parts[-3] == TICK_DIR and parts[-4].upper() in MARKETS:
+        return f"{parts[-2]}.{parts[-4].upper()}", "tick", stem
+    if len(parts) >= 3 and parts[-2] in PERIOD_DIRS:
+        market = parts[-3].upper()
+        return (f"{stem}.{market}" if market in MARKETS else stem), PERIOD_DIRS[parts[-2]], None
+    return None, None, None
+
+
+def _sample(records: np.ndarray) -> np.ndarray:
+    """等距抽取至多 SAMPLE_RECORDS 条记录（包含首尾）"""
+    n = len(records)
+    index = np.unique(np.linspace(0, n - 1, min(n, SAMPLE_RECORDS)).astype(np.int64))
+    return records[index]
+
+
+def _plausible(layout: DatLayout, records: np.ndarray, period: Optional[str], day: Optional[str]) -> bool:
+    """抽样检查记录内容是否符合该布局"""
+    if len(records) == 0:
+        return True
+    sample = _sample(records)
+    raw = sample["time"].astype(np.int64)
+    if layout.time_unit == "date":
+        month, dom = raw // 100 % 100, raw % 100
+        if (raw < 19900101).any() or (month < 1).any() or (month > 12).any() or (dom < 1).any() or (dom > 31).any():
+            return False
+    times = layout.time_ms(raw)
+    if (times < MIN_TIME_MS).any() or (times > time.time() * 1000 + 7 * DAY_MS).any() or (np.diff(times) < 0).any():
+        return False
+    local = times + BEIJING_OFFSET_MS
+    if layout.kind == "kline":
+        align = DAY_MS if period == "1d" else 60000
+        if period and (local % align).any():
+            return False
+        o, h, l, c = (layout.prices(sample[f]) for f in ("open", "high", "low", "close"))
+        if not np.isfinite([o, h, l, c]).all() or (np.abs([o, h, l, c]) > 1e7).any():
+            return False
+        traded = (o > 0) & (h > 0) & (l > 0) & (c > 0)
+        tol = 1e-6 * h
+        if (h[traded] + tol[traded] < np.maximum(o, c)[traded]).any() or \
+                (l[traded] - tol[traded] > np.minimum(o, c)[traded]).any():
+            return False
+        return bool((np.asarray(sample["volume"], dtype=np.float64) >= 0).all())
+    last = layout.prices(sample["lastPrice"])
+    if not np.isfinite(last).all() or (last < 0).any() or (last > 1e7).any():
+        return False
+    if day:
+        days = np.datetime_as_string(local.astype("datetime64[ms]"), unit="D")
+        if (np.char.replace(days, "-", "") != day).any():
+            return False
+    return bool((np.asarray(sample["volume"], dtype=np.float64) >= 0).all())
+
+
+def _map(path: str, layout: DatLayout, size: int) -> np.ndarray:
+    """把文件映射为结构化数组；文件末尾不足一条的残余字节（正在写入）不映射"""
+    count = max(0, (size - layout.header) // layout.record_size)
+    if count == 0:
+        return np.zeros(0, dtype=layout.dtype)
+    return np.memmap(path, dtype=layout.dtype, mode="r", offset=layout.header, shape=(count,))
+
+
+def detect_layout(path: str, period: Optional[str] = None) -> DatLayout:
+    """检测文件的记录布局
+
+    先尝试同目录已检测出的布局，再按 LAYOUTS 顺序尝试；文件大小恰好整除的布局优先于末尾有残余字节的布局。
+
+    Args:
+        path: .DAT 文件路径
+        period: 周期，默认从路径解析
+
+    Returns:
+        DatLayout: 记录布局
+
+    Raises:
+        ValueError: 没有符合的布局
+    """
+    _, parsed, day = parse_path(path)
+    period = period or parsed
+    kind = "tick" if period == "tick" else "kline"
+    size = os.path.getsize(path)
+    key = (os.path.dirname(os.path.abspath(path)) if kind == "kline" else
+           os.path.dirname(os.path.dirname(os.path.abspath(path))), kind)
+    with _detected_lock:
+        cached = _detected.get(key)
+        candidates = [layout for layout in LAYOUTS if layout.kind == kind]
+    if cached is not None:
+        candidates = [cached] + [layout for layout in candidates if layout is not cached]
+    exact = [layout for layout in candidates if size >= layout.header and (size - layout.header) % layout.record_size == 0]
+    partial = [layout for layout in candidates if layout not in exact and size > layout.header]
+    for layout in exact + partial:
+        if _plausible(layout, _map(path, layout, size), period, day):
+            with _detected_lock:
+                _detected[key] = layout
+            return layout
+    raise ValueError(f"无法识别的 .DAT 记录布局: {path}（{size} 字节），可用 khDat.register_layout 登记新的布局")
+
+
+class DatFile:
+    """以 np.memmap 映射的 MiniQMT .DAT 文件"""
+
+    def __init__(self, path: str, period: Optional[str] = None, layout: Optional[DatLayout] = None):
+        """打开文件
+
+        Args:
+            path: .DAT 文件路径
+            period: 周期（"1m"、"1d"、"tick" 等），默认从路径解析
+            layout: 记录布局，默认自动检测
+        """
+        self.path = path
+        self.code, parsed, self.day = parse_path(path)
+        self.period = period or parsed
+        self.layout = layout or detect_layout(path, self.period)
+        self.size = os.path.getsize(path)
+        self.records = _map(path, self.layout, self.size)
+
+    @property
+    def count(self) -> int:
+        """记录数"""
+        return len(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def times(self, part: slice = slice(None)) -> np.ndarray:
+        """毫秒时间戳"""
+        return self.layout.time_ms(self.records["time"][part])
+
+    def search(self, start_time="", end_time="", count: int = -1) -> slice:
+        """在时间列上二分查找 [start_time, end_time] 区间，参数含义与 khProvider.select_range 相同"""
+        column = self.records["time"]
+        lo, hi = parse_time_bound(start_time), parse_time_bound(end_time, end=True)
+        left = 0 if lo is None else bisect.bisect_left(column, self.layout.raw_time(lo))
+        right = len(column) if hi is None else bisect.bisect_right(column, self.layout.raw_time(hi))
+        if count is not None and count > 0:
+            left = max(left, right - count)
+        return slice(left, max(left, right))
+
+    def read(self, start_time="", end_time="", count: int = -1) -> np.ndarray:
+        """按时间区间取原始记录，返回映射数组的切片（不复制）"""
+        return self.records[self.search(start_time, end_time, count)]
+
+    def columns(self, part: slice = slice(None)) -> Dict[str, np.ndarray]:
+        """按下标区间取记录为 {字段: 一维数组}
+
+        time 为毫秒时间戳，价格已换算为元，分笔的五档字段展开为 askPrice1 ~ askPrice5 等，数据已复制。
+        """
+        records = self.records[part]
+        data = {"time": self.layout.time_ms(records["time"])}
+        for name in self.layout.dtype.names:
+            if name in ("time", "reserved"):
+                continue
+            values = self.layout.prices(records[name]) if name in self.layout.price_fields else np.array(records[name])
+            if values.ndim > 1:
+                for level in range(values.shape[1]):
+                    data[f"{name}{level + 1}"] = np.ascontiguousarray(values[:, level])
+            else:
+                data[name] = values
+        return data
+
+    def to_frame(self, start_time="", end_time="", count: int = -1,
+                 fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """按时间区间读取为与 xtdata 相同格式的 DataFrame
+
+        time 列为毫秒时间戳，行索引为时间标签，价格已换算为元；分笔的五档字段为每行一个数组。
+        数据会复制出映射区，文件关闭后仍可使用。
+
+        Args:
+            start_time: 开始时间，"YYYYMMDD" 或 "YYYYMMDDHHMMSS"
+            end_time: 结束时间
+            count: 大于0时只取区间内最后 count 条
+            fields: 需要的字段，默认全部（time 总会返回）
+        """
+        part = self.search(start_time, end_time, count)
+        records = self.records[part]
+        times = self.layout.time_ms(records["time"])
+        names = [name for name in self.layout.dtype.names if name not in ("time", "reserved")]
+        if fields:
+            names = [name for name in names if name in fields]
+        data = {"time": times}
+        for name in names:
+            values = records[name]
+            if name in self.layout.price_fields:
+                values = self.layout.prices(values)
+            data[name] = list(np.array(values)) if values.ndim > 1 else np.array(values)
+        period = "1d" if self.period == "1d" else "1m"
+        return pd.DataFrame(data, index=time_labels(times, period))
+
+    def close(self):
+        """释放本对象对映射的引用；read() 返回的切片各自持有映射的引用，关闭后仍可正常使用，映射在切片全部释放后解除"""
+        self.records = np.zeros(0, dtype=self.layout.dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"<DatFile {self.code} {self.period} {self.layout.name} {self.count} 条>"
+
+
+def open_dat(path: str, period: Optional[str] = None) -> DatFile:
+    """打开一个 .DAT 文件，记录布局自动检测"""
+    return DatFile(path, period)
+
+
+def iter_dat_files(datadir: str, periods: Optional[Sequence[str]] = None,
+                   markets: Sequence[str] = MARKETS) -> Iterator[Tuple[str, str, str]]:
+    """遍历 datadir 下的 .DAT 文件
+
+    Args:
+        datadir: MiniQMT 的 datadir 目录（其下为 SH/SZ/BJ 等市场目录）
+        periods: 只遍历这些周期（"1m"、"1d"、"tick" 等），默认全部
+        markets: 市场目录
+
+    Yields:
+        Tuple[str, str, str]: (文件路径, 股票代码, 周期)
+    """
+    wanted = set(periods) if periods else None
+    for market in markets:
+        market_dir = os.path.join(datadir, market)
+        if not os.path.isdir(market_dir):
+            continue
+        for entry in sorted(os.listdir(market_dir)):
+            period = "tick" if entry == TICK_DIR else PERIOD_DIRS.get(entry)
+            if period is None or (wanted is not None and period not in wanted):
+                continue
+            period_dir = os.path.join(market_dir, entry)
+            if period == "tick":
+                for code in sorted(os.listdir(period_dir)):
+                    code_dir = os.path.join(period_dir, code)
+                    if os.path.isdir(code_dir):
+                        for name in sorted(os.listdir(code_dir)):
+                            if name.lower().endswith(".dat"):
+                                yield os.path.join(code_dir, name), f"{code}.{market}", period
+                continue
+            for name in sorted(os.listdir(period_dir)):
+                if name.lower().endswith(".dat"):
+                    yield os.path.join(period_dir, name), f"{os.path.splitext(name)[0]}.{market}", period
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(prog="python -m khDat", description="MiniQMT .DAT 文件读取工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="查看文件的记录布局、记录数和时间范围")
+    info.add_argument("files", nargs="+")
+    show = sub.add_parser("show", help="按时间区间显示记录")
+    show.add_argument("file")
+    show.add_argument("--start", default="")
+    show.add_argument("--end", default="")
+    show.add_argument("--count", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        with open_dat(args.file) as dat:
+            with pd.option_context("display.width", 200, "display.max_columns", 50):
+                print(dat.to_frame(args.start, args.end, args.count))
+        return 0
+    failed = 0
+    for path in args.files:
+        try:
+            with open_dat(path) as dat:
+                span = ""
+                if dat.count:
+                    label = "1d" if dat.period == "1d" else "1m"
+                    first, last = time_labels(dat.times(slice(0, 1)), label)[0], time_labels(dat.times(slice(-1, None)), label)[0]
+                    span = f", {first} ~ {last}"
+                print(f"{path}: {dat.code} {dat.period} {dat.layout.name}（{dat.layout.record_size} 字节/条）"
+                      f", {dat.count} 条{span}")
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(f"{path}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,357 @@
+# coding: utf-8
+"""
+并发、限速、可断点续传的批量下载
+
+download_and_store_data 原先逐只股票顺序下载，每只之后固定 sleep(1)，中断后只能从头开始。
+BulkDownloader 把每只股票作为一个下载任务：
+
+- 有界线程池：同时执行的任务不超过 workers 个，待执行的任务按需提交，不会一次性堆满队列
+- 令牌桶限速（TokenBucket）：每个任务开始前取一个令牌，平均速率不超过 rate 个/秒，允许 burst 个的突发，
+  替代固定的 sleep
+- 单个任务失败后按指数退避重试（backoff、2×backoff、4×backoff ...，不超过 max_backoff 秒，带随机抖动），
+  重试耗尽后记为失败，不影响其他任务
+- 断点续传清单（DownloadManifest）：成功的任务写入 JSON 清单，同一下载任务（参数相同）再次运行时跳过已完成的股票；
+  全部成功后清单中的该任务自动清除，下次重新下载
+
+离线基准测试（使用 khProvider.SyntheticProvider 模拟下载延迟）：
+    python -m khDownload [--stocks 200] [--latency 0.05] [--workers 1 4 8 16] [--rate 0]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+MANIFEST_FILE = "_download_manifest.json"
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None):
+        """初始化
+
+        Args:
+            rate: 每秒补充的令牌数，None 或不大于0时不限速
+            burst: 桶容量（允许的突发数量），默认为 max(1, rate)
+        """
+        self.rate = float(rate) if rate and rate > 0 else 0.0
+        self.capacity = float(burst) if burst else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """预留令牌，返回需要等待的秒数（令牌不足时记为欠账，后来者排在其后）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0, stop: Optional[threading.Event] = None) -> bool:
+        """取得令牌，令牌不足时阻塞到补足为止
+
+        Args:
+            tokens: 需要的令牌数
+            stop: 置位时立即返回
+
+        Returns:
+            bool: 是否取得令牌（等待期间 stop 置位时返回False）
+        """
+        if self.rate <= 0:
+            return True
+        delay = self._reserve(tokens)
+        if delay <= 0:
+            return True
+        if stop is None:
+            time.sleep(delay)
+            return True
+        return not stop.wait(delay)
+
+
+class DownloadManifest:
+    """断点续传清单
+
+    JSON 文件中按下载参数的哈希区分不同的下载任务：
+        {"jobs": {任务ID: {"params": {...}, "done": {代码: 行数}, "failed": {代码: 错误信息}, "updated": 时间戳}}}
+    """
+
+    def __init__(self, path: str, params: Dict[str, Any], flush_interval: float = 1.0):
+        """初始化并读取已有的清单
+
+        Args:
+            path: 清单文件路径
+            params: 下载参数（周期、区间、复权方式、字段等），参数相同视为同一任务
+            flush_interval: 两次写盘的最短间隔（秒），结束时总会写盘
+        """
+        self.path = path
+        self.params = params
+        self.job_id = hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._data = {"jobs": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+                self._data.setdefault("jobs", {})
+            except (OSError, ValueError) as e:
+                logging.warning(f"下载清单 {path} 无法读取，重新开始: {str(e)}")
+        job = self._data["jobs"].setdefault(self.job_id, {"params": params, "done": {}, "failed": {}})
+        self.done: Dict[str, Any] = job.setdefault("done", {})
+        self.failed: Dict[str, str] = job.setdefault("failed", {})
+
+    def is_done(self, code: str) -> bool:
+        return code in self.done
+
+    def mark_done(self, code: str, rows: Any = None):
+        with self._lock:
+            self.done[code] = rows
+            self.failed.pop(code, None)
+        self.flush()
+
+    def mark_failed(self, code: str, error: str):
+        with self._lock:
+            self.failed[code] = error
+        self.flush()
+
+    def flush(self, force: bool = False):
+        """写盘（先写临时文件再替换）；未到 flush_interval 时跳过，force=True 时总会写盘"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = now
+            self._data["jobs"][self.job_id]["updated"] = time.time()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def finish(self):
+        """任务全部成功时从清单中移除，否则保留进度供下次续传"""
+        with self._lock:
+            if not self.failed:
+                self._data["jobs"].pop(self.job_id, None)
+        if self._data["jobs"]:
+            self.flush(force=True)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BulkDownloader:
+    """有界线程池 + 令牌桶限速 + 失败重试 + 断点续传的批量任务执行器"""
+
+    def __init__(self, task: Callable[[str], Any], workers: int = 4, rate: Optional[float] = None,
+                 burst: Optional[float] = None, retries: int = 3, backoff: float = 1.0, max_backoff: float = 30.0,
+                 manifest: Optional[DownloadManifest] = None, progress_callback: Optional[Callable[[Dict], None]] = None,
+                 check_interrupt: Optional[Callable[[], bool]] = None):
+        """初始化
+
+        Args:
+            task: 下载一只股票的函数 task(代码) -> 结果（如写入行数），抛出异常视为失败，InterruptedError 表示中断
+            workers: 并发线程数
+            rate: 每秒最多开始的任务数（含重试），None 或0为不限速
+            burst: 允许的突发任务数，默认为 max(1, rate)
+            retries: 失败后的最大重试次数
+            backoff: 第一次重试前的等待秒数，之后每次翻倍
+            max_backoff: 重试等待的上限（秒）
+            manifest: 断点续传清单，None 为不记录
+            progress_callback: 进度回调，每完成一个任务调用一次，参数为进度字典：
+                finished/total（已处理/总数）、done（成功）、skipped（清单中已完成而跳过）、
+                failed（失败的代码列表）、retries（累计重试次数）、elapsed（已用秒数）
+            check_interrupt: 返回True时停止下载并抛出 InterruptedError
+        """
+        self.task = task
+        self.workers = max(1, int(workers))
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.manifest = manifest
+        self.progress_callback = progress_callback
+        self.check_interrupt = check_interrupt or (lambda: False)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._retry_count = 0
+
+    def _run_one(self, code: str):
+        """执行一个任务，失败时退避重试"""
+        for attempt in range(self.retries + 1):
+            if self._stop.is_set() or self.check_interrupt():
+                raise InterruptedError("下载过程被用户中断")
+            if not self.bucket.acquire(stop=self._stop):
+                raise InterruptedError("下载过程被用户中断")
+            try:
+                return self.task(code)
+            except InterruptedError:
+                raise
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                delay = min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                with self._lock:
+                    self._retry_count += 1
+                logging.warning(f"下载 {code} 失败（第{attempt + 1}次），{delay:.1f}秒后重试: {str(e)}")
+                if self._stop.wait(delay):
+                    raise InterruptedError("下载过程被用户中断")
+
+    def run(self, codes: Iterable[str]) -> Dict[str, Any]:
+        """执行全部任务
+
+        Args:
+            codes: 股票代码列表（重复的只下载一次）
+
+        Returns:
+            Dict: 与进度回调相同的统计字典，另含 results（{代码: 任务结果}）
+
+        Raises:
+            InterruptedError: check_interrupt 返回True时，已完成的任务已写入清单
+        """
+        codes = list(dict.fromkeys(codes))
+        pending = [code for code in codes if not (self.manifest and self.manifest.is_done(code))]
+        progress = {
+            "finished": len(codes) - len(pending),
+            "total": len(codes),
+            "done": 0,
+            "skipped": len(codes) - len(pending),
+            "failed": [],
+            "retries": 0,
+            "elapsed": 0.0,
+        }
+        results: Dict[str, Any] = {}
+        start = time.time()
+        self._stop.clear()
+        self._retry_count = 0
+        if progress["skipped"]:
+            logging.info(f"断点续传：跳过已完成的 {progress['skipped']} 只股票")
+
+        def collect(code, future):
+            try:
+                result = future.result()
+            except InterruptedError:
+                raise
+            except Exception as e:
+                logging.error(f"下载 {code} 失败，已重试{self.retries}次: {str(e)}")
+                progress["failed"].append(code)
+                if self.manifest:
+                    self.manifest.mark_failed(code, str(e))
+            else:
+                results[code] = result
+                progress["done"] += 1
+                if self.manifest:
+                    self.manifest.mark_done(code, result if isinstance(result, (int, float, str)) else None)
+            progress["finished"] += 1
+            progress["retries"] = self._retry_count
+            progress["elapsed"] = time.time() - start
+            if self.progress_callback:
+                self.progress_callback(dict(progress, failed=list(progress["failed"])))
+
+        # 同时在途的任务不超过 2×workers 个，完成一个再提交一个
+        queue = iter(pending)
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="khDownload")
+        running = {}
+        try:
+            for code in queue:
+                running[executor.submit(self._run_one, code)] = code
+                if len(running) >= self.workers * 2:
+                    break
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(running.pop(future), future)
+                if self.check_interrupt():
+                    raise InterruptedError("下载过程被用户中断")
+                for code in queue:
+                    running[executor.submit(self._run_one, code)] = code
+                    if len(running) >= self.workers * 2:
+                        break
+        except BaseException:
+            # 中断或出错时停止所有在途任务（正在执行的任务会在下一次检查时退出）
+            self._stop.set()
+            for future in running:
+                future.cancel()
+            if self.manifest:
+                self.manifest.flush(force=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+
+        if self.manifest:
+            self.manifest.finish()
+        progress["elapsed"] = time.time() - start
+        return dict(progress, results=results)
+
+
+def benchmark(stock_count: int = 200, latency: float = 0.05, workers: Iterable[int] = (1, 4, 8, 16),
+              rate: Optional[float] = None, period: str = "1d", start_date: str = "20240101",
+              end_date: str = "20241231") -> pd.DataFrame:
+    """使用 SyntheticProvider 离线测试不同线程数下 download_and_store_data 的吞吐量
+
+    Args:
+        stock_count: 股票数量
+        latency: 每次下载调用的模拟延迟（秒）
+        workers: 参与测试的线程数
+        rate: 限速（每秒股票数），None 为不限速
+        period: 数据周期
+        start_date: 开始日期
+        end_date: 结束日期
+
+    Returns:
+        pd.DataFrame: 每种线程数的耗时和每秒下载股票数
+    """
+    import khProvider
+    from khQTTools import download_and_store_data
+
+    provider = khProvider.SyntheticProvider(universe_size=max(stock_count, 10), download_latency=latency)
+    codes = provider.get_stock_list_in_sector("沪深A股")[:stock_count]
+    previous = khProvider.set_provider(provider)
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            stock_file = os.path.join(tmp, "stocks.csv")
+            pd.DataFrame({"code": codes, "name": codes}).to_csv(stock_file, index=False, header=False)
+            for worker_count in workers:
+                out_dir = os.path.join(tmp, f"w{worker_count}")
+                start = time.time()
+                download_and_store_data(out_dir, [stock_file], ["open", "high", "low", "close", "volume"], period,
+                                        start_date, end_date, workers=worker_count, rate=rate, resume=False)
+                elapsed = time.time() - start
+                rows.append({
+                    "workers": worker_count,
+                    "rate": rate or 0,
+                    "stocks": len(codes),
+                    "seconds": round(elapsed, 3),
+                    "stocks_per_second": round(len(codes) / elapsed, 1) if elapsed > 0 else float("inf"),
+                })
+    finally:
+        khProvider.set_provider(previous)
+    return pd.DataFrame(rows)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="批量下载吞吐量基准测试（合成数据源）")
+    parser.add_argument("--stocks", type=int, default=200, help="股票数量")
+    parser.add_argument("--latency", type=float, default=0.05, help="每次下载调用的模拟延迟（秒）")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16], help="参与测试的线程数")
+    parser.add_argument("--rate", type=float, default=0, help="限速（每秒股票数），0为不限速")
+    parser.add_argument("--period", default="1d", help="数据周期")
+    args = parser.parse_args(argv)
+    print(benchmark(args.stocks, args.latency, args.workers, args.rate or None, args.period).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# coding: utf-8
+"""
+回测事件订阅模块
+
+回测引擎只通过这里定义的纯Python接口对外输出日志、进度和完成事件，
+本身不依赖Qt。图形界面、命令行和API任务分别作为订阅者接收事件：
+- GuiListener：转发给 KhQuantGUI，Qt 只在界面订阅者内部按需导入
+- CallbackListener：把普通函数包装为订阅者，用于命令行和无界面环境
+"""
+from typing import Callable, Optional
+
+
+class BacktestListener:
+    """回测事件订阅者基类，子类按需覆盖"""
+
+    def on_log(self, message: str, level: str = "INFO"):
+        """运行日志
+
+        Args:
+            message: 日志内容
+            level: 日志级别（INFO/WARNING/ERROR/DEBUG/TRADE）
+        """
+
+    def on_progress(self, percent: float):
+        """回测进度
+
+        Args:
+            percent: 进度百分比（0~100）
+        """
+
+    def on_finished(self, backtest_dir: str):
+        """回测完成
+
+        Args:
+            backtest_dir: 主策略的回测结果目录
+        """
+
+
+class CallbackListener(BacktestListener):
+    """把普通函数包装为订阅者"""
+
+    def __init__(self, log_callback: Optional[Callable[[str, str], None]] = None,
+                 progress_callback: Optional[Callable[[float], None]] = None,
+                 finished_callback: Optional[Callable[[str], None]] = None):
+        """初始化
+
+        Args:
+            log_callback: 日志回调，参数为 (日志内容, 日志级别)
+            progress_callback: 进度回调，参数为进度百分比
+            finished_callback: 完成回调，参数为主策略的回测结果目录
+        """
+        self.log_callback = log_callback
+        self.progress_callback = progress_callback
+        self.finished_callback = finished_callback
+
+    def on_log(self, message: str, level: str = "INFO"):
+        if self.log_callback:
+            self.log_callback(message, level)
+
+    def on_progress(self, percent: float):
+        if self.progress_callback:
+            self.progress_callback(percent)
+
+    def on_finished(self, backtest_dir: str):
+        if self.finished_callback:
+            self.finished_callback(backtest_dir)
+
+
+class GuiListener(BacktestListener):
+    """图形界面订阅者
+
+    界面通过解析"回测进度: xx%"日志更新进度条，这里保持原有的消息格式。
+    """
+
+    def __init__(self, gui):
+        """初始化
+
+        Args:
+            gui: KhQuantGUI 主窗口
+        """
+        self.gui = gui
+
+    def on_log(self, message: str, level: str = "INFO"):
+        self.gui.log_message(message, level)
+
+    def on_progress(self, percent: float):
+        self.gui.log_message(f"回测进度: {percent:.2f}%", "INFO")
+        if percent == 0:
+            # 强制发送0%进度信号，确保进度条立即显示
+            self.gui.progress_signal.emit(0)
+            # 刷新界面
+            from PyQt5.QtWidgets import QApplication
+            QApplication.processEvents()
+
+    def on_finished(self, backtest_dir: str):
+        from PyQt5.QtCore import Qt, QMetaObject, Q_ARG
+
+        self.gui.on_strategy_finished()
+
+        # 显示100%进度
+        self.gui.log_message("回测进度: 100.00%", "INFO")
+
+        # 然后再显示回测结果
+        self.gui.log_message("回测完成", "INFO")
+        QMetaObject.invokeMethod(
+            self.gui,
+            "show_backtest_result",
+            Qt.QueuedConnection,
+            Q_ARG(str, backtest_dir)
+        )
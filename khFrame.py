@@ -10,23 +10,40 @@ import shutil
 from types import SimpleNamespace
 import threading
 
-from xtquant import xtdata
-from xtquant.xttrader import XtQuantTrader, XtQuantTraderCallback
-from xtquant.xttype import StockAccount
-from xtquant import xtconstant
+from khProvider import xtdata
+try:
+    from xtquant.xttrader import XtQuantTrader, XtQuantTraderCallback
+    from xtquant.xttype import StockAccount
+    from xtquant import xtconstant
+except ImportError:
+    # 回测只用到账户对象和常量，未安装 xtquant 时使用等价的替代
+    from khTrade import XtQuantTraderCallback, xtconstant
+    XtQuantTrader = None
+
+    def StockAccount(account_id, account_type="STOCK"):
+        return SimpleNamespace(account_id=account_id, account_type=account_type)
 
 from khTrade import KhTradeManager
 from khRisk import KhRiskManager
 from khQTTools import KhQuTools
 from khConfig import KhConfig
+from khQTTools import set_history_provider
+from khMarket import MarketPanel, PanelHistory
+from khClock import BarClock, beijing_datetime, seconds_of_day, local_day_grid, first_bar_on_or_after, to_epoch_seconds
+from khStream import PanelStream, chunk_ranges
+from khCalendar import get_trade_calendar
+from khBatch import BatchOrders
+from khEvents import BacktestListener, CallbackListener, GuiListener
+from khLoader import HistoryLoader
 
 import numpy as np
-from PyQt5.QtCore import Qt, QMetaObject, Q_ARG
-from PyQt5.QtWidgets import QMessageBox
 import pandas as pd
 import os
 import holidays
 
+# 各数据周期每个交易日的K线数量，用于把预热K线数换算为交易日数
+BARS_PER_DAY = {"1d": 1, "5m": 48, "1m": 240, "tick": 4800}
+
 # 触发器基类
 class TriggerBase:
     """触发器基类，定义触发机制的通用接口"""
@@ -38,11 +55,34 @@ class TriggerBase:
             framework: KhQuantFramework实例
         """
         self.framework = framework
+        self.clock = None  # 回测时钟，由回测引擎在加载完时间轴后绑定
         
     def initialize(self):
         """初始化触发器"""
         pass
         
+    def bind_clock(self, clock):
+        """绑定回测时钟，回测时直接读取预计算的时间信息
+        
+        Args:
+            clock: khClock.BarClock实例
+        """
+        self.clock = clock
+        
+    def should_trigger_at(self, bar_index, data):
+        """按K线序号判断是否应该触发策略（回测使用）
+        
+        默认实现回退到按时间戳判断，子类可以改为读取回测时钟的预计算数组。
+        
+        Args:
+            bar_index: K线在回测时间轴上的序号
+            data: 当前市场数据
+            
+        Returns:
+            bool: 是否触发策略
+        """
+        return self.should_trigger(int(self.clock.raw_times[bar_index]), data)
+        
     def should_trigger(self, timestamp, data):
         """判断是否应该触发策略
         
@@ -80,6 +120,10 @@ class TickTrigger(TriggerBase):
         # Tick触发方式下，每个Tick都触发
         return True
         
+    def should_trigger_at(self, bar_index, data):
+        """按K线序号判断是否应该触发策略，Tick触发方式下每个时间点都触发"""
+        return True
+        
     def get_data_period(self):
         """获取数据周期
         
@@ -125,7 +169,7 @@ class KLineTrigger(TriggerBase):
                 timestamp = float(timestamp)
                 if timestamp > 1e10:  # 如果是毫秒级时间戳
                     timestamp = timestamp / 1000
-                current_time = datetime.datetime.fromtimestamp(timestamp)
+                current_time = beijing_datetime(timestamp)
             except:
                 current_time = datetime.datetime.now()
         
@@ -148,6 +192,26 @@ class KLineTrigger(TriggerBase):
             
         return False
         
+    def should_trigger_at(self, bar_index, data):
+        """按K线序号判断是否应该触发策略，直接读取回测时钟的预计算结果
+        
+        Args:
+            bar_index: K线在回测时间轴上的序号
+            data: 当前市场数据
+            
+        Returns:
+            bool: 是否触发策略
+        """
+        clock = self.clock
+        if self.period == "1m":
+            return bool(clock.seconds_of_day[bar_index] % 60 == 0)
+        elif self.period == "5m":
+            return bool(clock.seconds_of_day[bar_index] % 300 == 0)
+        elif self.period == "1d":
+            # 日K线在每个日期的第一根K线触发
+            return bool(clock.is_first_bar[bar_index])
+        return False
+        
     def get_data_period(self):
         """获取数据周期
         
@@ -159,7 +223,14 @@ class KLineTrigger(TriggerBase):
 
 # 自定义定时触发器
 class CustomTimeTrigger(TriggerBase):
-    """自定义定时触发器，在指定的时间点触发策略"""
+    """自定义定时触发器，在指定的时间点触发策略
+    
+    触发时间点编译为排序去重的当日秒数数组，按整条时间轴向量化二分查找匹配，
+    触发时间点数量对回测循环的开销没有影响。
+    """
+    
+    TRIGGER_TOLERANCE = 5  # 触发允许的误差（秒，不含）
+    FILTER_TOLERANCE = 1  # 加载数据时保留触发时间点附近数据的误差（秒，含）
     
     def __init__(self, framework, custom_times):
         """初始化自定义定时触发器
@@ -176,6 +247,52 @@ class CustomTimeTrigger(TriggerBase):
             seconds = h * 3600 + m * 60 + s
             self.trigger_seconds.append(seconds)
         self.trigger_seconds.sort()
+        self.trigger_array = np.unique(np.array(self.trigger_seconds, dtype=np.int64))
+        self._fires = None  # 绑定回测时钟后每根K线是否触发
+        
+    def distance(self, day_seconds) -> np.ndarray:
+        """向量化计算每个当日秒数到最近触发时间点的距离
+        
+        Args:
+            day_seconds: 当日秒数数组
+            
+        Returns:
+            np.ndarray: 距离（秒），没有触发时间点时为一个很大的数
+        """
+        day_seconds = np.asarray(day_seconds, dtype=np.int64)
+        if len(self.trigger_array) == 0:
+            return np.full(day_seconds.shape, np.iinfo(np.int64).max, dtype=np.int64)
+        pos = np.searchsorted(self.trigger_array, day_seconds)
+        right = self.trigger_array[np.minimum(pos, len(self.trigger_array) - 1)]
+        left = self.trigger_array[np.maximum(pos - 1, 0)]
+        return np.minimum(np.abs(day_seconds - left), np.abs(right - day_seconds))
+        
+    def filter_mask(self, times) -> np.ndarray:
+        """标记落在触发时间点附近的数据行
+        
+        Args:
+            times: 秒级或毫秒级时间戳数组
+            
+        Returns:
+            np.ndarray: 布尔掩码
+        """
+        return self.distance(seconds_of_day(times)) <= self.FILTER_TOLERANCE
+        
+    def time_axis(self, trading_days) -> np.ndarray:
+        """生成 交易日 × 触发时间点 的回测时间轴
+        
+        Args:
+            trading_days: 交易日数组（datetime64[D]）
+            
+        Returns:
+            np.ndarray: 秒级时间戳，按时间排序
+        """
+        return local_day_grid(trading_days, self.trigger_array)
+        
+    def bind_clock(self, clock):
+        """绑定回测时钟，并一次性计算整条时间轴上的触发标记"""
+        super().bind_clock(clock)
+        self._fires = self.distance(clock.seconds_of_day) < self.TRIGGER_TOLERANCE
         
     def should_trigger(self, timestamp, data):
         """判断是否应该触发策略
@@ -198,19 +315,30 @@ class CustomTimeTrigger(TriggerBase):
                 timestamp = float(timestamp)
                 if timestamp > 1e10:  # 如果是毫秒级时间戳
                     timestamp = timestamp / 1000
-                current_time = datetime.datetime.fromtimestamp(timestamp)
+                current_time = beijing_datetime(timestamp)
             except:
                 current_time = datetime.datetime.now()
         
         # 计算当前时间的秒数（从午夜开始）
         current_seconds = current_time.hour * 3600 + current_time.minute * 60 + current_time.second
         
-        # 检查是否接近任一触发时间点（允许5秒误差）
-        for trigger_second in self.trigger_seconds:
-            if abs(current_seconds - trigger_second) < 5:
-                return True
-                
-        return False
+        return self._near_trigger_time(current_seconds)
+        
+    def should_trigger_at(self, bar_index, data):
+        """按K线序号判断是否应该触发策略，直接读取回测时钟的当日秒数
+        
+        Args:
+            bar_index: K线在回测时间轴上的序号
+            data: 当前市场数据
+            
+        Returns:
+            bool: 是否触发策略
+        """
+        return bool(self._fires[bar_index])
+        
+    def _near_trigger_time(self, current_seconds):
+        """检查是否接近任一触发时间点（允许5秒误差）"""
+        return bool(self.distance([current_seconds])[0] < self.TRIGGER_TOLERANCE)
         
     def get_data_period(self):
         """获取数据周期
@@ -285,7 +413,7 @@ class MyTraderCallback(XtQuantTraderCallback):
                     # 检查并转换毫秒级时间戳
                     if timestamp > 1e10:
                         timestamp = timestamp / 1000
-                    formatted_time = datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                    formatted_time = beijing_datetime(timestamp).strftime('%Y-%m-%d %H:%M:%S')
                 except ValueError:
                     # 如果不是数字时间戳，尝试解析字符串
                     try:
@@ -332,7 +460,7 @@ class MyTraderCallback(XtQuantTraderCallback):
                     # 检查并转换毫秒级时间戳
                     if timestamp > 1e10:
                         timestamp = timestamp / 1000
-                    formatted_time = datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                    formatted_time = beijing_datetime(timestamp).strftime('%Y-%m-%d %H:%M:%S')
                 except ValueError:
                     # 如果不是数字时间戳，尝试解析字符串
                     try:
@@ -462,19 +590,53 @@ class MyTraderCallback(XtQuantTraderCallback):
             self.gui.log_message(f"处理资金变动时出错: {str(e)}", "ERROR")
             '''
 
+
+class StrategyBook:
+    """多策略同步回测中单个策略的独立账本
+
+    每个策略拥有自己的策略模块、交易管理器、风控管理器和回测记录，
+    与其他策略共享同一份行情面板、快照和回测时钟。
+    """
+
+    def __init__(self, name: str, strategy_file: str, strategy_module, trade_mgr: KhTradeManager, risk_mgr: KhRiskManager):
+        """初始化
+
+        Args:
+            name: 策略名称，用于区分回测结果目录
+            strategy_file: 策略文件路径
+            strategy_module: 策略模块
+            trade_mgr: 该策略独立的交易管理器
+            risk_mgr: 该策略独立的风控管理器
+        """
+        self.name = name
+        self.strategy_file = strategy_file
+        self.strategy_module = strategy_module
+        self.trade_mgr = trade_mgr
+        self.risk_mgr = risk_mgr
+        self.backtest_records = {}  # 回测记录
+        self.batch_orders = None  # 批量策略模式的回放指令
+        self.day_data = {}  # 当天最后一个时间点的数据，供盘后回调使用
+
 class KhQuantFramework:
     """量化交易框架主类"""
     
-    def __init__(self, config_path: str, strategy_file: str, trader_callback=None):
+    def __init__(self, config_path: str, strategy_file: Union[str, List[str]], trader_callback=None,
+                 config_overrides: Optional[Dict] = None, log_callback=None, progress_callback=None):
         """初始化框架
         
         Args:
             config_path: 配置文件路径
-            strategy_file: 策略文件路径
+            strategy_file: 策略文件路径；传入列表时在同一次回测中同步运行多个策略，
+                各策略使用独立的账户，共享行情数据，第一个策略为主策略（界面显示其账户）
             trader_callback: 交易回调函数
+            config_overrides: 覆盖配置项（见KhConfig.apply_overrides），用于参数优化
+            log_callback: 日志回调，参数为 (日志内容, 日志级别)，无界面运行时使用
+            progress_callback: 进度回调，参数为进度百分比，无界面运行时使用
         """
         self.config_path = config_path
         self.config = KhConfig(config_path)
+        if config_overrides:
+            self.config.apply_overrides(config_overrides)
         self.is_running = False  # 运行状态标识
         self.qmt_path = self.config.config_dict.get("qmt", {}).get("path", "") # QMT客户端路径
         self.account = None  # 账户对象
@@ -484,7 +646,10 @@ class KhQuantFramework:
         self.risk_mgr = KhRiskManager(self.config)  # 风险管理器
         self.tools = KhQuTools()  # 工具类
         self.backtest_records = {}  # 回测记录
-        self.daily_price_cache = {}  # 日线价格缓存，用于存储所有股票的日线数据
+        self.results_root = "backtest_results"  # 回测结果保存的根目录
+        self.data_source = None  # 历史行情数据源，为None时使用xtdata（见khLoader）
+        self.daily_price_cache = {}  # 日线收盘价缓存 {日期: {股票代码: 收盘价或None}}，行情面板取不到时才请求数据接口
+        self._panel_supplied = False  # 行情面板是否由调用方传入（参数优化等），此时估值不访问数据接口
         self._cached_benchmark_close = {}  # 基准指数收盘价缓存
         
         # 添加运行时间记录变量
@@ -492,14 +657,26 @@ class KhQuantFramework:
         self.end_time = None    # 策略结束运行时间
         self.total_runtime = 0  # 总运行时间（秒）
         
-        # 加载策略模块
-        self.strategy_module = self.load_strategy(strategy_file)
+        # 加载策略模块（多策略时每个文件加载为独立的模块对象）
+        self.strategy_files = [strategy_file] if isinstance(strategy_file, str) else list(strategy_file)
+        if not self.strategy_files:
+            raise ValueError("至少需要指定一个策略文件")
+        self.strategy_modules = [self.load_strategy(path) for path in self.strategy_files]
+        self.strategy_module = self.strategy_modules[0]
+        self.books = []  # 各策略的独立账本，见_create_books
         
         # 当前运行模式
         self.run_mode = self.config.run_mode
         
         self.trader_callback = trader_callback  # 保存交易回调函数
         
+        # 回测事件订阅者，界面只是其中之一（见khEvents）
+        self.listeners: List[BacktestListener] = []
+        if trader_callback is not None and hasattr(trader_callback, 'gui'):
+            self.listeners.append(GuiListener(trader_callback.gui))
+        if log_callback or progress_callback:
+            self.listeners.append(CallbackListener(log_callback, progress_callback))
+        
         # 创建触发器
         self.trigger = TriggerFactory.create_trigger(self, self.config.config_dict)
         
@@ -524,16 +701,39 @@ class KhQuantFramework:
         self.trade_mgr = KhTradeManager(self.config, self)
         
         # 清除可能存在的历史数据缓存，确保每次运行都是干净的状态
-        if hasattr(self, 'historical_data_ref'):
-            delattr(self, 'historical_data_ref')
-        if hasattr(self, 'time_field_cache'):
-            delattr(self, 'time_field_cache')
-        if hasattr(self, 'time_idx_cache'):
-            delattr(self, 'time_idx_cache')
+        self.historical_data_ref = {}
+        self.market_panel = None
+        self.market_snapshot = None
+        self.bar_clock = None
+        self.panel_history = None  # 历史窗口访问器（含预热数据），见history()
+        self._panel_request = None  # 最近一次加载面板的字段、周期和区间，用于按其他复权方式补充加载
         
         # 初始化风控管理器
         self.risk_mgr = KhRiskManager(self.config)
         
+    def add_listener(self, listener: BacktestListener):
+        """添加回测事件订阅者
+        
+        Args:
+            listener: 订阅者，实现khEvents.BacktestListener中需要的方法
+        """
+        self.listeners.append(listener)
+        
+    def log(self, message: str, level: str = "INFO"):
+        """向所有订阅者输出运行日志
+        
+        Args:
+            message: 日志内容
+            level: 日志级别
+        """
+        for listener in self.listeners:
+            listener.on_log(message, level)
+            
+    def _notify_progress(self, percent: float):
+        """向所有订阅者报告回测进度"""
+        for listener in self.listeners:
+            listener.on_progress(percent)
+        
     def load_strategy(self, strategy_file: str):
         """动态加载策略模块
         
@@ -552,10 +752,79 @@ class KhQuantFramework:
         """初始化交易接口和账户"""
         # 固定为回测模式，只进行虚拟账户初始化
         self._init_virtual_account()
-        # 在回测模式下也设置回调
-        if self.trader_callback:
-            self.trade_mgr.callback = self.trader_callback
-        
+        # 在回测模式下也设置回调（无界面运行时为None，交易管理器只打印日志）
+        self.trade_mgr.callback = self.trader_callback
+        self._create_books()
+
+    def _create_books(self):
+        """为每个策略创建独立账本
+
+        主策略沿用框架自身的交易管理器（界面回调绑定在它上面），
+        其余策略各自创建不带界面回调的交易管理器，初始资产与主策略相同。
+        """
+        strategy_file = self.config.config_dict.get("strategy_file", "")
+        primary_name = os.path.splitext(os.path.basename(strategy_file))[0] if strategy_file else "unknown"
+        books = [StrategyBook(primary_name, strategy_file, self.strategy_modules[0], self.trade_mgr, self.risk_mgr)]
+        names = {primary_name}
+
+        for path, module in zip(self.strategy_files[1:], self.strategy_modules[1:]):
+            name = os.path.splitext(os.path.basename(path))[0]
+            # 同名策略文件追加序号，避免结果目录互相覆盖
+            base_name, suffix = name, 2
+            while name in names:
+                name = f"{base_name}_{suffix}"
+                suffix += 1
+            names.add(name)
+
+            trade_mgr = KhTradeManager(self.config)
+            trade_mgr.assets = dict(self.trade_mgr.assets)
+            trade_mgr.positions = {}
+            trade_mgr.orders = {}
+            trade_mgr.trades = {}
+            books.append(StrategyBook(name, path, module, trade_mgr, KhRiskManager(self.config)))
+
+        self.books = books
+        self._activate_book(books[0])
+
+    def _activate_book(self, book: StrategyBook):
+        """切换当前账本
+
+        record_results、_record_daily_stats以及通过__framework__访问框架的策略
+        读取的都是self上的交易管理器和回测记录，多策略回测时逐个切换即可复用这些逻辑。
+        """
+        self.strategy_module = book.strategy_module
+        self.trade_mgr = book.trade_mgr
+        self.risk_mgr = book.risk_mgr
+        self.backtest_records = book.backtest_records
+
+    def _init_strategies(self, stock_codes):
+        """依次调用各策略的init函数，每个策略拿到自己的账户和持仓"""
+        now = datetime.datetime.now()
+        for book in self.books:
+            self._activate_book(book)
+            init_data = {
+                "__current_time__": {
+                    "timestamp": int(time.time()),
+                    "datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
+                    "date": now.strftime("%Y-%m-%d"),
+                    "time": now.strftime("%H:%M:%S")
+                },
+                "__account__": self.trade_mgr.assets,
+                "__positions__": self.trade_mgr.positions,
+                "__stock_list__": stock_codes,
+                "__framework__": self
+            }
+            self.strategy_module.init(stock_codes, init_data)
+        self._activate_book(self.books[0])
+
+    def get_strategy_records(self) -> Dict[str, Dict]:
+        """获取各策略的回测记录
+
+        Returns:
+            Dict[str, Dict]: {策略名称: 回测记录}，顺序与传入的策略文件一致
+        """
+        return {book.name: book.backtest_records for book in self.books}
+
     def _init_virtual_account(self):
         """初始化虚拟账户"""
         # 创建虚拟账户对象
@@ -620,17 +889,17 @@ class KhQuantFramework:
         stock_codes = self.get_stock_list()
         
         if not stock_codes:
-            if self.trader_callback:
-                self.trader_callback.gui.log_message("警告: 股票池为空，无法下载历史数据", "WARNING")
+            if self.listeners:
+                self.log("警告: 股票池为空，无法下载历史数据", "WARNING")
             return
             
-        if self.trader_callback:
-            self.trader_callback.gui.log_message(f"开始下载{len(stock_codes)}只股票的历史数据...", "INFO")
+        if self.listeners:
+            self.log(f"开始下载{len(stock_codes)}只股票的历史数据...", "INFO")
         
         xtdata.download_history_data2(
             stock_codes,
             period=self.config.kline_period,
-            start_time=self.config.backtest_start,
+            start_time=self.get_history_start(self.config.kline_period),
             end_time=self.config.backtest_end,  # 添加结束时间参数
             incrementally=True,
             callback=download_progress
@@ -656,9 +925,9 @@ class KhQuantFramework:
             
             # 创建时间信息
             if timestamp > 1e10:  # 毫秒级时间戳
-                dt = datetime.datetime.fromtimestamp(timestamp / 1000)
+                dt = beijing_datetime(timestamp / 1000)
             else:  # 秒级时间戳
-                dt = datetime.datetime.fromtimestamp(timestamp)
+                dt = beijing_datetime(timestamp)
             
             # 构建时间信息字典
             time_info = {
@@ -671,8 +940,8 @@ class KhQuantFramework:
             # 检查是否是交易日
             if not self.tools.is_trade_day(time_info["date"]):
                 # 如果不是交易日，则跳过策略调用
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"日期 {time_info['date']} 不是交易日，跳过策略执行", "INFO")
+                if self.listeners:
+                    self.log(f"日期 {time_info['date']} 不是交易日，跳过策略执行", "INFO")
                 return
             
             # 创建新的数据字典，包含时间信息
@@ -767,13 +1036,13 @@ class KhQuantFramework:
             # 如果所有股票数据都为空，记录错误并跳过策略调用
             if stock_data_empty:
                 current_time_str = data_with_time.get("__current_time__", {}).get("datetime", "未知时间")
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(
+                if self.listeners:
+                    self.log(
                         f"警告: 时间点 {current_time_str} 的所有股票数据为空，跳过策略调用", 
                         "WARNING"
                     )
                     if empty_stocks:
-                        self.trader_callback.gui.log_message(
+                        self.log(
                             f"空数据股票列表: {', '.join(empty_stocks[:10])}" + 
                             (f" 等{len(empty_stocks)}只股票" if len(empty_stocks) > 10 else ""),
                             "WARNING"
@@ -783,8 +1052,8 @@ class KhQuantFramework:
             # 如果有部分股票数据为空，记录警告但继续执行
             if empty_stocks:
                 current_time_str = data_with_time.get("__current_time__", {}).get("datetime", "未知时间")
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(
+                if self.listeners:
+                    self.log(
                         f"警告: 时间点 {current_time_str} 有 {len(empty_stocks)} 只股票数据为空: {', '.join(empty_stocks[:5])}" + 
                         (f" 等" if len(empty_stocks) > 5 else ""),
                         "WARNING"
@@ -808,15 +1077,20 @@ class KhQuantFramework:
             self.log_error(f"行情处理异常: {str(e)}")
             traceback.print_exc()
             
-    def run(self):
-        """启动框架"""
+    def run(self, init_data: Optional[bool] = None):
+        """启动框架
+        
+        Args:
+            init_data: 运行前是否补充下载行情数据。为None时有界面则读取设置界面的选项，
+                无界面时默认下载
+        """
         # 记录策略开始运行时间
         self.start_time = time.time()
         start_datetime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        if self.trader_callback:
-            self.trader_callback.gui.log_message(f"策略开始运行时间: {start_datetime}", "INFO")
-            self.trader_callback.gui.log_message("开始初始化交易接口和数据...", "INFO")
+        if self.listeners:
+            self.log(f"策略开始运行时间: {start_datetime}", "INFO")
+            self.log("开始初始化交易接口和数据...", "INFO")
         
         try:
             # 初始化
@@ -824,79 +1098,70 @@ class KhQuantFramework:
             self.init_trader_and_account() # 初始化交易接口和账户
             init_time = time.time() - init_start
             
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"交易接口初始化耗时: {init_time:.2f}秒", "INFO")
+            if self.listeners:
+                self.log(f"交易接口初始化耗时: {init_time:.2f}秒", "INFO")
             
             # 初始化缓存
             self.daily_price_cache = {}
             self._cached_benchmark_close = {}
             
-            # 直接从设置界面读取是否初始化数据的配置
-            from PyQt5.QtCore import QSettings
-            settings = QSettings('KHQuant', 'StockAnalyzer')
-            init_data_enabled = settings.value('init_data_enabled', True, type=bool)
+            # 未指定时直接从设置界面读取是否初始化数据的配置
+            if init_data is not None:
+                init_data_enabled = init_data
+            elif self.trader_callback:
+                from PyQt5.QtCore import QSettings
+                settings = QSettings('KHQuant', 'StockAnalyzer')
+                init_data_enabled = settings.value('init_data_enabled', True, type=bool)
+            else:
+                init_data_enabled = True
             
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"数据初始化设置: {'启用' if init_data_enabled else '禁用'}", "INFO")
+            if self.listeners:
+                self.log(f"数据初始化设置: {'启用' if init_data_enabled else '禁用'}", "INFO")
             
             if init_data_enabled:
                 data_init_start = time.time()
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message("开始初始化行情数据...", "INFO")
+                if self.listeners:
+                    self.log("开始初始化行情数据...", "INFO")
                 self.init_data() # 初始化行情数据
                 data_init_time = time.time() - data_init_start
                 
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"数据初始化耗时: {data_init_time:.2f}秒", "INFO")
+                if self.listeners:
+                    self.log(f"数据初始化耗时: {data_init_time:.2f}秒", "INFO")
             else:
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message("跳过数据初始化（根据设置禁用）", "INFO")
+                if self.listeners:
+                    self.log("跳过数据初始化（根据设置禁用）", "INFO")
             
             # 读取股票列表
             stock_list_start = time.time()
             stock_codes = self.get_stock_list()
             stock_list_time = time.time() - stock_list_start
             
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"股票列表加载耗时: {stock_list_time:.2f}秒", "INFO")
+            if self.listeners:
+                self.log(f"股票列表加载耗时: {stock_list_time:.2f}秒", "INFO")
             
-            # 准备初始化数据结构，包含时间、账户、持仓、股票池等信息
-            init_data = {
-                "__current_time__": {
-                    "timestamp": int(time.time()),
-                    "datetime": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "date": datetime.datetime.now().strftime("%Y-%m-%d"),
-                    "time": datetime.datetime.now().strftime("%H:%M:%S")
-                },
-                "__account__": self.trade_mgr.assets,
-                "__positions__": self.trade_mgr.positions,
-                "__stock_list__": stock_codes,
-                "__framework__": self
-            }
-            
-            # 调用策略初始化函数，并传递完整数据结构
+            # 调用策略初始化函数，并传递包含时间、账户、持仓、股票池等信息的完整数据结构
             strategy_init_start = time.time()
-            self.strategy_module.init(stock_codes, init_data)
+            self._init_strategies(stock_codes)
             strategy_init_time = time.time() - strategy_init_start
             
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"策略初始化耗时: {strategy_init_time:.2f}秒", "INFO")
+            if self.listeners:
+                self.log(f"策略初始化耗时: {strategy_init_time:.2f}秒", "INFO")
             
             self.is_running = True
             
             # 记录预处理总耗时
             preprocess_time = time.time() - self.start_time
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"预处理阶段总耗时: {preprocess_time:.2f}秒", "INFO")
-                self.trader_callback.gui.log_message("开始执行策略主逻辑...", "INFO")
+            if self.listeners:
+                self.log(f"预处理阶段总耗时: {preprocess_time:.2f}秒", "INFO")
+                self.log("开始执行策略主逻辑...", "INFO")
             
             # 固定运行回测模式
             strategy_start = time.time()
             self._run_backtest()
             strategy_time = time.time() - strategy_start
             
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"策略主逻辑执行耗时: {strategy_time:.2f}秒", "INFO")
+            if self.listeners:
+                self.log(f"策略主逻辑执行耗时: {strategy_time:.2f}秒", "INFO")
                 
             # 保持程序运行
             while self.is_running:
@@ -906,8 +1171,8 @@ class KhQuantFramework:
             error_msg = "框架运行异常: " + str(e)
             logging.error(error_msg, exc_info=True)
             # 调用错误回调函数
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(error_msg, "ERROR")
+            if self.listeners:
+                self.log(error_msg, "ERROR")
             raise  # 重新抛出异常
             
         finally:
@@ -916,9 +1181,9 @@ class KhQuantFramework:
             self.total_runtime = self.end_time - self.start_time
             end_datetime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"策略结束运行时间: {end_datetime}", "INFO")
-                self.trader_callback.gui.log_message(f"策略总运行时长: {self.total_runtime:.2f}秒", "INFO")
+            if self.listeners:
+                self.log(f"策略结束运行时间: {end_datetime}", "INFO")
+                self.log(f"策略总运行时长: {self.total_runtime:.2f}秒", "INFO")
                 
                 # 转换为更易读的格式
                 hours = int(self.total_runtime // 3600)
@@ -926,14 +1191,44 @@ class KhQuantFramework:
                 seconds = self.total_runtime % 60
                 
                 if hours > 0:
-                    self.trader_callback.gui.log_message(f"策略运行时长: {hours}小时{minutes}分钟{seconds:.2f}秒", "INFO")
+                    self.log(f"策略运行时长: {hours}小时{minutes}分钟{seconds:.2f}秒", "INFO")
                 elif minutes > 0:
-                    self.trader_callback.gui.log_message(f"策略运行时长: {minutes}分钟{seconds:.2f}秒", "INFO")
+                    self.log(f"策略运行时长: {minutes}分钟{seconds:.2f}秒", "INFO")
                 else:
-                    self.trader_callback.gui.log_message(f"策略运行时长: {seconds:.2f}秒", "INFO")
+                    self.log(f"策略运行时长: {seconds:.2f}秒", "INFO")
             
             self.stop()
 
+    def run_on_panel(self, panel=None, save_results=False):
+        """在预先加载好的行情面板上直接运行一次回测
+        
+        不做数据下载，不依赖GUI，回测结束后返回内存中的回测记录，
+        供参数优化等需要在同一份行情上反复回测的场景使用。
+        
+        Args:
+            panel: 行情面板（khMarket.MarketPanel），为None时按配置从xtdata加载
+            save_results: 是否把回测结果保存到backtest_results目录
+            
+        Returns:
+            Dict: 主策略的回测记录（trades、daily_stats等），多策略时其余策略的记录见get_strategy_records
+        """
+        self.start_time = time.time()
+        try:
+            self.init_trader_and_account()
+            self.daily_price_cache = {}
+            self._cached_benchmark_close = {}
+            
+            stock_codes = self.get_stock_list()
+            self._init_strategies(stock_codes)
+            
+            self.is_running = True
+            self._run_backtest(panel=panel, save_results=save_results)
+        finally:
+            self.is_running = False
+            self.end_time = time.time()
+            self.total_runtime = self.end_time - self.start_time
+        return self.backtest_records
+        
     def get_stock_list(self):
         """获取股票列表"""
         stock_codes = []
@@ -941,30 +1236,30 @@ class KhQuantFramework:
             # 优先从配置文件中的stock_list读取
             stock_codes = self.config.get_stock_list()
             if stock_codes:
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"从配置文件读取到 {len(stock_codes)} 支股票", "INFO")
+                if self.listeners:
+                    self.log(f"从配置文件读取到 {len(stock_codes)} 支股票", "INFO")
             else:
                 # 兼容性处理：尝试从stock_list_file文件读取（如果存在）
                 stock_list_file = self.config.config_dict["data"].get("stock_list_file", "")
                 if stock_list_file and os.path.exists(stock_list_file):
                     with open(stock_list_file, 'r', encoding='utf-8') as f:
                         stock_codes = [line.strip() for line in f if line.strip()]
-                        if self.trader_callback:
-                            self.trader_callback.gui.log_message(f"从兼容文件 {stock_list_file} 读取到 {len(stock_codes)} 支股票", "INFO")
+                        if self.listeners:
+                            self.log(f"从兼容文件 {stock_list_file} 读取到 {len(stock_codes)} 支股票", "INFO")
                         # 将读取到的股票列表保存到配置文件中
                         self.config.update_stock_list(stock_codes)
                         self.config.save_config()
                 else:
                     # 如果都没有，使用默认股票
                     stock_codes = ["000001.SZ"]
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message("股票列表为空，使用默认股票: 000001.SZ", "WARNING")
+                    if self.listeners:
+                        self.log("股票列表为空，使用默认股票: 000001.SZ", "WARNING")
 
         except Exception as e:
             # 出现异常时使用默认股票
             stock_codes = ["000001.SZ"]
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"读取股票列表出错: {str(e)}，使用默认股票: 000001.SZ", "ERROR")
+            if self.listeners:
+                self.log(f"读取股票列表出错: {str(e)}，使用默认股票: 000001.SZ", "ERROR")
         
         return stock_codes
     
@@ -1032,6 +1327,9 @@ class KhQuantFramework:
 
                 # 使用QMetaObject.invokeMethod在主线程中显示弹窗
                 if self.trader_callback and hasattr(self.trader_callback, 'gui'):
+                    from PyQt5.QtCore import Qt, QMetaObject, Q_ARG
+                    from PyQt5.QtWidgets import QMessageBox
+                    
                     # 创建一个标志变量来存储用户选择
                     user_choice = [None]  # 使用列表以便在lambda中修改
                     
@@ -1062,43 +1360,60 @@ class KhQuantFramework:
                     # 处理用户选择
                     if user_choice[0] == QMessageBox.No:
                         # 用户选择停止运行
-                        if self.trader_callback:
-                            self.trader_callback.gui.log_message("用户取消运行：数据周期与触发类型不匹配", "WARNING")
+                        if self.listeners:
+                            self.log("用户取消运行：数据周期与触发类型不匹配", "WARNING")
                         self.is_running = False
                         return
                     else:
                         # 用户选择继续运行，记录警告
-                        if self.trader_callback:
-                            self.trader_callback.gui.log_message(f"警告：继续运行不匹配配置 - 数据周期:{data_name}, 触发类型:{trigger_name}", "WARNING")
+                        if self.listeners:
+                            self.log(f"警告：继续运行不匹配配置 - 数据周期:{data_name}, 触发类型:{trigger_name}", "WARNING")
                 else:
                     # 没有GUI回调的情况，直接在日志中记录警告
                     print(f"警告：数据周期({data_period})与触发类型({trigger_type})不匹配")
                     
         except Exception as e:
             # 检查过程中出现异常，记录但不影响回测继续运行
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"周期一致性检查时出错: {str(e)}", "WARNING") 
+            if self.listeners:
+                self.log(f"周期一致性检查时出错: {str(e)}", "WARNING") 
             else:
                 print(f"周期一致性检查时出错: {str(e)}")
         
-    def _run_backtest(self):
-        """回测模式"""
+    def _run_backtest(self, panel=None, save_results=True):
+        """回测模式
+        
+        Args:
+            panel: 预先加载好的行情面板，为None时从xtdata加载；
+                面板中回测开始日期之前的K线作为预热数据，只供历史窗口读取
+            save_results: 是否把回测结果保存到backtest_results目录
+        """
+        stream = None
+        self._panel_supplied = panel is not None
         try:
             # 检查数据周期和触发周期的一致性
             self._check_period_consistency()
             
-            # 初始化回测记录字典
-            self.backtest_records = {
-                'trades': [],  # 交易记录
-                'daily_stats': [],  # 每日统计数据
-                'benchmark_data': [],  # 基准指数数据
-                'start_time': self.config.backtest_start,
-                'end_time': self.config.backtest_end,
-                'init_capital': self.config.config_dict["backtest"]["init_capital"]
-            }
+            # 初始化回测记录字典（多策略时每个策略各一份）
+            if not self.books:
+                self._create_books()
+            books = self.books
+            for book in books:
+                book.backtest_records = {
+                    'trades': [],  # 交易记录
+                    'daily_stats': [],  # 每日统计数据
+                    'benchmark_data': [],  # 基准指数数据
+                    'start_time': self.config.backtest_start,
+                    'end_time': self.config.backtest_end,
+                    'init_capital': self.config.config_dict["backtest"]["init_capital"]
+                }
+                book.day_data = {}
+            self._activate_book(books[0])
+            if len(books) > 1 and self.listeners:
+                self.log(
+                    f"多策略同步回测：{', '.join(book.name for book in books)}，共享行情数据，各自独立记账", "INFO")
             
-            if self.trader_callback:
-                self.trader_callback.gui.log_message("开始回测...", "INFO")
+            if self.listeners:
+                self.log("开始回测...", "INFO")
                 
             # 获取股票列表
             stock_codes = self.get_stock_list()
@@ -1106,28 +1421,18 @@ class KhQuantFramework:
             # 单独处理基准指数数据
             benchmark_code = self.config.config_dict["backtest"]["benchmark"]
 
-            # 获取策略文件名（不含路径和扩展名）
-            strategy_file = self.config.config_dict.get("strategy_file", "")
-            strategy_name = os.path.splitext(os.path.basename(strategy_file))[0] if strategy_file else "unknown"
+            # 构建主策略的回测结果目录路径（使用策略名称和回测时间范围）
+            backtest_dir = self.get_backtest_dir(books[0])
 
-            # 生成回测目录名（使用策略名称和回测时间范围）
-            backtest_dir_name = f"{strategy_name}_{self.config.backtest_start}_{self.config.backtest_end}"
-
-            # 构建回测结果目录路径
-            backtest_dir = os.path.join(
-                "backtest_results",
-                backtest_dir_name
-            )
-
-            # 确保目录存在
-            if not os.path.exists(backtest_dir):
+            # 确保目录存在（不保存结果时不创建目录，避免并行回测互相覆盖）
+            if save_results and not os.path.exists(backtest_dir):
                 os.makedirs(backtest_dir)
 
             benchmark_file = os.path.join(backtest_dir, "benchmark.csv")
 
-            if not os.path.exists(benchmark_file):
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"开始获取基准指数 {benchmark_code} 的每日数据", "INFO")
+            if save_results and not os.path.exists(benchmark_file):
+                if self.listeners:
+                    self.log(f"开始获取基准指数 {benchmark_code} 的每日数据", "INFO")
                 
                 try:
                     # 先下载数据
@@ -1146,13 +1451,13 @@ class KhQuantFramework:
                         end_time=self.config.backtest_end,
                     )
                     
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(
+                    if self.listeners:
+                        self.log(
                             f"获取到的数据结构: {benchmark_data.keys()}", 
                             "INFO"
                         )
                         if benchmark_code in benchmark_data:
-                            self.trader_callback.gui.log_message(
+                            self.log(
                                 f"数据字段: {benchmark_data[benchmark_code].columns.tolist()}", 
                                 "INFO"
                             )
@@ -1160,8 +1465,8 @@ class KhQuantFramework:
                     if benchmark_data and benchmark_code in benchmark_data:
                         df = benchmark_data[benchmark_code]
                         
-                        if self.trader_callback:
-                            self.trader_callback.gui.log_message(
+                        if self.listeners:
+                            self.log(
                                 f"基准数据形状: {df.shape}",
                                 "INFO"
                             )
@@ -1179,8 +1484,8 @@ class KhQuantFramework:
                                     try:
                                         df['date'] = pd.to_datetime(df['time'])
                                     except Exception as e:
-                                        if self.trader_callback:
-                                            self.trader_callback.gui.log_message(f"时间戳转换失败: {str(e)}", "ERROR")
+                                        if self.listeners:
+                                            self.log(f"时间戳转换失败: {str(e)}", "ERROR")
                             
                             # 选择需要的列并保存
                             if 'date' in df.columns:
@@ -1190,8 +1495,8 @@ class KhQuantFramework:
                                     # 确保保存目录存在
                                     os.makedirs(os.path.dirname(benchmark_file), exist_ok=True)
                                     result_df.to_csv(benchmark_file, index=False)
-                                    if self.trader_callback:
-                                        self.trader_callback.gui.log_message(
+                                    if self.listeners:
+                                        self.log(
                                             f"基准指数数据已保存到 {benchmark_file}, 共 {len(result_df)} 条记录",
                                             "INFO"
                                         )
@@ -1202,232 +1507,56 @@ class KhQuantFramework:
                                         cache_key = f"benchmark_{date_str}_{benchmark_code}"
                                         self._cached_benchmark_close[cache_key] = row['close']
                                     
-                                    if self.trader_callback:
-                                        self.trader_callback.gui.log_message(
+                                    if self.listeners:
+                                        self.log(
                                             f"已预缓存 {len(self._cached_benchmark_close)} 条基准指数数据",
                                             "INFO"
                                         )
                 except Exception as e:
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(f"获取和保存基准指数数据失败: {str(e)}", "ERROR")
+                    if self.listeners:
+                        self.log(f"获取和保存基准指数数据失败: {str(e)}", "ERROR")
                     logging.error(f"获取和保存基准指数数据失败: {str(e)}", exc_info=True)
             
-            # 获取数据周期
-            data_period = self.trigger.get_data_period()
-            
-            # 一次性加载所有股票的历史数据
-            historical_data = {}
-            for code in stock_codes:
-                if not self.is_running:
-                    break
-                    
-                # 确保field_list中包含time和close字段
-                field_list = self.config.config_dict["data"]["fields"]
-                if "time" not in field_list:
-                    field_list = ["time"] + field_list
-                if "close" not in field_list:
-                    field_list.append("close")
-                    
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"加载{code}的历史数据...", "INFO")
-                    
-                # 根据触发器的数据周期加载对应的历史数据
-                period = data_period
-                if period == "1s":
-                    # 对于自定义定时触发，检查时间点是否都是整分钟
-                    if isinstance(self.trigger, CustomTimeTrigger):
-                        # 检查所有触发时间点是否都是整分钟（秒数为0）
-                        all_whole_minutes = True
-                        for seconds in self.trigger.trigger_seconds:
-                            # 计算秒数部分
-                            seconds_part = seconds % 60
-                            if seconds_part != 0:
-                                all_whole_minutes = False
-                                break
-                        
-                        if all_whole_minutes:
-                            # 如果所有时间点都是整分钟，使用1m数据
-                            period = "1m"
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(f"所有自定义时间点都是整分钟，使用1分钟K线数据", "INFO")
-                        else:
-                            # 如果有不是整分钟的时间点，使用tick数据
-                            period = "tick"
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(f"存在非整分钟的自定义时间点，使用tick数据", "INFO")
-                    else:
-                        # 默认使用tick数据
-                        period = "tick"
-                
-                data = xtdata.get_market_data_ex(
-                    field_list=field_list,
-                    stock_list=[code],
-                    period=period,
-                    start_time=self.config.backtest_start,
-                    end_time=self.config.backtest_end,
-                    dividend_type=self.config.config_dict["data"]["dividend_type"],
-                    fill_data=True
-                )
-                if data and code in data:
-                    # 判断是否为自定义时间触发
-                    if isinstance(self.trigger, CustomTimeTrigger):
-                        # 对于自定义时间触发，只保留触发时间点附近的数据
-                        df = data[code]
-                        if 'time' in df.columns:
-                            # 获取所有时间戳
-                            all_timestamps = df['time'].values
-                            # 转换为秒级时间戳进行比较
-                            filtered_rows = []
-                            
-                            for ts in all_timestamps:
-                                # 转换时间戳为秒级
-                                ts_seconds = float(ts) / 1000 if float(ts) > 1e10 else float(ts)
-                                ts_dt = datetime.datetime.fromtimestamp(ts_seconds)
-                                
-                                # 计算当前时间点的秒数（从午夜开始）
-                                current_seconds = ts_dt.hour * 3600 + ts_dt.minute * 60 + ts_dt.second
-                                
-                                # 检查是否接近任一触发时间点（允许1秒误差）
-                                for trigger_second in self.trigger.trigger_seconds:
-                                    if abs(current_seconds - trigger_second) <= 1:
-                                        filtered_rows.append(ts)
-                                        break
-                            
-                            # 只保留触发时间点附近的数据
-                            if filtered_rows:
-                                filtered_df = df[df['time'].isin(filtered_rows)]
-                                historical_data[code] = filtered_df
-                                if self.trader_callback:
-                                    self.trader_callback.gui.log_message(
-                                        f"自定义时间触发: {code}过滤后保留{len(filtered_df)}个时间点，原始数据有{len(df)}个时间点", 
-                                        "INFO"
-                                    )
-                            else:
-                                # 如果没有找到匹配的时间点，仍然保存原始数据
-                                historical_data[code] = df
-                                if self.trader_callback:
-                                    self.trader_callback.gui.log_message(
-                                        f"警告: {code}没有找到匹配的自定义时间点，使用原始数据", 
-                                        "WARNING"
-                                    )
-                        else:
-                            # 如果没有time列，使用原始数据
-                            historical_data[code] = data[code]
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(
-                                    f"警告: {code}的数据中没有time列，无法按自定义时间过滤", 
-                                    "WARNING"
-                                )
-                    else:
-                        # 非自定义时间触发，直接存储DataFrame
-                        historical_data[code] = data[code]
-            
-            if not self.is_running:
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message("回测被中止", "WARNING")
-                return
-                    
-            # 获取所有时间点
-            all_times = []
-
-            # 对于自定义时间触发，使用不同的方式获取时间点
-            if isinstance(self.trigger, CustomTimeTrigger):
-                # 获取回测日期范围内的所有交易日
-                start_date = datetime.datetime.strptime(self.config.backtest_start, "%Y%m%d").date()
-                end_date = datetime.datetime.strptime(self.config.backtest_end, "%Y%m%d").date()
-                
-                # 获取交易日历（使用KhQuTools的真实交易日判断）
-                current_date = start_date
-                trading_days = []
-                while current_date <= end_date:
-                    # 使用KhQuTools判断是否为真实交易日（排除节假日）
-                    date_str = current_date.strftime("%Y-%m-%d")
-                    if self.tools.is_trade_day(date_str):
-                        trading_days.append(current_date)
-                    current_date += datetime.timedelta(days=1)
-                
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"回测期间共有{len(trading_days)}个交易日", "INFO")
-                
-                # 为每个交易日生成自定义触发时间点
-                for day in trading_days:
-                    for seconds in self.trigger.trigger_seconds:
-                        # 将秒数转换为时分秒
-                        h = seconds // 3600
-                        m = (seconds % 3600) // 60
-                        s = seconds % 60
-                        
-                        # 创建完整的datetime对象
-                        dt = datetime.datetime.combine(day, datetime.time(h, m, s))
-                        
-                        # 转换为时间戳（秒级）
-                        timestamp = int(dt.timestamp())
-                        all_times.append(timestamp)
-                
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"自定义时间触发模式：生成了{len(all_times)}个时间点", "INFO")
-            else:
-                # 非自定义时间触发模式，使用原来的方式获取时间点
-                for code, df in historical_data.items():
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(f"处理{code}的数据...", "INFO")
-                    
-                    # 检查数据结构
-                    if isinstance(df, pd.DataFrame):
-                        # DataFrame结构处理
-                        if 'time' in df.columns:
-                            times = df['time'].values
-                            all_times.extend(times)
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(f"从{code}的DataFrame中提取了{len(times)}个时间点", "INFO")
-                        else:
-                            # 尝试使用其他可能的时间字段
-                            time_field = None
-                            for field in ['timestamp', 'date', 'datetime']:
-                                if field in df.columns:
-                                    time_field = field
-                                    break
-                            
-                            if time_field is None:
-                                # 如果没有找到任何时间字段，尝试使用索引
-                                if isinstance(df.index, pd.DatetimeIndex):
-                                    times = df.index.astype(np.int64) // 10**9  # 转换为秒级时间戳
-                                    all_times.extend(times)
-                                    if self.trader_callback:
-                                        self.trader_callback.gui.log_message(f"从{code}的DataFrame索引中提取了{len(times)}个时间点", "INFO")
-                                else:
-                                    # 如果没有找到任何时间字段，跳过这个股票
-                                    if self.trader_callback:
-                                        self.trader_callback.gui.log_message(f"错误: {code}的数据中没有找到任何时间字段，跳过该股票", "ERROR")
-                                    continue
-                            else:
-                                times = df[time_field].values
-                                all_times.extend(times)
-                                if self.trader_callback:
-                                    self.trader_callback.gui.log_message(f"从{code}的DataFrame的{time_field}字段中提取了{len(times)}个时间点", "INFO")
-                    else:
-                        # 处理其他可能的数据结构
-                        if self.trader_callback:
-                            self.trader_callback.gui.log_message(f"警告: {code}的数据不是DataFrame格式，跳过该股票", "WARNING")
-                        continue
-            
-            # 去重并排序
-            all_times = sorted(list(set(all_times)))
+            # 加载历史行情并构建对齐面板（调用方已提供面板时直接复用，如参数优化时的共享内存面板）
+            if panel is None:
+                # 配置了流式回测时按交易日分段加载，回测循环处理当前段时后台预取下一段
+                stream = self._create_panel_stream(stock_codes)
+                if stream is not None:
+                    segment = stream.next_segment()
+                    panel = segment[0] if segment else None
+                else:
+                    panel = self.load_market_panel(stock_codes)
+                if panel is None:
+                    # 没有可回测的数据，结束运行状态，避免run()一直等待
+                    self.is_running = False
+                    return
             
-            if len(all_times) == 0:
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message("错误: 没有找到任何有效的时间点，无法进行回测", "ERROR")
-                return
+            # 回测开始日期之前的K线为预热数据：历史窗口使用完整面板，回测循环只遍历之后的部分（共享同一份数组）
+            start_bar = first_bar_on_or_after(panel.times, self.config.backtest_start)
+            self.panel_history = PanelHistory(
+                panel,
+                start_bar,
+                period=None if isinstance(self.trigger, CustomTimeTrigger) else self.trigger.get_data_period(),
+                dividend_type=self.config.config_dict.get("data", {}).get("dividend_type", "none"),
+                panel_loader=self._load_history_panel
+            )
+            if start_bar > 0:
+                panel = panel.slice(start_bar)
+                if self.listeners:
+                    self.log(f"已预加载{start_bar}个时间点的预热数据，供历史窗口读取", "INFO")
+            set_history_provider(self.panel_history)
             
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"共找到{len(all_times)}个时间点", "INFO")
-                self.trader_callback.gui.log_message(f"第一个时间点: {all_times[0]}", "INFO")
-                self.trader_callback.gui.log_message(f"最后一个时间点: {all_times[-1]}", "INFO")
+            all_times = panel.times.tolist()
             
             # 保存所有时间点到实例变量，供record_results使用
             self.all_times = all_times
             
-            total_times = len(all_times)
+            # 一次性预计算整条时间轴的日期、时间和日内位置，回测循环与触发器直接读取
+            self.bar_clock = BarClock(all_times)
+            self.trigger.bind_clock(self.bar_clock)
+            
+            # 流式回测时只加载了第一段，按第一段的K线数估算总数
+            total_times = stream.estimate_total(len(all_times)) if stream is not None else len(all_times)
             processed_times = 0
             
             # 计算进度显示增量（至少为1，最多为总数/100向上取整）
@@ -1438,50 +1567,38 @@ class KhQuantFramework:
                 progress_increment = 1
                 
             # 显示开始进度
-            if self.trader_callback:
-                self.trader_callback.gui.log_message("回测进度: 0.00%", "INFO")
-                # 强制发送0%进度信号，确保进度条立即显示
-                self.trader_callback.gui.progress_signal.emit(0)
-                # 刷新界面
-                from PyQt5.QtWidgets import QApplication
-                QApplication.processEvents()
-            
-            # 预先构建数据缓存（避免在循环中重复构建）
-            if not hasattr(self, 'historical_data_ref'):
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message("首次运行，正在构建数据缓存...", "INFO")
-                
-                # 创建包含原始DataFrame引用的字典
-                self.historical_data_ref = {}
-                
-                # 创建时间字段到索引的映射，用于快速查找
-                self.time_field_cache = {}
-                self.time_idx_cache = {}
-                
-                # 创建基于当前时间点的数据引用
-                for code, df in historical_data.items():
-                    # 找到时间字段
-                    for field in ['time', 'timestamp', 'date', 'datetime']:
-                        if field in df.columns:
-                            self.time_field_cache[code] = field
-                            # 保存原始DataFrame引用
-                            self.historical_data_ref[code] = df
-                            
-                            # 预先创建时间值到索引的映射（只计算一次）
-                            time_values = df[field].values
-                            time_idx_map = {}
-                            for i, tv in enumerate(time_values):
-                                time_idx_map[tv] = i
-                            self.time_idx_cache[code] = time_idx_map
-                            break
-                
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message("数据缓存构建完成", "INFO")
+            self._notify_progress(0)
+            
+            # 保存对齐面板的引用，回测循环只做整数下标访问
+            self.market_panel = panel
+            snapshot = panel.snapshot()
+            self.market_snapshot = snapshot
+            snapshot_codes = snapshot.codes
+            
+            # 批量策略模式：策略一次性计算整段面板的信号矩阵，回测循环只负责逐行回放
+            for book in books:
+                self._activate_book(book)
+                book.batch_orders = None
+                if hasattr(self.strategy_module, 'khHandlebarBatch'):
+                    batch_start = time.time()
+                    batch_data = {
+                        "__clock__": self.bar_clock,
+                        "__account__": self.trade_mgr.assets,
+                        "__positions__": self.trade_mgr.positions,
+                        "__stock_list__": stock_codes,
+                        "__framework__": self
+                    }
+                    book.batch_orders = BatchOrders.from_result(self.strategy_module.khHandlebarBatch(panel, batch_data), panel)
+                    if self.listeners:
+                        self.log(
+                            f"批量策略模式：{book.name} 的 khHandlebarBatch 计算完成，耗时{time.time() - batch_start:.2f}秒，"
+                            f"共{book.batch_orders.order_count}条指令，分布在{int(book.batch_orders.active_rows.sum())}个时间点",
+                            "INFO"
+                        )
             
             # 按时间顺序模拟
             current_date = None
             day_start_time = None
-            day_data = {}
             
             # 获取盘前盘后回调设置
             pre_market_enabled = self.config.config_dict.get("market_callback", {}).get("pre_market_enabled", False)
@@ -1489,34 +1606,27 @@ class KhQuantFramework:
             post_market_enabled = self.config.config_dict.get("market_callback", {}).get("post_market_enabled", False)
             post_market_time = self.config.config_dict.get("market_callback", {}).get("post_market_time", "15:30:00")
             
-            if pre_market_enabled and self.trader_callback:
-                self.trader_callback.gui.log_message(f"已启用盘前回调，将在每个交易日 {pre_market_time} 执行", "INFO")
+            if pre_market_enabled and self.listeners:
+                self.log(f"已启用盘前回调，将在每个交易日 {pre_market_time} 执行", "INFO")
                 # 检查策略是否实现了盘前回调方法
-                if not hasattr(self.strategy_module, 'khPreMarket'):
-                    self.trader_callback.gui.log_message("警告: 策略模块未实现 khPreMarket 方法，盘前回调将不会执行", "WARNING")
-            if post_market_enabled and self.trader_callback:
-                self.trader_callback.gui.log_message(f"已启用盘后回调，将在每个交易日 {post_market_time} 执行", "INFO")
+                for book in books:
+                    if not hasattr(book.strategy_module, 'khPreMarket'):
+                        self.log(f"警告: 策略模块 {book.name} 未实现 khPreMarket 方法，盘前回调将不会执行", "WARNING")
+            if post_market_enabled and self.listeners:
+                self.log(f"已启用盘后回调，将在每个交易日 {post_market_time} 执行", "INFO")
                 # 检查策略是否实现了盘后回调方法
-                if not hasattr(self.strategy_module, 'khPostMarket'):
-                    self.trader_callback.gui.log_message("警告: 策略模块未实现 khPostMarket 方法，盘后回调将不会执行", "WARNING")
+                for book in books:
+                    if not hasattr(book.strategy_module, 'khPostMarket'):
+                        self.log(f"警告: 策略模块 {book.name} 未实现 khPostMarket 方法，盘后回调将不会执行", "WARNING")
             
             # 获取唯一的交易日列表
-            trading_days = set()
-            for time_point in all_times:
-                try:
-                    timestamp = int(time_point)
-                    # 判断时间戳精度（秒级或毫秒级）
-                    if timestamp > 1e10:  # 毫秒级时间戳
-                        dt = datetime.datetime.fromtimestamp(timestamp / 1000)
-                    else:  # 秒级时间戳
-                        dt = datetime.datetime.fromtimestamp(timestamp)
-                    trading_days.add(dt.strftime("%Y-%m-%d"))
-                except:
-                    pass
-            
-            trading_days = sorted(list(trading_days))
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"回测期间共有 {len(trading_days)} 个交易日", "INFO")
+            if stream is not None:
+                trading_days = get_trade_calendar(self.config.backtest_end).get_trade_days(
+                    self.config.backtest_start, self.config.backtest_end)
+            else:
+                trading_days = self.bar_clock.day_dates
+            if self.listeners:
+                self.log(f"回测期间共有 {len(trading_days)} 个交易日", "INFO")
             
             # 初始化时间统计变量
             time_stats = {
@@ -1534,12 +1644,12 @@ class KhQuantFramework:
                 "总时间": 0
             }
             
-            for current_time in all_times:
+            for bar_index, current_time in self._iterate_bars(all_times, stream):
                 loop_start_time = time.time()
                 
                 if not self.is_running:
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message("回测被中止", "WARNING")
+                    if self.listeners:
+                        self.log("回测被中止", "WARNING")
                     break
                     
                 processed_times += 1
@@ -1552,299 +1662,176 @@ class KhQuantFramework:
                 elif processed_times == total_times:  # 最后一次也显示
                     should_show_progress = True
                 
-                if should_show_progress and self.trader_callback:
-                    progress = (processed_times / total_times) * 100
-                    self.trader_callback.gui.log_message(f"回测进度: {progress:.2f}%", "INFO")
-                
-                # 进一步优化的构造数据代码
-                data_start_time = time.time()
-                
-                # 创建包含__current_time__的字典结构
-                try:
-                    timestamp = int(current_time)
-                    # 判断时间戳精度（秒级或毫秒级）
-                    if timestamp > 1e10:  # 毫秒级时间戳
-                        dt = datetime.datetime.fromtimestamp(timestamp / 1000)
-                    else:  # 秒级时间戳
-                        dt = datetime.datetime.fromtimestamp(timestamp)
-                        
-                    time_info = {
-                        "timestamp": timestamp,
-                        "datetime": dt.strftime("%Y-%m-%d %H:%M:%S"),
-                        "date": dt.strftime("%Y-%m-%d"),
-                        "time": dt.strftime("%H:%M:%S"),
-                        "raw_time": current_time
-                    }
-                except Exception as e:
-                    # 如果转换失败，使用原始时间戳
-                    time_info = {
-                        "timestamp": current_time,
-                        "datetime": str(current_time),
-                        "date": str(current_time),
-                        "time": str(current_time),
-                        "raw_time": current_time
-                    }
-                
-                # 创建当前时间点的数据视图
-                current_data = {"__current_time__": time_info}
-                
-                # 直接添加数据引用，而不是转换为字典
-                for code in self.historical_data_ref:
-                    if code in self.time_field_cache and code in self.time_idx_cache:
-                        time_field = self.time_field_cache[code]
-                        time_idx_map = self.time_idx_cache[code]
-                        df = self.historical_data_ref[code]
-                        
-                        # 尝试直接匹配当前时间
-                        if current_time in time_idx_map:
-                            idx = time_idx_map[current_time]
-                            # 直接存储行引用，而不是转换为字典
-                            current_data[code] = df.iloc[idx]
-                        else:
-                            # 尝试处理精度不一致问题
-                            matched = False
-                            idx = -1
-                            
-                            if isinstance(current_time, (int, float)):
-                                # 处理毫秒/秒的转换
-                                if current_time > 1e10:  # 毫秒级
-                                    sec_time = current_time // 1000
-                                    if sec_time in time_idx_map:
-                                        idx = time_idx_map[sec_time]
-                                        matched = True
-                                else:  # 秒级
-                                    ms_time = current_time * 1000
-                                    if ms_time in time_idx_map:
-                                        idx = time_idx_map[ms_time]
-                                        matched = True
-                            
-                            if matched:
-                                # 直接存储行引用
-                                current_data[code] = df.iloc[idx]
-                            else:
-                                # 没有匹配的数据，存储空Series
-                                current_data[code] = pd.Series({})
-                    else:
-                        # 没有时间字段的情况
-                        current_data[code] = pd.Series({})
-                
-                time_stats["构造数据"] += time.time() - data_start_time
-                
-                # 添加日志，显示第一个股票的数据示例
-                if processed_times == 1 and self.trader_callback and current_data:
-                    # 获取第一个股票代码
-                    first_stock = None
-                    for code in current_data:
-                        if code != "__current_time__":
-                            first_stock = code
-                            break
-                    
-                    if first_stock:
-                        sample_data = current_data[first_stock]
-                        self.trader_callback.gui.log_message(f"数据样例 - 股票: {first_stock}, 字段: {list(sample_data.keys())}", "INFO")
-                        # 打印每个字段的值（最多显示5个字段）
-                        sample_str = ""
-                        count = 0
-                        for key, value in sample_data.items():
-                            if count < 5:
-                                sample_str += f"{key}: {value}, "
-                                count += 1
-                        if sample_str:
-                            self.trader_callback.gui.log_message(f"部分字段值: {sample_str[:-2]}", "INFO")
+                if should_show_progress and self.listeners:
+                    self._notify_progress(min(processed_times / total_times, 1.0) * 100)
                 
-                # 构造时间信息
+                # 构造时间信息（直接读取回测时钟的预计算结果）
                 time_info_start = time.time()
-                try:
-                    timestamp = int(current_time)
-                    # 判断时间戳精度（秒级或毫秒级）
-                    if timestamp > 1e10:  # 毫秒级时间戳
-                        dt = datetime.datetime.fromtimestamp(timestamp / 1000)
-                    else:  # 秒级时间戳
-                        dt = datetime.datetime.fromtimestamp(timestamp)
-                        
-                    time_info = {
-                        "timestamp": timestamp,
-                        "datetime": dt.strftime("%Y-%m-%d %H:%M:%S"),
-                        "date": dt.strftime("%Y-%m-%d"),
-                        "time": dt.strftime("%H:%M:%S"),
-                        "raw_time": current_time
-                    }
-                except Exception as e:
-                    # 如果转换失败，使用原始时间戳
-                    time_info = {
-                        "timestamp": current_time,
-                        "datetime": str(current_time),
-                        "date": str(current_time),
-                        "time": str(current_time),
-                        "raw_time": current_time
-                    }
-                
-                # 添加当前时间信息到数据中
-                # 添加时间信息到数据中
-                current_data["__current_time__"] = time_info
+                time_info = self.bar_clock.time_info(bar_index)
                 time_stats["构造时间信息"] += time.time() - time_info_start
                 
-                # 添加账户和持仓信息到数据字典
-                account_data = {
-                    "__account__": self.trade_mgr.assets
-                }
-                # 添加持仓信息
-                positions_data = {
-                    "__positions__": self.trade_mgr.positions
-                }
-                # 添加股票池信息
-                stock_list_data = {
-                    "__stock_list__": stock_codes
-                }
-                # 合并所有信息
-                current_data.update(account_data)
-                current_data.update(positions_data)
-                current_data.update(stock_list_data)
-                
                 # 检查是否是新的一天
+                # 盘后回调需在行情快照更新之前执行，保证其读到的是前一交易日最后一个时间点的行情
                 new_day_start = time.time()
-                if current_date != time_info["date"]:
+                is_new_day = time_info["is_first_bar"]
+                if is_new_day:
                     # 如果有前一天的数据，执行盘后回调
                     post_market_start = time.time()
-                    if current_date is not None and post_market_enabled and hasattr(self.strategy_module, 'khPostMarket'):
-                        # 执行盘后回调
-                        try:
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(f"执行盘后回调 - 日期: {current_date}", "INFO")
-                            
-                            # 设置时间信息为盘后时间
-                            post_time_info = time_info.copy()
-                            post_time_info["time"] = post_market_time
-                            post_time_info["datetime"] = f"{current_date} {post_market_time}"
-                            
-                            # 使用最后一个时间点的数据或创建一个完整的数据结构
-                            post_data = day_data.copy() if day_data else {}
-                            post_data["__current_time__"] = post_time_info
-                            
-                            # 添加账户和持仓信息到数据字典
-                            post_data["__account__"] = self.trade_mgr.assets
-                            post_data["__positions__"] = self.trade_mgr.positions
-                            post_data["__stock_list__"] = stock_codes
-                            
-                            # 添加框架实例到数据字典
-                            post_data["__framework__"] = self
-                            
+                    if current_date is not None and post_market_enabled:
+                        for book in books:
+                            if not hasattr(book.strategy_module, 'khPostMarket'):
+                                continue
+                            self._activate_book(book)
                             # 执行盘后回调
-                            post_signals = self.strategy_module.khPostMarket(post_data)
-                            
-                            # 处理盘后回调产生的信号
-                            if post_signals:
-                                for signal in post_signals:
-                                    if 'price' in signal:
-                                        signal['price'] = round(float(signal['price']), 2)
-                                    signal['timestamp'] = time_info["timestamp"]
+                            try:
+                                if self.listeners:
+                                    self.log(f"执行盘后回调 - 日期: {current_date}", "INFO")
+                                
+                                # 设置时间信息为盘后时间
+                                post_time_info = time_info.copy()
+                                post_time_info["time"] = post_market_time
+                                post_time_info["time_num"] = post_market_time.replace(":", "")
+                                post_time_info["datetime"] = f"{current_date} {post_market_time}"
+                                
+                                # 使用最后一个时间点的数据或创建一个完整的数据结构
+                                post_data = book.day_data.copy() if book.day_data else {}
+                                post_data["__current_time__"] = post_time_info
                                 
-                                # 发送交易指令
-                                self.trade_mgr.process_signals(post_signals)
-                        except Exception as e:
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(f"执行盘后回调时出错: {str(e)}", "ERROR")
+                                # 添加账户和持仓信息到数据字典
+                                post_data["__account__"] = self.trade_mgr.assets
+                                post_data["__positions__"] = self.trade_mgr.positions
+                                post_data["__stock_list__"] = stock_codes
+                                
+                                # 添加框架实例到数据字典
+                                post_data["__framework__"] = self
+                                
+                                # 执行盘后回调
+                                post_signals = self.strategy_module.khPostMarket(post_data)
+                                
+                                # 处理盘后回调产生的信号
+                                if post_signals:
+                                    for signal in post_signals:
+                                        if 'price' in signal:
+                                            signal['price'] = round(float(signal['price']), 2)
+                                        signal['timestamp'] = time_info["timestamp"]
+                                    
+                                    # 发送交易指令
+                                    self.trade_mgr.process_signals(post_signals)
+                            except Exception as e:
+                                if self.listeners:
+                                    self.log(f"执行盘后回调时出错: {str(e)}", "ERROR")
                     time_stats["盘后回调"] += time.time() - post_market_start
                     
                     # 更新当前日期
                     current_date = time_info["date"]
                     day_start_time = time_info["timestamp"]
-                    day_data = current_data
+                time_stats["检查新日期"] += time.time() - new_day_start
+                
+                # 快照切换到面板中当前时间点的视图，所有策略共享同一份只读视图，不新建Series
+                data_start_time = time.time()
+                snapshot.load(self.market_panel, bar_index)
+                self.panel_history.advance(bar_index)
+                time_stats["构造数据"] += time.time() - data_start_time
+                
+                # 添加日志，显示第一个股票的数据示例
+                if processed_times == 1 and self.listeners and snapshot.bars:
+                    # 获取第一个股票代码
+                    first_stock = next(iter(snapshot.bars))
+                    sample_data = snapshot.bars[first_stock]
+                    self.log(f"数据样例 - 股票: {first_stock}, 字段: {list(sample_data.keys())}", "INFO")
+                    # 打印每个字段的值（最多显示5个字段）
+                    sample_str = ""
+                    count = 0
+                    for key, value in sample_data.items():
+                        if count < 5:
+                            sample_str += f"{key}: {value}, "
+                            count += 1
+                    if sample_str:
+                        self.log(f"部分字段值: {sample_str[:-2]}", "INFO")
+                
+                # 为每个策略创建当前时间点的数据视图，行情部分共享，账户和持仓各自独立
+                for book in books:
+                    self._activate_book(book)
+                    data_start_time = time.time()
+                    current_data = {"__current_time__": time_info}
+                    current_data.update(snapshot.bars)
+                    
+                    # 添加账户、持仓和股票池信息到数据字典
+                    current_data["__account__"] = self.trade_mgr.assets
+                    current_data["__positions__"] = self.trade_mgr.positions
+                    current_data["__stock_list__"] = stock_codes
+                    time_stats["构造数据"] += time.time() - data_start_time
+                    
+                    # 更新当天的数据
+                    book.day_data = current_data
                     
                     # 检查是否需要执行盘前回调
-                    pre_market_start = time.time()
-                    if pre_market_enabled and hasattr(self.strategy_module, 'khPreMarket'):
-                        # 执行盘前回调
-                        try:
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(f"执行盘前回调 - 日期: {current_date}", "INFO")
-                            
-                            # 设置时间信息为盘前时间
-                            pre_time_info = time_info.copy()
-                            pre_time_info["time"] = pre_market_time
-                            pre_time_info["datetime"] = f"{current_date} {pre_market_time}"
-                            
-                            # 使用当前时间点的数据或创建一个完整的数据结构
-                            pre_data = current_data.copy()
-                            pre_data["__current_time__"] = pre_time_info
-                            
-                            # 确保包含账户和持仓信息
-                            pre_data["__account__"] = self.trade_mgr.assets
-                            pre_data["__positions__"] = self.trade_mgr.positions
-                            pre_data["__stock_list__"] = stock_codes
-                            
-                            # 添加框架实例到数据字典
-                            pre_data["__framework__"] = self
-                            
+                    if is_new_day:
+                        pre_market_start = time.time()
+                        if pre_market_enabled and hasattr(self.strategy_module, 'khPreMarket'):
                             # 执行盘前回调
-                            pre_signals = self.strategy_module.khPreMarket(pre_data)
-                            
-                            # 处理盘前回调产生的信号
-                            if pre_signals:
-                                for signal in pre_signals:
-                                    if 'price' in signal:
-                                        signal['price'] = round(float(signal['price']), 2)
-                                    signal['timestamp'] = time_info["timestamp"]
+                            try:
+                                if self.listeners:
+                                    self.log(f"执行盘前回调 - 日期: {current_date}", "INFO")
                                 
-                                # 发送交易指令
-                                self.trade_mgr.process_signals(pre_signals)
-                        except Exception as e:
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(f"执行盘前回调时出错: {str(e)}", "ERROR")
-                    time_stats["盘前回调"] += time.time() - pre_market_start
-                else:
-                    # 更新当天的数据
-                    day_data = current_data
-                time_stats["检查新日期"] += time.time() - new_day_start
-                
-                # 使用触发器判断是否应该触发策略
+                                # 设置时间信息为盘前时间
+                                pre_time_info = time_info.copy()
+                                pre_time_info["time"] = pre_market_time
+                                pre_time_info["time_num"] = pre_market_time.replace(":", "")
+                                pre_time_info["datetime"] = f"{current_date} {pre_market_time}"
+                                
+                                # 使用当前时间点的数据或创建一个完整的数据结构
+                                pre_data = current_data.copy()
+                                pre_data["__current_time__"] = pre_time_info
+                                
+                                # 添加框架实例到数据字典
+                                pre_data["__framework__"] = self
+                                
+                                # 执行盘前回调
+                                pre_signals = self.strategy_module.khPreMarket(pre_data)
+                                
+                                # 处理盘前回调产生的信号
+                                if pre_signals:
+                                    for signal in pre_signals:
+                                        if 'price' in signal:
+                                            signal['price'] = round(float(signal['price']), 2)
+                                        signal['timestamp'] = time_info["timestamp"]
+                                    
+                                    # 发送交易指令
+                                    self.trade_mgr.process_signals(pre_signals)
+                            except Exception as e:
+                                if self.listeners:
+                                    self.log(f"执行盘前回调时出错: {str(e)}", "ERROR")
+                        time_stats["盘前回调"] += time.time() - pre_market_start
+                
+                # 使用触发器判断是否应该触发策略（触发条件只与时间有关，所有策略共用一次判断）
                 trigger_start = time.time()
-                if not self.trigger.should_trigger(current_time, current_data):
+                if not self.trigger.should_trigger_at(bar_index, current_data):
                     time_stats["触发器检查"] += time.time() - trigger_start
                     continue
                 time_stats["触发器检查"] += time.time() - trigger_start
                 
-                # 风控检查
-                risk_start = time.time()
-                if not self.risk_mgr.check_risk(current_data):
-                    time_stats["风控检查"] += time.time() - risk_start
-                    continue
-                time_stats["风控检查"] += time.time() - risk_start
-                
                 # 检查是否是交易日
-                current_date_str = current_data.get("__current_time__", {}).get("date", "")
+                current_date_str = time_info.get("date", "")
                 if current_date_str and not self.tools.is_trade_day(current_date_str):
                     # 如果不是交易日，跳过策略调用
                     continue
                 
-                # 添加框架实例到数据字典
-                current_data["__framework__"] = self
-                
-                # 检查股票数据是否为空
-                stock_data_empty = True
-                empty_stocks = []
-                for key, value in current_data.items():
-                    # 跳过框架内部字段
-                    if key.startswith("__"):
-                        continue
-                    # 检查股票数据是否为空
-                    if isinstance(value, pd.Series) and not value.empty:
-                        stock_data_empty = False
-                    elif isinstance(value, pd.Series) and value.empty:
-                        empty_stocks.append(key)
-                    elif not value:  # 处理其他空值情况
-                        empty_stocks.append(key)
+                # 检查股票数据是否为空（直接读取快照的有效性标记，无需逐只检查）
+                valid_count = snapshot.valid_count()
+                stock_data_empty = valid_count == 0
+                empty_stocks = snapshot.empty_codes() if valid_count < len(snapshot_codes) else []
                 
                 # 如果所有股票数据都为空，记录错误并跳过策略调用
                 if stock_data_empty:
-                    current_time_str = current_data.get("__current_time__", {}).get("datetime", str(current_time))
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(
+                    current_time_str = time_info.get("datetime", str(current_time))
+                    if self.listeners:
+                        self.log(
                             f"警告: 时间点 {current_time_str} 的所有股票数据为空，跳过策略调用", 
                             "WARNING"
                         )
                         if empty_stocks:
-                            self.trader_callback.gui.log_message(
+                            self.log(
                                 f"空数据股票列表: {', '.join(empty_stocks[:10])}" + 
                                 (f" 等{len(empty_stocks)}只股票" if len(empty_stocks) > 10 else ""),
                                 "WARNING"
@@ -1853,291 +1840,686 @@ class KhQuantFramework:
                 
                 # 如果有部分股票数据为空，记录警告但继续执行
                 if empty_stocks:
-                    current_time_str = current_data.get("__current_time__", {}).get("datetime", str(current_time))
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(
+                    current_time_str = time_info.get("datetime", str(current_time))
+                    if self.listeners:
+                        self.log(
                             f"警告: 时间点 {current_time_str} 有 {len(empty_stocks)} 只股票数据为空: {', '.join(empty_stocks[:5])}" + 
                             (f" 等" if len(empty_stocks) > 5 else ""),
                             "WARNING"
                         )
                 
-                # 调用策略处理
-                strategy_start = time.time()
-                signals = self.strategy_module.khHandlebar(current_data)
-                time_stats["策略处理"] += time.time() - strategy_start
-                
-                # 处理信号中的价格精度
-                signal_process_start = time.time()
-                if signals:
-                    for signal in signals:
-                        if 'price' in signal:
-                            # 确保价格保留到0.01
-                            signal['price'] = round(float(signal['price']), 2)
-                        # 添加当前回测时间戳
-                        signal['timestamp'] = current_time
-                time_stats["处理信号"] += time.time() - signal_process_start
-                
-                # 发送交易指令
-                trade_start = time.time()
-                if signals:
-                    self.trade_mgr.process_signals(signals)
-                time_stats["交易指令"] += time.time() - trade_start
-                
-                # 记录结果
-                record_start = time.time()
-                self.record_results(current_time, current_data, signals)
-                time_stats["记录结果"] += time.time() - record_start
+                for book in books:
+                    self._activate_book(book)
+                    current_data = book.day_data
+                    
+                    # 风控检查
+                    risk_start = time.time()
+                    if not self.risk_mgr.check_risk(current_data):
+                        time_stats["风控检查"] += time.time() - risk_start
+                        continue
+                    time_stats["风控检查"] += time.time() - risk_start
+                    
+                    # 添加框架实例到数据字典
+                    current_data["__framework__"] = self
+                    
+                    # 调用策略处理
+                    strategy_start = time.time()
+                    if book.batch_orders is not None:
+                        signals = book.batch_orders.signals_at(bar_index, current_data)
+                    else:
+                        signals = self.strategy_module.khHandlebar(current_data)
+                    time_stats["策略处理"] += time.time() - strategy_start
+                    
+                    # 处理信号中的价格精度
+                    signal_process_start = time.time()
+                    if signals:
+                        for signal in signals:
+                            if 'price' in signal:
+                                # 确保价格保留到0.01
+                                signal['price'] = round(float(signal['price']), 2)
+                            # 添加当前回测时间戳
+                            signal['timestamp'] = current_time
+                    time_stats["处理信号"] += time.time() - signal_process_start
+                    
+                    # 发送交易指令
+                    trade_start = time.time()
+                    if signals:
+                        self.trade_mgr.process_signals(signals)
+                    time_stats["交易指令"] += time.time() - trade_start
+                    
+                    # 记录结果
+                    record_start = time.time()
+                    self.record_results(current_time, current_data, signals)
+                    time_stats["记录结果"] += time.time() - record_start
                 
                 # 累计总时间
                 time_stats["总时间"] += time.time() - loop_start_time
             
             # 输出时间统计信息
-            if self.trader_callback:
+            if self.listeners:
                 total_time = time_stats["总时间"]
                 if total_time > 0:
-                    self.trader_callback.gui.log_message("回测各部分执行时间统计:", "INFO")
+                    self.log("回测各部分执行时间统计:", "INFO")
                     for key, value in time_stats.items():
                         if key != "总时间":
                             percentage = (value / total_time) * 100
-                            self.trader_callback.gui.log_message(f"{key}: {value:.4f}秒 ({percentage:.2f}%)", "INFO")
-                    self.trader_callback.gui.log_message(f"总执行时间: {total_time:.4f}秒", "INFO")
+                            self.log(f"{key}: {value:.4f}秒 ({percentage:.2f}%)", "INFO")
+                    self.log(f"总执行时间: {total_time:.4f}秒", "INFO")
             
             # 处理最后一天的盘后回调
-            if current_date is not None and post_market_enabled and hasattr(self.strategy_module, 'khPostMarket'):
-                try:
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(f"执行最后一天的盘后回调 - 日期: {current_date}", "INFO")
-                    
-                    # 设置时间信息为盘后时间
-                    time_info = (day_data.get("__current_time__", {}) if day_data else {}).copy()
-                    if not time_info:
-                        # 如果没有时间信息，创建一个默认的
-                        time_info = {
-                            "timestamp": int(time.time()),
-                            "date": current_date,
-                            "time": post_market_time,
-                            "datetime": f"{current_date} {post_market_time}"
-                        }
-                    else:
-                        time_info["time"] = post_market_time
-                        time_info["datetime"] = f"{current_date} {post_market_time}"
-                    
-                    # 使用最后一个时间点的数据或创建一个完整的数据结构
-                    post_data = day_data.copy() if day_data else {}
-                    post_data["__current_time__"] = time_info
-                    
-                    # 添加账户和持仓信息到数据字典
-                    post_data["__account__"] = self.trade_mgr.assets
-                    post_data["__positions__"] = self.trade_mgr.positions
-                    post_data["__stock_list__"] = self.get_stock_list()
-                    
-                    # 添加框架实例到数据字典
-                    post_data["__framework__"] = self
-                    
-                    # 执行盘后回调
-                    post_signals = self.strategy_module.khPostMarket(post_data)
-                    
-                    # 处理盘后回调产生的信号
-                    if post_signals:
-                        for signal in post_signals:
-                            if 'price' in signal:
-                                signal['price'] = round(float(signal['price']), 2)
-                            signal['timestamp'] = time_info["timestamp"]
+            if current_date is not None and post_market_enabled:
+                for book in books:
+                    if not hasattr(book.strategy_module, 'khPostMarket'):
+                        continue
+                    self._activate_book(book)
+                    day_data = book.day_data
+                    try:
+                        if self.listeners:
+                            self.log(f"执行最后一天的盘后回调 - 日期: {current_date}", "INFO")
                         
-                        # 发送交易指令
-                        self.trade_mgr.process_signals(post_signals)
-                except Exception as e:
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(f"执行最后一天的盘后回调时出错: {str(e)}", "ERROR")
-                
-            # 回测完成后发送信号
-            if self.trader_callback:
-                # 先停止策略并更新状态
-                self.is_running = False
-                self.trader_callback.gui.on_strategy_finished()
-                
-                # 显示100%进度
-                self.trader_callback.gui.log_message("回测进度: 100.00%", "INFO")
-                
-                # 然后再显示回测结果
-                self.trader_callback.gui.log_message("回测完成", "INFO")
-                QMetaObject.invokeMethod(
-                    self.trader_callback.gui, 
-                    "show_backtest_result", 
-                    Qt.QueuedConnection,
-                    Q_ARG(str, backtest_dir)
-                )
+                        # 设置时间信息为盘后时间
+                        time_info = (day_data.get("__current_time__", {}) if day_data else {}).copy()
+                        if not time_info:
+                            # 如果没有时间信息，创建一个默认的
+                            time_info = {
+                                "timestamp": int(time.time()),
+                                "date": current_date,
+                                "time": post_market_time,
+                                "datetime": f"{current_date} {post_market_time}"
+                            }
+                        else:
+                            time_info["time"] = post_market_time
+                            time_info["time_num"] = post_market_time.replace(":", "")
+                            time_info["datetime"] = f"{current_date} {post_market_time}"
+                        
+                        # 使用最后一个时间点的数据或创建一个完整的数据结构
+                        post_data = day_data.copy() if day_data else {}
+                        post_data["__current_time__"] = time_info
+                        
+                        # 添加账户和持仓信息到数据字典
+                        post_data["__account__"] = self.trade_mgr.assets
+                        post_data["__positions__"] = self.trade_mgr.positions
+                        post_data["__stock_list__"] = self.get_stock_list()
+                        
+                        # 添加框架实例到数据字典
+                        post_data["__framework__"] = self
+                        
+                        # 执行盘后回调
+                        post_signals = self.strategy_module.khPostMarket(post_data)
+                        
+                        # 处理盘后回调产生的信号
+                        if post_signals:
+                            for signal in post_signals:
+                                if 'price' in signal:
+                                    signal['price'] = round(float(signal['price']), 2)
+                                signal['timestamp'] = time_info["timestamp"]
+                            
+                            # 发送交易指令
+                            self.trade_mgr.process_signals(post_signals)
+                    except Exception as e:
+                        if self.listeners:
+                            self.log(f"执行最后一天的盘后回调时出错: {str(e)}", "ERROR")
                 
+            # 回测结束后恢复主策略账本，run_on_panel返回的是主策略的回测记录
+            self._activate_book(books[0])
+            
+            # 回测完成后先停止策略并更新状态，再通知订阅者（界面据此显示回测结果）
+            self.is_running = False
+            for listener in self.listeners:
+                listener.on_finished(backtest_dir)
+            
+            if not save_results:
+                return
+            
             # 在回测完成后保存回测记录
-            try:
-                # 获取策略文件名（不含路径和扩展名）
-                strategy_file = self.config.config_dict.get("strategy_file", "")
-                strategy_name = os.path.splitext(os.path.basename(strategy_file))[0] if strategy_file else "unknown"
+            # 多策略时每个策略各自保存一份完整的回测结果
+            for book in books:
+                self._activate_book(book)
+                self._save_backtest_results(book)
+            self._activate_book(books[0])
                 
-                # 生成回测时间戳
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                # 创建当前回测的子目录（包含策略名）
-                backtest_dir = os.path.join(
-                    "backtest_results",
-                    backtest_dir_name
-                )
+        except Exception as e:
+            error_msg = "回测运行异常: " + str(e)
+            logging.error(error_msg, exc_info=True)
+            # 调用错误回调函数
+            if self.listeners:
+                self.log(error_msg, "ERROR")
+                import traceback
+                self.log(f"错误详情:\n{traceback.format_exc()}", "ERROR")
+            raise  # 重新抛出异常
+        finally:
+            if stream is not None:
+                stream.close()
+            # 回测结束后khHistory恢复为从数据接口读取
+            set_history_provider(None)
 
-                # 如果目录已存在，先删除
-                if os.path.exists(backtest_dir):
-                    shutil.rmtree(backtest_dir)
+    def _create_panel_stream(self, stock_codes) -> Optional[PanelStream]:
+        """按 data.stream_chunk_days 创建流式回测的分段面板
+        
+        Args:
+            stock_codes: 股票代码列表
+            
+        Returns:
+            Optional[PanelStream]: 分段面板；未开启流式回测或回测区间只有一段时返回None（一次性加载）
+        """
+        chunk_days = self.config.stream_chunk_days
+        if chunk_days <= 0:
+            return None
+        if any(hasattr(book.strategy_module, 'khHandlebarBatch') for book in self.books):
+            if self.listeners:
+                self.log("批量策略模式需要整段行情面板，忽略流式回测配置", "WARNING")
+            return None
+        ranges = chunk_ranges(self.config.backtest_start, self.config.backtest_end, chunk_days)
+        if len(ranges) <= 1:
+            return None
+        
+        def load(start_time, end_time, first):
+            # 第一段在主线程中加载（含预热区间并输出完整日志），之后的分段在后台线程中静默加载
+            if first:
+                return self.load_market_panel(stock_codes, end_time=end_time)
+            return self._load_panel(stock_codes, start_time, end_time, verbose=False)[0]
+        
+        keep_bars = self.get_warmup_bars()
+        if self.listeners:
+            self.log(
+                f"流式回测：回测区间按每{chunk_days}个交易日分为{len(ranges)}段加载，"
+                f"分段之间保留{keep_bars}根K线供历史窗口读取", "INFO")
+        return PanelStream(load, ranges, stock_codes, keep_bars=keep_bars, prefetch=self.config.stream_prefetch)
+    
+    def _iterate_bars(self, all_times, stream: Optional[PanelStream]):
+        """遍历回测时间轴，流式回测时当前段结束后切换到下一段
+        
+        切换时历史窗口、行情面板和回测时钟一起换到新的分段，bar_index 为当前段内的下标。
+        
+        Args:
+            all_times: 当前段的时间轴
+            stream: 分段面板，None 为一次性加载的整段面板
+            
+        Yields:
+            Tuple[int, float]: (bar_index, 时间戳)
+        """
+        day_offset = 0
+        while True:
+            yield from enumerate(all_times)
+            if stream is None or not self.is_running:
+                return
+            day_offset += self.bar_clock.day_count
+            segment = stream.next_segment()
+            if segment is None:
+                return
+            panel, start_bar = segment
+            self.panel_history.rebase(panel, start_bar)
+            start_time, end_time = stream.current_range
+            # 按其他复权方式补充加载时需覆盖新面板的整条时间轴（含保留的上一段K线）
+            first_time = int(to_epoch_seconds(panel.times[:1])[0])
+            self._panel_request = dict(self._panel_request, start_time=beijing_datetime(
+                first_time).strftime("%Y%m%d"), end_time=end_time)
+            panel = panel.slice(start_bar)
+            all_times = panel.times.tolist()
+            self.all_times = all_times
+            self.market_panel = panel
+            self.bar_clock = BarClock(all_times, day_offset=day_offset)
+            self.trigger.bind_clock(self.bar_clock)
+            if self.listeners:
+                self.log(
+                    f"流式回测：切换到第{stream.index + 1}/{len(stream)}段 {start_time}~{end_time}，"
+                    f"{len(all_times)}个时间点，面板占用内存{self.panel_history.panel.nbytes / 1024 / 1024:.1f}MB",
+                    "INFO")
+    
+    def get_backtest_dir(self, book: StrategyBook) -> str:
+        """获取策略的回测结果目录（策略名称_回测开始日期_回测结束日期）"""
+        return os.path.join(
+            self.results_root,
+            f"{book.name}_{self.config.backtest_start}_{self.config.backtest_end}"
+        )
 
-                # 创建新目录
-                os.makedirs(backtest_dir)
+    def _save_backtest_results(self, book: StrategyBook):
+        """把一个策略的回测记录保存到其回测结果目录
+        
+        Args:
+            book: 策略账本
+        """
+        try:
+            # 创建当前回测的子目录（包含策略名）
+            backtest_dir = self.get_backtest_dir(book)
 
-                # 保存交易记录
-                trades_df = pd.DataFrame(self.backtest_records['trades'])
-                if len(trades_df) > 0:
-                    trades_df.to_csv(os.path.join(backtest_dir, "trades.csv"), index=False, encoding='utf-8-sig')
-                else:
-                    # 创建一个包含列名但没有数据的空DataFrame
-                    empty_trades_df = pd.DataFrame(columns=[
-                        'datetime', 'code', 'action', 'price', 'volume', 'amount',
-                        'commission', 'stamp_tax', 'transfer_fee', 'flow_fee',
-                        'total_asset', 'cash', 'market_value'
-                    ])
-                    empty_trades_df.to_csv(os.path.join(backtest_dir, "trades.csv"), index=False, encoding='utf-8-sig')
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message("回测期间没有产生交易记录", "WARNING")
-
-                # 保存每日统计数据
-                daily_stats_df = pd.DataFrame(self.backtest_records['daily_stats'])
-                if len(daily_stats_df) > 0:
-                    daily_stats_df.to_csv(os.path.join(backtest_dir, "daily_stats.csv"), index=False, encoding='utf-8-sig')
-                else:
-                    # 创建一个包含列名但没有数据的空DataFrame
-                    empty_stats_df = pd.DataFrame(columns=[
-                        'date', 'total_asset', 'cash', 'market_value', 
-                        'daily_return', 'benchmark_close', 'positions'
-                    ])
-                    empty_stats_df.to_csv(os.path.join(backtest_dir, "daily_stats.csv"), index=False, encoding='utf-8-sig')
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message("回测期间没有产生每日统计数据", "WARNING")
-                
-                # 保存基准指数数据
-                benchmark_code = self.config.config_dict["backtest"]["benchmark"]
-                try:
-                    # 先下载数据确保可用
-                    xtdata.download_history_data(
-                        stock_code=benchmark_code,
-                        period="1d",
-                        start_time=self.config.backtest_start,
-                        end_time=self.config.backtest_end,
-                    )
-                    
-                    benchmark_data = xtdata.get_market_data(
-                        field_list=['close'],
-                        stock_list=[benchmark_code],
-                        period='1d',
-                        start_time=self.config.backtest_start,
-                        end_time=self.config.backtest_end,
-                    )
-                    
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(
-                            f"基准数据获取结果: {benchmark_data.keys()}", 
-                            "INFO"
-                        )
+            # 如果目录已存在，先删除
+            if os.path.exists(backtest_dir):
+                shutil.rmtree(backtest_dir)
 
-                    if benchmark_data and 'close' in benchmark_data and len(benchmark_data['close']) > 0:
-                        closes = benchmark_data['close'].values[0]  # 获取收盘价数据
-                        if len(closes) > 0:
-                            # 直接从benchmark_data中获取日期数据
-                            # 获取交易日期索引
-                            if 'date' in benchmark_data:
-                                dates = benchmark_data['date'][0]  # 使用benchmark_data中的日期
-                            elif hasattr(benchmark_data, 'index') and benchmark_data.index is not None and not isinstance(benchmark_data.index, pd.RangeIndex):
-                                dates = benchmark_data.index  # 有些情况下日期可能在索引中
-                            elif hasattr(benchmark_data['close'], 'columns') and len(benchmark_data['close'].columns) > 0:
-                                # 从columns中获取日期（日期作为列名出现的情况）
-                                date_cols = [col for col in benchmark_data['close'].columns if str(col).isdigit()]
-                                if date_cols:
-                                    # 将列名转换为日期对象
-                                    dates = pd.to_datetime(date_cols, format='%Y%m%d')
-                                    # 确保closes的顺序与dates匹配
-                                    closes = np.array([benchmark_data['close'].iloc[0][col] for col in date_cols])
-                                else:
-                                    # 如果没有日期数据，才使用日期范围（不推荐）
-                                    self.trader_callback.gui.log_message(
-                                        "警告：基准数据中没有日期信息，将使用日期范围替代，可能不准确",
-                                        "WARNING"
-                                    )
-                                    dates = pd.date_range(
-                                        start=pd.to_datetime(self.config.backtest_start, format='%Y%m%d'),
-                                        end=pd.to_datetime(self.config.backtest_end, format='%Y%m%d'),
-                                        freq='B'  # 使用工作日频率
-                                    )
-                                
-                                # 创建包含日期和收盘价的DataFrame
-                                df = pd.DataFrame({
-                                    'date': dates,
-                                    'close': closes
-                                })
-                                
-                                # 保存到benchmark.csv
-                                benchmark_file = os.path.join(backtest_dir, "benchmark.csv")
-                                df.to_csv(benchmark_file, index=False)
-                                
-                                if self.trader_callback:
-                                    self.trader_callback.gui.log_message(
-                                        f"基准指数数据已保存到 {benchmark_file}, 共 {len(df)} 条记录",
-                                        "INFO"
-                                    )
-                        else:
-                            if self.trader_callback:
-                                self.trader_callback.gui.log_message(f"基准指数 {benchmark_code} 收盘价数据为空", "WARNING")
-                    else:
-                        if self.trader_callback:
-                            self.trader_callback.gui.log_message(f"基准指数 {benchmark_code} 数据获取失败", "WARNING")
-                except Exception as e:
-                    if self.trader_callback:
-                        self.trader_callback.gui.log_message(f"获取基准指数数据时出错: {str(e)}", "ERROR")
-                    logging.error(f"获取基准指数数据时出错: {str(e)}", exc_info=True)
+            # 创建新目录
+            os.makedirs(backtest_dir)
+
+            # 保存交易记录
+            trades_df = pd.DataFrame(self.backtest_records['trades'])
+            if len(trades_df) > 0:
+                trades_df.to_csv(os.path.join(backtest_dir, "trades.csv"), index=False, encoding='utf-8-sig')
+            else:
+                # 创建一个包含列名但没有数据的空DataFrame
+                empty_trades_df = pd.DataFrame(columns=[
+                    'datetime', 'code', 'action', 'price', 'volume', 'amount',
+                    'commission', 'stamp_tax', 'transfer_fee', 'flow_fee',
+                    'total_asset', 'cash', 'market_value'
+                ])
+                empty_trades_df.to_csv(os.path.join(backtest_dir, "trades.csv"), index=False, encoding='utf-8-sig')
+                if self.listeners:
+                    self.log("回测期间没有产生交易记录", "WARNING")
+
+            # 保存每日统计数据
+            daily_stats_df = pd.DataFrame(self.backtest_records['daily_stats'])
+            if len(daily_stats_df) > 0:
+                daily_stats_df.to_csv(os.path.join(backtest_dir, "daily_stats.csv"), index=False, encoding='utf-8-sig')
+            else:
+                # 创建一个包含列名但没有数据的空DataFrame
+                empty_stats_df = pd.DataFrame(columns=[
+                    'date', 'total_asset', 'cash', 'market_value', 
+                    'daily_return', 'benchmark_close', 'positions'
+                ])
+                empty_stats_df.to_csv(os.path.join(backtest_dir, "daily_stats.csv"), index=False, encoding='utf-8-sig')
+                if self.listeners:
+                    self.log("回测期间没有产生每日统计数据", "WARNING")
+            
+            # 保存基准指数数据
+            benchmark_code = self.config.config_dict["backtest"]["benchmark"]
+            try:
+                # 先下载数据确保可用
+                xtdata.download_history_data(
+                    stock_code=benchmark_code,
+                    period="1d",
+                    start_time=self.config.backtest_start,
+                    end_time=self.config.backtest_end,
+                )
                 
-                # 保存回测配置信息
-                config_info = {
-                    'start_time': self.backtest_records['start_time'],
-                    'end_time': self.backtest_records['end_time'],
-                    'init_capital': self.backtest_records['init_capital'],
-                    'benchmark': self.config.config_dict["backtest"]["benchmark"],
-                    'strategy_file': self.config.config_dict.get("strategy_file", ""),  # 从配置字典中获取策略文件路径
-                    'actual_start_time': datetime.datetime.fromtimestamp(self.start_time).strftime("%Y-%m-%d %H:%M:%S") if self.start_time else "",
-                    'actual_end_time': datetime.datetime.fromtimestamp(self.end_time).strftime("%Y-%m-%d %H:%M:%S") if self.end_time else "",
-                    'total_runtime_seconds': self.total_runtime,
-                    'total_runtime_formatted': self._format_runtime(self.total_runtime)
-                }
-                pd.DataFrame([config_info]).to_csv(os.path.join(backtest_dir, "config.csv"), index=False, encoding='utf-8-sig')
+                benchmark_data = xtdata.get_market_data(
+                    field_list=['close'],
+                    stock_list=[benchmark_code],
+                    period='1d',
+                    start_time=self.config.backtest_start,
+                    end_time=self.config.backtest_end,
+                )
                 
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(
-                        f"回测记录已保存到目录: {backtest_dir}", 
-                        "INFO"
-                    )
-                    # 记录回测总耗时
-                    self.trader_callback.gui.log_message(
-                        f"回测总耗时: {self._format_runtime(self.total_runtime)}", 
+                if self.listeners:
+                    self.log(
+                        f"基准数据获取结果: {benchmark_data.keys()}", 
                         "INFO"
                     )
-                
+
+                if benchmark_data and 'close' in benchmark_data and len(benchmark_data['close']) > 0:
+                    closes = benchmark_data['close'].values[0]  # 获取收盘价数据
+                    if len(closes) > 0:
+                        # 直接从benchmark_data中获取日期数据
+                        # 获取交易日期索引
+                        if 'date' in benchmark_data:
+                            dates = benchmark_data['date'][0]  # 使用benchmark_data中的日期
+                        elif hasattr(benchmark_data, 'index') and benchmark_data.index is not None and not isinstance(benchmark_data.index, pd.RangeIndex):
+                            dates = benchmark_data.index  # 有些情况下日期可能在索引中
+                        elif hasattr(benchmark_data['close'], 'columns') and len(benchmark_data['close'].columns) > 0:
+                            # 从columns中获取日期（日期作为列名出现的情况）
+                            date_cols = [col for col in benchmark_data['close'].columns if str(col).isdigit()]
+                            if date_cols:
+                                # 将列名转换为日期对象
+                                dates = pd.to_datetime(date_cols, format='%Y%m%d')
+                                # 确保closes的顺序与dates匹配
+                                closes = np.array([benchmark_data['close'].iloc[0][col] for col in date_cols])
+                            else:
+                                # 如果没有日期数据，才使用日期范围（不推荐）
+                                self.log(
+                                    "警告：基准数据中没有日期信息，将使用日期范围替代，可能不准确",
+                                    "WARNING"
+                                )
+                                dates = pd.date_range(
+                                    start=pd.to_datetime(self.config.backtest_start, format='%Y%m%d'),
+                                    end=pd.to_datetime(self.config.backtest_end, format='%Y%m%d'),
+                                    freq='B'  # 使用工作日频率
+                                )
+                            
+                            # 创建包含日期和收盘价的DataFrame
+                            df = pd.DataFrame({
+                                'date': dates,
+                                'close': closes
+                            })
+                            
+                            # 保存到benchmark.csv
+                            benchmark_file = os.path.join(backtest_dir, "benchmark.csv")
+                            df.to_csv(benchmark_file, index=False)
+                            
+                            if self.listeners:
+                                self.log(
+                                    f"基准指数数据已保存到 {benchmark_file}, 共 {len(df)} 条记录",
+                                    "INFO"
+                                )
+                    else:
+                        if self.listeners:
+                            self.log(f"基准指数 {benchmark_code} 收盘价数据为空", "WARNING")
+                else:
+                    if self.listeners:
+                        self.log(f"基准指数 {benchmark_code} 数据获取失败", "WARNING")
             except Exception as e:
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"保存回测记录时出错: {str(e)}", "ERROR")
-                logging.error(f"保存回测记录时出错: {str(e)}", exc_info=True)
-                
+                if self.listeners:
+                    self.log(f"获取基准指数数据时出错: {str(e)}", "ERROR")
+                logging.error(f"获取基准指数数据时出错: {str(e)}", exc_info=True)
+            
+            # 保存回测配置信息
+            config_info = {
+                'start_time': self.backtest_records['start_time'],
+                'end_time': self.backtest_records['end_time'],
+                'init_capital': self.backtest_records['init_capital'],
+                'benchmark': self.config.config_dict["backtest"]["benchmark"],
+                'strategy_file': book.strategy_file,  # 主策略为配置字典中的策略文件路径
+                'actual_start_time': datetime.datetime.fromtimestamp(self.start_time).strftime("%Y-%m-%d %H:%M:%S") if self.start_time else "",
+                'actual_end_time': datetime.datetime.fromtimestamp(self.end_time).strftime("%Y-%m-%d %H:%M:%S") if self.end_time else "",
+                'total_runtime_seconds': self.total_runtime,
+                'total_runtime_formatted': self._format_runtime(self.total_runtime)
+            }
+            pd.DataFrame([config_info]).to_csv(os.path.join(backtest_dir, "config.csv"), index=False, encoding='utf-8-sig')
+            
+            if self.listeners:
+                self.log(
+                    f"回测记录已保存到目录: {backtest_dir}", 
+                    "INFO"
+                )
+                # 记录回测总耗时
+                self.log(
+                    f"回测总耗时: {self._format_runtime(self.total_runtime)}", 
+                    "INFO"
+                )
+            
         except Exception as e:
-            error_msg = "回测运行异常: " + str(e)
-            logging.error(error_msg, exc_info=True)
-            # 调用错误回调函数
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(error_msg, "ERROR")
-                import traceback
-                self.trader_callback.gui.log_message(f"错误详情:\n{traceback.format_exc()}", "ERROR")
-            raise  # 重新抛出异常
+            if self.listeners:
+                self.log(f"保存回测记录时出错: {str(e)}", "ERROR")
+            logging.error(f"保存回测记录时出错: {str(e)}", exc_info=True)
+
+    def get_warmup_bars(self) -> int:
+        """获取回测开始前需要预加载的K线数量
+        
+        取配置项 backtest.warmup_bars 与各策略模块中 WARMUP_BARS 声明的最大值。
+        
+        Returns:
+            int: 预热K线数量
+        """
+        declared = [int(getattr(module, "WARMUP_BARS", 0) or 0) for module in self.strategy_modules]
+        return max([int(self.config.warmup_bars or 0)] + declared)
+    
+    def get_history_start(self, period: str) -> str:
+        """计算包含预热区间的历史数据开始日期
+        
+        按每个交易日的K线数量把预热K线数换算为交易日数，再从交易日历向前推算。
+        
+        Args:
+            period: 数据周期
+            
+        Returns:
+            str: YYYYMMDD 格式的开始日期，没有预热需求时即回测开始日期
+        """
+        warmup = self.get_warmup_bars()
+        if warmup <= 0:
+            return self.config.backtest_start
+        if isinstance(self.trigger, CustomTimeTrigger):
+            bars_per_day = len(self.trigger.trigger_array)
+        else:
+            bars_per_day = BARS_PER_DAY.get(period, 1)
+        days = -(-warmup // max(1, bars_per_day))
+        try:
+            start = get_trade_calendar(self.config.backtest_start).prev_trade_day(self.config.backtest_start, days)
+        except ValueError as e:
+            logging.warning(f"预热区间超出交易日历范围，从回测开始日期加载: {str(e)}")
+            return self.config.backtest_start
+        return start.replace("-", "")
+    
+    def _load_history_panel(self, dividend_type: str) -> MarketPanel:
+        """按其他复权方式加载与当前历史窗口同一时间轴的面板
+        
+        Args:
+            dividend_type: 复权方式
+            
+        Returns:
+            MarketPanel: 行情面板
+        """
+        request = self._panel_request
+        if request is None or self.panel_history is None:
+            raise ValueError("当前回测的行情面板不是由框架加载的，无法按其他复权方式补充加载")
+        if self.listeners:
+            self.log(f"历史窗口请求复权方式 {dividend_type}，补充加载一次历史数据", "INFO")
+        loader = HistoryLoader(self.data_source, batch_size=self.config.load_batch_size,
+                               workers=self.config.load_workers)
+        frames = loader.load(request["stock_codes"], request["field_list"], request["period"],
+                             request["start_time"], request["end_time"], dividend_type)
+        return MarketPanel.from_frames(frames, time_axis=self.panel_history.panel.times)
+    
+    def history(self, field: str, count: int, codes: Union[str, List[str], None] = None,
+                include_current: bool = False, fq: Optional[str] = None) -> np.ndarray:
+        """获取截至当前K线的历史窗口（直接切片预加载的行情面板，不调用数据接口）
+        
+        Args:
+            field: 数值字段名，如"close"
+            count: 窗口长度（时间点数量，含预热数据）
+            codes: None 返回全部股票；单个代码返回一维窗口；代码列表返回对应的列
+            include_current: 是否包含当前K线，默认不包含
+            fq: 复权方式（pre/post/none），None 为回测配置的复权方式
+            
+        Returns:
+            np.ndarray: 只读窗口，形状为 (窗口长度, 股票数) 或 (窗口长度,)
+        """
+        if self.panel_history is None:
+            raise RuntimeError("回测尚未加载行情数据，无法读取历史窗口")
+        return self.panel_history.window(field, count, codes, include_current, fq)
+    
+    def load_market_panel(self, stock_codes, start_time=None, end_time=None):
+        """加载回测区间（含预热区间）的历史行情并构建对齐面板
+        
+        Args:
+            stock_codes: 股票代码列表
+            start_time: 加载开始日期，None 为含预热区间的开始日期
+            end_time: 加载结束日期，None 为回测结束日期
+            
+        Returns:
+            MarketPanel: 行情面板；回测被中止或没有有效时间点时返回None
+        """
+        panel, self._panel_request, historical_data = self._load_panel(stock_codes, start_time, end_time)
+        if panel is not None:
+            # 保存原始数据的引用
+            self.historical_data_ref = historical_data
+        return panel
+    
+    def _load_panel(self, stock_codes, start_time=None, end_time=None, verbose=True):
+        """加载指定区间的历史行情并构建对齐面板（流式回测在后台线程中调用，不修改框架状态）
+        
+        Args:
+            stock_codes: 股票代码列表
+            start_time: 加载开始日期，None 为含预热区间的开始日期
+            end_time: 加载结束日期，None 为回测结束日期
+            verbose: 是否输出加载过程日志
+            
+        Returns:
+            Tuple[Optional[MarketPanel], Dict, Dict]: (行情面板, 加载请求, 原始数据)；
+            回测被中止或没有有效时间点时面板为None
+        """
+        listeners = self.listeners if verbose else None
+        end_time = end_time or self.config.backtest_end
+        # 获取数据周期
+        data_period = self.trigger.get_data_period()
+        
+        # 确保field_list中包含time和close字段（复制一份，避免修改配置中的列表）
+        field_list = list(self.config.config_dict["data"]["fields"])
+        if "time" not in field_list:
+            field_list = ["time"] + field_list
+        if "close" not in field_list:
+            field_list.append("close")
+        
+        # 根据触发器的数据周期加载对应的历史数据
+        period = data_period
+        if period == "1s":
+            # 对于自定义定时触发，检查时间点是否都是整分钟
+            if isinstance(self.trigger, CustomTimeTrigger):
+                # 检查所有触发时间点是否都是整分钟（秒数为0）
+                all_whole_minutes = True
+                for seconds in self.trigger.trigger_seconds:
+                    # 计算秒数部分
+                    seconds_part = seconds % 60
+                    if seconds_part != 0:
+                        all_whole_minutes = False
+                        break
+                
+                if all_whole_minutes:
+                    # 如果所有时间点都是整分钟，使用1m数据
+                    period = "1m"
+                    if listeners:
+                        self.log(f"所有自定义时间点都是整分钟，使用1分钟K线数据", "INFO")
+                else:
+                    # 如果有不是整分钟的时间点，使用tick数据
+                    period = "tick"
+                    if listeners:
+                        self.log(f"存在非整分钟的自定义时间点，使用tick数据", "INFO")
+            else:
+                # 默认使用tick数据
+                period = "tick"
+        
+        # 按批次并发加载所有股票的历史数据
+        batch_size = self.config.load_batch_size
+        workers = self.config.load_workers
+        if listeners:
+            self.log(f"开始加载{len(stock_codes)}只股票的历史数据（每批{batch_size}只，{workers}个线程）...", "INFO")
+        
+        reported_failures = 0
+        
+        def on_load_progress(progress):
+            nonlocal reported_failures
+            if listeners:
+                self.log(
+                    f"历史数据加载进度: {progress['finished']}/{progress['total']}只股票，"
+                    f"{progress['rows']}行，耗时{progress['elapsed']:.2f}秒",
+                    "INFO"
+                )
+                new_failures = progress['failed'][reported_failures:]
+                if new_failures:
+                    self.log(f"加载失败的股票: {', '.join(new_failures)}", "WARNING")
+            reported_failures = len(progress['failed'])
+        
+        loader = HistoryLoader(
+            self.data_source,
+            batch_size=batch_size,
+            workers=workers,
+            progress_callback=on_load_progress,
+            is_cancelled=lambda: not self.is_running
+        )
+        # 策略声明了预热K线数量时，从回测开始日期之前的对应交易日开始加载
+        history_start = start_time or self.get_history_start(period)
+        if start_time is None and history_start != self.config.backtest_start and listeners:
+            self.log(f"预热{self.get_warmup_bars()}根K线，历史数据从{history_start}开始加载", "INFO")
+        request = {
+            "stock_codes": list(stock_codes),
+            "field_list": field_list,
+            "period": period,
+            "start_time": history_start,
+            "end_time": end_time,
+        }
+        loaded_data = loader.load(
+            stock_codes,
+            field_list,
+            period,
+            history_start,
+            end_time,
+            self.config.config_dict["data"]["dividend_type"]
+        )
+        
+        historical_data = {}
+        for code, df in loaded_data.items():
+            # 判断是否为自定义时间触发
+            if isinstance(self.trigger, CustomTimeTrigger):
+                # 对于自定义时间触发，只保留触发时间点附近的数据（允许1秒误差，整列向量化计算）
+                if 'time' in df.columns:
+                    mask = self.trigger.filter_mask(df['time'].values)
+                    
+                    # 只保留触发时间点附近的数据
+                    if mask.any():
+                        filtered_df = df[mask]
+                        historical_data[code] = filtered_df
+                        if listeners:
+                            self.log(
+                                f"自定义时间触发: {code}过滤后保留{len(filtered_df)}个时间点，原始数据有{len(df)}个时间点", 
+                                "INFO"
+                            )
+                    else:
+                        # 如果没有找到匹配的时间点，仍然保存原始数据
+                        historical_data[code] = df
+                        if listeners:
+                            self.log(
+                                f"警告: {code}没有找到匹配的自定义时间点，使用原始数据", 
+                                "WARNING"
+                            )
+                else:
+                    # 如果没有time列，使用原始数据
+                    historical_data[code] = df
+                    if listeners:
+                        self.log(
+                            f"警告: {code}的数据中没有time列，无法按自定义时间过滤", 
+                            "WARNING"
+                        )
+            else:
+                # 非自定义时间触发，直接存储DataFrame
+                historical_data[code] = df
+        
+        if not self.is_running:
+            if listeners:
+                self.log("回测被中止", "WARNING")
+            return None, request, historical_data
+                
+        # 获取所有时间点
+        all_times = []
+
+        # 对于自定义时间触发，使用不同的方式获取时间点
+        if isinstance(self.trigger, CustomTimeTrigger):
+            # 获取回测日期范围（含预热区间）内的所有交易日
+            start_date = datetime.datetime.strptime(history_start, "%Y%m%d").date()
+            end_date = datetime.datetime.strptime(end_time, "%Y%m%d").date()
+            
+            # 从交易日历中直接截取区间内的交易日（排除周末和节假日）
+            get_trade_calendar(start_date)
+            trading_days = get_trade_calendar(end_date).trade_days_between(start_date, end_date)
+            
+            if listeners:
+                self.log(f"回测期间共有{len(trading_days)}个交易日", "INFO")
+            
+            # 为每个交易日生成自定义触发时间点（交易日 × 触发时间点 网格，秒级时间戳）
+            all_times = self.trigger.time_axis(trading_days)
+            
+            if listeners:
+                self.log(f"自定义时间触发模式：生成了{len(all_times)}个时间点", "INFO")
+
+        # 构建 时间×股票×字段 对齐的行情面板（向量化对齐，只在加载阶段执行一次）
+        if listeners:
+            self.log("正在构建对齐行情面板...", "INFO")
+        if isinstance(self.trigger, CustomTimeTrigger):
+            # 自定义时间触发：以生成的触发时间点作为时间轴
+            panel = MarketPanel.from_frames(historical_data, time_axis=all_times)
+        else:
+            # 非自定义时间触发：以所有股票时间戳的并集作为时间轴
+            panel = MarketPanel.from_frames(historical_data)
+
+        if listeners:
+            for code in panel.skipped:
+                self.log(f"错误: {code}的数据中没有找到任何时间字段，跳过该股票", "ERROR")
+            for code, count in panel.row_counts().items():
+                self.log(f"{code}在时间轴上对齐了{count}个时间点", "INFO")
+            self.log(
+                f"行情面板构建完成: {len(panel.times)}个时间点 × {len(panel.codes)}只股票 × "
+                f"{len(panel.numeric_fields)}个字段，占用内存{panel.nbytes / 1024 / 1024:.1f}MB",
+                "INFO"
+            )
+
+        all_times = panel.times.tolist()
+        
+        if len(all_times) == 0:
+            if listeners:
+                self.log("错误: 没有找到任何有效的时间点，无法进行回测", "ERROR")
+            return None, request, historical_data
+        
+        if listeners:
+            self.log(f"共找到{len(all_times)}个时间点", "INFO")
+            self.log(f"第一个时间点: {all_times[0]}", "INFO")
+            self.log(f"最后一个时间点: {all_times[-1]}", "INFO")
+        
+        return panel, request, historical_data
 
     def record_results(self, timestamp, data, signals):
         """记录回测结果
@@ -2159,8 +2541,8 @@ class KhQuantFramework:
             is_trading_day = self.tools.is_trade_day(current_date)
             if not is_trading_day:
                 # 如果不是交易日，则跳过策略调用
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"日期 {current_date} 不是交易日，跳过策略执行", "INFO")
+                if self.listeners:
+                    self.log(f"日期 {current_date} 不是交易日，跳过策略执行", "INFO")
                 return
             
             # 记录交易信号
@@ -2203,7 +2585,7 @@ class KhQuantFramework:
                     current_date = self._cached_timestamp.get('date')
                     current_ts_seconds = self._cached_timestamp.get('ts_seconds')
                 else:
-                    current_time = datetime.datetime.fromtimestamp(ts_seconds)
+                    current_time = beijing_datetime(ts_seconds)
                     current_date = current_time.date()
                     current_ts_seconds = ts_seconds
                     self._cached_timestamp = {
@@ -2290,8 +2672,8 @@ class KhQuantFramework:
             assets['total_asset'] = assets['cash'] + total_market_value
             
             # 只在资产变化显著时触发回调，减少不必要的回调
-            if abs(assets['total_asset'] - old_total_asset) > 0.01 and self.trader_callback:
-                self.trader_callback.on_stock_asset(SimpleNamespace(**assets))
+            if abs(assets['total_asset'] - old_total_asset) > 0.01 and self.trade_mgr.callback:
+                self.trade_mgr.callback.on_stock_asset(SimpleNamespace(**assets))
             
             # 7. 交易信号处理优化
             if signals:
@@ -2356,102 +2738,60 @@ class KhQuantFramework:
                     for signal in signals
                 ])
             
-            # 8. 最后时间点判断优化
-            # 使用函数字典替代if-else判断
-            is_last_time_point = False
-            
-            if isinstance(self.trigger, CustomTimeTrigger):
-                # 对于自定义时间触发，使用缓存优化
-                trigger_seconds = self.trigger.trigger_seconds
-                if trigger_seconds:
-                    # 缓存当天的触发时间点
-                    cache_key = f"time_points_{current_date}"
-                    if not hasattr(self, '_cached_time_points') or cache_key not in self._cached_time_points:
-                        if not hasattr(self, '_cached_time_points'):
-                            self._cached_time_points = {}
-                            
-                        # 获取当天所有触发时间点并缓存
-                        today_times = []
-                        max_trigger_second = max(trigger_seconds)
-                        
-                        # 使用列表推导式优化循环
-                        today_times = [
-                            int(datetime.datetime.combine(current_date, datetime.time(
-                                seconds // 3600,
-                                (seconds % 3600) // 60,
-                                seconds % 60
-                            )).timestamp())
-                            for seconds in trigger_seconds
-                        ]
-                        
-                        # 缓存计算结果
-                        self._cached_time_points[cache_key] = {
-                            'times': sorted(today_times),
-                            'max_second': max_trigger_second
-                        }
-                    
-                    # 使用缓存数据
-                    max_trigger_second = self._cached_time_points[cache_key]['max_second']
-                    
-                    # 计算当前时间点的秒数(使用已有变量避免重复计算)
-                    current_ts_dt = current_time
-                    current_seconds = current_ts_dt.hour * 3600 + current_ts_dt.minute * 60 + current_ts_dt.second
-                    
-                    # 检查是否是当天最后一个触发点
-                    is_last_time_point = abs(current_seconds - max_trigger_second) < 0.1
+            # 8. 最后时间点判断 - 直接读取回测时钟的日期边界索引，O(1)
+            if "is_last_bar" in current_time_info:
+                is_last_time_point = current_time_info["is_last_bar"]
             else:
-                # 非自定义时间触发，使用all_times缓存优化
-                cache_key = f"daily_times_{current_date}"
-                if not hasattr(self, '_cached_daily_times') or cache_key not in self._cached_daily_times:
-                    if not hasattr(self, '_cached_daily_times'):
-                        self._cached_daily_times = {}
-                        
-                    # 获取当天的时间点，使用生成器表达式优化
-                    today_times = []
-                    
-                    # 使用列表推导式和异常处理优化
-                    try:
-                        today_times = [
-                            t for t in self.all_times
-                            if datetime.datetime.fromtimestamp(
-                                float(t) / 1000 if float(t) > 1e10 else float(t)
-                            ).date() == current_date
-                        ]
-                    except Exception:
-                        # 出错时使用传统循环方式作为备选
-                        for t in self.all_times:
-                            try:
-                                t_float = float(t)
-                                t_seconds = t_float / 1000 if t_float > 1e10 else t_float
-                                t_time = datetime.datetime.fromtimestamp(t_seconds)
-                                
-                                if t_time.date() == current_date:
-                                    today_times.append(t)
-                            except Exception:
-                                continue
-                    
-                    # 缓存结果
-                    self._cached_daily_times[cache_key] = sorted(today_times)
-                
-                # 使用缓存的时间点
-                today_times = self._cached_daily_times[cache_key]
-                
-                # 检查是否是最后时间点
-                if today_times:
-                    # 直接使用数值比较，避免创建新的datetime对象
-                    last_time = float(today_times[-1])
-                    last_time_seconds = last_time / 1000 if last_time > 1e10 else last_time
-                    is_last_time_point = abs(last_time_seconds - current_ts_seconds) < 0.1
+                bar_index = self.bar_clock.bar_index_of(timestamp) if self.bar_clock is not None else -1
+                is_last_time_point = bar_index >= 0 and bool(self.bar_clock.is_last_bar[bar_index])
             
             # 9. 每日统计记录优化 - 只在最后时间点记录
             if is_last_time_point and is_trading_day:
                 self._record_daily_stats(current_date, current_time, data)
             
         except Exception as e:
-            if self.trader_callback:
-                self.trader_callback.gui.log_message(f"记录回测结果时出错: {str(e)}", "ERROR")
+            if self.listeners:
+                self.log(f"记录回测结果时出错: {str(e)}", "ERROR")
             logging.error(f"记录回测结果时出错: {str(e)}", exc_info=True)
     
+    def _panel_day_closes(self, codes, yyyymmdd_date):
+        """从行情面板读取当天最后一根K线的收盘价
+        
+        当天最后一根K线是收盘K线（日线，或15:00及以后的分钟线）时即为当日收盘价；
+        当天没有数据的股票（停牌）取面板中此前最近一根有效K线的收盘价。
+        行情面板由调用方传入时，即使最后一根不是收盘K线也直接使用，不再请求数据接口。
+        
+        Args:
+            codes: 股票代码列表
+            yyyymmdd_date: YYYYMMDD 格式日期
+            
+        Returns:
+            Dict[str, float]: {股票代码: 收盘价}，面板中取不到的股票不在结果中
+        """
+        panel, clock = self.market_panel, self.bar_clock
+        if panel is None or clock is None or 'close' not in panel.field_index:
+            return {}
+        bounds = clock.day_bounds(f"{yyyymmdd_date[:4]}-{yyyymmdd_date[4:6]}-{yyyymmdd_date[6:8]}")
+        if bounds is None:
+            return {}
+        end = bounds[1] - 1
+        seconds = int(clock.seconds_of_day[end])
+        if not self._panel_supplied and 0 < seconds < 15 * 3600:
+            return {}
+        close = panel.column('close')
+        prices = {}
+        for code in codes:
+            n = panel.code_index.get(code)
+            if n is None:
+                continue
+            if panel.valid[end, n] and close[end, n] > 0:
+                prices[code] = float(close[end, n])
+                continue
+            rows = np.flatnonzero(panel.valid[:end + 1, n] & (close[:end + 1, n] > 0))
+            if len(rows):
+                prices[code] = float(close[rows[-1], n])
+        return prices
+    
     def _record_daily_stats(self, current_date, current_time, data):
         """记录每日统计数据（从record_results中分离出来的功能）
         
@@ -2480,22 +2820,18 @@ class KhQuantFramework:
         # 转换日期为YYYYMMDD格式，用于获取日线数据
         yyyymmdd_date = date_str.replace('-', '') if '-' in date_str else date_str
         
-        # 批量获取收盘价
-        daily_prices = {}
-        if position_codes:
-            # 检查缓存中是否已有当日数据
-            cache_date_key = f"daily_prices_{yyyymmdd_date}"
-            if cache_date_key in self.daily_price_cache:
-                # 直接使用缓存中的数据
-                daily_prices = self.daily_price_cache[cache_date_key]
-                if self.trader_callback:
-                    self.trader_callback.gui.log_message(f"使用缓存的日线数据，日期: {yyyymmdd_date}", "INFO")
-            else:
+        # 收盘价优先从共享的行情面板读取，面板中没有的股票再请求日线数据
+        daily_prices = self._panel_day_closes(position_codes, yyyymmdd_date) if position_codes else {}
+        missing_codes = [code for code in position_codes if code not in daily_prices]
+        if missing_codes and not self._panel_supplied:
+            # 缓存按日期和股票记录，多策略同步回测时各账本持有的股票不同，缺少的股票单独请求
+            cached = self.daily_price_cache.setdefault(f"daily_prices_{yyyymmdd_date}", {})
+            to_fetch = [code for code in missing_codes if code not in cached]
+            if to_fetch:
                 try:
-                    # 一次性获取所有持仓股票的日线数据
                     daily_data = xtdata.get_market_data(
                         field_list=['close'],
-                        stock_list=position_codes,
+                        stock_list=to_fetch,
                         period='1d',
                         start_time=yyyymmdd_date,
                         end_time=yyyymmdd_date,
@@ -2503,26 +2839,17 @@ class KhQuantFramework:
                         dividend_type=self.config.config_dict["data"].get("dividend_type", "none")
                     )
                     
-                    # 优化数据提取逻辑
-                    if daily_data is not None and isinstance(daily_data, dict) and 'close' in daily_data:
-                        close_data = daily_data['close']
-                        # 检查close_data的类型
-                        if isinstance(close_data, pd.DataFrame):
-                            # 使用向量化操作处理DataFrame
-                            if any(code in close_data.index for code in position_codes):
-                                latest_date = close_data.columns[-1]
-                                # 使用向量化操作获取所有股票的价格
-                                valid_codes = [code for code in position_codes if code in close_data.index]
-                                daily_prices.update({
-                                    code: close_data.loc[code, latest_date]
-                                    for code in valid_codes
-                                    if close_data.loc[code, latest_date] is not None and close_data.loc[code, latest_date] > 0
-                                })
-                    
-                    # 缓存获取的数据，避免同一天重复请求
-                    self.daily_price_cache[cache_date_key] = daily_prices
+                    close_data = daily_data.get('close') if isinstance(daily_data, dict) else None
+                    for code in to_fetch:
+                        price = None
+                        if isinstance(close_data, pd.DataFrame) and code in close_data.index and len(close_data.columns):
+                            value = close_data.loc[code, close_data.columns[-1]]
+                            if value is not None and value > 0:
+                                price = value
+                        cached[code] = price
                 except Exception as e:
                     logging.error(f"获取日线数据失败: {e}")
+            daily_prices.update({code: cached[code] for code in missing_codes if cached.get(code) is not None})
         
         # 批量计算持仓市值
         for code in position_codes:
@@ -2619,8 +2946,8 @@ class KhQuantFramework:
             })
         
         # 输出日志
-        if self.trader_callback:
-            self.trader_callback.gui.log_message(
+        if self.listeners:
+            self.log(
                 f"每日统计 - 日期: {daily_stat['date']} | "
                 f"总资产: {total_asset:.2f} | "
                 f"日收益率: {daily_return*100:.2f}% | "
@@ -2647,10 +2974,10 @@ class KhQuantFramework:
                 self.total_runtime = self.end_time - self.start_time
                 
                 # 记录停止日志
-                if self.trader_callback:
+                if self.listeners:
                     end_datetime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    self.trader_callback.gui.log_message(f"策略手动停止时间: {end_datetime}", "INFO")
-                    self.trader_callback.gui.log_message(f"策略总运行时长: {self._format_runtime(self.total_runtime)}", "INFO")
+                    self.log(f"策略手动停止时间: {end_datetime}", "INFO")
+                    self.log(f"策略总运行时长: {self._format_runtime(self.total_runtime)}", "INFO")
         
         if self.trader:
             self.trader.stop()
@@ -0,0 +1,322 @@
+# coding: utf-8
+"""
+增量指标缓存模块
+
+策略在每根K线上对每只股票调用 khMA 等函数时，原实现每次都重新获取整段历史并从头计算。
+这里按 (股票代码, 周期, 字段, 复权方式, 指标, 参数) 缓存指标的运行状态：
+- 窗口类指标（MA/SUM/STD）保存定长环形缓冲区和累计和，每根新K线 O(1) 更新
+- 递推类指标（EMA/SMA）只保存上一个值，每根新K线 O(1) 更新
+首次请求（缓存未命中）或时间倒退时才按完整窗口重新计算。
+
+数据来源有两种：
+- 回测运行中（khQTTools 注册了 khMarket.PanelHistory）直接读取预加载面板中新增的行
+- 其他情况由调用方获取最近一段历史（khHistory），按时间戳只把新增的K线计入状态
+"""
+import math
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 支持的指标
+WINDOW_INDICATORS = ("MA", "SUM", "STD")
+RECURSIVE_INDICATORS = ("EMA", "SMA")
+
+# 递推类指标缓存未命中时读取的K线数量为 N 的倍数，初值的影响衰减到可忽略
+RECURSIVE_LOOKBACK_FACTOR = 10
+
+
+def lookback_bars(indicator: str, params: Tuple) -> int:
+    """缓存未命中时需要读取的K线数量
+
+    Args:
+        indicator: 指标名称
+        params: 指标参数，第一个为周期 N
+
+    Returns:
+        int: K线数量
+    """
+    n = int(params[0])
+    if indicator in RECURSIVE_INDICATORS:
+        return n * RECURSIVE_LOOKBACK_FACTOR
+    return n
+
+
+class WindowState:
+    """窗口类指标（MA/SUM/STD）的运行状态
+
+    环形缓冲区保存最近 N 个值，累计和与平方和随新值增减；
+    每推入 N 个值按缓冲区重新求和一次，避免浮点误差累积（均摊仍为 O(1)）。
+    NaN 不计入累计和，默认按窗口内的有效值计算（与原 khMA 的 Series.mean() 一致，跳过 NaN），
+    窗口内全部为 NaN 时为 NaN；skip_nan=False 时窗口内有 NaN 即为 NaN（与 pandas rolling 一致）。
+    """
+
+    def __init__(self, indicator: str, n: int, skip_nan: bool = True):
+        """初始化
+
+        Args:
+            indicator: 指标名称（MA/SUM/STD）
+            n: 窗口长度
+            skip_nan: 是否跳过窗口内的 NaN
+        """
+        self.indicator = indicator
+        self.n = n
+        self.skip_nan = skip_nan
+        self.buffer = np.zeros(n, dtype=np.float64)
+        self.count = 0
+        self.pos = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nan_count = 0
+        self._pushes = 0
+
+    def reset(self, values: np.ndarray):
+        """用一段完整历史重新初始化"""
+        values = np.asarray(values, dtype=np.float64)[-self.n:]
+        self.count = len(values)
+        self.buffer[:self.count] = values
+        self.pos = self.count % self.n
+        self._refresh()
+
+    def _refresh(self):
+        """按缓冲区重新精确求和"""
+        window = self.buffer[:self.count]
+        finite = window[~np.isnan(window)]
+        self.nan_count = self.count - len(finite)
+        self.total = float(finite.sum())
+        self.total_sq = float(np.dot(finite, finite))
+        self._pushes = 0
+
+    def push(self, x: float):
+        """推入一个新值，O(1)"""
+        if self.count == self.n:
+            old = self.buffer[self.pos]
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+                self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.buffer[self.pos] = x
+        if math.isnan(x):
+            self.nan_count += 1
+        else:
+            self.total += x
+            self.total_sq += x * x
+        self.pos = (self.pos + 1) % self.n
+        self._pushes += 1
+        if self._pushes >= self.n:
+            self._refresh()
+
+    @property
+    def value(self) -> float:
+        """当前指标值，窗口未填满或没有有效值（skip_nan=False 时为含NaN）时为NaN"""
+        valid = self.count - self.nan_count
+        if self.count < self.n or valid == 0 or (self.nan_count and not self.skip_nan):
+            return float("nan")
+        if self.indicator == "SUM":
+            return self.total
+        mean = self.total / valid
+        if self.indicator == "MA":
+            return mean
+        # STD 为总体标准差（ddof=0），与 MyTT.STD 一致；只有一个有效值时为0，避免累计和相减的舍入误差
+        if valid == 1:
+            return 0.0
+        return math.sqrt(max(self.total_sq / valid - mean * mean, 0.0))
+
+
+class RecursiveState:
+    """递推类指标（EMA/SMA）的运行状态
+
+    Y = alpha * X + (1 - alpha) * Y'，以第一个值为初值，与 MyTT 中 ewm(adjust=False) 一致：
+    EMA 的 alpha = 2 / (N + 1)，SMA(N, M) 的 alpha = M / N。
+    """
+
+    def __init__(self, indicator: str, n: int, m: int = 1):
+        """初始化
+
+        Args:
+            indicator: 指标名称（EMA/SMA）
+            n: 周期
+            m: SMA 的权重参数
+        """
+        self.indicator = indicator
+        self.alpha = 2.0 / (n + 1) if indicator == "EMA" else m / n
+        self.current = float("nan")
+        self.gap = 0  # 上一个有效值之后连续的NaN个数
+
+    def reset(self, values: np.ndarray):
+        """用一段完整历史重新初始化"""
+        self.current = float("nan")
+        self.gap = 0
+        for x in np.asarray(values, dtype=np.float64).tolist():
+            self.push(x)
+
+    def push(self, x: float):
+        """推入一个新值，O(1)"""
+        if math.isnan(x):
+            if not math.isnan(self.current):
+                self.gap += 1
+            return
+        if math.isnan(self.current):
+            self.current = x
+        elif self.gap:
+            # 与 pandas ewm(ignore_na=False) 一致：NaN 期间旧值的权重继续衰减
+            decay = (1 - self.alpha) ** (self.gap + 1)
+            self.current = (decay * self.current + self.alpha * x) / (decay + self.alpha)
+        else:
+            self.current = self.alpha * x + (1 - self.alpha) * self.current
+        self.gap = 0
+
+    @property
+    def value(self) -> float:
+        """当前指标值"""
+        return self.current
+
+
+def create_state(indicator: str, params: Tuple):
+    """按指标名称创建运行状态
+
+    Args:
+        indicator: 指标名称（MA/SUM/STD/EMA/SMA）
+        params: 指标参数，(N,) 或 SMA 的 (N, M)
+
+    Returns:
+        WindowState 或 RecursiveState
+    """
+    indicator = indicator.upper()
+    if indicator in WINDOW_INDICATORS:
+        return WindowState(indicator, int(params[0]))
+    if indicator in RECURSIVE_INDICATORS:
+        return RecursiveState(indicator, int(params[0]), int(params[1]) if len(params) > 1 else 1)
+    raise ValueError(f"不支持增量计算的指标: {indicator}，支持 {WINDOW_INDICATORS + RECURSIVE_INDICATORS}")
+
+
+def _same_value(a: float, b: float) -> bool:
+    """两个数值相同（都为NaN也视为相同）"""
+    return a == b or (math.isnan(a) and math.isnan(b))
+
+
+class _Entry:
+    """缓存项：指标状态及其已计入的最后位置"""
+
+    __slots__ = ("state", "source", "position", "last_time", "last_value")
+
+    def __init__(self, state, source=None, position: int = 0, last_time: Optional[int] = None,
+                 last_value: float = float("nan")):
+        self.state = state
+        self.source = source  # 面板来源（PanelHistory），换了一次回测即失效
+        self.position = position  # 面板来源：已计入的时间轴结束下标（不含）
+        self.last_time = last_time  # 序列来源：已计入的最后一根K线时间戳
+        self.last_value = last_value  # 序列来源：已计入的最后一根K线的数值，用于发现历史被改写（前复权除权）
+
+
+class IndicatorCache:
+    """按 (股票代码, 周期, 字段, 复权方式, 指标, 参数) 缓存的增量指标"""
+
+    def __init__(self):
+        self._entries: Dict[Tuple, _Entry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """清空所有缓存项"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update_from_panel(self, key: Tuple, history, code: str, field: str, indicator: str, params: Tuple,
+                          period: str, current_time=None, fq: Optional[str] = None) -> Optional[float]:
+        """从回测预加载面板增量更新指标
+
+        Args:
+            key: 缓存键
+            history: khMarket.PanelHistory
+            code: 股票代码
+            field: 数值字段
+            indicator: 指标名称
+            params: 指标参数
+            period: K线周期
+            current_time: 截止时间（不含），见 PanelHistory.cutoff_index
+            fq: 复权方式
+
+        Returns:
+            Optional[float]: 指标值；周期不匹配、股票或字段不在面板中、预加载数据不足时返回None
+        """
+        if history.period is None or period != history.period:
+            return None
+        try:
+            panel = history.panel_for(fq)
+        except Exception:
+            return None
+        if code not in panel.code_index or field not in panel.field_index:
+            return None
+        n, f = panel.code_index[code], panel.field_index[field]
+        # 位置按整个回测历史计数（base + 面板下标），流式回测切换分段后缓存仍然有效
+        base = getattr(history, "base", 0)
+        end = history.cutoff_index(current_time)
+
+        entry = self._entries.get(key)
+        if entry is None or entry.source is not history or base + end < entry.position or entry.position < base:
+            # 缓存未命中或时间倒退：按完整窗口重新计算
+            index = history.tail_index(code, lookback_bars(indicator, params), end, fq)
+            if index is None:
+                return None
+            entry = _Entry(create_state(indicator, params), history, base + end)
+            entry.state.reset(panel.values[index, n, f])
+            self._entries[key] = entry
+            self.misses += 1
+            return entry.state.value
+
+        if base + end > entry.position:
+            index = history.row_index(code, entry.position - base, end, fq)
+            for x in panel.values[index, n, f].tolist():
+                entry.state.push(x)
+            entry.position = base + end
+        self.hits += 1
+        return entry.state.value
+
+    def update_from_series(self, key: Tuple, times: Sequence, values: Sequence, indicator: str,
+                           params: Tuple) -> float:
+        """用最近一段历史增量更新指标
+
+        只把时间晚于上次已计入K线的部分推入状态；上次的K线不在这段历史中（间隔过久）、
+        时间倒退，或这根K线的数值与上次计入时不同（前复权等历史在除权日被整体改写）时，
+        按这段历史重新计算。
+
+        Args:
+            key: 缓存键
+            times: 按时间升序的时间戳（可转换为 int64 的数值或 datetime）
+            values: 与 times 对应的数值
+            indicator: 指标名称
+            params: 指标参数
+
+        Returns:
+            float: 指标值
+        """
+        times = np.asarray(times)
+        if np.issubdtype(times.dtype, np.datetime64):
+            times = times.astype("datetime64[ns]").astype(np.int64)
+        times = times.astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if len(times) == 0:
+            return float("nan")
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.source is None and entry.last_time is not None:
+            last = entry.last_time
+            index = int(np.searchsorted(times, last, side="left"))
+            if index < len(times) and times[index] == last and _same_value(values[index], entry.last_value):
+                for x in values[index + 1:].tolist():
+                    entry.state.push(x)
+                entry.last_time = int(times[-1])
+                entry.last_value = float(values[-1])
+                self.hits += 1
+                return entry.state.value
+
+        entry = _Entry(create_state(indicator, params), last_time=int(times[-1]), last_value=float(values[-1]))
+        entry.state.reset(values)
+        self._entries[key] = entry
+        self.misses += 1
+        return entry.state.value
@@ -0,0 +1,204 @@
+# coding: utf-8
+"""
+历史行情批量加载模块
+
+把股票池按批次拆分，在线程池中并发调用数据源，结果按股票池顺序汇总为
+{股票代码: DataFrame}，可直接交给 khMarket.MarketPanel.from_frames 构建对齐面板。
+
+数据源是一个可调用对象：
+    source(stock_list, field_list, period, start_time, end_time, dividend_type) -> {股票代码: DataFrame}
+默认使用 XtDataSource（当前行情数据源的 get_market_data_ex，见 khProvider）；传入 khProvider.SyntheticProvider
+时在本地生成合成行情并模拟每次调用的延迟，用于离线测试和加载吞吐量基准测试：
+    python -m khLoader
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+
+class XtDataSource:
+    """xtdata 本地行情数据源（经 khProvider 转发，可切换为本地文件或合成数据源）"""
+
+    def __init__(self, fill_data: bool = True, provider=None):
+        """初始化
+
+        Args:
+            fill_data: 是否向后填充缺失数据，与 get_market_data_ex 的同名参数一致
+            provider: 行情数据源（khProvider.MarketDataProvider），None 时使用当前数据源
+        """
+        self.fill_data = fill_data
+        self.provider = provider
+
+    def __call__(self, stock_list: List[str], field_list: List[str], period: str,
+                 start_time: str, end_time: str, dividend_type: str = "none") -> Dict[str, pd.DataFrame]:
+        from khProvider import xtdata
+
+        provider = self.provider if self.provider is not None else xtdata
+        return provider.get_market_data_ex(
+            field_list=field_list,
+            stock_list=stock_list,
+            period=period,
+            start_time=start_time,
+            end_time=end_time,
+            dividend_type=dividend_type,
+            fill_data=self.fill_data
+        )
+
+
+class HistoryLoader:
+    """批量并发历史行情加载器"""
+
+    def __init__(self, source: Optional[Callable] = None, batch_size: int = 50, workers: int = 4,
+                 progress_callback: Optional[Callable[[Dict], None]] = None,
+                 is_cancelled: Optional[Callable[[], bool]] = None):
+        """初始化
+
+        Args:
+            source: 数据源，默认为 XtDataSource()
+            batch_size: 每次调用数据源的股票数量
+            workers: 并发线程数，为1时按批次顺序加载
+            progress_callback: 进度回调，每完成一个批次调用一次，参数为进度字典：
+                finished/total（已完成/总股票数）、batches_done/batch_count（批次）、
+                rows（已加载行数）、elapsed（已用秒数）、failed（加载失败的股票列表）
+            is_cancelled: 返回True时停止提交新的批次
+        """
+        self.source = source or XtDataSource()
+        self.batch_size = max(1, int(batch_size))
+        self.workers = max(1, int(workers))
+        self.progress_callback = progress_callback
+        self.is_cancelled = is_cancelled or (lambda: False)
+
+    def _fetch_batch(self, batch: List[str], field_list: List[str], period: str,
+                     start_time: str, end_time: str, dividend_type: str):
+        """加载一个批次；整批失败时逐只重试，返回 (数据, 失败列表)"""
+        try:
+            return self.source(batch, field_list, period, start_time, end_time, dividend_type) or {}, []
+        except Exception as e:
+            if len(batch) == 1:
+                logging.error(f"加载{batch[0]}的历史数据失败: {str(e)}")
+                return {}, list(batch)
+            logging.warning(f"批量加载{len(batch)}只股票失败，改为逐只加载: {str(e)}")
+
+        data, failed = {}, []
+        for code in batch:
+            try:
+                data.update(self.source([code], field_list, period, start_time, end_time, dividend_type) or {})
+            except Exception as e:
+                logging.error(f"加载{code}的历史数据失败: {str(e)}")
+                failed.append(code)
+        return data, failed
+
+    def load(self, stock_codes: Sequence[str], field_list: List[str], period: str,
+             start_time: str, end_time: str, dividend_type: str = "none") -> Dict[str, pd.DataFrame]:
+        """加载股票池的历史行情
+
+        Args:
+            stock_codes: 股票代码列表
+            field_list: 字段列表
+            period: 数据周期
+            start_time: 开始时间
+            end_time: 结束时间
+            dividend_type: 复权方式
+
+        Returns:
+            Dict[str, pd.DataFrame]: {股票代码: DataFrame}，顺序与 stock_codes 一致，
+            没有数据或加载失败的股票不包含在内
+        """
+        codes = list(dict.fromkeys(stock_codes))
+        batches = [codes[i:i + self.batch_size] for i in range(0, len(codes), self.batch_size)]
+        progress = {
+            "finished": 0,
+            "total": len(codes),
+            "batches_done": 0,
+            "batch_count": len(batches),
+            "rows": 0,
+            "elapsed": 0.0,
+            "failed": [],
+        }
+        results: Dict[str, pd.DataFrame] = {}
+        start = time.time()
+
+        def collect(batch, data, failed):
+            for code in batch:
+                df = data.get(code)
+                if df is not None and len(df) > 0:
+                    results[code] = df
+                    progress["rows"] += len(df)
+            progress["failed"].extend(failed)
+            progress["finished"] += len(batch)
+            progress["batches_done"] += 1
+            progress["elapsed"] = time.time() - start
+            if self.progress_callback:
+                self.progress_callback(dict(progress))
+
+        args = (field_list, period, start_time, end_time, dividend_type)
+        if self.workers == 1 or len(batches) <= 1:
+            for batch in batches:
+                if self.is_cancelled():
+                    break
+                collect(batch, *self._fetch_batch(batch, *args))
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as executor:
+                futures = {}
+                for batch in batches:
+                    if self.is_cancelled():
+                        break
+                    futures[executor.submit(self._fetch_batch, batch, *args)] = batch
+                for future in as_completed(futures):
+                    collect(futures[future], *future.result())
+                    if self.is_cancelled():
+                        for pending in futures:
+                            pending.cancel()
+                        break
+
+        # 按股票池顺序返回，保证面板的股票顺序稳定
+        return {code: results[code] for code in codes if code in results}
+
+
+def benchmark(stock_count: int = 1000, latency: float = 0.02, per_stock_latency: float = 0.0005,
+              batch_sizes: Sequence[int] = (1, 50, 200), workers: Sequence[int] = (1, 4, 8),
+              period: str = "1d", start_time: str = "20240101", end_time: str = "20241231") -> pd.DataFrame:
+    """使用 khProvider.SyntheticProvider 离线测试不同批次大小和线程数下的加载吞吐量
+
+    Args:
+        stock_count: 股票数量
+        latency: 每次调用的模拟延迟（秒）
+        per_stock_latency: 每只股票的模拟延迟（秒）
+        batch_sizes: 参与测试的批次大小
+        workers: 参与测试的线程数
+        period: 数据周期
+        start_time: 开始日期
+        end_time: 结束日期
+
+    Returns:
+        pd.DataFrame: 每种组合的耗时、调用次数和每秒加载股票数
+    """
+    from khProvider import SyntheticProvider
+
+    codes = [f"{600000 + i:06d}.SH" for i in range(stock_count)]
+    fields = ["time", "open", "high", "low", "close", "volume"]
+    rows = []
+    for batch_size in batch_sizes:
+        for worker_count in workers:
+            provider = SyntheticProvider(universe_size=stock_count, latency=latency,
+                                         per_stock_latency=per_stock_latency)
+            loader = HistoryLoader(XtDataSource(provider=provider), batch_size=batch_size, workers=worker_count)
+            start = time.time()
+            frames = loader.load(codes, fields, period, start_time, end_time)
+            elapsed = time.time() - start
+            rows.append({
+                "batch_size": batch_size,
+                "workers": worker_count,
+                "calls": provider.calls,
+                "stocks": len(frames),
+                "seconds": round(elapsed, 3),
+                "stocks_per_second": round(len(frames) / elapsed, 1) if elapsed > 0 else float("inf"),
+            })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    print(benchmark().to_string(index=False))
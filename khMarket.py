@@ -0,0 +1,737 @@
+# coding: utf-8
+"""
+回测行情数据模块
+
+提供回测引擎使用的行情数据结构：
+- MarketPanel: 加载阶段一次性构建的 时间×股票×字段 对齐行情面板
+- MarketSnapshot: 单时间点行情缓冲区，在回测过程中原地切换到当前K线
+- StockBar: 单只股票当前K线的只读视图，兼容 pandas.Series 的常用访问方式
+- PanelHistory: 回测内的历史窗口访问器，按回测游标截取面板的尾部窗口，不会读到未来数据
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from khClock import beijing_day_start_ms, beijing_epoch_ms
+from khProvider import BEIJING_OFFSET_MS
+
+
+class StockBar:
+    """单只股票当前K线的只读视图
+
+    视图本身不保存数据，而是直接读取 MarketSnapshot 的缓冲区。
+    回测引擎每根K线原地切换缓冲区，因此同一个 StockBar 对象在整个回测
+    期间保持有效；如需保留某一时刻的数据，请调用 copy()/to_dict()/to_series()。
+
+    支持与 pandas.Series 一致的常用访问方式：
+    bar['close'], bar.close, bar.get('close'), 'close' in bar,
+    bar.empty, bar.keys(), bar.items(), bar.index, bar.values
+    """
+
+    __slots__ = ("_snapshot", "_pos", "name")
+
+    def __init__(self, snapshot: "MarketSnapshot", pos: int, name: str):
+        """初始化视图
+
+        Args:
+            snapshot: 所属的行情快照
+            pos: 股票在快照中的行号
+            name: 股票代码
+        """
+        object.__setattr__(self, "_snapshot", snapshot)
+        object.__setattr__(self, "_pos", pos)
+        object.__setattr__(self, "name", name)
+
+    # ------------------------------------------------------------------
+    # Series 兼容属性
+    # ------------------------------------------------------------------
+    @property
+    def empty(self) -> bool:
+        """当前时间点是否没有该股票的数据"""
+        return not self._snapshot._valid[self._pos]
+
+    @property
+    def index(self) -> pd.Index:
+        """字段名索引（无数据时为空索引）"""
+        if self.empty:
+            return pd.Index([])
+        return pd.Index(self._snapshot.fields)
+
+    @property
+    def values(self) -> np.ndarray:
+        """字段值数组（与 pandas.Series.values 一致）"""
+        return self.to_numpy()
+
+    @property
+    def size(self) -> int:
+        return len(self)
+
+    def keys(self) -> List[str]:
+        """返回字段名列表"""
+        if self.empty:
+            return []
+        return list(self._snapshot.fields)
+
+    def items(self):
+        """按 (字段名, 值) 迭代"""
+        if self.empty:
+            return iter(())
+        return ((field, self._read(field)) for field in self._snapshot.fields)
+
+    def get(self, key, default=None):
+        """获取字段值，字段不存在或当前无数据时返回default"""
+        if self.empty:
+            return default
+        snapshot = self._snapshot
+        idx = snapshot._num_index.get(key)
+        if idx is not None:
+            return snapshot._values[self._pos, idx]
+        idx = snapshot._obj_index.get(key)
+        if idx is not None:
+            return snapshot._objects[self._pos, idx]
+        return default
+
+    def to_numpy(self) -> np.ndarray:
+        """返回当前字段值的数组副本"""
+        if self.empty:
+            return np.array([], dtype=np.float64)
+        snapshot = self._snapshot
+        if not snapshot.object_fields:
+            return snapshot._values[self._pos].copy()
+        return np.array([self._read(field) for field in snapshot.fields], dtype=object)
+
+    def to_dict(self) -> Dict:
+        """返回当前字段值的字典副本"""
+        return dict(self.items())
+
+    def to_series(self) -> pd.Series:
+        """返回当前字段值的 pandas.Series 副本"""
+        if self.empty:
+            return pd.Series({}, name=self.name, dtype=np.float64)
+        return pd.Series(self.to_numpy(), index=self._snapshot.fields, name=self.name)
+
+    copy = to_series
+
+    def __copy__(self) -> pd.Series:
+        return self.to_series()
+
+    def __deepcopy__(self, memo) -> pd.Series:
+        return self.to_series()
+
+    def __reduce__(self):
+        # 序列化时保存当前值，而不是整个快照缓冲区
+        return self.to_series().__reduce__()
+
+    # ------------------------------------------------------------------
+    # 容器协议
+    # ------------------------------------------------------------------
+    def _read(self, key):
+        snapshot = self._snapshot
+        idx = snapshot._num_index.get(key)
+        if idx is not None:
+            return snapshot._values[self._pos, idx]
+        return snapshot._objects[self._pos, snapshot._obj_index[key]]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if self.empty or not self._snapshot.has_field(key):
+                raise KeyError(key)
+            return self._read(key)
+        # 列表、切片等复杂索引交给 pandas 处理
+        return self.to_series()[key]
+
+    def __contains__(self, key) -> bool:
+        return not self.empty and self._snapshot.has_field(key)
+
+    def __len__(self) -> int:
+        return 0 if self.empty else len(self._snapshot.fields)
+
+    def __iter__(self):
+        # 与 pandas.Series 一致，迭代的是字段值
+        if self.empty:
+            return iter(())
+        return (self._read(field) for field in self._snapshot.fields)
+
+    def __bool__(self) -> bool:
+        return not self.empty
+
+    def __getattr__(self, name):
+        # 仅在常规属性查找失败时调用：先按字段名取值，再回退到 Series 的其他方法
+        if name.startswith("__"):
+            raise AttributeError(name)
+        snapshot = object.__getattribute__(self, "_snapshot")
+        if snapshot.has_field(name):
+            if self.empty:
+                raise AttributeError(name)
+            return self._read(name)
+        return getattr(self.to_series(), name)
+
+    def __setattr__(self, name, value):
+        raise TypeError("行情快照为只读视图，如需修改请先调用 copy()")
+
+    def __setitem__(self, key, value):
+        raise TypeError("行情快照为只读视图，如需修改请先调用 copy()")
+
+    def __repr__(self) -> str:
+        return f"StockBar({self.name}, {self.to_dict()})"
+
+
+class MarketSnapshot:
+    """单时间点行情缓冲区
+
+    数值字段保存在 float64 的 (股票数, 字段数) 数组中，非数值字段（如tick
+    的五档报价列表）保存在 object 数组中。回测引擎每根K线只把缓冲区切换为
+    面板中对应时间点的视图，策略拿到的 StockBar 视图在整个回测期间保持不变。
+    """
+
+    def __init__(self, codes: Sequence[str], numeric_fields: Sequence[str], object_fields: Sequence[str] = ()):
+        """初始化快照缓冲区
+
+        Args:
+            codes: 股票代码列表
+            numeric_fields: 数值字段列表
+            object_fields: 非数值字段列表
+        """
+        self.codes = list(codes)
+        self.numeric_fields = list(numeric_fields)
+        self.object_fields = list(object_fields)
+        self.fields = self.numeric_fields + self.object_fields
+        self._num_index = {field: i for i, field in enumerate(self.numeric_fields)}
+        self._obj_index = {field: i for i, field in enumerate(self.object_fields)}
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+
+        n = len(self.codes)
+        self._values = np.full((n, len(self.numeric_fields)), np.nan, dtype=np.float64)
+        self._objects = np.empty((n, len(self.object_fields)), dtype=object)
+        self._valid = np.zeros(n, dtype=bool)
+
+        # 视图对象只创建一次，整个回测期间复用
+        self.bars: Dict[str, StockBar] = {
+            code: StockBar(self, i, code) for i, code in enumerate(self.codes)
+        }
+
+    def has_field(self, field) -> bool:
+        """字段是否存在"""
+        return field in self._num_index or field in self._obj_index
+
+    def load(self, panel: "MarketPanel", t: int):
+        """切换到面板中第t个时间点（只替换数组视图，不拷贝数据）
+
+        Args:
+            panel: 行情面板，字段顺序需与快照一致
+            t: 时间轴下标
+        """
+        self._values = panel.values[t]
+        self._valid = panel.valid[t]
+        if panel.objects is not None:
+            self._objects = panel.objects[t]
+
+    def valid_count(self) -> int:
+        """当前时间点有数据的股票数量"""
+        return int(np.count_nonzero(self._valid))
+
+    def empty_codes(self) -> List[str]:
+        """当前时间点没有数据的股票代码列表"""
+        return [self.codes[i] for i in np.flatnonzero(~self._valid)]
+
+    @staticmethod
+    def split_fields(frames: Dict[str, pd.DataFrame]):
+        """根据列类型把字段划分为数值字段和非数值字段
+
+        Args:
+            frames: {股票代码: DataFrame}
+
+        Returns:
+            tuple: (数值字段列表, 非数值字段列表)，保持列的出现顺序
+        """
+        ordered = []
+        non_numeric = set()
+        for df in frames.values():
+            for column in df.columns:
+                if column not in ordered:
+                    ordered.append(column)
+                if not pd.api.types.is_numeric_dtype(df[column].dtype):
+                    non_numeric.add(column)
+        numeric_fields = [c for c in ordered if c not in non_numeric]
+        object_fields = [c for c in ordered if c in non_numeric]
+        return numeric_fields, object_fields
+
+
+# 可作为时间轴的字段，按优先级排列
+TIME_FIELDS = ("time", "timestamp", "date", "datetime")
+
+
+def to_milliseconds(times: np.ndarray) -> np.ndarray:
+    """把秒级/毫秒级混合的时间戳统一为毫秒级，用于对齐比较
+
+    Args:
+        times: int64 时间戳数组
+
+    Returns:
+        np.ndarray: 毫秒级 int64 时间戳数组
+    """
+    times = np.asarray(times, dtype=np.int64)
+    return np.where(times < 10_000_000_000, times * 1000, times)
+
+
+def frame_times(df: pd.DataFrame) -> Optional[np.ndarray]:
+    """提取 DataFrame 的时间列并转换为 int64
+
+    数值型时间列保持原始精度（xtdata 为毫秒级），日期时间类型转换为毫秒级时间戳。
+
+    Args:
+        df: 单只股票的历史数据
+
+    Returns:
+        np.ndarray 或 None: int64 时间数组，找不到时间字段时返回 None
+    """
+    for field in TIME_FIELDS:
+        if field in df.columns:
+            column = df[field]
+            break
+    else:
+        if isinstance(df.index, pd.DatetimeIndex):
+            column = pd.Series(df.index)
+        else:
+            return None
+
+    if pd.api.types.is_numeric_dtype(column.dtype):
+        return column.to_numpy(dtype=np.int64)
+    if not pd.api.types.is_datetime64_any_dtype(column.dtype):
+        column = pd.to_datetime(column)
+    return column.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+
+
+class MarketPanel:
+    """时间×股票×字段 对齐的稠密行情面板
+
+    在数据加载阶段一次性构建：时间轴是所有股票时间戳的并集（或由调用方
+    指定，如自定义定时触发生成的时间点），每只股票的数据通过
+    np.searchsorted 写入对应位置，valid 标记该时间点是否有数据。
+    回测循环只需整数下标访问，内存占用为 时间数×股票数×字段数×8 字节。
+    """
+
+    def __init__(self, times: np.ndarray, codes: Sequence[str], numeric_fields: Sequence[str],
+                 object_fields: Sequence[str], values: np.ndarray, valid: np.ndarray,
+                 objects: Optional[np.ndarray] = None, skipped: Sequence[str] = ()):
+        """初始化面板（通常通过 from_frames 构建）
+
+        Args:
+            times: int64 时间轴，长度 T
+            codes: 股票代码列表，长度 N
+            numeric_fields: 数值字段列表，长度 F
+            object_fields: 非数值字段列表
+            values: float64 数组 (T, N, F)
+            valid: bool 数组 (T, N)
+            objects: object 数组 (T, N, 非数值字段数)，无非数值字段时为 None
+            skipped: 因缺少时间字段而未纳入面板的股票代码
+        """
+        self.times = times
+        self.codes = list(codes)
+        self.numeric_fields = list(numeric_fields)
+        self.object_fields = list(object_fields)
+        self.values = values
+        self.valid = valid
+        self.objects = objects
+        self.skipped = list(skipped)
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+        self.field_index = {field: i for i, field in enumerate(self.numeric_fields)}
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], time_axis: Optional[np.ndarray] = None) -> "MarketPanel":
+        """由 {股票代码: DataFrame} 构建对齐面板
+
+        Args:
+            frames: 每只股票的历史数据
+            time_axis: 指定的时间轴；为 None 时使用所有股票时间戳的并集
+
+        Returns:
+            MarketPanel: 对齐后的行情面板
+        """
+        codes = []
+        code_times = []
+        skipped = []
+        for code, df in frames.items():
+            times = frame_times(df) if isinstance(df, pd.DataFrame) else None
+            if times is None:
+                skipped.append(code)
+                continue
+            codes.append(code)
+            code_times.append(times)
+
+        numeric_fields, object_fields = MarketSnapshot.split_fields({code: frames[code] for code in codes})
+
+        if time_axis is None:
+            if code_times:
+                axis = np.unique(np.concatenate(code_times))
+            else:
+                axis = np.empty(0, dtype=np.int64)
+        else:
+            axis = np.asarray(time_axis, dtype=np.int64)
+        axis_key = to_milliseconds(axis)
+        order = np.argsort(axis_key, kind="stable")
+        sorted_key = axis_key[order]
+
+        T, N, F = len(axis), len(codes), len(numeric_fields)
+        values = np.full((T, N, F), np.nan, dtype=np.float64)
+        valid = np.zeros((T, N), dtype=bool)
+        objects = np.empty((T, N, len(object_fields)), dtype=object) if object_fields else None
+
+        for n, (code, times) in enumerate(zip(codes, code_times)):
+            if T == 0 or len(times) == 0:
+                continue
+            df = frames[code]
+            # 向量化定位每行数据在时间轴上的位置，只保留精确匹配的行
+            key = to_milliseconds(times)
+            pos = np.minimum(np.searchsorted(sorted_key, key), T - 1)
+            hit = sorted_key[pos] == key
+            rows = np.flatnonzero(hit)
+            target = order[pos[hit]]
+
+            for f, field in enumerate(numeric_fields):
+                if field in df.columns:
+                    column = df[field].to_numpy(dtype=np.float64, na_value=np.nan)
+                    values[target, n, f] = column[rows]
+            if objects is not None:
+                for f, field in enumerate(object_fields):
+                    if field in df.columns:
+                        objects[target, n, f] = df[field].to_numpy(dtype=object)[rows]
+            valid[target, n] = True
+
+        return cls(axis, codes, numeric_fields, object_fields, values, valid, objects, skipped)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        """面板数组占用的内存字节数"""
+        return int(self.values.nbytes + self.valid.nbytes + self.times.nbytes +
+                   (self.objects.nbytes if self.objects is not None else 0))
+
+    def row_counts(self) -> Dict[str, int]:
+        """每只股票在时间轴上的有效数据条数"""
+        counts = self.valid.sum(axis=0)
+        return {code: int(counts[i]) for i, code in enumerate(self.codes)}
+
+    def column(self, field: str) -> np.ndarray:
+        """返回某个数值字段的 (时间, 股票) 视图
+
+        Args:
+            field: 数值字段名
+
+        Returns:
+            np.ndarray: 形状为 (T, N) 的只读视图
+        """
+        view = self.values[:, :, self.field_index[field]]
+        view.flags.writeable = False
+        return view
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "MarketPanel":
+        """截取时间轴上 [start, stop) 区间的子面板（共享底层数组，不拷贝数据）
+
+        Args:
+            start: 起始下标
+            stop: 结束下标，默认为时间轴末尾
+
+        Returns:
+            MarketPanel: 子面板
+        """
+        window = slice(start, stop)
+        objects = self.objects[window] if self.objects is not None else None
+        return MarketPanel(self.times[window], self.codes, self.numeric_fields, self.object_fields,
+                           self.values[window], self.valid[window], objects, self.skipped)
+
+    def reindex(self, codes: Sequence[str], numeric_fields: Optional[Sequence[str]] = None,
+                object_fields: Optional[Sequence[str]] = None) -> "MarketPanel":
+        """按指定的股票和字段顺序重排面板，面板中没有的股票或字段视为无数据
+
+        Args:
+            codes: 股票代码列表
+            numeric_fields: 数值字段列表，None 为保持不变
+            object_fields: 非数值字段列表，None 为保持不变
+
+        Returns:
+            MarketPanel: 重排后的面板；股票和字段都与原面板相同时返回自身
+        """
+        codes = list(codes)
+        numeric_fields = list(self.numeric_fields if numeric_fields is None else numeric_fields)
+        object_fields = list(self.object_fields if object_fields is None else object_fields)
+        if codes == self.codes and numeric_fields == self.numeric_fields and object_fields == self.object_fields:
+            return self
+
+        T = len(self.times)
+        values = np.full((T, len(codes), len(numeric_fields)), np.nan, dtype=np.float64)
+        valid = np.zeros((T, len(codes)), dtype=bool)
+        objects = np.empty((T, len(codes), len(object_fields)), dtype=object) if object_fields else None
+        dst = [i for i, code in enumerate(codes) if code in self.code_index]
+        src = [self.code_index[codes[i]] for i in dst]
+        for f, field in enumerate(numeric_fields):
+            if field in self.field_index:
+                values[:, dst, f] = self.values[:, src, self.field_index[field]]
+        if objects is not None and self.objects is not None:
+            for f, field in enumerate(object_fields):
+                if field in self.object_fields:
+                    objects[:, dst, f] = self.objects[:, src, self.object_fields.index(field)]
+        valid[:, dst] = self.valid[:, src]
+        return MarketPanel(self.times, codes, numeric_fields, object_fields, values, valid, objects, self.skipped)
+
+    @classmethod
+    def concat(cls, panels: Sequence["MarketPanel"]) -> "MarketPanel":
+        """沿时间轴拼接股票和字段都相同的面板（时间需已按先后排列且互不重叠）
+
+        Args:
+            panels: 面板列表
+
+        Returns:
+            MarketPanel: 拼接后的面板
+        """
+        panels = [panel for panel in panels if len(panel) > 0] or list(panels[:1])
+        first = panels[0]
+        for panel in panels[1:]:
+            if panel.codes != first.codes or panel.numeric_fields != first.numeric_fields or \
+                    panel.object_fields != first.object_fields:
+                raise ValueError("拼接的面板股票或字段不一致，请先用 reindex 对齐")
+        if len(panels) == 1:
+            return first
+        objects = np.concatenate([panel.objects for panel in panels]) if first.objects is not None else None
+        return cls(np.concatenate([panel.times for panel in panels]), first.codes, first.numeric_fields,
+                   first.object_fields, np.concatenate([panel.values for panel in panels]),
+                   np.concatenate([panel.valid for panel in panels]), objects, first.skipped)
+
+    def snapshot(self) -> MarketSnapshot:
+        """创建与面板字段一致的行情快照"""
+        return MarketSnapshot(self.codes, self.numeric_fields, self.object_fields)
+
+
+# khHistory 的复权参数与数据接口 dividend_type 的对应关系
+FQ_DIVIDEND_TYPES = {"pre": "front", "post": "back", "none": "none"}
+
+
+class PanelHistory:
+    """回测内的历史窗口访问器
+
+    持有包含预热区间的完整行情面板和回测游标（当前K线在面板中的下标），
+    所有窗口都以游标为上界截取，策略读不到当前K线之后的数据。
+    数值窗口直接返回面板数组的只读切片视图，不拷贝数据，也不再逐K线调用数据接口。
+    """
+
+    def __init__(self, panel: MarketPanel, start_bar: int = 0, period: Optional[str] = None,
+                 dividend_type: str = "none",
+                 panel_loader: Optional[Callable[[str], MarketPanel]] = None):
+        """初始化
+
+        Args:
+            panel: 包含预热区间的完整行情面板
+            start_bar: 回测第一根K线在面板中的下标，之前的K线为预热数据
+            period: 面板的K线周期（1d/1m/5m/tick）；面板不是完整K线序列时（如自定义定时触发）为None
+            dividend_type: 面板的复权方式
+            panel_loader: 按复权方式加载同一时间轴面板的函数，请求其他复权方式时调用
+        """
+        self.panel = panel
+        self.start_bar = int(start_bar)
+        self.period = period
+        self.dividend_type = dividend_type
+        self.panel_loader = panel_loader
+        self.cursor = self.start_bar - 1  # 回测开始前游标停在最后一根预热K线
+        self.times_ms = to_milliseconds(panel.times)
+        self._panels = {dividend_type: panel}
+        self._row_counts: Dict[tuple, np.ndarray] = {}
+        # 当前面板第一根K线在整个回测历史中的序号，流式回测切换分段时增加（见 rebase）
+        self.base = 0
+
+    def rebase(self, panel: MarketPanel, start_bar: int):
+        """流式回测切换到下一段面板
+
+        新面板由上一段面板末尾保留的若干K线和新加载的分段拼接而成，
+        base 增加上一段面板中被丢弃的K线数，使 base + 下标 在整个回测中保持连续。
+
+        Args:
+            panel: 新面板
+            start_bar: 新分段第一根K线在新面板中的下标
+        """
+        times_ms = to_milliseconds(panel.times)
+        dropped = int(np.searchsorted(self.times_ms, times_ms[0], side="left")) if len(times_ms) else len(self.times_ms)
+        self.base += dropped
+        self.panel = panel
+        self.times_ms = times_ms
+        self.start_bar = int(start_bar)
+        self.cursor = self.start_bar - 1
+        self._panels = {self.dividend_type: panel}
+        self._row_counts = {}
+
+    def advance(self, bar_index: int):
+        """把游标移动到回测时间轴上的第 bar_index 根K线"""
+        self.cursor = self.start_bar + bar_index
+
+    def panel_for(self, fq: Optional[str] = None) -> MarketPanel:
+        """获取指定复权方式的面板，首次请求其他复权方式时按同一时间轴加载并缓存
+
+        Args:
+            fq: 复权方式，支持 khHistory 的 pre/post/none 或数据接口的 dividend_type，None 为回测配置的复权方式
+
+        Returns:
+            MarketPanel: 行情面板
+        """
+        dividend_type = FQ_DIVIDEND_TYPES.get(fq, fq) if fq else self.dividend_type
+        panel = self._panels.get(dividend_type)
+        if panel is None:
+            if self.panel_loader is None:
+                raise ValueError(f"历史窗口没有预加载复权方式为 {dividend_type} 的数据")
+            panel = self.panel_loader(dividend_type)
+            self._panels[dividend_type] = panel
+        return panel
+
+    def end_index(self, include_current: bool = False) -> int:
+        """窗口的结束下标（不含），不超过当前游标"""
+        return max(0, self.cursor + 1 if include_current else self.cursor)
+
+    def window(self, field: str, count: int, codes: Union[str, Sequence[str], None] = None,
+               include_current: bool = False, fq: Optional[str] = None) -> np.ndarray:
+        """获取截至当前K线的尾部窗口
+
+        窗口按面板时间轴取最近 count 个时间点，某只股票在某个时间点没有数据时为NaN。
+
+        Args:
+            field: 数值字段名
+            count: 窗口长度
+            codes: None 返回全部股票；单个代码返回一维窗口；代码列表按顺序返回对应的列
+            include_current: 是否包含当前K线，默认不包含（与 khHistory 一致）
+            fq: 复权方式，None 为回测配置的复权方式
+
+        Returns:
+            np.ndarray: 只读数组，形状为 (窗口长度, 股票数) 或 (窗口长度,)；
+            codes 为列表时需要按列重排，返回的是副本，其余情况为面板视图
+        """
+        panel = self.panel_for(fq)
+        end = self.end_index(include_current)
+        start = max(0, end - int(count))
+        view = panel.values[start:end, :, panel.field_index[field]]
+        if isinstance(codes, str):
+            view = view[:, panel.code_index[codes]]
+        elif codes is not None:
+            view = view[:, [panel.code_index[code] for code in codes]]
+        view.flags.writeable = False
+        return view
+
+    def _rows_before(self, panel: MarketPanel, dividend_type: str, code: str, skip_paused: bool) -> np.ndarray:
+        """某只股票有效行数的前缀和，rows[i] 为时间轴前 i 个时间点中的有效行数"""
+        key = (dividend_type, code, skip_paused)
+        rows = self._row_counts.get(key)
+        if rows is None:
+            n = panel.code_index[code]
+            mask = panel.valid[:, n]
+            if skip_paused and "volume" in panel.field_index:
+                mask = mask & (panel.values[:, n, panel.field_index["volume"]] > 0)
+            rows = np.zeros(len(mask) + 1, dtype=np.int64)
+            np.cumsum(mask, out=rows[1:])
+            self._row_counts[key] = rows
+        return rows
+
+    def cutoff_index(self, current_time=None) -> int:
+        """计算截止时间（不含）对应的窗口结束下标，不超过当前游标
+
+        Args:
+            current_time: 截止时间，毫秒时间戳或北京时间的 datetime/字符串（与 BarClock 使用同一换算），
+                日线只比较日期；None 时截止到当前K线之前
+
+        Returns:
+            int: 结束下标（不含）
+        """
+        end = self.end_index()
+        if current_time is not None:
+            cutoff_ms = beijing_epoch_ms(current_time)
+            if self.period == "1d":
+                # 日线只比较日期，不包含当天
+                cutoff_ms = beijing_day_start_ms(cutoff_ms)
+            end = min(end, int(np.searchsorted(self.times_ms, cutoff_ms, side="left")))
+        return end
+
+    def row_index(self, code: str, start: int, end: int, fq: Optional[str] = None,
+                  skip_paused: bool = False) -> np.ndarray:
+        """某只股票在时间轴 [start, end) 区间内有数据的行下标
+
+        Args:
+            code: 股票代码
+            start: 起始下标
+            end: 结束下标（不含）
+            fq: 复权方式
+            skip_paused: 是否跳过成交量为0的停牌K线
+
+        Returns:
+            np.ndarray: 行下标数组
+        """
+        panel = self.panel_for(fq)
+        n = panel.code_index[code]
+        mask = panel.valid[start:end, n]
+        if skip_paused and "volume" in panel.field_index:
+            mask = mask & (panel.values[start:end, n, panel.field_index["volume"]] > 0)
+        return start + np.flatnonzero(mask)
+
+    def tail_index(self, code: str, count: int, end: int, fq: Optional[str] = None,
+                   skip_paused: bool = False) -> Optional[np.ndarray]:
+        """某只股票在 end 之前最近 count 条有数据的行下标
+
+        Args:
+            code: 股票代码
+            count: 行数
+            end: 结束下标（不含）
+            fq: 复权方式
+            skip_paused: 是否跳过成交量为0的停牌K线
+
+        Returns:
+            Optional[np.ndarray]: 行下标数组，有效行不足 count 条时返回None
+        """
+        dividend_type = FQ_DIVIDEND_TYPES.get(fq, fq) if fq else self.dividend_type
+        rows = self._rows_before(self.panel_for(dividend_type), dividend_type, code, skip_paused)
+        available = int(rows[end])
+        if available < count:
+            return None
+        # 第 available-count+1 个有效行所在位置即窗口起点
+        start = int(np.searchsorted(rows[1:], available - count + 1, side="left"))
+        return self.row_index(code, start, end, dividend_type, skip_paused)
+
+    def frames(self, codes: Sequence[str], fields: Sequence[str], count: int, period: Optional[str] = None,
+               current_time=None, skip_paused: bool = False,
+               fq: Optional[str] = None) -> Optional[Dict[str, pd.DataFrame]]:
+        """按 khHistory 的格式返回历史数据（不包含当前时间点）
+
+        Args:
+            codes: 股票代码列表
+            fields: 数值字段列表
+            count: 每只股票返回的K线数量
+            period: 请求的K线周期，与面板周期不一致时无法提供
+            current_time: 截止时间（毫秒时间戳或北京时间的 datetime，不含），None 时截止到当前K线之前；
+                实际截止位置不会超过回测游标
+            skip_paused: 是否跳过成交量为0的停牌K线
+            fq: 复权方式
+
+        Returns:
+            Optional[Dict[str, pd.DataFrame]]: {股票代码: DataFrame(time + fields)}；
+            周期、股票、字段不匹配或预加载的数据不足 count 条时返回None，由调用方回退到数据接口
+        """
+        if self.period is None or (period is not None and period != self.period):
+            return None
+        fields = [field for field in fields if field != "time"]
+        dividend_type = FQ_DIVIDEND_TYPES.get(fq, fq) if fq else self.dividend_type
+        try:
+            panel = self.panel_for(dividend_type)
+        except Exception:
+            return None
+        if any(code not in panel.code_index for code in codes) or \
+                any(field not in panel.field_index for field in fields):
+            return None
+
+        end = self.cutoff_index(current_time)
+        result = {}
+        for code in codes:
+            index = self.tail_index(code, count, end, dividend_type, skip_paused)
+            if index is None:
+                return None
+            n = panel.code_index[code]
+            data = {"time": pd.to_datetime(self.times_ms[index] + BEIJING_OFFSET_MS, unit="ms")}
+            for field in fields:
+                data[field] = panel.values[index, n, panel.field_index[field]]
+            result[code] = pd.DataFrame(data)
+        return result
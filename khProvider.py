@@ -0,0 +1,679 @@
+# coding: utf-8
+"""
+行情数据源接口
+
+回测引擎、khQTTools 的数据下载/补充/股票列表函数和 miniQMT 数据解析器原本直接调用 xtquant.xtdata，
+离开 MiniQMT 就无法运行或做性能分析。这里把它们用到的数据接口抽象为 MarketDataProvider，
+方法名和参数与 xtdata 的同名函数一致，覆盖：
+- 行情数据：get_market_data_ex / get_market_data / get_local_data
+- 下载与补充：download_history_data / download_history_data2 / download_sector_data
+- 板块与合约：get_sector_list / get_stock_list_in_sector / get_instrument_detail
+- 交易日：get_trading_dates
+
+内置三种实现：
+- XtDataProvider：转发到 xtquant.xtdata（默认）
+- LocalFileProvider：读取本地文件（download_and_store_data 导出的 CSV、data 目录下的股票列表）
+- SyntheticProvider：确定性的合成行情和股票池，可注入延迟，用于离线测试和基准测试
+
+调用方通过 `from khProvider import xtdata` 取得一个转发到当前数据源的对象，调用方式与 xtdata 模块相同。
+当前数据源用 set_provider() 切换，或在启动前设置环境变量 KHQUANT_DATA_PROVIDER：
+    xtdata                 默认，使用 MiniQMT
+    synthetic              合成数据
+    local:<目录>            本地文件
+"""
+import glob
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from khCalendar import get_trade_calendar
+
+BEIJING_OFFSET_MS = 8 * 3600 * 1000
+DAY_MS = 86400 * 1000
+PROVIDER_ENV = "KHQUANT_DATA_PROVIDER"
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def parse_time_bound(text, end: bool = False) -> Optional[int]:
+    """把 xtdata 风格的时间参数转换为毫秒时间戳（北京时间）
+
+    Args:
+        text: "YYYYMMDD" 或 "YYYYMMDDHHMMSS"，空字符串表示不限
+        end: 是否为结束时间；只有日期时结束时间取当天最后一毫秒
+
+    Returns:
+        Optional[int]: 毫秒时间戳，不限时为None
+    """
+    text = str(text or "").strip()
+    if not text:
+        return None
+    day = np.datetime64(f"{text[:4]}-{text[4:6]}-{text[6:8]}", "D").astype("datetime64[ms]").astype(np.int64)
+    if len(text) >= 14:
+        seconds = int(text[8:10]) * 3600 + int(text[10:12]) * 60 + int(text[12:14])
+        return int(day + seconds * 1000 - BEIJING_OFFSET_MS)
+    return int(day - BEIJING_OFFSET_MS + (DAY_MS - 1 if end else 0))
+
+
+def time_labels(times_ms: np.ndarray, period: str) -> List[str]:
+    """生成与 xtdata 一致的行索引：日线为 "YYYYMMDD"，其余为 "YYYYMMDDHHMMSS"（北京时间）"""
+    local = (np.asarray(times_ms, dtype=np.int64) + BEIJING_OFFSET_MS).astype("datetime64[ms]")
+    if period == "1d":
+        return [s.replace("-", "") for s in np.datetime_as_string(local, unit="D")]
+    return [s.replace("-", "").replace("T", "").replace(":", "") for s in np.datetime_as_string(local, unit="s")]
+
+
+def select_range(times_ms: np.ndarray, start_time="", end_time="", count: int = -1) -> slice:
+    """在已排序的时间戳上选取 [start_time, end_time] 区间，count > 0 时只保留最后 count 根"""
+    lo, hi = parse_time_bound(start_time), parse_time_bound(end_time, end=True)
+    left = 0 if lo is None else int(np.searchsorted(times_ms, lo, side="left"))
+    right = len(times_ms) if hi is None else int(np.searchsorted(times_ms, hi, side="right"))
+    if count is not None and count > 0:
+        left = max(left, right - count)
+    return slice(left, max(left, right))
+
+
+class MarketDataProvider:
+    """行情数据源基类
+
+    子类至少实现 get_market_data_ex 和板块/合约相关方法；get_market_data、get_local_data、
+    download_history_data2、get_trading_dates 有基于其他方法的默认实现。
+    """
+
+    name = "base"
+
+    def available(self) -> bool:
+        """数据源当前是否可用（例如 xtquant 是否已安装）"""
+        return True
+
+    def spec(self) -> Optional[tuple]:
+        """在其他进程中重建同一数据源所需的 (名称, 构造参数)，见 create_provider；无法按名称重建时为 None"""
+        return (self.name, {}) if self.name in PROVIDERS else None
+
+    def get_market_data_ex(self, field_list: Optional[List[str]] = None, stock_list: Optional[List[str]] = None,
+                           period: str = "1d", start_time: str = "", end_time: str = "", count: int = -1,
+                           dividend_type: str = "none", fill_data: bool = True) -> Dict[str, pd.DataFrame]:
+        """获取行情数据
+
+        Returns:
+            Dict[str, pd.DataFrame]: {股票代码: DataFrame}，行索引为时间标签，time 列为毫秒时间戳
+        """
+        raise NotImplementedError
+
+    def get_local_data(self, field_list: Optional[List[str]] = None, stock_list: Optional[List[str]] = None,
+                       period: str = "1d", start_time: str = "", end_time: str = "", count: int = -1,
+                       dividend_type: str = "none", fill_data: bool = True,
+                       data_dir: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """读取本地已有的行情数据，格式与 get_market_data_ex 相同"""
+        return self.get_market_data_ex(field_list, stock_list, period, start_time, end_time, count,
+                                       dividend_type, fill_data)
+
+    def get_market_data(self, field_list: Optional[List[str]] = None, stock_list: Optional[List[str]] = None,
+                        period: str = "1d", start_time: str = "", end_time: str = "", count: int = -1,
+                        dividend_type: str = "none", fill_data: bool = True) -> Dict[str, pd.DataFrame]:
+        """按字段获取行情数据
+
+        Returns:
+            Dict[str, pd.DataFrame]: {字段: DataFrame}，行为股票代码，列为时间标签
+        """
+        fields = list(field_list or ["time", "open", "high", "low", "close", "volume"])
+        frames = self.get_market_data_ex(fields, stock_list, period, start_time, end_time, count,
+                                         dividend_type, fill_data)
+        codes = [code for code in (stock_list or []) if code in frames]
+        result = {}
+        for field in fields:
+            columns = {code: frames[code][field] for code in codes if field in frames[code].columns}
+            result[field] = pd.DataFrame(columns).T if columns else pd.DataFrame()
+        return result
+
+    def download_history_data(self, stock_code: str, period: str = "1d", start_time: str = "",
+                              end_time: str = "", incrementally: Optional[bool] = None):
+        """下载（补充）单只股票的历史数据到本地"""
+        return None
+
+    def download_history_data2(self, stock_list: Sequence[str], period: str = "1d", start_time: str = "",
+                               end_time: str = "", callback: Optional[Callable[[Dict], None]] = None,
+                               incrementally: Optional[bool] = None):
+        """批量下载历史数据，每完成一只股票调用一次 callback（进度字典与 xtdata 一致）"""
+        stock_list = list(stock_list)
+        for i, code in enumerate(stock_list, 1):
+            self.download_history_data(code, period, start_time, end_time, incrementally)
+            if callback:
+                callback({"finished": i, "total": len(stock_list), "stockcode": code, "message": ""})
+        if callback and not stock_list:
+            callback({"finished": 0, "total": 0, "stockcode": "", "message": ""})
+
+    def download_sector_data(self):
+        """下载板块分类数据"""
+        return None
+
+    def get_sector_list(self) -> List[str]:
+        """获取板块列表"""
+        raise NotImplementedError
+
+    def get_stock_list_in_sector(self, sector_name: str) -> List[str]:
+        """获取板块成分股"""
+        raise NotImplementedError
+
+    def get_instrument_detail(self, stock_code: str, iscomplete: bool = False) -> Optional[Dict]:
+        """获取合约基础信息，至少包含 InstrumentID/InstrumentName/ExchangeID"""
+        raise NotImplementedError
+
+    def get_trading_dates(self, market: str = "SH", start_time: str = "", end_time: str = "",
+                          count: int = -1) -> List[int]:
+        """获取交易日列表
+
+        Returns:
+            List[int]: 每个交易日北京时间零点的毫秒时间戳
+        """
+        end = parse_time_bound(end_time)
+        end_day = np.datetime64(int(end + BEIJING_OFFSET_MS), "ms").astype("datetime64[D]") if end is not None \
+            else np.datetime64("today", "D")
+        start = parse_time_bound(start_time)
+        start_day = np.datetime64(int(start + BEIJING_OFFSET_MS), "ms").astype("datetime64[D]") if start is not None \
+            else end_day - 3650
+        get_trade_calendar(start_day)
+        days = get_trade_calendar(end_day).trade_days_between(start_day, end_day)
+        if count is not None and count > 0:
+            days = days[-count:]
+        return (days.astype("datetime64[ms]").astype(np.int64) - BEIJING_OFFSET_MS).tolist()
+
+
+class XtDataProvider(MarketDataProvider):
+    """xtquant.xtdata 数据源（需要 MiniQMT）
+
+    协议方法原样转发到 xtdata；其他属性（如 subscribe_quote）也会转发，保持与直接使用 xtdata 相同。
+    """
+
+    name = "xtdata"
+
+    def __init__(self):
+        self._module = None
+
+    @property
+    def module(self):
+        """xtquant.xtdata 模块，首次使用时导入"""
+        if self._module is None:
+            from xtquant import xtdata as module
+            self._module = module
+        return self._module
+
+    def available(self) -> bool:
+        try:
+            self.module
+            return True
+        except ImportError:
+            return False
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.module, name)
+
+    def get_market_data_ex(self, *args, **kwargs):
+        return self.module.get_market_data_ex(*args, **kwargs)
+
+    def get_local_data(self, *args, **kwargs):
+        return self.module.get_local_data(*args, **kwargs)
+
+    def get_market_data(self, *args, **kwargs):
+        return self.module.get_market_data(*args, **kwargs)
+
+    def download_history_data(self, *args, **kwargs):
+        return self.module.download_history_data(*args, **kwargs)
+
+    def download_history_data2(self, *args, **kwargs):
+        return self.module.download_history_data2(*args, **kwargs)
+
+    def download_sector_data(self):
+        return self.module.download_sector_data()
+
+    def get_sector_list(self):
+        return self.module.get_sector_list()
+
+    def get_stock_list_in_sector(self, *args, **kwargs):
+        return self.module.get_stock_list_in_sector(*args, **kwargs)
+
+    def get_instrument_detail(self, *args, **kwargs):
+        return self.module.get_instrument_detail(*args, **kwargs)
+
+    def get_trading_dates(self, *args, **kwargs):
+        return self.module.get_trading_dates(*args, **kwargs)
+
+
+class _SectorFiles:
+    """data 目录下 "{板块}_股票列表.csv" 格式的股票列表（每行 代码,名称）"""
+
+    SUFFIX = "_股票列表.csv"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._sectors: Optional[Dict[str, List[str]]] = None
+        self._names: Dict[str, str] = {}
+
+    def _load(self):
+        if self._sectors is not None:
+            return
+        self._sectors = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, "*" + self.SUFFIX))):
+            sector = os.path.basename(path)[:-len(self.SUFFIX)]
+            codes = []
+            try:
+                df = pd.read_csv(path, header=None, names=["code", "name"], dtype=str, encoding="utf-8-sig")
+            except Exception as e:
+                logging.warning(f"读取股票列表文件失败 {path}: {str(e)}")
+                continue
+            for code, name in zip(df["code"], df["name"]):
+                if isinstance(code, str) and code.strip():
+                    code = code.strip()
+                    codes.append(code)
+                    self._names.setdefault(code, str(name).strip())
+            self._sectors[sector] = codes
+
+    def sectors(self) -> Dict[str, List[str]]:
+        self._load()
+        return self._sectors
+
+    def name_of(self, code: str) -> Optional[str]:
+        self._load()
+        return self._names.get(code)
+
+
+class LocalFileProvider(MarketDataProvider):
+    """本地文件数据源
+
+    K线优先从 data_dir 下的列式存储（khStore.ColumnStore）按区间读取；目录不是列式存储或其中没有
+    该股票时，读取 download_and_store_data 导出的 CSV 文件
+    （"{代码}_{周期}_{开始}_{结束}_{时间段}_{复权}.csv"，列为 date[,time] 与数据字段），
+    同一股票的多个文件按时间合并去重；板块与合约名称读取 "{板块}_股票列表.csv"。
+    本地数据源不能下载，下载类方法不做任何操作。
+    """
+
+    name = "local"
+
+    def __init__(self, data_dir: str, sector_dir: Optional[str] = None):
+        """初始化
+
+        Args:
+            data_dir: 列式存储目录或K线 CSV 文件所在目录
+            sector_dir: 股票列表文件所在目录，默认与 data_dir 相同，找不到时使用项目的 data 目录
+        """
+        self.data_dir = data_dir
+        self.sector_dir = sector_dir
+        if sector_dir is None:
+            sector_dir = data_dir if glob.glob(os.path.join(data_dir, "*" + _SectorFiles.SUFFIX)) else DEFAULT_DATA_DIR
+        self._sectors = _SectorFiles(sector_dir)
+        self._cache: Dict[tuple, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+        self.store = None
+        from khStore import ColumnStore
+        if ColumnStore.is_store(data_dir):
+            self.store = ColumnStore(data_dir)
+
+    def spec(self):
+        return f"{self.name}:{self.data_dir}", {"sector_dir": self.sector_dir}
+
+    def _files(self, code: str, period: str, dividend_type: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.data_dir, f"{code}_{period}_*_{dividend_type}.csv")))
+
+    @staticmethod
+    def read_csv(path: str) -> Optional[pd.DataFrame]:
+        """读取一个 download_and_store_data 格式的 CSV，date[,time] 转换为毫秒时间戳 time 列"""
+        df = pd.read_csv(path, dtype={"date": str, "time": str})
+        if "date" not in df.columns:
+            return None
+        text = df["date"].str.replace("-", "", regex=False)
+        if "time" in df.columns:
+            text = text + df["time"].str.replace(":", "", regex=False).str.zfill(6)
+            local = pd.to_datetime(text, format="%Y%m%d%H%M%S")
+        else:
+            local = pd.to_datetime(text, format="%Y%m%d")
+        df = df.drop(columns=[c for c in ("date", "time") if c in df.columns])
+        df.insert(0, "time", local.values.astype("datetime64[ms]").astype(np.int64) - BEIJING_OFFSET_MS)
+        return df
+
+    def _read(self, code: str, period: str, dividend_type: str) -> Optional[pd.DataFrame]:
+        """读取并合并一只股票的全部文件，time 列为毫秒时间戳；结果按文件修改时间缓存"""
+        files = self._files(code, period, dividend_type)
+        if not files:
+            return None
+        key = (code, period, dividend_type, tuple((f, os.path.getmtime(f)) for f in files))
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        parts = [df for df in map(self.read_csv, files) if df is not None]
+        if not parts:
+            return None
+        merged = pd.concat(parts, ignore_index=True).drop_duplicates("time", keep="last").sort_values("time")
+        merged = merged.reset_index(drop=True)
+        with self._lock:
+            self._cache = {k: v for k, v in self._cache.items() if k[:3] != key[:3]}
+            self._cache[key] = merged
+        return merged
+
+    def get_market_data_ex(self, field_list=None, stock_list=None, period="1d", start_time="", end_time="",
+                           count=-1, dividend_type="none", fill_data=True):
+        result = {}
+        for code in stock_list or []:
+            if self.store is not None and self.store.coverage(code, period, dividend_type):
+                fields = [f for f in (field_list or []) if f != "time"] or None
+                result[code] = self.store.read_frame(code, period, start_time, end_time, fields, count,
+                                                     dividend_type)
+                continue
+            df = self._read(code, period, dividend_type)
+            if df is None:
+                continue
+            times = df["time"].to_numpy()
+            part = df.iloc[select_range(times, start_time, end_time, count)]
+            fields = [f for f in (field_list or df.columns) if f in part.columns]
+            if "time" not in fields:
+                fields = ["time"] + fields
+            out = part[fields].copy()
+            out.index = time_labels(out["time"].to_numpy(), period)
+            result[code] = out
+        return result
+
+    def get_sector_list(self):
+        return list(self._sectors.sectors())
+
+    def get_stock_list_in_sector(self, sector_name):
+        return list(self._sectors.sectors().get(sector_name, []))
+
+    def get_instrument_detail(self, stock_code, iscomplete=False):
+        name = self._sectors.name_of(stock_code)
+        if name is None:
+            return None
+        code, _, exchange = stock_code.partition(".")
+        return {"InstrumentID": code, "InstrumentName": name, "ExchangeID": exchange}
+
+
+class SyntheticProvider(MarketDataProvider):
+    """确定性的合成数据源
+
+    价格是 (股票代码, K线时间) 的确定函数：日线为从 ORIGIN 开始的随机游走，
+    日内K线是前一日收盘到当日收盘之间的布朗桥，因此任意区间、任意批次请求到的同一根K线都相同，
+    日内最后一根K线的收盘价等于当日日线收盘价。
+    股票池按 universe_size 生成沪深主板/创业板/科创板/指数/转债，板块名称与 xtdata 一致。
+    每次取数固定延迟 latency 秒，每只股票再增加 per_stock_latency 秒；每次下载延迟 download_latency 秒。
+    """
+
+    name = "synthetic"
+    ORIGIN = "20100101"
+    PERIOD_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "tick": 3}
+    INDICES = {
+        "000001.SH": "上证指数", "000016.SH": "上证50", "000300.SH": "沪深300", "000905.SH": "中证500",
+        "000852.SH": "中证1000", "399001.SZ": "深证成指", "399006.SZ": "创业板指",
+    }
+
+    def __init__(self, seed: int = 0, universe_size: int = 400, latency: float = 0.0,
+                 per_stock_latency: float = 0.0, download_latency: float = 0.0):
+        """初始化
+
+        Args:
+            seed: 随机种子
+            universe_size: 沪深A股数量
+            latency: 每次取数的固定延迟（秒）
+            per_stock_latency: 取数时每只股票的额外延迟（秒）
+            download_latency: 每次下载调用的延迟（秒）
+        """
+        self.seed = seed
+        self.universe_size = universe_size
+        self.latency = latency
+        self.per_stock_latency = per_stock_latency
+        self.download_latency = download_latency
+        self.calls = 0
+        self.downloads = 0
+        self._lock = threading.Lock()
+        self._sectors: Optional[Dict[str, List[str]]] = None
+        self._daily: Dict[str, tuple] = {}
+
+    def spec(self):
+        return self.name, {"seed": self.seed, "universe_size": self.universe_size, "latency": self.latency,
+                           "per_stock_latency": self.per_stock_latency, "download_latency": self.download_latency}
+
+    # ---- 股票池 ----
+    def _build_sectors(self) -> Dict[str, List[str]]:
+        n = max(4, int(self.universe_size))
+        sh_main = [f"{600000 + i:06d}.SH" for i in range(n * 4 // 10)]
+        star = [f"{688001 + i:06d}.SH" for i in range(n // 10)]
+        sz_main = [f"{1 + i:06d}.SZ" for i in range(n * 3 // 10)]
+        gem = [f"{300001 + i:06d}.SZ" for i in range(n - len(sh_main) - len(star) - len(sz_main))]
+        all_a = sh_main + star + sz_main + gem
+        return {
+            "上证A股": sh_main + star,
+            "深证A股": sz_main + gem,
+            "创业板": gem,
+            "科创板": star,
+            "沪深A股": all_a,
+            "指数": list(self.INDICES),
+            "上证50": sh_main[:50],
+            "沪深300": all_a[:300],
+            "中证500": all_a[300:800],
+            "沪深转债": [f"{113001 + i:06d}.SH" for i in range(max(1, n // 20))],
+        }
+
+    def sectors(self) -> Dict[str, List[str]]:
+        with self._lock:
+            if self._sectors is None:
+                self._sectors = self._build_sectors()
+            return self._sectors
+
+    def get_sector_list(self):
+        return list(self.sectors())
+
+    def get_stock_list_in_sector(self, sector_name):
+        return list(self.sectors().get(sector_name, []))
+
+    def get_instrument_detail(self, stock_code, iscomplete=False):
+        code, _, exchange = stock_code.partition(".")
+        if stock_code in self.INDICES:
+            name = self.INDICES[stock_code]
+        elif stock_code in self.sectors()["沪深转债"]:
+            name = f"模拟{code[-3:]}转债"
+        else:
+            name = f"模拟{code}"
+        return {"InstrumentID": code, "InstrumentName": name, "ExchangeID": exchange,
+                "OpenDate": self.ORIGIN, "PriceTick": 0.01, "VolumeMultiple": 1}
+
+    # ---- 下载 ----
+    def download_history_data(self, stock_code, period="1d", start_time="", end_time="", incrementally=None):
+        with self._lock:
+            self.downloads += 1
+        if self.download_latency > 0:
+            time.sleep(self.download_latency)
+
+    # ---- 行情 ----
+    def _code_seed(self, code: str) -> int:
+        return zlib.crc32(code.encode("utf-8"))
+
+    def _trade_days(self, start_time, end_time) -> np.ndarray:
+        """请求区间覆盖的交易日（不早于 ORIGIN）"""
+        lo, hi = parse_time_bound(start_time), parse_time_bound(end_time, end=True)
+        origin = np.datetime64(f"{self.ORIGIN[:4]}-{self.ORIGIN[4:6]}-{self.ORIGIN[6:]}", "D")
+        start = origin if lo is None else max(origin, np.datetime64(lo + BEIJING_OFFSET_MS, "ms").astype("datetime64[D]"))
+        end = np.datetime64("today", "D") if hi is None else np.datetime64(hi + BEIJING_OFFSET_MS, "ms").astype("datetime64[D]")
+        if end < start:
+            return np.zeros(0, dtype="datetime64[D]")
+        get_trade_calendar(start)
+        return get_trade_calendar(end).trade_days_between(start, end)
+
+    def _daily_closes(self, code: str, last_day: np.datetime64):
+        """从 ORIGIN 到 last_day 的日收盘价和日线扰动；按股票缓存，需要更长区间时重新生成（前缀不变）"""
+        with self._lock:
+            cached = self._daily.get(code)
+        if cached is not None and cached[0][-1] >= last_day:
+            return cached
+        days = self._trade_days(self.ORIGIN, str(last_day).replace("-", ""))
+        # 按固定块长生成随机数，保证区间变长时已有交易日的值不变
+        blocks = (len(days) + 4095) // 4096
+        rng = np.random.default_rng([self.seed, self._code_seed(code)])
+        steps = np.concatenate([rng.normal(0.0, 0.02, 4096) for _ in range(blocks)])[:len(days)]
+        rng = np.random.default_rng([self.seed, self._code_seed(code), 1])
+        noise = np.concatenate([rng.random((4096, 3)) for _ in range(blocks)])[:len(days)]
+        # 对数价格围绕基准价均值回复，长区间内价格保持在合理范围
+        log_price = np.empty(len(steps))
+        level = 0.0
+        for i, step in enumerate(steps.tolist()):
+            level = level * 0.995 + step
+            log_price[i] = level
+        closes = (5 + self._code_seed(code) % 45) * np.exp(log_price)
+        with self._lock:
+            self._daily[code] = (days, closes, noise)
+        return days, closes, noise
+
+    def _bars(self, code: str, period: str, days: np.ndarray) -> Dict[str, np.ndarray]:
+        """生成指定交易日的K线"""
+        all_days, closes, day_noise = self._daily_closes(code, days[-1])
+        index = np.searchsorted(all_days, days)
+        close_day = closes[index]
+        prev_day = np.where(index > 0, closes[np.maximum(index - 1, 0)], close_day)
+        day_ms = days.astype("datetime64[ms]").astype(np.int64) - BEIJING_OFFSET_MS
+        code_seed = self._code_seed(code)
+
+        if period == "1d":
+            noise = day_noise[index]
+            open_ = prev_day * (1 + (noise[:, 0] - 0.5) * 0.01)
+            high = np.maximum(open_, close_day) * (1 + noise[:, 1] * 0.01)
+            low = np.minimum(open_, close_day) * (1 - noise[:, 2] * 0.01)
+            times = day_ms
+            close = close_day
+            volume = (1e6 * (0.5 + noise[:, 0])).round()
+        else:
+            step = self.PERIOD_SECONDS.get(period, 60)
+            morning = np.arange(9 * 3600 + 30 * 60 + step, 11 * 3600 + 30 * 60 + 1, step)
+            afternoon = np.arange(13 * 3600 + step, 15 * 3600 + 1, step)
+            offsets = np.concatenate((morning, afternoon)).astype(np.int64) * 1000
+            k = len(offsets)
+            paths = np.empty((len(days), k))
+            noise = np.empty((len(days), k, 2))
+            for row, day in enumerate(index.tolist()):
+                rng = np.random.default_rng([self.seed, code_seed, day])
+                walk = np.cumsum(rng.normal(0, 0.002, k))
+                bridge = walk - np.arange(1, k + 1) / k * walk[-1]
+                trend = np.linspace(np.log(prev_day[row]), np.log(close_day[row]), k + 1)[1:]
+                paths[row] = np.exp(trend + bridge)
+                noise[row] = rng.random((k, 2))
+            close = paths.ravel()
+            open_ = np.concatenate((prev_day[:, None], paths[:, :-1]), axis=1).ravel()
+            spread = noise[..., 0].ravel() * 0.002 * close
+            high = np.maximum(open_, close) + spread
+            low = np.minimum(open_, close) - spread
+            times = (day_ms[:, None] + offsets[None, :]).ravel()
+            volume = (1e4 * (0.5 + noise[..., 1].ravel())).round()
+        return {
+            "time": times, "open": open_, "high": high, "low": low, "close": close,
+            "volume": volume, "amount": volume * close, "preClose": open_,
+        }
+
+    def get_market_data_ex(self, field_list=None, stock_list=None, period="1d", start_time="", end_time="",
+                           count=-1, dividend_type="none", fill_data=True):
+        stock_list = list(stock_list or [])
+        with self._lock:
+            self.calls += 1
+        delay = self.latency + self.per_stock_latency * len(stock_list)
+        if delay > 0:
+            time.sleep(delay)
+        days = self._trade_days(start_time, end_time)
+        fields = list(field_list or ["time", "open", "high", "low", "close", "volume", "amount"])
+        result = {}
+        for code in stock_list:
+            if len(days) == 0:
+                result[code] = pd.DataFrame(columns=fields)
+                continue
+            bars = self._bars(code, period, days)
+            part = select_range(bars["time"], start_time, end_time, count)
+            data = {f: (bars[f][part] if f in bars else np.zeros(part.stop - part.start)) for f in fields}
+            result[code] = pd.DataFrame(data, index=time_labels(bars["time"][part], period))
+        return result
+
+
+PROVIDERS = {
+    "xtdata": XtDataProvider,
+    "local": LocalFileProvider,
+    "synthetic": SyntheticProvider,
+}
+
+_provider: Optional[MarketDataProvider] = None
+_provider_lock = threading.Lock()
+
+
+def create_provider(spec: str, **kwargs) -> MarketDataProvider:
+    """按名称创建数据源
+
+    Args:
+        spec: "xtdata"、"synthetic" 或 "local:<目录>"
+        **kwargs: 传给数据源构造函数的参数
+
+    Returns:
+        MarketDataProvider: 数据源
+    """
+    name, _, arg = (spec or "xtdata").partition(":")
+    name = name.strip().lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"未知的数据源: {spec}，可选 {list(PROVIDERS)}")
+    if name == "local":
+        return LocalFileProvider(arg or kwargs.pop("data_dir", DEFAULT_DATA_DIR), **kwargs)
+    return PROVIDERS[name](**kwargs)
+
+
+def get_provider() -> MarketDataProvider:
+    """获取当前数据源，未设置时按环境变量 KHQUANT_DATA_PROVIDER 创建（默认 xtdata）"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider(os.environ.get(PROVIDER_ENV, "xtdata"))
+    return _provider
+
+
+def set_provider(provider) -> Optional[MarketDataProvider]:
+    """切换当前数据源
+
+    Args:
+        provider: MarketDataProvider 实例、create_provider 接受的名称，或 None（恢复为默认）
+
+    Returns:
+        Optional[MarketDataProvider]: 之前的数据源
+    """
+    global _provider
+    if isinstance(provider, str):
+        provider = create_provider(provider)
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
+
+
+def provider_available() -> bool:
+    """当前数据源是否可用"""
+    return get_provider().available()
+
+
+class _ActiveProvider:
+    """转发到当前数据源的对象，调用方式与 xtquant.xtdata 模块相同"""
+
+    def __getattr__(self, name):
+        return getattr(get_provider(), name)
+
+    def __repr__(self) -> str:
+        return f"<khProvider.xtdata -> {get_provider().name}>"
+
+
+xtdata = _ActiveProvider()
+
+
+if __name__ == "__main__":
+    # 合成数据源自检：同一根K线在不同区间请求中保持一致
+    provider = SyntheticProvider()
+    whole = provider.get_market_data_ex(["time", "close"], ["600000.SH"], "1m", "20240102", "20240110")["600000.SH"]
+    part = provider.get_market_data_ex(["time", "close"], ["600000.SH"], "1m", "20240105", "20240108")["600000.SH"]
+    daily = provider.get_market_data_ex(["time", "close"], ["600000.SH"], "1d", "20240102", "20240110")["600000.SH"]
+    assert np.allclose(whole.loc[part.index, "close"], part["close"])
+    assert np.allclose(whole["close"].iloc[239::240].to_numpy(), daily["close"].to_numpy())
+    print(whole.tail(3))
+    print(daily)
@@ -19,25 +19,34 @@ if is_subprocess():
 
 import csv
 import time
+import threading
 from datetime import datetime, timedelta
 import pandas as pd
-from xtquant import xtdata
+from khProvider import xtdata
 # from xtquant.xtdata import get_client
 import glob
 import numpy as np
 import logging
 import ast
 import holidays  # 添加这个导入，用于处理holidays.China()
+from khCalendar import get_trade_calendar
+from khClock import beijing_datetime
+from khDownload import BulkDownloader, DownloadManifest, MANIFEST_FILE
+from khCoverage import CoverageManifest
+from khIndicator import IndicatorCache, lookback_bars
 from typing import Dict, List, Union, Optional
 import math
 from khTrade import KhTradeManager
 from types import SimpleNamespace
 
 # 延迟导入Qt相关模块，避免在子进程中意外启动Qt应用
+# 未安装PyQt5时（如无界面的服务器）使用占位符，回测引擎本身不依赖Qt
+_QT_AVAILABLE = False
 try:
     if not is_subprocess():
         # 在主进程中正常导入Qt模块
         from PyQt5.QtCore import QThread, pyqtSignal
+        _QT_AVAILABLE = True
     else:
         # 在子进程中创建空的占位符类
         class QThread:
@@ -99,7 +108,13 @@ def is_trade_day(date_str: str = None) -> bool:
     if date_str is None:
         date_str = datetime.now().strftime("%Y-%m-%d")
     
-    # 标准化日期格式
+    # 优先使用进程内缓存的交易日历（O(1)查询）
+    try:
+        return get_trade_calendar(date_str).is_trade_day(date_str)
+    except Exception:
+        pass
+    
+    # 交易日历无法解析该日期时，退回逐项解析判断
     try:
         # 尝试解析不同的日期格式
         date_obj = None
@@ -185,19 +200,9 @@ def get_trade_days_count(start_date: str, end_date: str) -> int:
             logging.error(f"起始日期 {start_date} 晚于结束日期 {end_date}")
             return 0
             
-        # 初始化计数器
-        trade_days = 0
-        
-        # 遍历日期范围内的每一天
-        current_dt = start_dt
-        while current_dt <= end_dt:
-            current_date_str = current_dt.strftime("%Y-%m-%d")
-            # 使用is_trade_day函数判断是否为交易日
-            if is_trade_day(current_date_str):
-                trade_days += 1
-            
-            # 前进到下一天
-            current_dt += timedelta(days=1)
+        # 确保交易日历覆盖起止日期后，用累计计数直接得到结果，无需逐日遍历
+        get_trade_calendar(start_date)
+        trade_days = get_trade_calendar(end_date).count_trade_days(start_date, end_date)
             
         logging.info(f"从 {start_date} 到 {end_date} 共有 {trade_days} 个交易日")
         return trade_days
@@ -206,6 +211,43 @@ def get_trade_days_count(start_date: str, end_date: str) -> int:
         logging.error(f"计算交易日天数时出错: {str(e)}")
         return 0
 
+def get_trade_days(start_date: str, end_date: str) -> List[str]:
+    """获取指定日期范围内（含首尾）的交易日列表
+
+    Args:
+        start_date: 起始日期，格式为"YYYY-MM-DD"或"YYYYMMDD"
+        end_date: 结束日期，格式为"YYYY-MM-DD"或"YYYYMMDD"
+
+    Returns:
+        List[str]: "YYYY-MM-DD"格式的交易日列表
+    """
+    get_trade_calendar(start_date)
+    return get_trade_calendar(end_date).get_trade_days(start_date, end_date)
+
+def get_next_trade_day(date_str: str, n: int = 1) -> str:
+    """获取指定日期之后的第n个交易日（不含当天）
+
+    Args:
+        date_str: 日期，格式为"YYYY-MM-DD"或"YYYYMMDD"
+        n: 向后数的交易日个数
+
+    Returns:
+        str: "YYYY-MM-DD"格式的交易日
+    """
+    return get_trade_calendar(date_str).next_trade_day(date_str, n)
+
+def get_prev_trade_day(date_str: str, n: int = 1) -> str:
+    """获取指定日期之前的第n个交易日（不含当天）
+
+    Args:
+        date_str: 日期，格式为"YYYY-MM-DD"或"YYYYMMDD"
+        n: 向前数的交易日个数
+
+    Returns:
+        str: "YYYY-MM-DD"格式的交易日
+    """
+    return get_trade_calendar(date_str).prev_trade_day(date_str, n)
+
 # ============================================================================
 # 兼容性：保留原有的KhQuTools类，但让类方法调用上面的独立函数
 # ============================================================================
@@ -259,22 +301,10 @@ class KhQuTools:
         if fre_step in ['1m', '5m', 'tick'] and not self.is_trade_time():
             raise ValueError("不在交易时间内，无法计算日内移动平均线")
 
-        # 获取历史数据（不包含当前时间点）
-        data = khHistory(
-            symbol_list=stock_code,
-            fields=[field],
-            bar_count=period,
-            fre_step=fre_step,
-            current_time=end_time,
-            fq=fq,
-            force_download=True  # 确保数据最新
-        )
-
-        if stock_code not in data or len(data[stock_code]) < period:
-            raise ValueError(f"股票 {stock_code} 数据量不足 {period} 条，无法计算 MA{period}")
-
-        prices = data[stock_code][field]
-        return round(prices.mean(), 2)
+        # 增量计算（不包含当前时间点），回测中直接读取预加载数据，否则强制下载以确保数据最新
+        value = khIndicatorValue(stock_code, 'MA', period, field=field, fre_step=fre_step,
+                                 end_time=end_time, fq=fq, force_download=True)
+        return round(value, 2)
 
 
 def khMA(stock_code: str, period: int, field: str = 'close', fre_step: str = '1d', end_time: Optional[str] = None, fq: str = 'pre') -> float:
@@ -308,22 +338,83 @@ def khMA(stock_code: str, period: int, field: str = 'close', fre_step: str = '1d
     if fre_step in ['1m', '5m', 'tick'] and not tools.is_trade_time():
         raise ValueError("不在交易时间内，无法计算日内移动平均线")
 
-    # 获取历史数据（不包含当前时间点）
+    # 增量计算（不包含当前时间点），同一股票同一参数的后续调用只计入新增的K线
+    value = khIndicatorValue(stock_code, 'MA', period, field=field, fre_step=fre_step,
+                             end_time=end_time, fq=fq)
+    return round(value, 2)
+
+
+def _parse_history_time(text):
+    """按 khHistory 支持的格式解析时间字符串，整数视为K线时间戳原样返回"""
+    if isinstance(text, (int, np.integer)):
+        return int(text)
+    for fmt in ('%Y%m%d %H%M%S', '%Y-%m-%d %H:%M:%S', '%Y%m%d', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"无法解析时间格式: {text}，支持的格式: YYYYMMDD, YYYY-MM-DD, YYYYMMDD HHMMSS, YYYY-MM-DD HH:MM:SS")
+
+
+# 增量指标缓存，键为 (股票代码, 周期, 字段, 复权方式, 指标, 参数)
+_indicator_cache = IndicatorCache()
+
+
+def khIndicatorValue(stock_code: str, indicator: str, N: int, M: int = 1, field: str = 'close',
+                     fre_step: str = '1d', end_time: Optional[str] = None, fq: str = 'pre',
+                     force_download: bool = False) -> float:
+    """计算截至 end_time（不含）的指标值，按股票和参数缓存运行状态增量更新
+
+    支持 MA/SUM/STD（最近N根K线中有效值的均值/合计/总体标准差，跳过NaN）以及 EMA/SMA（递推均线，
+    与 MyTT 的 EMA(S, N)/SMA(S, N, M) 一致）。首次调用或时间倒退时按完整窗口计算，
+    之后每根新K线 O(1) 更新；递推类指标首次计算读取 N 的 10 倍根K线。
+
+    Args:
+        stock_code: 股票代码
+        indicator: 指标名称，MA/SUM/STD/EMA/SMA
+        N: 周期
+        M: SMA 的权重参数
+        field: 计算字段，默认为'close'
+        fre_step: 时间频率，如'1d', '1m'等
+        end_time: 结束时间（不含），也可传入K线时间戳，如果为None使用当前时间
+        fq: 复权方式，'pre'前复权, 'post'后复权, 'none'不复权
+        force_download: 数据接口读取时是否强制下载最新数据
+
+    Returns:
+        float: 指标值
+
+    Raises:
+        ValueError: 数据不足或指标不支持增量计算
+    """
+    indicator = indicator.upper()
+    params = (int(N), int(M)) if indicator == 'SMA' else (int(N),)
+    key = (stock_code, fre_step, field, fq, indicator, params)
+
+    # 回测运行中优先读取预加载面板，只计入新增的行
+    if _history_provider is not None and not force_download:
+        current_time = _parse_history_time(end_time) if end_time is not None else None
+        value = _indicator_cache.update_from_panel(
+            key, _history_provider, stock_code, field, indicator, params,
+            fre_step, current_time, fq
+        )
+        if value is not None:
+            return value
+
+    # 通过数据接口读取最近一段历史（不包含当前时间点），只把新增的K线计入状态
+    bar_count = lookback_bars(indicator, params)
     data = khHistory(
         symbol_list=stock_code,
         fields=[field],
-        bar_count=period,
+        bar_count=bar_count,
         fre_step=fre_step,
         current_time=end_time,
         fq=fq,
-        force_download=False  # 不强制下载数据，提高回测速度
+        force_download=force_download
     )
-
-    if stock_code not in data or len(data[stock_code]) < period:
-        raise ValueError(f"股票 {stock_code} 数据量不足 {period} 条，无法计算均线{period}")
-
-    prices = data[stock_code][field]
-    return round(prices.mean(), 2)
+    frame = data.get(stock_code)
+    if frame is None or len(frame) < params[0]:
+        raise ValueError(f"股票 {stock_code} 数据量不足 {params[0]} 条，无法计算{indicator}{params[0]}")
+    return _indicator_cache.update_from_series(key, frame['time'].values, frame[field].values, indicator, params)
 
 
 def calculate_max_buy_volume(data: Dict, stock_code: str, price: float, cash_ratio: float = 1.0) -> int:
@@ -604,7 +695,8 @@ def process_row(row, stock_codes, stock_names):
         else:
             logging.info(f"跳过证券（无交易所后缀）: {stock_code}")
 
-def download_and_store_data(local_data_path, stock_files, field_list, period_type, start_date, end_date, dividend_type='none', time_range='all', progress_callback=None, log_callback=None, check_interrupt=None):
+def download_and_store_data(local_data_path, stock_files, field_list, period_type, start_date, end_date, dividend_type='none', time_range='all', progress_callback=None, log_callback=None, check_interrupt=None, storage='csv',
+                            workers=4, rate=4.0, retries=3, resume=True):
     """
     下载并存储指定股票、字段、周期类型和时间段的数据到文件。
 
@@ -706,12 +798,30 @@ def download_and_store_data(local_data_path, stock_files, field_list, period_typ
       - 该函数用于检查是否需要中断下载过程。
       - 返回True表示需要中断，返回False表示继续执行。
 
+    - storage (str, optional): 存储格式，默认为'csv'。
+      - 'csv': 每只股票一个CSV文件（上述命名规则）
+      - 'store': 写入 local_data_path 下的列式存储（khStore.ColumnStore），按 周期/股票/年份 分区，
+        时间为int64毫秒时间戳，重复下载只追加新K线，可用 ColumnStore.read 按区间读取
+      - 'both': 同时写入两种格式
+
+    - workers (int, optional): 并发下载的线程数，默认为4。
+
+    - rate (float, optional): 限速，每秒最多开始下载的股票数（令牌桶，含重试），默认为4.0；None 或0为不限速。
+      替代原先每只股票之后固定等待1秒。
+
+    - retries (int, optional): 单只股票下载失败后的重试次数，默认为3，每次重试前按指数退避等待。
+      重试耗尽的股票不中断其他股票的下载。
+
+    - resume (bool, optional): 是否断点续传，默认为True。
+      已完成的股票记录在 local_data_path 下的 _download_manifest.json 中（按下载参数区分任务），
+      中断或有失败后用相同参数再次运行只下载未完成的股票；全部成功后清单中的该任务自动清除。
+
     返回值:
     - 无返回值，数据直接保存到指定目录。
 
     异常:
     - 如果股票代码文件不存在或格式错误，会记录警告并跳过。
-    - 如果数据下载失败，会记录错误并继续处理下一只股票。
+    - 如果数据下载失败，会按 retries 重试，仍失败时继续处理其他股票，全部处理完后抛出RuntimeError列出失败的股票。
     - 如果保存文件失败，会记录错误信息。
     - 如果中断检查函数返回True，会抛出InterruptedError异常。
     """
@@ -734,190 +844,211 @@ def download_and_store_data(local_data_path, stock_files, field_list, period_typ
         if not os.path.exists(local_data_path):
             os.makedirs(local_data_path)
 
+        if storage not in ('csv', 'store', 'both'):
+            raise ValueError(f"不支持的存储格式: {storage}")
+        store = None
+        if storage in ('store', 'both'):
+            from khStore import ColumnStore
+            store = ColumnStore(local_data_path)
+
         total_stocks = len(stocks)
-        for index, stock in enumerate(stocks, 1):
+        completed = 0
+        completed_lock = threading.Lock()
+
+        def download_stock(stock):
+            """下载并保存一只股票，返回保存的行数（在下载线程中执行）"""
+            nonlocal completed
+            with completed_lock:
+                completed += 1
+                index = completed
+            if log_callback:
+                log_callback(f"正在处理 {stock} ({index}/{total_stocks})")
+
+            # 判断是否为指数
+            is_index = stock in ["000001.SH", "399001.SZ", "399006.SZ", "000688.SH", 
+                               "000300.SH", "000905.SH", "000852.SH"]
+
             try:
-                # 检查是否需要中断
+                # 每次主要操作前检查中断
                 if check_interrupt and check_interrupt():
                     logging.info("下载过程被中断")
                     raise InterruptedError("下载过程被用户中断")
                     
-                if log_callback:
-                    log_callback(f"正在处理 {stock} ({index}/{total_stocks})")
-
-                # 判断是否为指数
-                is_index = stock in ["000001.SH", "399001.SZ", "399006.SZ", "000688.SH", 
-                                   "000300.SH", "000905.SH", "000852.SH"]
-
-                try:
-                    # 每次主要操作前检查中断
+                if is_index:
+                    # 指数数据处理
+                    logging.info(f"获取指数数据: {stock}")
+                    xtdata.download_history_data(stock, period=period_type, 
+                                               start_time=start_date, end_time=end_date)
+                    
+                    # 再次检查中断
                     if check_interrupt and check_interrupt():
                         logging.info("下载过程被中断")
                         raise InterruptedError("下载过程被用户中断")
                         
-                    if is_index:
-                        # 指数数据处理
-                        logging.info(f"获取指数数据: {stock}")
-                        xtdata.download_history_data(stock, period=period_type, 
-                                                   start_time=start_date, end_time=end_date)
-                        
-                        # 再次检查中断
-                        if check_interrupt and check_interrupt():
-                            logging.info("下载过程被中断")
-                            raise InterruptedError("下载过程被用户中断")
-                            
-                        data = xtdata.get_market_data_ex(
-                            field_list=['time'] + field_list,
-                            stock_list=[stock],
-                            period=period_type,
-                            start_time=start_date,
-                            end_time=end_date,
-                            count=-1,
-                            dividend_type=dividend_type,  # 添加复权参数
-                            fill_data=True
-                        )
-                        if data and stock in data:
-                            df = data[stock]
-                            logging.info(f"成功获取指数数据: {stock}")
-                        else:
-                            raise Exception(f"未能获取指数数据: {stock}")
-                    else:
-                        # 普通股票数据处理
-                        logging.info(f"获取股票数据: {stock}")
-                        xtdata.download_history_data(stock, period=period_type, 
-                                                   start_time=start_date, end_time=end_date)
-                        
-                        # 再次检查中断
-                        if check_interrupt and check_interrupt():
-                            logging.info("下载过程被中断")
-                            raise InterruptedError("下载过程被用户中断")
-                            
-                        data = xtdata.get_local_data(  
-                            field_list=['time'] + field_list,
-                            stock_list=[stock],
-                            period=period_type,
-                            start_time=start_date,
-                            end_time=end_date,
-                            dividend_type=dividend_type,  # 添加复权参数
-                            fill_data=True
-                        )
+                    data = xtdata.get_market_data_ex(
+                        field_list=['time'] + field_list,
+                        stock_list=[stock],
+                        period=period_type,
+                        start_time=start_date,
+                        end_time=end_date,
+                        count=-1,
+                        dividend_type=dividend_type,  # 添加复权参数
+                        fill_data=True
+                    )
+                    if data and stock in data:
                         df = data[stock]
-
-                    # 检查中断
+                        logging.info(f"成功获取指数数据: {stock}")
+                    else:
+                        raise Exception(f"未能获取指数数据: {stock}")
+                else:
+                    # 普通股票数据处理
+                    logging.info(f"获取股票数据: {stock}")
+                    xtdata.download_history_data(stock, period=period_type, 
+                                               start_time=start_date, end_time=end_date)
+                    
+                    # 再次检查中断
                     if check_interrupt and check_interrupt():
                         logging.info("下载过程被中断")
                         raise InterruptedError("下载过程被用户中断")
                         
-                    # 开始数据处理和保存
-                    logging.debug(f"准备处理数据 - 股票代码: {stock}")
+                    data = xtdata.get_local_data(  
+                        field_list=['time'] + field_list,
+                        stock_list=[stock],
+                        period=period_type,
+                        start_time=start_date,
+                        end_time=end_date,
+                        dividend_type=dividend_type,  # 添加复权参数
+                        fill_data=True
+                    )
+                    df = data[stock]
+
+                # 检查中断
+                if check_interrupt and check_interrupt():
+                    logging.info("下载过程被中断")
+                    raise InterruptedError("下载过程被用户中断")
                     
-                    # 检查df是否为DataFrame类型
-                    if not isinstance(df, pd.DataFrame):
-                        error_msg = f"处理 {stock} 数据失败: 返回的数据不是DataFrame格式"
-                        logging.error(error_msg)
-                        if log_callback:
-                            log_callback(error_msg)
-                        continue
-                        
-                    logging.debug(f"原始数据形状: {df.shape}")
-                    logging.debug(f"原始数据列: {df.columns.tolist()}")
+                # 开始数据处理和保存
+                logging.debug(f"准备处理数据 - 股票代码: {stock}")
+                
+                # 检查df是否为DataFrame类型
+                if not isinstance(df, pd.DataFrame):
+                    error_msg = f"处理 {stock} 数据失败: 返回的数据不是DataFrame格式"
+                    logging.error(error_msg)
+                    if log_callback:
+                        log_callback(error_msg)
+                    return 0
                     
-                    # 统一的数据处理逻辑
-                    df["time"] = pd.to_datetime(df["time"].astype(float), unit='ms') + pd.Timedelta(hours=8)
-                    logging.debug(f"时间列转换后的前5行:\n{df['time'].head()}")
-
-                    if period_type == '1d':
-                        df["date"] = df["time"].dt.strftime("%Y-%m-%d")
-                        df = df[["date"] + field_list]
-                    else:
-                        if time_range != 'all':
-                            start_time, end_time = time_range.split('-')
-                            start_time = datetime.strptime(start_time, "%H:%M").time()
-                            end_time = datetime.strptime(end_time, "%H:%M").time()
-                            df["time_obj"] = df["time"].dt.time
-                            mask = (df["time_obj"] >= start_time) & (df["time_obj"] <= end_time)
-                            df = df.loc[mask].copy()
-                            df.drop(columns=["time_obj"], inplace=True)
-                        
-                        df["date"] = df["time"].dt.strftime("%Y-%m-%d")
-                        df["time"] = df["time"].dt.strftime("%H:%M:%S")
-                        df = df[["date", "time"] + field_list]
-
-                    # 检查中断
-                    if check_interrupt and check_interrupt():
-                        logging.info("下载过程被中断")
-                        raise InterruptedError("下载过程被用户中断")
-                        
-                    # 保存数据
-                    logging.debug(f"准备保存数据 - 股票代码: {stock}")
-                    logging.debug(f"处理后数据形状: {df.shape}")
-                    logging.debug(f"处理后数据列: {df.columns.tolist()}")
-                    logging.debug(f"处理后前5行数据:\n{df.head()}")
+                logging.debug(f"原始数据形状: {df.shape}")
+                logging.debug(f"原始数据列: {df.columns.tolist()}")
+                
+                # 统一的数据处理逻辑
+                raw_time = df["time"].astype(np.int64)
+                df["time"] = pd.to_datetime(df["time"].astype(float), unit='ms') + pd.Timedelta(hours=8)
+                logging.debug(f"时间列转换后的前5行:\n{df['time'].head()}")
+
+                if period_type == '1d':
+                    df["date"] = df["time"].dt.strftime("%Y-%m-%d")
+                    df = df[["date"] + field_list]
+                else:
+                    if time_range != 'all':
+                        start_time, end_time = time_range.split('-')
+                        start_time = datetime.strptime(start_time, "%H:%M").time()
+                        end_time = datetime.strptime(end_time, "%H:%M").time()
+                        df["time_obj"] = df["time"].dt.time
+                        mask = (df["time_obj"] >= start_time) & (df["time_obj"] <= end_time)
+                        df = df.loc[mask].copy()
+                        df.drop(columns=["time_obj"], inplace=True)
                     
-                    if not df.empty:
-                        time_range_filename = time_range.replace(":", "_")
-                        # 在文件名中添加复权信息
-                        file_name = f"{stock}_{period_type}_{start_date}_{end_date}_{time_range_filename}_{dividend_type}.csv"
-                        file_path = os.path.join(local_data_path, file_name)
-                        
-                        logging.info(f"保存文件 - 路径: {file_path}")
-                        df.to_csv(file_path, index=False)
-                        logging.info(f"文件保存成功: {file_path}")
-                        
-                        # 验证文件是否成功保存并获取更多信息
-                        if os.path.exists(file_path):
-                            file_size = os.path.getsize(file_path)
-                            # 获取文件大小的可读形式
-                            if file_size < 1024:
-                                readable_size = f"{file_size} 字节"
-                            elif file_size < 1024 * 1024:
-                                readable_size = f"{file_size/1024:.2f} KB"
-                            else:
-                                readable_size = f"{file_size/(1024*1024):.2f} MB"
-                                
-                            # 获取行数和列数信息
-                            rows_count = len(df)
-                            cols_count = len(df.columns)
-                            
-                            logging.info(f"已保存文件信息: 大小={readable_size}, 行数={rows_count}, 列数={cols_count}")
-                            
-                            # 通过log_callback提供详细信息
-                            if log_callback:
-                                file_info = f"{stock} {period_type} 数据已存储: 文件大小={readable_size}, 行数={rows_count}, 列数={cols_count}, 路径: {file_path}"
-                                log_callback(file_info)
-                        else:
-                            logging.error(f"文件保存失败: {file_path}")
-                            if log_callback:
-                                log_callback(f"保存失败: {file_path}")
-                    else:
-                        logging.warning(f"股票 {stock} 的数据为空，跳过保存")
-                        if log_callback:
-                            log_callback(f"股票 {stock} 的数据为空，跳过保存")
-
-                except InterruptedError:
-                    logging.info(f"处理{stock}时被中断")
-                    raise
-                except Exception as e:
-                    logging.error(f"处理{stock}时出错: {str(e)}", exc_info=True)
-                    raise
+                    df["date"] = df["time"].dt.strftime("%Y-%m-%d")
+                    df["time"] = df["time"].dt.strftime("%H:%M:%S")
+                    df = df[["date", "time"] + field_list]
 
-                if progress_callback:
-                    progress_callback(int(index / total_stocks * 100))
-                
                 # 检查中断
                 if check_interrupt and check_interrupt():
                     logging.info("下载过程被中断")
                     raise InterruptedError("下载过程被用户中断")
                     
-                time.sleep(1)  # 添加延迟避免请求过快
+                # 保存数据
+                logging.debug(f"准备保存数据 - 股票代码: {stock}")
+                logging.debug(f"处理后数据形状: {df.shape}")
+                logging.debug(f"处理后数据列: {df.columns.tolist()}")
+                logging.debug(f"处理后前5行数据:\n{df.head()}")
+                
+                if not df.empty and store is not None:
+                    columns = {"time": raw_time.loc[df.index].to_numpy()}
+                    columns.update({field: df[field].to_numpy() for field in field_list})
+                    added = store.write(stock, period_type, columns, dividend_type)
+                    logging.info(f"已写入列式存储: {stock} {period_type}, 新增 {added} 行")
+                    if log_callback:
+                        log_callback(f"{stock} {period_type} 数据已写入列式存储: 新增 {added} 行, 路径: {local_data_path}")
+
+                if not df.empty and storage in ('csv', 'both'):
+                    time_range_filename = time_range.replace(":", "_")
+                    # 在文件名中添加复权信息
+                    file_name = f"{stock}_{period_type}_{start_date}_{end_date}_{time_range_filename}_{dividend_type}.csv"
+                    file_path = os.path.join(local_data_path, file_name)
+                    
+                    logging.info(f"保存文件 - 路径: {file_path}")
+                    df.to_csv(file_path, index=False)
+                    logging.info(f"文件保存成功: {file_path}")
+                    
+                    # 验证文件是否成功保存并获取更多信息
+                    if os.path.exists(file_path):
+                        file_size = os.path.getsize(file_path)
+                        # 获取文件大小的可读形式
+                        if file_size < 1024:
+                            readable_size = f"{file_size} 字节"
+                        elif file_size < 1024 * 1024:
+                            readable_size = f"{file_size/1024:.2f} KB"
+                        else:
+                            readable_size = f"{file_size/(1024*1024):.2f} MB"
+                            
+                        # 获取行数和列数信息
+                        rows_count = len(df)
+                        cols_count = len(df.columns)
+                        
+                        logging.info(f"已保存文件信息: 大小={readable_size}, 行数={rows_count}, 列数={cols_count}")
+                        
+                        # 通过log_callback提供详细信息
+                        if log_callback:
+                            file_info = f"{stock} {period_type} 数据已存储: 文件大小={readable_size}, 行数={rows_count}, 列数={cols_count}, 路径: {file_path}"
+                            log_callback(file_info)
+                    else:
+                        logging.error(f"文件保存失败: {file_path}")
+                        if log_callback:
+                            log_callback(f"保存失败: {file_path}")
+                elif df.empty:
+                    logging.warning(f"股票 {stock} 的数据为空，跳过保存")
+                    if log_callback:
+                        log_callback(f"股票 {stock} 的数据为空，跳过保存")
 
             except InterruptedError:
-                logging.info(f"处理股票 {stock} 时被用户中断")
-                raise
-            except Exception as e:
-                logging.error(f"处理股票 {stock} 时出错: {str(e)}", exc_info=True)
+                logging.info(f"处理{stock}时被中断")
                 raise
-        
+            return len(df)
+
+        def on_progress(progress):
+            if progress_callback:
+                progress_callback(int(progress["finished"] / max(1, progress["total"]) * 100))
+
+        # 断点续传清单按下载参数区分任务，参数相同的任务再次运行时跳过已完成的股票
+        manifest = None
+        if resume:
+            manifest = DownloadManifest(os.path.join(local_data_path, MANIFEST_FILE), {
+                "fields": list(field_list), "period": period_type, "start": start_date, "end": end_date,
+                "dividend_type": dividend_type, "time_range": time_range, "storage": storage,
+            })
+        downloader = BulkDownloader(download_stock, workers=workers, rate=rate, retries=retries,
+                                    manifest=manifest, progress_callback=on_progress,
+                                    check_interrupt=check_interrupt)
+        summary = downloader.run(stocks)
+        if summary["skipped"] and log_callback:
+            log_callback(f"断点续传：跳过已完成的 {summary['skipped']} 只股票")
+        if summary["failed"]:
+            # 其他股票已下载完成，最后再报告失败，调用方据此提示用户重新运行（只会下载未完成的股票）
+            raise RuntimeError(f"{len(summary['failed'])} 只股票下载失败（已重试{retries}次）: "
+                               f"{', '.join(summary['failed'])}，再次运行将只下载未完成的股票")
+
         if log_callback:
             log_callback("数据下载和存储完成.")
 
@@ -1369,7 +1500,7 @@ def stock_list_worker(output_dir, queue):
                 pass  # 可能已经设置过了
         
         # 在子进程中导入模块，避免Qt冲突
-        from xtquant import xtdata
+        from khProvider import xtdata
         import ast
         import logging
         
@@ -1401,7 +1532,7 @@ def stock_list_worker(output_dir, queue):
 
 def get_stock_list_for_subprocess(queue):
     """子进程版本的获取股票列表函数，带进度反馈"""
-    from xtquant import xtdata
+    from khProvider import xtdata
     import ast
     
     # 初始化返回的字典
@@ -1583,7 +1714,7 @@ def save_stock_list_to_csv_for_subprocess(stock_dict, output_dir, queue):
         print(f"[更新进度] {board_names[board]}列表保存完成，共 {len(stocks)} 只证券", flush=True)
 
 # 定义多进程版本的更新管理器类
-if not is_subprocess():
+if not is_subprocess() and _QT_AVAILABLE:
     from PyQt5.QtCore import QObject, pyqtSignal, QTimer
     import multiprocessing
     import queue
@@ -1685,14 +1816,14 @@ if not is_subprocess():
 def get_and_save_stock_list(output_dir):
     """获取并保存股票列表的便捷函数，返回多进程更新管理器实例"""
     # 检查是否在主进程中
-    if not is_subprocess():
+    if not is_subprocess() and _QT_AVAILABLE:
         # 在主进程中使用多进程管理器
         update_manager = StockListUpdateManager(output_dir)
         return update_manager
     else:
         # 在子进程中直接执行，不使用Qt相关功能
         try:
-            from xtquant import xtdata
+            from khProvider import xtdata
             stock_dict = get_stock_list()
             save_stock_list_to_csv(stock_dict, output_dir)
             return True, "股票列表更新成功！"
@@ -1701,7 +1832,7 @@ def get_and_save_stock_list(output_dir):
             logging.error(error_msg, exc_info=True)
             return False, error_msg
 # 只在主进程中定义Qt线程类
-if not is_subprocess():
+if not is_subprocess() and _QT_AVAILABLE:
     class StockListUpdateThread(QThread):
         """股票列表更新线程"""
         progress = pyqtSignal(str)  # 用于发送进度信息
@@ -1973,7 +2104,7 @@ else:
                     f.write(f"{stock['code']},{stock['name']}\n")
             print(f"[更新进度] {board_names[board]}列表保存完成，共 {len(stocks)} 只证券", flush=True)
 
-def supplement_history_data(stock_files, field_list, period_type, start_date, end_date, dividend_type='none', time_range='all', progress_callback=None, log_callback=None, check_interrupt=None):
+def supplement_history_data(stock_files, field_list, period_type, start_date, end_date, dividend_type='none', time_range='all', progress_callback=None, log_callback=None, check_interrupt=None, coverage=None):
     """
     补充历史行情数据。
 
@@ -1995,11 +2126,16 @@ def supplement_history_data(stock_files, field_list, period_type, start_date, en
     - check_interrupt (function, optional): 中断检查函数
         - 该函数用于检查是否需要中断数据补充过程
         - 返回True表示需要中断，返回False表示继续执行
+    - coverage (optional): 本地数据覆盖范围清单（khCoverage.CoverageManifest 或清单文件路径），默认为当前数据源的清单
+        - 补充前按清单判断每只股票需要下载的区间，本地数据已是最新的股票直接跳过
+        - 补充后用取回的数据更新清单（首尾K线时间和缺口）
+        - 传入 False 时不使用清单，每只股票都完整补充一次
     """
     # 在函数开始时设置环境变量，防止意外启动Qt应用（仅在子进程中）
     if is_subprocess():
         os.environ['QT_QPA_PLATFORM'] = 'offscreen'
     
+    manifest = None
     try:
         # 获取所有股票代码
         stocks = []
@@ -2019,8 +2155,26 @@ def supplement_history_data(stock_files, field_list, period_type, start_date, en
                 log_callback("没有找到需要补充数据的股票")
             return
 
-        total_stocks = len(stocks)
-        for index, stock in enumerate(stocks, 1):
+        # 按覆盖范围清单只补充过期的股票和区间
+        manifest = None
+        if coverage is not False:
+            manifest = coverage if isinstance(coverage, CoverageManifest) else CoverageManifest(coverage)
+            plan = manifest.plan(stocks, period_type, start_date, end_date)
+        else:
+            plan = {stock: [(start_date, end_date)] for stock in dict.fromkeys(stocks)}
+        skipped = len(dict.fromkeys(stocks)) - len(plan)
+        if skipped and log_callback:
+            log_callback(f"{skipped} 只股票的本地数据已是最新，跳过；需要补充 {len(plan)} 只")
+        if not plan and progress_callback:
+            progress_callback(100)
+
+        # 取数时带上time列，用于更新覆盖范围
+        fetch_fields = list(field_list)
+        if fetch_fields and "time" not in fetch_fields:
+            fetch_fields = ["time"] + fetch_fields
+
+        total_stocks = len(plan)
+        for index, (stock, ranges) in enumerate(plan.items(), 1):
             try:
                 # 检查是否需要中断
                 if check_interrupt and check_interrupt():
@@ -2035,14 +2189,15 @@ def supplement_history_data(stock_files, field_list, period_type, start_date, en
                     logging.info("补充数据过程被中断")
                     raise InterruptedError("补充数据过程被用户中断")
                     
-                # 调用download_history_data进行数据补充
-                xtdata.download_history_data(
-                    stock,
-                    period=period_type,
-                    start_time=start_date,
-                    end_time=end_date,
-                    incrementally=True
-                )
+                # 调用download_history_data进行数据补充（只下载过期的区间）
+                for range_start, range_end in ranges:
+                    xtdata.download_history_data(
+                        stock,
+                        period=period_type,
+                        start_time=range_start,
+                        end_time=range_end,
+                        incrementally=True
+                    )
 
                 # 检查是否需要中断
                 if check_interrupt and check_interrupt():
@@ -2051,15 +2206,29 @@ def supplement_history_data(stock_files, field_list, period_type, start_date, en
                     
                     
                 # 获取数据（带复权参数）
+                window_start = min(range_start for range_start, _ in ranges)
                 data = xtdata.get_market_data_ex(
-                    field_list=field_list,
+                    field_list=fetch_fields,
                     stock_list=[stock],
                     period=period_type,
-                    start_time=start_date,
+                    start_time=window_start,
                     end_time=end_date,
                     dividend_type=dividend_type,
                     fill_data=True
                 )
+                if manifest is not None:
+                    # 覆盖记录按实际存在的K线判断缺口，时间不能用 fill_data=True 填充过的结果
+                    raw = xtdata.get_market_data_ex(
+                        field_list=['time'],
+                        stock_list=[stock],
+                        period=period_type,
+                        start_time=window_start,
+                        end_time=end_date,
+                        dividend_type='none',
+                        fill_data=False
+                    )
+                    if stock in raw and isinstance(raw[stock], pd.DataFrame) and 'time' in raw[stock].columns:
+                        manifest.update(stock, period_type, raw[stock]['time'].to_numpy(np.int64), window_start, end_date)
 
                 # 添加更详细的数据信息
                 if stock in data and data[stock] is not None:
@@ -2125,6 +2294,9 @@ def supplement_history_data(stock_files, field_list, period_type, start_date, en
         if log_callback:
             log_callback(error_msg)
         raise
+    finally:
+        if manifest is not None:
+            manifest.save(force=True)
 
 def get_stock_names(stock_codes, stock_list_file):
     """
@@ -2153,6 +2325,20 @@ def get_stock_names(stock_codes, stock_list_file):
     
     return stock_names
 
+# 回测引擎运行期间注册的历史窗口访问器（khMarket.PanelHistory），khHistory 优先从中读取
+_history_provider = None
+
+def set_history_provider(provider):
+    """注册或清除回测引擎的历史窗口访问器
+    
+    参数:
+        provider: khMarket.PanelHistory 对象，传入None表示清除
+    """
+    global _history_provider
+    _history_provider = provider
+    # 缓存的指标状态对应上一次回测的面板，一并清空
+    _indicator_cache.clear()
+
 def khHistory(symbol_list, fields, bar_count, fre_step, current_time=None, skip_paused=False, fq='pre', force_download=False):
     """
     获取股票历史数据（不包含当前时间点）
@@ -2165,6 +2351,7 @@ def khHistory(symbol_list, fields, bar_count, fre_step, current_time=None, skip_
         current_time: 当前时间，支持多种格式：
                      - 日线数据：'YYYYMMDD' 或 'YYYY-MM-DD'
                      - 分钟/tick数据：'YYYYMMDD HHMMSS' 或 'YYYY-MM-DD HH:MM:SS'
+                     - K线时间戳（整数，秒或毫秒），如 data['__current_time__']['timestamp']
                      - 如果为None则使用当前日期时间
         skip_paused: 是否跳过停牌数据，True跳过，False不跳过
         fq: 复权方式，'pre'前复权, 'post'后复权, 'none'不复权
@@ -2178,7 +2365,7 @@ def khHistory(symbol_list, fields, bar_count, fre_step, current_time=None, skip_
     
     # 导入必要的模块
     try:
-        from xtquant import xtdata
+        from khProvider import xtdata
         import pandas as pd
         from datetime import datetime, timedelta
     except ImportError as e:
@@ -2207,6 +2394,10 @@ def khHistory(symbol_list, fields, bar_count, fre_step, current_time=None, skip_
         # 如果没有指定时间，使用当前时间
         current_datetime = datetime.now()
         current_date_str = current_datetime.strftime('%Y%m%d')
+    elif isinstance(current_time, (int, np.integer)):
+        # K线时间戳：预加载面板直接按时间戳截取，数据接口按北京时间换算
+        current_datetime = beijing_datetime(current_time)
+        current_date_str = current_datetime.strftime('%Y%m%d')
     else:
         # 解析输入的时间格式
         if isinstance(current_time, str):
@@ -2232,7 +2423,7 @@ def khHistory(symbol_list, fields, bar_count, fre_step, current_time=None, skip_
             
             current_date_str = current_datetime.strftime('%Y%m%d')
         else:
-            raise ValueError("current_time必须是字符串格式")
+            raise ValueError("current_time必须是字符串或时间戳")
     
     #print(f"解析的当前时间: {current_datetime.strftime('%Y-%m-%d %H:%M:%S')} (不包含此时间点)")
     
@@ -2253,6 +2444,17 @@ def khHistory(symbol_list, fields, bar_count, fre_step, current_time=None, skip_
     }
     period = period_map.get(fre_step, fre_step)
     
+    # 回测运行中且预加载的数据足够时，直接从内存面板截取，不再调用数据接口
+    if _history_provider is not None and not force_download:
+        served = _history_provider.frames(
+            stock_codes, fields, bar_count, period,
+            current_time if isinstance(current_time, (int, np.integer))
+            else (current_datetime if current_time is not None else None),
+            skip_paused, dividend_type
+        )
+        if served is not None:
+            return served
+    
     result = {}
     
     try:
@@ -19,7 +19,7 @@ import numpy as np
 import pandas as pd
 
 # ===== 量化库 =====
-from xtquant import xtdata
+from khProvider import xtdata
 try:
     from xtquant.xttrader import XtQuantTrader, XtQuantTraderCallback
 except ImportError:
@@ -40,6 +40,7 @@ from khQTTools import *
 # ===== 指标库（MyTT） =====
 import MyTT as _mytt
 from MyTT import *  # 暴露 MA/RSI 等指标函数
+import MyTTStream  # 流式指标，如 MyTTStream.MACD(12, 26, 9).update(bar)
 
 # ===== 时间标准化类 =====
 class TimeInfo:
@@ -58,6 +59,9 @@ class TimeInfo:
     @property
     def date_num(self) -> str:
         """返回数字日期格式: 20240603"""
+        # 回测引擎已预计算，直接读取
+        if "date_num" in self._current_time:
+            return self._current_time["date_num"]
         date_str = self.date_str
         if date_str:
             return date_str.replace("-", "")
@@ -71,6 +75,8 @@ class TimeInfo:
     @property
     def datetime_str(self) -> str:
         """返回完整日期时间格式: 2024-06-03 09:30:00"""
+        if "date_num" in self._current_time and "datetime" in self._current_time:
+            return self._current_time["datetime"]
         if self.date_str and self.time_str:
             return f"{self.date_str} {self.time_str}"
         return ""
@@ -78,6 +84,8 @@ class TimeInfo:
     @property
     def datetime_num(self) -> str:
         """返回数字日期时间格式: 20240603093000"""
+        if "time_num" in self._current_time:
+            return f"{self.date_num}{self._current_time['time_num']}"
         if self.date_num and self.time_str:
             time_num = self.time_str.replace(":", "")
             return f"{self.date_num}{time_num}"
@@ -423,6 +431,47 @@ def khHas(data: Dict, stock_code: str) -> bool:
         logging.error(f"检查持仓时出错: {str(e)}")
         return False
 
+def khParam(data: Dict, name: str, default: Any = None) -> Any:
+    """读取策略参数的便捷函数
+    
+    参数来自配置文件的 strategy_params 节，参数优化时由优化器逐组覆盖。
+    
+    Args:
+        data: 策略数据字典
+        name: 参数名
+        default: 未配置该参数时的默认值
+        
+    Returns:
+        Any: 参数值
+    """
+    framework = data.get("__framework__")
+    if framework is None:
+        return default
+    return framework.config.strategy_params.get(name, default)
+
+def khWindow(data: Dict, field: str = 'close', count: int = 20, stock_code: Union[str, List[str], None] = None,
+             include_current: bool = False, fq: Optional[str] = None) -> np.ndarray:
+    """读取截至当前K线的历史窗口的便捷函数
+    
+    直接切片回测引擎预加载的行情面板（含策略 WARMUP_BARS 声明的预热数据），
+    返回只读数组视图，不调用数据接口，也不会读到当前K线之后的数据。
+    
+    Args:
+        data: 策略数据字典
+        field: 数值字段名，默认为'close'
+        count: 窗口长度
+        stock_code: 股票代码或代码列表，None 表示股票池全部股票
+        include_current: 是否包含当前K线，默认不包含
+        fq: 复权方式（pre/post/none），None 为回测配置的复权方式
+        
+    Returns:
+        np.ndarray: 单只股票为 (窗口长度,)，否则为 (窗口长度, 股票数)；不在回测中运行时返回空数组
+    """
+    framework = data.get("__framework__")
+    if framework is None or getattr(framework, "panel_history", None) is None:
+        return np.empty(0)
+    return framework.history(field, count, stock_code, include_current, fq)
+
 def khBuy(data: Dict, stock_code: str, ratio: float = 1.0, volume: Optional[int] = None, reason: str = "") -> Dict:
     """生成买入信号的便捷函数
     
@@ -511,9 +560,9 @@ __all__ = [
     # 新增类和函数
     'TimeInfo', 'StockDataParser', 'PositionParser', 'StockPoolParser',
     'StrategyContext', 'parse_context', 'khGet', 'khPrice', 'khHas',
-    'khBuy', 'khSell', 'get_default_risk_params',
+    'khBuy', 'khSell', 'khParam', 'khWindow', 'get_default_risk_params',
     # 指标函数（MyTT）与项目内均线
-    'MA', 'RSI', 'khMA'
+    'MA', 'RSI', 'khMA', 'MyTTStream'
 ] 
 
 # 自动并入 khQTTools 与 MyTT 的所有公共符号，便于 from khQuantImport import * 统一入口
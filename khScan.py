@@ -0,0 +1,261 @@
+# coding: utf-8
+"""
+本地行情数据的缺口与异常扫描
+
+逐只股票读取本地数据的时间列，与交易日历和日内交易时段的K线网格比对，汇总为一张表：
+
+    missing_days      首尾K线之间（或指定区间内）没有任何数据的交易日数
+    incomplete_days   有数据但K线数不足一个完整交易日的交易日数（分钟线）
+    missing_bars      缺少的K线数（日线为缺失交易日数，分钟线为交易时段网格中缺少的K线数）
+    duplicates        重复时间戳的行数
+    unsorted          时间倒序的次数
+    out_of_session    交易时段（9:30-11:30、13:00-15:00，tick 从 9:15 开始）之外的行数
+    non_trading_day   落在非交易日的行数
+
+分钟线的网格与 xtdata 一致按K线结束时间标记（1m 为 9:31…11:30、13:01…15:00），9:30 的开盘K线不计为异常；
+tick 数据只检查交易日和时段。每个文件内完全向量化，文件之间用进程池并行。
+
+支持两种本地数据：khStore 列式存储目录和 download_and_store_data 生成的 CSV 目录（自动识别）。
+
+命令行：
+    python -m khScan <数据目录> [--period 1m] [--start 20240101] [--end 20241231] [--workers 8] [--output 报告.csv] [--all]
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from khCalendar import get_trade_calendar, to_day
+from khProvider import BEIJING_OFFSET_MS, DAY_MS
+from khStore import ColumnStore
+
+PERIOD_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "1h": 3600}
+MORNING = (9 * 3600 + 30 * 60, 11 * 3600 + 30 * 60)
+AFTERNOON = (13 * 3600, 15 * 3600)
+TICK_OPEN = 9 * 3600 + 15 * 60
+COLUMNS = ["code", "period", "dividend_type", "rows", "first", "last", "trade_days", "missing_days",
+           "incomplete_days", "missing_bars", "duplicates", "unsorted", "out_of_session", "non_trading_day",
+           "first_missing", "error"]
+ISSUE_COLUMNS = ["missing_bars", "duplicates", "unsorted", "out_of_session", "non_trading_day"]
+
+
+def session_grid(period: str) -> Optional[np.ndarray]:
+    """分钟线一个交易日内的K线网格（当日秒数，按K线结束时间），日线和tick返回None"""
+    step = PERIOD_SECONDS.get(period)
+    if step is None:
+        return None
+    morning = np.arange(MORNING[0] + step, MORNING[1] + 1, step)
+    afternoon = np.arange(AFTERNOON[0] + step, AFTERNOON[1] + 1, step)
+    return np.concatenate((morning, afternoon)).astype(np.int64)
+
+
+def _date_text(ms: int) -> str:
+    return str(np.datetime64(int(ms) + BEIJING_OFFSET_MS, "ms").astype("datetime64[s]")).replace("T", " ")
+
+
+def check_times(times_ms, period: str, start_date: Optional[str] = None,
+                end_date: Optional[str] = None) -> Dict:
+    """检查一只股票的时间列
+
+    Args:
+        times_ms: 时间列（毫秒时间戳，UTC）
+        period: 周期（1d/1m/5m/15m/30m/60m/tick）
+        start_date: 检查区间的开始日期 YYYYMMDD，None 为第一根K线所在日期
+        end_date: 检查区间的结束日期 YYYYMMDD，None 为最后一根K线所在日期
+
+    Returns:
+        Dict: 各项统计，字段见模块说明
+    """
+    times = np.asarray(times_ms, dtype=np.int64)
+    result = {"rows": len(times), "first": "", "last": "", "trade_days": 0, "missing_days": 0,
+              "incomplete_days": 0, "missing_bars": 0, "duplicates": 0, "unsorted": 0, "out_of_session": 0,
+              "non_trading_day": 0, "first_missing": ""}
+    if len(times) == 0 and (start_date is None or end_date is None):
+        return result
+
+    steps = np.diff(times)
+    result["unsorted"] = int(np.count_nonzero(steps < 0))
+    # 时间通常已排序，去重只需比较相邻元素
+    if len(times) == 0:
+        unique = times  # 区间内没有数据：全部交易日都按缺失统计
+    elif result["unsorted"] == 0:
+        unique = times[np.concatenate(([True], steps != 0))]
+    else:
+        unique = np.unique(times)
+    result["duplicates"] = int(len(times) - len(unique))
+    if len(unique):
+        result["first"], result["last"] = _date_text(unique[0]), _date_text(unique[-1])
+
+    local = unique + BEIJING_OFFSET_MS
+    days = (local // DAY_MS).astype("datetime64[D]")
+    seconds = (local % DAY_MS) // 1000
+
+    lo = to_day(start_date) if start_date else days[0]
+    hi = to_day(end_date) if end_date else days[-1]
+    get_trade_calendar(lo)
+    trade_days = get_trade_calendar(hi).trade_days_between(lo, hi)
+    result["trade_days"] = int(len(trade_days))
+
+    # 落在非交易日的行（只统计检查区间内的）
+    in_range = (days >= lo) & (days <= hi)
+    position = np.searchsorted(trade_days, days)
+    on_trade_day = (position < len(trade_days)) & (trade_days[np.minimum(position, len(trade_days) - 1)] == days) \
+        if len(trade_days) else np.zeros(len(days), dtype=bool)
+    result["non_trading_day"] = int(np.count_nonzero(in_range & ~on_trade_day))
+
+    present = np.zeros(len(trade_days), dtype=bool)
+    present[position[on_trade_day]] = True
+    missing = trade_days[~present]
+    result["missing_days"] = int(len(missing))
+    if len(missing):
+        result["first_missing"] = str(missing[0])
+
+    if period == "1d":
+        result["missing_bars"] = result["missing_days"]
+        return result
+
+    # 交易时段之外的行
+    open_seconds = TICK_OPEN if period == "tick" else MORNING[0]
+    in_session = ((seconds >= open_seconds) & (seconds <= MORNING[1])) | \
+                 ((seconds >= AFTERNOON[0]) & (seconds <= AFTERNOON[1]))
+    result["out_of_session"] = int(np.count_nonzero(~in_session))
+
+    grid = session_grid(period)
+    if grid is None:
+        # tick 没有固定网格，只统计缺失的交易日
+        return result
+    # 每个交易日落在网格上的K线数（时间已去重）
+    slot = np.searchsorted(grid, seconds)
+    on_grid = (slot < len(grid)) & (grid[np.minimum(slot, len(grid) - 1)] == seconds) & on_trade_day
+    per_day = np.bincount(position[on_grid], minlength=len(trade_days))
+    shortfall = len(grid) - per_day
+    result["incomplete_days"] = int(np.count_nonzero(present & (shortfall > 0)))
+    result["missing_bars"] = int(shortfall.sum())
+    if not result["first_missing"] and result["incomplete_days"]:
+        result["first_missing"] = str(trade_days[present & (shortfall > 0)][0])
+    return result
+
+
+def _read_times(kind: str, location: str, code: str, period: str, dividend_type: str) -> np.ndarray:
+    """读取一个扫描任务的时间列"""
+    if kind == "store":
+        return np.asarray(ColumnStore(location).read(code, period, fields=["time"], dividend_type=dividend_type)["time"])
+    df = pd.read_csv(location, usecols=lambda c: c in ("date", "time"), dtype=str)
+    text = df["date"].str.replace("-", "", regex=False)
+    if "time" in df.columns:
+        local = pd.to_datetime(text + df["time"].str.replace(":", "", regex=False).str.zfill(6), format="%Y%m%d%H%M%S")
+    else:
+        local = pd.to_datetime(text, format="%Y%m%d")
+    return local.values.astype("datetime64[ms]").astype(np.int64) - BEIJING_OFFSET_MS
+
+
+def _scan_job(job: Tuple) -> Dict:
+    """扫描一个文件（在工作进程中执行）"""
+    kind, location, code, period, dividend_type, start_date, end_date = job
+    row = {"code": code, "period": period, "dividend_type": dividend_type, "error": ""}
+    try:
+        row.update(check_times(_read_times(kind, location, code, period, dividend_type), period, start_date, end_date))
+    except Exception as e:
+        row["error"] = str(e)
+    return row
+
+
+def list_jobs(path: str, periods: Optional[Sequence[str]] = None, codes: Optional[Sequence[str]] = None,
+              start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Tuple]:
+    """列出数据目录中的扫描任务（列式存储按 周期/股票，CSV 目录按文件）"""
+    wanted = set(codes) if codes else None
+    jobs = []
+    if ColumnStore.is_store(path):
+        store = ColumnStore(path)
+        for name in store.periods():
+            period, _, dividend_type = name.partition("_")
+            dividend_type = dividend_type or "none"
+            if periods and period not in periods:
+                continue
+            for code in store.codes(period, dividend_type):
+                if wanted is None or code in wanted:
+                    jobs.append(("store", path, code, period, dividend_type, start_date, end_date))
+        return jobs
+    for file in sorted(glob.glob(os.path.join(path, "*.csv"))):
+        parts = os.path.basename(file)[:-4].split("_")
+        if len(parts) < 6:
+            continue
+        code, period, dividend_type = parts[0], parts[1], parts[-1]
+        if dividend_type == "ratio":
+            dividend_type = "_".join(parts[-2:])
+        if (periods and period not in periods) or (wanted is not None and code not in wanted):
+            continue
+        jobs.append(("csv", file, code, period, dividend_type, start_date, end_date))
+    return jobs
+
+
+def scan(path: str, periods: Optional[Sequence[str]] = None, codes: Optional[Sequence[str]] = None,
+         start_date: Optional[str] = None, end_date: Optional[str] = None,
+         workers: Optional[int] = None) -> pd.DataFrame:
+    """扫描数据目录中所有股票的缺口与异常
+
+    Args:
+        path: khStore 列式存储目录或 download_and_store_data 的 CSV 目录
+        periods: 只扫描这些周期，None 为全部
+        codes: 只扫描这些股票，None 为全部
+        start_date: 检查区间的开始日期 YYYYMMDD，None 为每只股票第一根K线所在日期
+        end_date: 检查区间的结束日期 YYYYMMDD，None 为每只股票最后一根K线所在日期
+        workers: 并行进程数，None 为CPU核数，1 为在当前进程中顺序扫描
+
+    Returns:
+        pd.DataFrame: 每个文件一行，列见 COLUMNS
+    """
+    jobs = list_jobs(path, periods, codes, start_date, end_date)
+    workers = (os.cpu_count() or 1) if workers is None else max(1, int(workers))
+    if workers == 1 or len(jobs) <= 1:
+        rows = [_scan_job(job) for job in jobs]
+    else:
+        chunksize = max(1, len(jobs) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            rows = list(executor.map(_scan_job, jobs, chunksize=chunksize))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def summarize(report: pd.DataFrame) -> Dict[str, int]:
+    """汇总扫描结果：文件数、有问题的文件数和各项异常的合计"""
+    issues = report[ISSUE_COLUMNS].fillna(0).sum(axis=1) > 0
+    summary = {"files": int(len(report)), "files_with_issues": int((issues | (report["error"] != "")).sum()),
+               "rows": int(report["rows"].fillna(0).sum())}
+    summary.update({column: int(report[column].fillna(0).sum()) for column in ISSUE_COLUMNS + ["missing_days"]})
+    summary["errors"] = int((report["error"] != "").sum())
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="本地行情数据的缺口与异常扫描")
+    parser.add_argument("path", help="khStore 列式存储目录或 CSV 数据目录")
+    parser.add_argument("--period", nargs="+", help="只扫描这些周期")
+    parser.add_argument("--code", nargs="+", help="只扫描这些股票")
+    parser.add_argument("--start", help="检查区间的开始日期 YYYYMMDD")
+    parser.add_argument("--end", help="检查区间的结束日期 YYYYMMDD")
+    parser.add_argument("--workers", type=int, help="并行进程数，默认为CPU核数")
+    parser.add_argument("--output", help="把完整结果保存为CSV")
+    parser.add_argument("--all", action="store_true", help="列出所有文件（默认只列出有问题的文件）")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    report = scan(args.path, args.period, args.code, args.start, args.end, args.workers)
+    elapsed = time.time() - start
+    summary = summarize(report)
+    print(", ".join(f"{key}={value}" for key, value in summary.items()) + f", seconds={elapsed:.2f}")
+    if args.output:
+        report.to_csv(args.output, index=False, encoding="utf-8-sig")
+    shown = report if args.all else report[(report[ISSUE_COLUMNS].fillna(0).sum(axis=1) > 0) | (report["error"] != "")]
+    if len(shown):
+        with pd.option_context("display.max_rows", 200, "display.width", 200):
+            print(shown.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
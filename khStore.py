@@ -0,0 +1,565 @@
+# coding: utf-8
+"""
+列式行情存储
+
+download_and_store_data 原先每只股票写一个 CSV，时间保存为字符串，每个使用方都要重新解析文本。
+ColumnStore 按 周期/股票/年份 分区保存列式数据：
+
+    <root>/_khstore.json                  存储参数（价格精度）
+    <root>/<周期>[_<复权>]/<代码>/_meta.json  字段类型和各年份分区的覆盖范围（行数、首尾时间）
+    <root>/<周期>[_<复权>]/<代码>/2024/      未压缩分区，每个字段一个二进制列文件（time.bin、close.bin ...）
+    <root>/<周期>[_<复权>]/<代码>/2023.npz   已压缩（封存）分区
+
+- time 列为 int64 毫秒时间戳（UTC，与 xtdata 相同），价格列为 float64 或 float32，其余为 float64
+- 新数据的时间都晚于分区末尾时直接追加到列文件末尾；有重叠时合并后重写该分区
+- 只有不复权（none）的数据增量追加/合并。复权数据（front/back/front_ratio/back_ratio）的历史会随除权
+  整体改变，不同时间取得的数据基准不同，不能拼接：每次写入整体替换该股票该周期已有的复权数据，
+  需要完整区间时应一次写入完整区间（或只存不复权数据，读取后再复权）
+- 读取时列文件以 np.memmap 映射，按时间二分查找区间，不做任何文本解析
+- 过去年份的分区可以用 zlib 压缩封存（seal），读取时整体解压
+- _meta.json 是各分区的覆盖索引，行数以它为准；写入中断留下的多余字节会在下次追加时截掉
+
+同一股票的写入需在同一进程内进行（不同股票可以由不同进程并发写入）。
+
+命令行：
+    python -m khStore info <存储目录> [周期]
+    python -m khStore import-csv <CSV目录> <存储目录>
+    python -m khStore export-csv <存储目录> <代码> <周期> <输出文件> [--start 20240101] [--end 20241231]
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from khProvider import BEIJING_OFFSET_MS, parse_time_bound, time_labels
+
+STORE_MARKER = "_khstore.json"
+META_FILE = "_meta.json"
+PRICE_FIELDS = {"open", "high", "low", "close", "preClose", "lastPrice", "lastClose", "settlementPrice",
+                "settle", "avgPrice"}
+
+
+def _year_of(times_ms: np.ndarray) -> np.ndarray:
+    """毫秒时间戳对应的北京时间年份"""
+    local = (np.asarray(times_ms, dtype=np.int64) + BEIJING_OFFSET_MS).astype("datetime64[ms]")
+    return local.astype("datetime64[Y]").astype(np.int64) + 1970
+
+
+def _to_ms(values) -> np.ndarray:
+    """把 time 列转换为 int64 毫秒时间戳；datetime 类型视为北京时间"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ms]").astype(np.int64) - BEIJING_OFFSET_MS
+    return values.astype(np.int64)
+
+
+def _atomic_json(path: str, data: Dict):
+    """先写临时文件再替换，避免读到写了一半的 JSON"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class ColumnStore:
+    """按 周期/股票/年份 分区的列式行情存储"""
+
+    def __init__(self, root: str, price_dtype: str = "float64", compress: bool = False):
+        """初始化
+
+        Args:
+            root: 存储根目录，不存在时在首次写入时创建
+            price_dtype: 价格列精度，"float64" 或 "float32"；已有存储以创建时的设置为准
+            compress: 写入后是否自动压缩封存今年以前的分区
+        """
+        self.root = root
+        self.compress = compress
+        self.price_dtype = price_dtype
+        marker = os.path.join(root, STORE_MARKER)
+        if os.path.exists(marker):
+            with open(marker, "r", encoding="utf-8") as f:
+                self.price_dtype = json.load(f).get("price_dtype", price_dtype)
+        if np.dtype(self.price_dtype) not in (np.float32, np.float64):
+            raise ValueError(f"价格精度只能是 float32 或 float64: {price_dtype}")
+        self._locks: Dict[tuple, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @staticmethod
+    def is_store(path: str) -> bool:
+        """目录是否为 ColumnStore 存储"""
+        return os.path.exists(os.path.join(path, STORE_MARKER))
+
+    # ---- 路径与元数据 ----
+    def _period_dir(self, period: str, dividend_type: str = "none") -> str:
+        name = period if dividend_type in (None, "", "none") else f"{period}_{dividend_type}"
+        return os.path.join(self.root, name)
+
+    def _code_dir(self, code: str, period: str, dividend_type: str = "none") -> str:
+        return os.path.join(self._period_dir(period, dividend_type), code)
+
+    def _lock(self, code: str, period: str, dividend_type: str) -> threading.Lock:
+        key = (code, period, dividend_type)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _load_meta(self, code_dir: str) -> Optional[Dict]:
+        path = os.path.join(code_dir, META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _field_dtype(self, field: str) -> str:
+        if field == "time":
+            return "int64"
+        if field in PRICE_FIELDS:
+            return str(np.dtype(self.price_dtype))
+        return "float64"
+
+    def _ensure_marker(self):
+        marker = os.path.join(self.root, STORE_MARKER)
+        if not os.path.exists(marker):
+            os.makedirs(self.root, exist_ok=True)
+            _atomic_json(marker, {"version": 1, "price_dtype": str(np.dtype(self.price_dtype))})
+
+    # ---- 分区读写 ----
+    def _read_partition(self, code_dir: str, year: str, info: Dict, fields: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """读取一个分区的全部列；未压缩分区返回只读 memmap"""
+        rows = info["rows"]
+        if info.get("sealed"):
+            with np.load(os.path.join(code_dir, f"{year}.npz")) as npz:
+                return {field: npz[field] if field in npz.files else np.full(rows, np.nan)
+                        for field in fields}
+        columns = {}
+        for field, dtype in fields.items():
+            path = os.path.join(code_dir, year, f"{field}.bin")
+            if rows == 0 or not os.path.exists(path):
+                columns[field] = np.full(rows, np.nan) if field != "time" else np.zeros(rows, dtype=np.int64)
+            else:
+                columns[field] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+        return columns
+
+    def _write_partition(self, code_dir: str, year: str, columns: Dict[str, np.ndarray], sealed: bool):
+        """整体写入（重写）一个分区"""
+        part_dir = os.path.join(code_dir, year)
+        npz_path = os.path.join(code_dir, f"{year}.npz")
+        if sealed:
+            tmp = f"{npz_path}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(tmp, **columns)
+            os.replace(tmp, npz_path)
+            if os.path.isdir(part_dir):
+                shutil.rmtree(part_dir)
+            return
+        tmp_dir = f"{part_dir}.{os.getpid()}.tmp"
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        for field, values in columns.items():
+            values.tofile(os.path.join(tmp_dir, f"{field}.bin"))
+        if os.path.isdir(part_dir):
+            shutil.rmtree(part_dir)
+        os.replace(tmp_dir, part_dir)
+        if os.path.exists(npz_path):
+            os.remove(npz_path)
+
+    def _drop_partition(self, code_dir: str, year: str):
+        """删除一个分区的文件"""
+        part_dir = os.path.join(code_dir, year)
+        npz_path = os.path.join(code_dir, f"{year}.npz")
+        if os.path.isdir(part_dir):
+            shutil.rmtree(part_dir)
+        if os.path.exists(npz_path):
+            os.remove(npz_path)
+
+    def _remove_rows(self, code_dir: str, meta: Dict, lo: Optional[int], hi: Optional[int]) -> int:
+        """删除 [lo, hi]（毫秒时间戳，None 为不限）内的行并更新 meta，返回删除的行数（调用方持有锁）"""
+        removed = 0
+        for key in sorted(meta["partitions"], key=int):
+            info = meta["partitions"][key]
+            if (lo is not None and info["last"] < lo) or (hi is not None and info["first"] > hi):
+                continue
+            if (lo is None or info["first"] >= lo) and (hi is None or info["last"] <= hi):
+                # 整个分区都在区间内
+                self._drop_partition(code_dir, key)
+                del meta["partitions"][key]
+                removed += info["rows"]
+                continue
+            columns = {field: np.array(values) for field, values in
+                       self._read_partition(code_dir, key, info, meta["fields"]).items()}
+            times = columns["time"]
+            keep = np.zeros(len(times), dtype=bool)
+            if lo is not None:
+                keep |= times < lo
+            if hi is not None:
+                keep |= times > hi
+            removed += int(len(times) - np.count_nonzero(keep))
+            columns = {field: values[keep] for field, values in columns.items()}
+            self._write_partition(code_dir, key, columns, sealed=bool(info.get("sealed")))
+            info.update(rows=len(columns["time"]), first=int(columns["time"][0]), last=int(columns["time"][-1]))
+        return removed
+
+    def _append_partition(self, code_dir: str, year: str, rows: int, columns: Dict[str, np.ndarray]):
+        """把新行追加到未压缩分区的列文件末尾"""
+        part_dir = os.path.join(code_dir, year)
+        for field, values in columns.items():
+            path = os.path.join(part_dir, f"{field}.bin")
+            # 截掉上次写入中断时残留的、未记入元数据的字节
+            expected = rows * values.dtype.itemsize
+            if os.path.getsize(path) != expected:
+                os.truncate(path, expected)
+            with open(path, "ab") as f:
+                values.tofile(f)
+
+    # ---- 写入 ----
+    def write(self, code: str, period: str, data: Union[pd.DataFrame, Dict[str, Sequence]],
+              dividend_type: str = "none") -> int:
+        """写入一只股票的K线，已存在的同一时间的K线会被新数据覆盖
+
+        不复权数据与已有数据合并；复权数据整体替换该股票该周期已有的数据（见模块说明）。
+
+        Args:
+            code: 股票代码
+            period: 周期，如 "1d"、"1m"、"tick"
+            data: 包含 time 列（毫秒时间戳，或视为北京时间的 datetime）的 DataFrame 或 {字段: 数组}
+            dividend_type: 复权方式，不同复权方式分开存储
+
+        Returns:
+            int: 新增的K线数量（不含覆盖的已有K线）
+        """
+        if isinstance(data, pd.DataFrame):
+            data = {column: data[column].to_numpy() for column in data.columns}
+        if "time" not in data:
+            raise ValueError("写入的数据必须包含 time 列")
+        # 只保存数值列；tick 的五档盘口等列表字段不适合定长列存储
+        skipped = [f for f, v in data.items() if f != "time" and not np.issubdtype(np.asarray(v).dtype, np.number)
+                   and not np.issubdtype(np.asarray(v).dtype, np.bool_)]
+        if skipped:
+            logging.warning(f"{code} {period} 跳过非数值字段: {skipped}")
+            data = {f: v for f, v in data.items() if f not in skipped}
+        times = _to_ms(data["time"])
+        if len(times) == 0:
+            return 0
+        # 排序并按时间去重，保留最后出现的一行
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        keep = np.append(times[1:] != times[:-1], True)
+        index = order[keep]
+        times = times[keep]
+
+        self._ensure_marker()
+        code_dir = self._code_dir(code, period, dividend_type)
+        with self._lock(code, period, dividend_type):
+            os.makedirs(code_dir, exist_ok=True)
+            meta = self._load_meta(code_dir) or {"code": code, "period": period, "dividend_type": dividend_type,
+                                                 "fields": {"time": "int64"}, "partitions": {}}
+            replaced = 0
+            if dividend_type not in (None, "", "none") and meta["partitions"]:
+                # 复权数据的基准随除权变化，不与已有数据合并
+                previous = self.read(code, period, fields=["time"], dividend_type=dividend_type)["time"]
+                replaced = int(np.count_nonzero(np.isin(times, previous)))
+                self._remove_rows(code_dir, meta, None, None)
+            fields = meta["fields"]
+            new_fields = [f for f in data if f != "time" and f not in fields]
+            for field in new_fields:
+                fields[field] = self._field_dtype(field)
+            incoming = {"time": times}
+            for field, dtype in fields.items():
+                if field != "time":
+                    incoming[field] = (np.asarray(data[field])[index].astype(dtype) if field in data
+                                       else np.full(len(times), np.nan, dtype=dtype))
+
+            years = _year_of(times)
+            added = 0
+            for year in np.unique(years).tolist():
+                mask = years == year
+                part = {field: values[mask] for field, values in incoming.items()}
+                key = str(year)
+                info = meta["partitions"].get(key)
+                if info is None:
+                    self._write_partition(code_dir, key, part, sealed=False)
+                    meta["partitions"][key] = {"rows": len(part["time"]), "first": int(part["time"][0]),
+                                               "last": int(part["time"][-1]), "sealed": False}
+                    added += len(part["time"])
+                    continue
+                if not info.get("sealed") and not new_fields and part["time"][0] > info["last"]:
+                    # 纯追加：只写新行
+                    self._append_partition(code_dir, key, info["rows"], part)
+                    info["rows"] += len(part["time"])
+                    info["last"] = int(part["time"][-1])
+                    added += len(part["time"])
+                    continue
+                # 有重叠或新增字段：合并后重写整个分区
+                old = {field: np.array(values) for field, values in
+                       self._read_partition(code_dir, key, info, fields).items()}
+                merged_time = np.concatenate((old["time"], part["time"]))
+                order = np.argsort(merged_time, kind="stable")
+                merged_time = merged_time[order]
+                last_of_each = np.append(merged_time[1:] != merged_time[:-1], True)
+                merged = {field: np.concatenate((old[field], part[field]))[order][last_of_each]
+                          for field in fields}
+                added += len(merged["time"]) - info["rows"]
+                self._write_partition(code_dir, key, merged, sealed=bool(info.get("sealed")))
+                info.update(rows=len(merged["time"]), first=int(merged["time"][0]), last=int(merged["time"][-1]))
+            _atomic_json(os.path.join(code_dir, META_FILE), meta)
+        if self.compress:
+            self.seal(codes=[code], period=period, dividend_type=dividend_type)
+        return added - replaced
+
+    def remove(self, code: str, period: str, start_time="", end_time="", dividend_type: str = "none") -> int:
+        """删除一只股票指定区间的K线
+
+        Args:
+            code: 股票代码
+            period: 周期
+            start_time: 开始时间，格式同 read，空为不限
+            end_time: 结束时间（含），格式同 read，空为不限；两者都为空时删除该周期的全部数据
+            dividend_type: 复权方式
+
+        Returns:
+            int: 删除的行数
+        """
+        code_dir = self._code_dir(code, period, dividend_type)
+        lo = start_time if isinstance(start_time, (int, np.integer)) else parse_time_bound(start_time)
+        hi = end_time if isinstance(end_time, (int, np.integer)) else parse_time_bound(end_time, end=True)
+        with self._lock(code, period, dividend_type):
+            meta = self._load_meta(code_dir)
+            if meta is None:
+                return 0
+            removed = self._remove_rows(code_dir, meta, lo, hi)
+            if removed:
+                _atomic_json(os.path.join(code_dir, META_FILE), meta)
+        return removed
+
+    def seal(self, codes: Optional[Iterable[str]] = None, period: str = "1d", dividend_type: str = "none",
+             before_year: Optional[int] = None) -> int:
+        """压缩封存 before_year（默认今年）以前的分区
+
+        Returns:
+            int: 本次封存的分区数
+        """
+        if before_year is None:
+            before_year = int(str(np.datetime64("today", "Y")))
+        sealed = 0
+        for code in (codes if codes is not None else self.codes(period, dividend_type)):
+            code_dir = self._code_dir(code, period, dividend_type)
+            with self._lock(code, period, dividend_type):
+                meta = self._load_meta(code_dir)
+                if meta is None:
+                    continue
+                for key, info in meta["partitions"].items():
+                    if info.get("sealed") or int(key) >= before_year:
+                        continue
+                    columns = {field: np.array(values) for field, values in
+                               self._read_partition(code_dir, key, info, meta["fields"]).items()}
+                    self._write_partition(code_dir, key, columns, sealed=True)
+                    info["sealed"] = True
+                    sealed += 1
+                _atomic_json(os.path.join(code_dir, META_FILE), meta)
+        return sealed
+
+    # ---- 读取 ----
+    def read(self, code: str, period: str, start_time="", end_time="", fields: Optional[List[str]] = None,
+             count: int = -1, dividend_type: str = "none") -> Dict[str, np.ndarray]:
+        """按时间区间读取一只股票的K线
+
+        Args:
+            code: 股票代码
+            period: 周期
+            start_time: 开始时间，"YYYYMMDD"/"YYYYMMDDHHMMSS" 或毫秒时间戳，空为不限
+            end_time: 结束时间（含），格式同上；只有日期时包含当天全部K线
+            fields: 字段列表，None 为全部字段；time 列总是返回
+            count: 大于0时只返回区间内最后 count 根
+            dividend_type: 复权方式
+
+        Returns:
+            Dict[str, np.ndarray]: {字段: 数组}；区间落在单个未压缩分区时为只读 memmap 视图
+        """
+        code_dir = self._code_dir(code, period, dividend_type)
+        meta = self._load_meta(code_dir)
+        all_fields = meta["fields"] if meta else {"time": "int64"}
+        wanted = ["time"] + [f for f in (fields or all_fields) if f != "time"]
+        dtypes = {f: all_fields.get(f, "float64") for f in wanted}
+        if meta is None:
+            return {f: np.zeros(0, dtype=dtypes[f]) for f in wanted}
+
+        lo = start_time if isinstance(start_time, (int, np.integer)) else parse_time_bound(start_time)
+        hi = end_time if isinstance(end_time, (int, np.integer)) else parse_time_bound(end_time, end=True)
+        pieces = []
+        for key in sorted(meta["partitions"], key=int):
+            info = meta["partitions"][key]
+            if info["rows"] == 0 or (lo is not None and info["last"] < lo) or (hi is not None and info["first"] > hi):
+                continue
+            columns = self._read_partition(code_dir, key, info, {f: dtypes[f] for f in wanted if f in all_fields})
+            times = columns["time"]
+            left = 0 if lo is None else int(np.searchsorted(times, lo, side="left"))
+            right = len(times) if hi is None else int(np.searchsorted(times, hi, side="right"))
+            if right > left:
+                pieces.append({f: columns[f][left:right] if f in columns else np.full(right - left, np.nan)
+                               for f in wanted})
+        if count is not None and count > 0:
+            # 从后往前保留 count 根
+            kept, remaining = [], count
+            for piece in reversed(pieces):
+                if remaining <= 0:
+                    break
+                n = len(piece["time"])
+                kept.append(piece if n <= remaining else {f: v[n - remaining:] for f, v in piece.items()})
+                remaining -= min(n, remaining)
+            pieces = kept[::-1]
+        if not pieces:
+            return {f: np.zeros(0, dtype=dtypes[f]) for f in wanted}
+        if len(pieces) == 1:
+            return pieces[0]
+        return {f: np.concatenate([piece[f] for piece in pieces]) for f in wanted}
+
+    def read_frame(self, code: str, period: str, start_time="", end_time="", fields: Optional[List[str]] = None,
+                   count: int = -1, dividend_type: str = "none") -> pd.DataFrame:
+        """按时间区间读取一只股票的K线，返回与 xtdata.get_market_data_ex 相同格式的 DataFrame"""
+        columns = self.read(code, period, start_time, end_time, fields, count, dividend_type)
+        return pd.DataFrame({f: np.asarray(v) for f, v in columns.items()},
+                            index=time_labels(columns["time"], period))
+
+    # ---- 覆盖索引 ----
+    def periods(self) -> List[str]:
+        """已存储的 周期[_复权] 目录名"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def codes(self, period: str, dividend_type: str = "none") -> List[str]:
+        """已存储指定周期数据的股票代码"""
+        period_dir = self._period_dir(period, dividend_type)
+        if not os.path.isdir(period_dir):
+            return []
+        return sorted(name for name in os.listdir(period_dir)
+                      if os.path.exists(os.path.join(period_dir, name, META_FILE)))
+
+    def coverage(self, code: str, period: str, dividend_type: str = "none") -> Optional[Dict]:
+        """一只股票已覆盖的时间范围
+
+        Returns:
+            Optional[Dict]: {"first", "last", "rows", "partitions"}，没有数据时为None
+        """
+        meta = self._load_meta(self._code_dir(code, period, dividend_type))
+        if not meta or not meta["partitions"]:
+            return None
+        parts = meta["partitions"]
+        return {
+            "first": min(info["first"] for info in parts.values()),
+            "last": max(info["last"] for info in parts.values()),
+            "rows": sum(info["rows"] for info in parts.values()),
+            "partitions": parts,
+        }
+
+    def ranges(self, period: str, dividend_type: str = "none",
+               codes: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """批量查询覆盖范围
+
+        Returns:
+            pd.DataFrame: 以股票代码为索引，列为 first/last（毫秒时间戳）和 rows
+        """
+        rows = {}
+        for code in (codes if codes is not None else self.codes(period, dividend_type)):
+            cover = self.coverage(code, period, dividend_type)
+            if cover:
+                rows[code] = {"first": cover["first"], "last": cover["last"], "rows": cover["rows"]}
+        return pd.DataFrame.from_dict(rows, orient="index", columns=["first", "last", "rows"])
+
+    # ---- CSV 导入导出 ----
+    def export_csv(self, code: str, period: str, path: str, start_time="", end_time="",
+                   fields: Optional[List[str]] = None, dividend_type: str = "none") -> int:
+        """导出为 download_and_store_data 格式的 CSV（date[,time] 为北京时间字符串）
+
+        Returns:
+            int: 导出的行数
+        """
+        columns = self.read(code, period, start_time, end_time, fields, dividend_type=dividend_type)
+        local = pd.to_datetime(columns["time"], unit="ms") + pd.Timedelta(hours=8)
+        df = pd.DataFrame({"date": local.strftime("%Y-%m-%d")})
+        if period != "1d":
+            df["time"] = local.strftime("%H:%M:%S")
+        for field, values in columns.items():
+            if field != "time":
+                df[field] = np.asarray(values)
+        df.to_csv(path, index=False)
+        return len(df)
+
+    def import_csv_dir(self, csv_dir: str) -> Dict[str, int]:
+        """导入 download_and_store_data 生成的 CSV 文件
+
+        Returns:
+            Dict[str, int]: {文件名: 新增行数}
+        """
+        from khProvider import LocalFileProvider
+
+        provider = LocalFileProvider(csv_dir)
+        result = {}
+        for path in sorted(glob.glob(os.path.join(csv_dir, "*.csv"))):
+            parts = os.path.basename(path)[:-4].split("_")
+            if len(parts) < 6:
+                continue
+            code, period, dividend_type = parts[0], parts[1], parts[-1]
+            if dividend_type == "ratio":
+                dividend_type = "_".join(parts[-2:])
+            df = provider.read_csv(path)
+            if df is not None:
+                result[os.path.basename(path)] = self.write(code, period, df, dividend_type)
+        return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(prog="python -m khStore", description="列式行情存储工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="查看各周期的股票数量和覆盖范围")
+    info.add_argument("root")
+    info.add_argument("period", nargs="?")
+    imp = sub.add_parser("import-csv", help="导入 download_and_store_data 生成的CSV目录")
+    imp.add_argument("csv_dir")
+    imp.add_argument("root")
+    imp.add_argument("--float32", action="store_true", help="价格列使用 float32")
+    exp = sub.add_parser("export-csv", help="导出一只股票为CSV")
+    exp.add_argument("root")
+    exp.add_argument("code")
+    exp.add_argument("period")
+    exp.add_argument("output")
+    exp.add_argument("--start", default="")
+    exp.add_argument("--end", default="")
+    exp.add_argument("--dividend", default="none")
+    args = parser.parse_args(argv)
+
+    if args.command == "import-csv":
+        store = ColumnStore(args.root, price_dtype="float32" if args.float32 else "float64")
+        result = store.import_csv_dir(args.csv_dir)
+        print(f"导入 {len(result)} 个文件，新增 {sum(result.values())} 行")
+    elif args.command == "export-csv":
+        store = ColumnStore(args.root)
+        rows = store.export_csv(args.code, args.period, args.output, args.start, args.end,
+                                dividend_type=args.dividend)
+        print(f"导出 {rows} 行到 {args.output}")
+    else:
+        store = ColumnStore(args.root)
+        for name in store.periods():
+            period, _, dividend_type = name.partition("_")
+            if args.period and period != args.period:
+                continue
+            table = store.ranges(period, dividend_type or "none")
+            if table.empty:
+                continue
+            first = time_labels(np.array([table["first"].min()]), period)[0]
+            last = time_labels(np.array([table["last"].max()]), period)[0]
+            print(f"{name}: {len(table)} 只股票, {int(table['rows'].sum())} 行, {first} ~ {last}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+# coding: utf-8
+"""
+流式回测的分段行情面板
+
+一次性加载整个回测区间时，多年的分钟或tick数据会占满内存。PanelStream 把回测区间按交易日切成若干段，
+每次只持有当前段的面板（加上上一段末尾保留的预热K线），并在后台线程中预取下一段，
+回测循环处理当前段的同时下一段已在加载。
+
+每段面板都按同一股票列表和字段顺序对齐，回测引擎可以复用同一个行情快照；
+上一段末尾的 keep_bars 根K线拼接在下一段之前，历史窗口和增量指标在分段之间保持连续。
+"""
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from khCalendar import get_trade_calendar, to_day
+from khMarket import MarketPanel
+
+
+def chunk_ranges(start_date: str, end_date: str, chunk_days: int) -> List[Tuple[str, str]]:
+    """把回测区间按交易日切分为首尾相接的日期段
+
+    相邻两段之间不留空隙（下一段从上一段最后一个交易日的次日开始），
+    因此即使数据中有交易日历之外的日期也不会遗漏。
+
+    Args:
+        start_date: 开始日期 YYYYMMDD
+        end_date: 结束日期 YYYYMMDD
+        chunk_days: 每段的交易日数量
+
+    Returns:
+        List[Tuple[str, str]]: [(开始日期, 结束日期)]，YYYYMMDD 格式
+    """
+    start, end = to_day(start_date), to_day(end_date)
+    get_trade_calendar(start)
+    days = get_trade_calendar(end).trade_days_between(start, end)
+    ranges = []
+    begin = start
+    for i in range(chunk_days - 1, len(days) - 1, max(1, chunk_days)):
+        ranges.append((begin, days[i]))
+        begin = days[i] + 1
+    ranges.append((begin, end))
+    return [(str(a).replace("-", ""), str(b).replace("-", "")) for a, b in ranges if a <= b]
+
+
+class PanelStream:
+    """按日期段依次加载行情面板，后台预取下一段"""
+
+    def __init__(self, load: Callable[[str, str, bool], Optional[MarketPanel]], ranges: Sequence[Tuple[str, str]],
+                 codes: Sequence[str], keep_bars: int = 0, prefetch: bool = True):
+        """初始化
+
+        Args:
+            load: 加载函数 load(开始日期, 结束日期, 是否第一段) -> MarketPanel，没有数据时返回None；
+                第一段（还没有任何数据时）需要连同预热区间一起加载
+            ranges: 回测区间的日期段，见 chunk_ranges
+            codes: 股票池，每段面板都按此顺序对齐
+            keep_bars: 切换分段时保留的上一段末尾K线数（历史窗口和预热需要的长度）
+            prefetch: 是否在后台线程中预取下一段
+        """
+        self.load = load
+        self.ranges = list(ranges)
+        self.codes = list(codes)
+        self.keep_bars = max(0, int(keep_bars))
+        self.index = -1  # 当前段序号
+        self.bars_loaded = 0  # 已加载的回测K线数（不含保留的预热K线）
+        self._fields = None
+        self._previous: Optional[MarketPanel] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="khStream") if prefetch else None
+        self._pending: Optional[Future] = None
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    @property
+    def current_range(self) -> Optional[Tuple[str, str]]:
+        """当前段的日期区间"""
+        return self.ranges[self.index] if 0 <= self.index < len(self.ranges) else None
+
+    def _load(self, index: int, first: bool) -> Optional[MarketPanel]:
+        start, end = self.ranges[index]
+        return self.load(start, end, first)
+
+    def _submit(self, index: int):
+        if self._executor is not None and index < len(self.ranges):
+            self._pending = self._executor.submit(self._load, index, self._previous is None)
+
+    def _align(self, panel: MarketPanel) -> MarketPanel:
+        """按股票池和第一段的字段对齐"""
+        if self._fields is None:
+            self._fields = (list(panel.numeric_fields), list(panel.object_fields))
+        return panel.reindex(self.codes, *self._fields)
+
+    def next_segment(self) -> Optional[Tuple[MarketPanel, int]]:
+        """加载下一段
+
+        Returns:
+            Optional[Tuple[MarketPanel, int]]: (面板, 回测起始下标)；面板前面是保留的上一段末尾K线，
+            起始下标之前的K线只供历史窗口读取。所有段处理完时返回None
+        """
+        while self.index + 1 < len(self.ranges):
+            self.index += 1
+            if self._pending is not None:
+                panel = self._pending.result()
+                self._pending = None
+            else:
+                panel = self._load(self.index, self._previous is None)
+            if panel is None or len(panel) == 0:
+                logging.info(f"流式回测分段 {self.current_range} 没有数据，跳过")
+                continue
+            panel = self._align(panel)
+            if self._previous is None:
+                start_bar = 0
+                combined = panel
+            else:
+                tail = self._previous.slice(max(0, len(self._previous) - self.keep_bars)) if self.keep_bars else \
+                    self._previous.slice(len(self._previous))
+                start_bar = len(tail)
+                combined = MarketPanel.concat([tail, panel])
+            self._previous = combined
+            self.bars_loaded += len(combined) - start_bar
+            # 当前段就绪后再预取下一段，此时已能确定下一段是否需要从预热区间开始加载
+            self._submit(self.index + 1)
+            return combined, start_bar
+        return None
+
+    def estimate_total(self, first_bars: int) -> int:
+        """按第一段的K线数估算整个回测的K线数（用于进度显示）"""
+        return max(first_bars, int(round(first_bars * len(self.ranges))))
+
+    def close(self):
+        """停止预取并释放面板"""
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._previous = None
@@ -0,0 +1,300 @@
+# coding: utf-8
+"""
+参数优化模块
+
+行情数据只在主进程加载一次，放入 multiprocessing.shared_memory，
+各工作进程直接把共享内存映射为 MarketPanel（不复制数据），
+再把参数组合分发到进程池中并行运行无界面回测，最终汇总成一张结果表。
+
+用法示例：
+    sweep = ParamSweep("strategies/双均线.kh", "strategies/双均线.py",
+                       {"fast": [5, 10], "slow": [20, 30, 60]})
+    results = sweep.run()
+    results.to_csv("sweep_results.csv", index=False)
+
+参数名不带"."时作为策略参数写入配置的 strategy_params 节（策略中用 khParam 读取），
+带"."时按路径覆盖配置项，如 "backtest.trade_cost.commission_rate"。
+会改变行情数据本身的配置项（data.*、回测区间、触发方式）不能参与优化。
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from khMarket import MarketPanel
+from khProvider import create_provider, get_provider, set_provider
+
+# 参与优化时会导致共享行情失效的配置项
+FIXED_CONFIG_PREFIXES = ("data.", "backtest.start_time", "backtest.end_time", "backtest.trigger",
+                         "backtest.warmup_bars")
+
+# 年化使用的交易日数，与回测结果窗口保持一致
+TRADING_DAYS_PER_YEAR = 250
+
+
+class SharedPanel:
+    """放在共享内存中的行情面板
+
+    主进程创建并持有共享内存，工作进程通过 spec 以只读视图方式挂载。
+    非数值字段无法放入共享内存，不会传给工作进程。
+    """
+
+    ARRAYS = ("times", "values", "valid")
+
+    def __init__(self, panel: MarketPanel):
+        """把面板数组复制到共享内存
+
+        Args:
+            panel: 主进程加载的行情面板
+        """
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.spec = {
+            "codes": list(panel.codes),
+            "numeric_fields": list(panel.numeric_fields),
+            "arrays": {},
+        }
+        if panel.object_fields:
+            logging.warning(f"非数值字段 {panel.object_fields} 无法放入共享内存，参数优化时不可用")
+        try:
+            for name in self.ARRAYS:
+                array = np.ascontiguousarray(getattr(panel, name))
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                self.spec["arrays"][name] = (block.name, array.shape, array.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def nbytes(self) -> int:
+        """共享内存占用字节数"""
+        return sum(block.size for block in self._blocks)
+
+    @staticmethod
+    def attach(spec: Dict):
+        """在工作进程中挂载共享内存面板
+
+        Args:
+            spec: SharedPanel.spec
+
+        Returns:
+            tuple: (MarketPanel, 共享内存句柄列表)。句柄需在面板使用期间保持引用
+        """
+        blocks = []
+        arrays = {}
+        for name, (block_name, shape, dtype) in spec["arrays"].items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            array.flags.writeable = False
+            arrays[name] = array
+        panel = MarketPanel(arrays["times"], spec["codes"], spec["numeric_fields"], [],
+                            arrays["values"], arrays["valid"])
+        return panel, blocks
+
+    def close(self):
+        """释放共享内存"""
+        for block in self._blocks:
+            try:
+                block.close()
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def expand_grid(param_grid: Union[Dict[str, List[Any]], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """展开参数网格
+
+    Args:
+        param_grid: {参数名: 候选值列表}（笛卡尔积展开）或参数组合列表
+
+    Returns:
+        List[Dict[str, Any]]: 参数组合列表
+    """
+    if isinstance(param_grid, dict):
+        names = list(param_grid.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*(param_grid[n] for n in names))]
+    return [dict(combo) for combo in param_grid]
+
+
+def summarize_records(records: Dict, risk_free_rate: float = 0.0) -> Dict[str, float]:
+    """根据回测记录计算汇总指标
+
+    Args:
+        records: KhQuantFramework.backtest_records
+        risk_free_rate: 无风险利率（年化）
+
+    Returns:
+        Dict[str, float]: 汇总指标
+    """
+    init_capital = float(records.get("init_capital", 0) or 0)
+    daily_stats = records.get("daily_stats", [])
+    assets = np.array([stat["total_asset"] for stat in daily_stats], dtype=np.float64)
+    trade_count = len(records.get("trades", []))
+
+    if len(assets) == 0 or init_capital <= 0:
+        return {
+            "final_asset": init_capital, "total_return": 0.0, "annual_return": 0.0,
+            "max_drawdown": 0.0, "volatility": 0.0, "sharpe": 0.0,
+            "trade_count": trade_count, "days": len(assets),
+        }
+
+    total_return = assets[-1] / init_capital - 1
+    days = len(assets)
+    annual_return = (1 + total_return) ** (TRADING_DAYS_PER_YEAR / days) - 1 if total_return > -1 else -1.0
+
+    peaks = np.maximum.accumulate(np.concatenate(([init_capital], assets)))[1:]
+    max_drawdown = float(np.max((peaks - assets) / peaks)) if days else 0.0
+
+    returns = np.diff(np.concatenate(([init_capital], assets))) / np.concatenate(([init_capital], assets[:-1]))
+    volatility = float(np.std(returns, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)) if days > 1 else 0.0
+    sharpe = (annual_return - risk_free_rate) / volatility if volatility > 0 else 0.0
+
+    return {
+        "final_asset": float(assets[-1]),
+        "total_return": float(total_return),
+        "annual_return": float(annual_return),
+        "max_drawdown": max_drawdown,
+        "volatility": volatility,
+        "sharpe": float(sharpe),
+        "trade_count": trade_count,
+        "days": days,
+    }
+
+
+# ----------------------------------------------------------------------
+# 工作进程
+# ----------------------------------------------------------------------
+_worker = {}
+
+
+def _init_worker(spec: Dict, config_path: str, strategy_file: str, risk_free_rate: float, provider=None):
+    """工作进程初始化：切换到主进程的数据源，挂载共享内存面板
+
+    provider 为主进程数据源的 (名称, 构造参数)，或无法按名称重建时的数据源实例本身
+    """
+    if isinstance(provider, tuple):
+        name, kwargs = provider
+        provider = create_provider(name, **kwargs)
+    if provider is not None:
+        set_provider(provider)
+    panel, blocks = SharedPanel.attach(spec)
+    _worker.update(panel=panel, blocks=blocks, config_path=config_path,
+                   strategy_file=strategy_file, risk_free_rate=risk_free_rate)
+
+
+def _run_combination(index: int, params: Dict[str, Any]):
+    """在工作进程中运行一组参数的回测"""
+    from khFrame import KhQuantFramework
+
+    start = time.time()
+    framework = KhQuantFramework(_worker["config_path"], _worker["strategy_file"], config_overrides=params)
+    records = framework.run_on_panel(_worker["panel"])
+    metrics = summarize_records(records, _worker["risk_free_rate"])
+    metrics["elapsed"] = time.time() - start
+    return index, metrics
+
+
+class ParamSweep:
+    """并行参数优化器"""
+
+    def __init__(self, config_path: str, strategy_file: str,
+                 param_grid: Union[Dict[str, List[Any]], List[Dict[str, Any]]],
+                 processes: Optional[int] = None, risk_free_rate: float = 0.0,
+                 download: bool = False):
+        """初始化
+
+        Args:
+            config_path: 回测配置文件（.kh）路径
+            strategy_file: 策略文件路径
+            param_grid: 参数网格或参数组合列表
+            processes: 工作进程数，默认为CPU核数
+            risk_free_rate: 计算夏普比率使用的无风险利率
+            download: 加载行情前是否先补充下载历史数据
+        """
+        self.config_path = config_path
+        self.strategy_file = strategy_file
+        self.combinations = expand_grid(param_grid)
+        self.processes = processes or os.cpu_count() or 1
+        self.risk_free_rate = risk_free_rate
+        self.download = download
+
+        for combo in self.combinations:
+            for key in combo:
+                if key.startswith(FIXED_CONFIG_PREFIXES):
+                    raise ValueError(f"配置项 {key} 会改变行情数据，不能参与参数优化")
+
+    def load_panel(self) -> MarketPanel:
+        """在主进程中加载一次行情面板"""
+        from khFrame import KhQuantFramework
+
+        framework = KhQuantFramework(self.config_path, self.strategy_file)
+        if self.download:
+            framework.init_data()
+        framework.is_running = True
+        panel = framework.load_market_panel(framework.get_stock_list())
+        if panel is None:
+            raise RuntimeError("没有加载到有效的行情数据，无法进行参数优化")
+        return panel
+
+    def run(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> pd.DataFrame:
+        """运行全部参数组合
+
+        Args:
+            progress_callback: 进度回调，参数为 (已完成数量, 总数量)
+
+        Returns:
+            pd.DataFrame: 每行一组参数及其汇总指标，按夏普比率降序排列
+        """
+        panel = self.load_panel()
+        total = len(self.combinations)
+        rows: List[Optional[Dict[str, Any]]] = [None] * total
+
+        with SharedPanel(panel) as shared:
+            logging.info(f"行情已放入共享内存 {shared.nbytes / 1024 / 1024:.1f}MB，"
+                         f"开始并行回测 {total} 组参数（{self.processes} 个进程）")
+            # 主进程不再需要面板副本
+            del panel
+            context = multiprocessing.get_context("spawn")
+            # spawn 启动的工作进程不会继承 set_provider() 设置的数据源
+            provider = get_provider()
+            provider_spec = provider.spec() or provider
+            with ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(shared.spec, self.config_path, self.strategy_file,
+                                               self.risk_free_rate, provider_spec)) as executor:
+                futures = {executor.submit(_run_combination, i, combo): i
+                           for i, combo in enumerate(self.combinations)}
+                done = 0
+                for future in as_completed(futures):
+                    index = futures[future]
+                    combo = self.combinations[index]
+                    try:
+                        _, metrics = future.result()
+                        rows[index] = {**combo, **metrics, "error": ""}
+                    except Exception as e:
+                        logging.error(f"参数组合 {combo} 回测失败: {str(e)}")
+                        rows[index] = {**combo, "error": str(e)}
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, total)
+
+        results = pd.DataFrame(rows)
+        if "sharpe" in results.columns:
+            results = results.sort_values("sharpe", ascending=False, na_position="last").reset_index(drop=True)
+        return results
@@ -3,8 +3,22 @@ from typing import Any, Dict, List, Optional
 import datetime
 from types import SimpleNamespace
 
-from xtquant.xttrader import XtQuantTraderCallback
-from xtquant import xtconstant
+try:
+    from xtquant.xttrader import XtQuantTraderCallback
+    from xtquant import xtconstant
+except ImportError:
+    # 未安装 xtquant 时（如在 Linux 上用 khProvider 的本地/合成数据源回测），使用取值相同的常量
+    XtQuantTraderCallback = object
+    xtconstant = SimpleNamespace(
+        SECURITY_ACCOUNT=2,
+        STOCK_BUY=23,
+        STOCK_SELL=24,
+        FIX_PRICE=11,
+        ORDER_SUCCEEDED=56,
+        DIRECTION_FLAG_LONG=48,
+        OFFSET_FLAG_OPEN=48,
+        OFFSET_FLAG_CLOSE=49,
+    )
 
 class KhTradeManager:
     """交易管理类"""
@@ -2,7 +2,8 @@
 # -*- coding: utf-8 -*-
 """
 miniQMT数据解析器
-使用xtquant.xtdata.get_local_data处理miniQMT的本地数据
+优先用 khDat 直接映射 .DAT 文件读取；无法识别记录布局时，
+使用xtquant.xtdata.get_local_data处理miniQMT的本地数据（经 khProvider 转发，可切换数据源）
 """
 
 import struct
@@ -12,11 +13,16 @@ import pandas as pd
 import numpy as np
 import logging
 
-try:
-    from xtquant.xtdata import get_local_data
-    XTDATA_AVAILABLE = True
-except ImportError:
-    XTDATA_AVAILABLE = False
+from khDat import open_dat
+from khProvider import xtdata, provider_available
+
+
+def get_local_data(*args, **kwargs):
+    """经当前行情数据源读取本地数据，参数与 xtdata.get_local_data 相同"""
+    return xtdata.get_local_data(*args, **kwargs)
+
+
+if not provider_available():
     logging.warning("xtquant未安装，将使用示例数据")
 
 
@@ -40,7 +46,8 @@ class MiniQMTDataParser:
         """
         data = []
         
-        if not XTDATA_AVAILABLE:
+        native_data = self._read_native(file_path, 'tick', max_records)
+        if native_data is None and not provider_available():
             self.logger.warning("xtquant不可用，无法解析tick数据")
             return []
             
@@ -64,7 +71,7 @@ class MiniQMTDataParser:
             # 如果max_records为None，使用一个很大的数值表示不限制
             count_limit = max_records if max_records is not None else 10000000  # 1000万条，基本相当于无限制
             
-            tick_data = get_local_data(
+            tick_data = native_data if native_data is not None else get_local_data(
                 field_list=[],  # 空列表表示获取所有字段
                 stock_list=[full_stock_code],
                 period='tick',
@@ -362,6 +369,34 @@ class MiniQMTDataParser:
         else:
             return f"{stock_code}.SH"  # 默认上交所
     
+    def _open_native(self, file_path, period_type=None):
+        """用 khDat 直接映射 .DAT 文件，无法识别记录布局时返回 None"""
+        try:
+            return open_dat(file_path, period_type)
+        except (OSError, ValueError) as e:
+            self.logger.debug(f"无法直接读取 {file_path}: {e}")
+            return None
+    
+    def _read_native(self, file_path, period_type, max_records):
+        """
+        直接读取 .DAT 文件，返回与 get_local_data 相同的 {股票代码: DataFrame}
+        
+        Args:
+            file_path: 数据文件路径
+            period_type: 周期类型
+            max_records: 最大记录数，与 get_local_data 的 count 一样取最后若干条
+            
+        Returns:
+            dict: 无法直接读取时返回 None
+        """
+        dat = self._open_native(file_path, period_type)
+        if dat is None or not dat.code:
+            return None
+        with dat:
+            df = dat.to_frame(count=max_records if max_records is not None else -1)
+        self.logger.info(f"直接读取 {os.path.basename(file_path)}: 布局 {dat.layout.name}，{len(df)} 条")
+        return {dat.code: df}
+    
     def _process_tick_array(self, tick_array, max_records):
         """处理tick数据数组"""
         data = []
@@ -560,7 +595,8 @@ class MiniQMTDataParser:
         """
         data = []
         
-        if not XTDATA_AVAILABLE:
+        native_data = self._read_native(file_path, period_type, max_records)
+        if native_data is None and not provider_available():
             self.logger.warning("xtquant不可用，无法解析K线数据")
             return []
             
@@ -580,7 +616,7 @@ class MiniQMTDataParser:
             # 如果max_records为None，使用一个很大的数值表示不限制
             count_limit = max_records if max_records is not None else 10000000  # 1000万条，基本相当于无限制
             
-            kline_data = get_local_data(
+            kline_data = native_data if native_data is not None else get_local_data(
                 field_list=[],  # 空列表表示获取所有字段
                 stock_list=[full_stock_code],
                 period=period_type,
@@ -1100,11 +1136,17 @@ class MiniQMTDataParser:
         Returns:
             int: 记录数量
         """
-        # 优先使用文件大小估算方法，更可靠
+        # 能识别记录布局时，记录数由文件大小和记录长度精确算出
+        dat = self._open_native(file_path, period_type)
+        if dat is not None:
+            with dat:
+                return dat.count
+        
+        # 否则使用文件大小估算方法
         estimated_count = self._estimate_record_count_by_filesize(file_path)
         
         # 如果xtquant可用，尝试验证
-        if XTDATA_AVAILABLE and estimated_count > 0:
+        if provider_available() and estimated_count > 0:
             try:
                 # 从文件路径提取股票代码
                 stock_code = self._extract_stock_code_from_kline_path(file_path)
@@ -1248,6 +1290,15 @@ class MiniQMTDataParser:
             else:
                 period_type = '1d'  # 默认
             
+            # 能识别记录布局时直接给出布局、记录长度和记录数
+            dat = self._open_native(file_path)
+            if dat is not None:
+                with dat:
+                    info['format'] = f'{dat.period}_{dat.layout.name}'
+                    info['record_size'] = dat.layout.record_size
+                    info['record_count'] = dat.count
+                return info
+            
             # 获取真实记录数
             record_count = self.get_real_record_count(file_path, period_type)
             info['record_count'] = record_count
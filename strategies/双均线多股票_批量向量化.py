@@ -0,0 +1,33 @@
+# coding: utf-8  # 源文件编码
+# 策略说明：
+# - 策略名称：双均线多股票（批量向量化模式）
+# - 功能：对股票池内每只股票，短均线上穿长均线买入，下穿卖出（周期由 strategy_params 的 fast/slow 配置，默认5/20）
+# - 实现方式：实现 khHandlebarBatch，一次性拿到整段行情面板，用 pandas 对所有股票同时计算均线，
+#   返回 时间×股票 的信号矩阵，由回测框架逐K线回放撮合
+# - 与逐K线版本的区别：均线只计算一次，无需在每根K线上调用 khHistory/MA
+from khQuantImport import *  # 统一导入工具与指标
+
+def init(stocks=None, data=None):  # 策略初始化（无需特殊处理）
+    """本策略不需初始化"""
+    pass  # 占位
+
+
+def khHandlebarBatch(panel, data: Dict):  # 批量策略函数
+    """一次性计算整段回测区间的信号矩阵"""
+    fast = int(khParam(data, "fast", 5))  # 短均线周期（可在参数优化中调整）
+    slow = int(khParam(data, "slow", 20))  # 长均线周期
+    close = pd.DataFrame(panel.column("close"), columns=panel.codes).ffill()  # 时间×股票 收盘价
+    ma_fast = close.rolling(fast).mean().shift(1)  # 截至前一根K线的短均线（避免未来函数）
+    ma_slow = close.rolling(slow).mean().shift(1)  # 截至前一根K线的长均线
+    above = ma_fast > ma_slow  # 短均线在长均线之上
+    prev_above = above.shift(1, fill_value=False)  # 上一根K线的状态
+
+    signal = np.zeros(close.shape)  # 信号矩阵
+    signal[(above & ~prev_above & ma_slow.notna()).to_numpy()] = 0.5  # 金叉→0.5仓买入
+    signal[(~above & prev_above & ma_slow.notna()).to_numpy()] = -1.0  # 死叉→全部卖出
+    return {"signal": signal, "price": "open", "reason": "双均线交叉"}  # 以开盘价委托
+
+
+def khHandlebar(data: Dict) -> List[Dict]:  # 实盘/模拟模式下的逐K线入口
+    """批量模式仅用于回测，逐K线入口不产生信号"""
+    return []  # 无信号